@@ -44,6 +44,16 @@ class SearchConfig:
     SIMILARITY_WEIGHT_FACTOR: float = 2.0
     POSITION_BONUS_BASE: float = 2.0
     POSITION_BONUS_DECAY: float = 0.5
+    
+    # In-process vector index (database RPCs remain the fallback)
+    USE_LOCAL_VECTOR_INDEX: bool = True
+    LOCAL_INDEX_LOAD_PAGE_SIZE: int = 1000
+    
+    # Local hybrid search: "weighted" (similarity + normalized BM25) or "rrf" (reciprocal rank fusion)
+    HYBRID_FUSION_METHOD: str = "weighted"
+    RRF_K: int = 60
+    BM25_K1: float = 1.5
+    BM25_B: float = 0.75
 
 
 @dataclass
@@ -125,7 +135,8 @@ class EmbeddingConfig:
     TASK_TYPE_QUERY: str = "retrieval_query"
     
     EMBEDDING_DIMENSION: int = 768
-    BATCH_SIZE: int = 10
+    BATCH_SIZE: int = 50
+    MAX_CONCURRENT_BATCHES: int = 4
     MAX_INPUT_LENGTH: int = 8192
     
     MAX_RETRIES: int = 3
@@ -168,6 +179,15 @@ class DatabaseConfig:
     CONTEXTUAL_SEARCH_FUNCTION: str = "contextual_search"
     ANALYTICS_FUNCTION: str = "log_search_analytics"
     LOG_ANALYTICS_FUNCTION: str = "log_search_analytics"
+    LOG_ANALYTICS_BULK_FUNCTION: str = "log_search_analytics_bulk"
+    BULK_INSERT_CHUNKS_FUNCTION: str = "insert_document_chunks_bulk"
+    RECORD_KEY_USAGE_BULK_FUNCTION: str = "record_api_key_usage_bulk"
+    KEY_USAGE_ROLLUPS_TABLE: str = "api_key_usage_rollups"
+    KEY_USAGE_MAINTENANCE_FUNCTION: str = "maintain_api_key_usage_partitions"
+    INGESTION_JOBS_TABLE: str = "ingestion_jobs"
+    CORPUS_WATERMARK_TABLE: str = "corpus_watermark"
+    CORPUS_CHANGES_TABLE: str = "corpus_changes"
+    BULK_INSERT_BATCH_SIZE: int = 250
     
     MAX_CONNECTIONS: int = 20
     CONNECTION_TIMEOUT: int = 30
@@ -189,8 +209,70 @@ class PerformanceConfig:
     EMBEDDING_CACHE_SIZE: int = 1000
     EMBEDDING_CACHE_TTL_SECONDS: int = 3600
     
+    EMBEDDING_STORE_ENABLED: bool = True
+    EMBEDDING_STORE_PATH: str = ""
+    EMBEDDING_STORE_MAX_ENTRIES: int = 200000
+    EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS: float = 3600.0  # LRU access times are refreshed at most this often
+    
+    SEARCH_CACHE_ENABLED: bool = True
+    SEARCH_CACHE_SIZE: int = 500
+    SEARCH_CACHE_TTL_SECONDS: int = 600
+    # How often the shared corpus watermark is read (0 disables polling)
+    CORPUS_WATERMARK_POLL_SECONDS: float = 10.0
+    
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_SIZE: int = 300
+    ANSWER_CACHE_TTL_SECONDS: int = 1800
+    
+    # Off until the audited false-hit rate (semantic_cache.false_hit_rate_percent) justifies it
+    SEMANTIC_CACHE_ENABLED: bool = False
+    SEMANTIC_CACHE_THRESHOLD: float = 0.95
+    SEMANTIC_CACHE_MAX_ENTRIES: int = 1000
+    SEMANTIC_CACHE_TTL_SECONDS: int = 1800
+    SEMANTIC_CACHE_AUDIT_RATE: float = 0.1
+    SEMANTIC_CACHE_AUDIT_MIN_OVERLAP: float = 0.5
+    
+    EMBEDDING_MICRO_BATCHING_ENABLED: bool = True
+    EMBEDDING_BATCH_WINDOW_MS: int = 10
+    EMBEDDING_BATCH_MAX_SIZE: int = 32
+    
     LOG_SEARCH_ANALYTICS: bool = True
     LOG_PERFORMANCE_METRICS: bool = True
+    LOG_STAGE_TIMINGS: bool = True
+    INCLUDE_STAGE_TIMINGS: bool = False
+    
+    ANALYTICS_BUFFER_ENABLED: bool = True
+    ANALYTICS_BUFFER_MAX_SIZE: int = 5000
+    ANALYTICS_BATCH_SIZE: int = 100
+    ANALYTICS_FLUSH_INTERVAL_SECONDS: float = 2.0
+    ANALYTICS_MAX_BATCH_ATTEMPTS: int = 5
+    
+    KEY_USAGE_AGGREGATION_ENABLED: bool = True
+    KEY_USAGE_FLUSH_INTERVAL_SECONDS: float = 5.0
+    
+    KEY_RPM_LIMIT: int = 15
+    KEY_TPM_LIMIT: int = 1000000
+    KEY_ROTATION_MIN_HEADROOM: float = 0.2
+    KEY_LEASE_MAX_WAIT_SECONDS: float = 10.0
+    KEY_REFRESH_INTERVAL_SECONDS: int = 1800
+    KEY_REFRESH_AHEAD_RATIO: float = 0.8
+    
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_CHAT_CONCURRENCY: int = 32
+    SCHEDULER_TITLE_CONCURRENCY: int = 4
+    SCHEDULER_INGESTION_CONCURRENCY: int = 2
+    SCHEDULER_TITLE_MIN_HEADROOM: float = 0.1
+    SCHEDULER_INGESTION_MIN_HEADROOM: float = 0.3
+    
+    INGESTION_QUEUE_BACKEND: str = "supabase"  # "supabase" or "sqlite" (local stand-in)
+    INGESTION_QUEUE_SQLITE_PATH: str = ""
+    INGESTION_WORKERS: int = 2
+    INGESTION_LEASE_SECONDS: int = 300
+    INGESTION_MAX_ATTEMPTS: int = 5
+    INGESTION_RETRY_BASE_SECONDS: float = 10.0
+    INGESTION_RETRY_MAX_SECONDS: float = 600.0
+    INGESTION_IDLE_POLL_SECONDS: float = 5.0
+    INGESTION_PENDING_SWEEP_SECONDS: float = 30.0  # SQLite store only; the Supabase trigger queues pending documents
     
     TOKEN_ESTIMATION_MULTIPLIER: float = 1.3
     HEBREW_TOKEN_RATIO: float = 0.75
@@ -198,6 +280,8 @@ class PerformanceConfig:
     CONTEXT_TRIM_THRESHOLD: float = 0.8
     MAX_RETRIES: int = 3
     RETRY_BACKOFF_BASE: int = 5
+    
+    GEMINI_EXECUTOR_WORKERS: int = 16
 
 
 @dataclass
@@ -2,25 +2,76 @@ import asyncio
 import logging
 import os
 import time
-from typing import Dict, List, Optional, Any
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 from supabase import create_client, Client
 
+from .usage_aggregator import UsageAggregator, split_usage_rollups
+from .rate_governor import KeyRateGovernor
+
+try:
+    from ..utils.async_db import execute_async
+    from ..config.rag_config import get_performance_config, get_database_config
+except ImportError:
+    from src.ai.utils.async_db import execute_async
+    from src.ai.config.rag_config import get_performance_config, get_database_config
+
 logger = logging.getLogger(__name__)
 
+# Gemini errors meaning the key itself is over its rate limit or quota
+_RATE_LIMIT_MARKERS = ('quota', 'rate limit', 'resource_exhausted', '429')
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """Whether a Gemini API error reports that the key used is rate-limited"""
+    error_str = str(error).lower()
+    return any(marker in error_str for marker in _RATE_LIMIT_MARKERS)
+
+
+class KeyLease:
+    """An API key checked out for one request; release it through the key manager when done"""
+    
+    def __init__(self, key_data: Dict[str, Any]):
+        self.key_data = key_data
+        self.key_id = key_data.get('id')
+        self.key_name = key_data.get('key_name')
+        self.api_key = key_data.get('api_key') or key_data.get('key')
+        self.acquired_at = time.monotonic()
+        self.released = False
+
+
+@dataclass(frozen=True)
+class KeySnapshot:
+    """Keys loaded by one refresh; replaced as a whole, never mutated in place"""
+    keys: Tuple[Dict[str, Any], ...] = ()
+    version: int = 0
+    loaded_at: Optional[datetime] = None
+
+
+def _key_signature(keys) -> Tuple:
+    """Fields whose change is pushed to snapshot subscribers"""
+    return tuple(
+        (key_data.get('id'), key_data.get('api_key') or key_data.get('key'), key_data.get('minute_limit_requests'))
+        for key_data in keys
+    )
+
+
 class DatabaseKeyManager:
     """Database API key management system"""
     
     def __init__(self, use_direct_supabase: bool = False):
-        self.api_keys: List[Dict[str, Any]] = []
+        self._snapshot = KeySnapshot()
+        self._listeners: List[Callable[[KeySnapshot], None]] = []
         self.current_key_index = 0
         self.use_direct_supabase = use_direct_supabase
         self.last_refresh = None
-        self.refresh_interval = 1800  # 30 minutes
         
         self.key_usage_stats = {}
-        self.rotation_threshold = 3
         self.rate_limit_cooldown = 30
+        # Requests currently holding each key (by key id)
+        self.active_leases: Dict[Any, int] = {}
         
         if self.use_direct_supabase:
             supabase_url = os.getenv("SUPABASE_URL")
@@ -38,64 +89,159 @@ class DatabaseKeyManager:
             logger.info("DatabaseKeyManager initialized with HTTP client")
             
         self._auto_refresh_task = None
-        self._start_auto_refresh()
+        self._refresh_task = None
         self._initial_load_done = False
-
-    def _start_auto_refresh(self):
-        """Start background task for automatic key refresh"""
-        async def auto_refresh_loop():
-            while True:
-                try:
-                    await asyncio.sleep(self.refresh_interval)
-                    await self.refresh_keys()
-                    logger.info("Keys auto-refreshed successfully")
-                except Exception as e:
-                    logger.error(f"Auto-refresh failed: {e}")
-                    await asyncio.sleep(300)  # 5 minutes instead of 1 minute
         
+        performance_config = get_performance_config()
+        self.refresh_interval = getattr(performance_config, 'KEY_REFRESH_INTERVAL_SECONDS', 1800)
+        self.refresh_ahead_ratio = getattr(performance_config, 'KEY_REFRESH_AHEAD_RATIO', 0.8)
+        self.refresh_retry_min = 5.0
+        self.refresh_retry_max = 300.0
+        # Local RPM/TPM buckets per key drive rotation without any network calls
+        self.governor = KeyRateGovernor(
+            requests_per_minute=getattr(performance_config, 'KEY_RPM_LIMIT', 15),
+            tokens_per_minute=getattr(performance_config, 'KEY_TPM_LIMIT', 1000000)
+        )
+        self.rotation_min_headroom = getattr(performance_config, 'KEY_ROTATION_MIN_HEADROOM', 0.2)
+        self.lease_max_wait = getattr(performance_config, 'KEY_LEASE_MAX_WAIT_SECONDS', 10.0)
+        self.usage_bulk_function = getattr(get_database_config(), 'RECORD_KEY_USAGE_BULK_FUNCTION', 'record_api_key_usage_bulk')
+        self.usage_aggregator: Optional[UsageAggregator] = None
+        if getattr(performance_config, 'KEY_USAGE_AGGREGATION_ENABLED', True):
+            self.usage_aggregator = UsageAggregator(
+                self._write_usage_rows,
+                flush_interval=getattr(performance_config, 'KEY_USAGE_FLUSH_INTERVAL_SECONDS', 5.0)
+            )
+        
+        # Newly loaded keys get their per-key RPM limit pushed into the governor
+        self.subscribe(self._configure_governor)
+        self._ensure_refresher()
+
+    @property
+    def api_keys(self) -> Tuple[Dict[str, Any], ...]:
+        """Keys of the current snapshot"""
+        return self._snapshot.keys
+
+    @api_keys.setter
+    def api_keys(self, keys):
+        self._publish(keys)
+
+    @property
+    def snapshot(self) -> KeySnapshot:
+        return self._snapshot
+
+    def subscribe(self, callback: Callable[[KeySnapshot], None]):
+        """Call back with every new snapshot whose keys changed (and now, if keys are loaded)"""
+        self._listeners.append(callback)
+        if self._snapshot.keys:
+            self._notify(callback, self._snapshot)
+
+    def _notify(self, callback: Callable[[KeySnapshot], None], snapshot: KeySnapshot):
+        try:
+            callback(snapshot)
+        except Exception as e:
+            logger.warning(f"Key snapshot subscriber failed: {e}")
+
+    def _publish(self, keys, loaded_at: Optional[datetime] = None) -> KeySnapshot:
+        """Swap in a new snapshot; subscribers are only told when the key set changed"""
+        previous = getattr(self, '_snapshot', None) or KeySnapshot()
+        keys = tuple(keys or ())
+        changed = _key_signature(keys) != _key_signature(previous.keys)
+        snapshot = KeySnapshot(keys, previous.version + 1 if changed else previous.version, loaded_at or previous.loaded_at)
+        self._snapshot = snapshot
+        if changed:
+            for callback in list(getattr(self, '_listeners', ())):
+                self._notify(callback, snapshot)
+        return snapshot
+
+    def _configure_governor(self, snapshot: KeySnapshot):
+        for key_data in snapshot.keys:
+            self.governor.configure_key(key_data.get('id'), key_data.get('minute_limit_requests'))
+
+    def _ensure_refresher(self):
+        """Start the background refresher on the running loop unless one is already alive"""
+        task = self._auto_refresh_task
+        if task is not None and not task.done() and task.get_loop().is_running():
+            return
         try:
             loop = asyncio.get_running_loop()
-            self._auto_refresh_task = loop.create_task(auto_refresh_loop())
         except RuntimeError:
-            logger.info("Auto-refresh will start when event loop is available")
+            logger.info("Key refresher will start when event loop is available")
+            return
+        self._auto_refresh_task = loop.create_task(self._refresh_loop())
+
+    def _refresh_ahead_delay(self) -> float:
+        """Seconds until the current snapshot should be refreshed"""
+        if not self.last_refresh:
+            return 0.0
+        age = (datetime.now() - self.last_refresh).total_seconds()
+        return max(0.0, self.refresh_interval * self.refresh_ahead_ratio - age)
+
+    async def _refresh_loop(self):
+        """Refresh keys ahead of expiry; on failure keep serving the current snapshot and back off"""
+        retry_delay = self.refresh_retry_min
+        delay = self._refresh_ahead_delay() if self.api_keys else 0.0
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                refreshed = await self._refresh_shared()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Auto-refresh failed: {e}")
+                refreshed = False
+            if refreshed:
+                retry_delay = self.refresh_retry_min
+                logger.info("Keys auto-refreshed successfully")
+                # An empty key table is polled at the retry pace, never in a tight loop
+                delay = self._refresh_ahead_delay() if self.api_keys else self.refresh_retry_min
+            else:
+                delay = retry_delay
+                retry_delay = min(retry_delay * 2, self.refresh_retry_max)
+
+    async def _refresh_shared(self) -> bool:
+        """Run one refresh that every concurrent caller on this loop awaits together"""
+        task = self._refresh_task
+        if task is None or task.done() or task.get_loop() is not asyncio.get_running_loop():
+            task = self._refresh_task = asyncio.ensure_future(self.refresh_keys())
+        return await asyncio.shield(task)
+
+    async def start(self):
+        """Load keys and start the background refresher (call once at application startup)"""
+        await self._ensure_keys_loaded()
+
+    def _in_cooldown(self, key_id: Any, now: Optional[float] = None) -> bool:
+        """Whether the API rate-limited this key within the cooldown window"""
+        last_rate_limit = self.key_usage_stats.get(key_id, {}).get('last_rate_limit')
+        return bool(last_rate_limit) and (now or time.time()) - last_rate_limit < self.rate_limit_cooldown
 
     async def _should_rotate_key(self, key_data: Dict[str, Any]) -> bool:
-        """Check if current key should be rotated based on usage patterns"""
+        """Check if current key should be rotated, from local rate buckets only"""
         key_id = key_data.get('id')
         
-        usage_count = self.key_usage_stats.get(key_id, {}).get('count', 0)
-        if usage_count >= self.rotation_threshold:
-            logger.info(f"Key {key_data.get('key_name')} reached session rotation threshold ({usage_count} requests)")
+        if self._in_cooldown(key_id):
+            logger.info(f"Key {key_data.get('key_name')} still in rate-limit cooldown")
             return True
         
-        # Only check database usage occasionally (every 10th request per key)
-        try:
-            if not self.use_direct_supabase and usage_count % 10 == 0:
-                logger.debug(f"Performing periodic database usage check for key {key_id} (usage: {usage_count})")
-                response = await self.client.get(f"{self.base_url}/api/keys/")
-                if response.status_code == 200:
-                    data = response.json()
-                    if data.get('status') == 'ok':
-                        keys_status = data.get('key_management', {}).get('keys_status', [])
-                        for key_status in keys_status:
-                            if key_status.get('id') == key_id:
-                                current_minute_requests = key_status.get('requests_current_minute', 0)
-                                if current_minute_requests >= 12:
-                                    logger.info(f"Key {key_data.get('key_name')} high current minute usage ({current_minute_requests} requests)")
-                                    return True
-                                break
-        except Exception as e:
-            logger.debug(f"Could not check database usage for rotation: {e}")
-        
-        last_rate_limit = self.key_usage_stats.get(key_id, {}).get('last_rate_limit')
-        if last_rate_limit:
-            time_since_limit = time.time() - last_rate_limit
-            if time_since_limit < self.rate_limit_cooldown:
-                logger.info(f"Key {key_data.get('key_name')} still in cooldown ({int(self.rate_limit_cooldown - time_since_limit)}s remaining)")
-                return True
+        if not self.governor.can_admit(key_id) or self.governor.headroom(key_id) < self.rotation_min_headroom:
+            logger.info(f"Key {key_data.get('key_name')} is low on headroom ({self.governor.headroom(key_id):.2f})")
+            return True
         
         return False
 
+    def _select_key_index(self) -> Optional[int]:
+        """Index of the admissible key with the most headroom (fewest leases on ties), or None"""
+        now = time.time()
+        best_index = None
+        best_score = None
+        for index, key_data in enumerate(self.api_keys):
+            key_id = key_data.get('id')
+            if self._in_cooldown(key_id, now) or not self.governor.can_admit(key_id):
+                continue
+            score = (self.governor.headroom(key_id), -self.active_leases.get(key_id, 0))
+            if best_score is None or score > best_score:
+                best_index, best_score = index, score
+        return best_index
+
     async def _notify_backend_key_change(self, old_index: int, new_index: int):
         """Notify backend about key rotation for dashboard sync"""
         try:
@@ -131,75 +277,87 @@ class DatabaseKeyManager:
         except Exception as e:
             logger.warning(f"Could not restore last active key: {e}, starting from key 0")
 
-    async def refresh_keys(self):
-        """Refresh API keys from database"""
+    async def _fetch_keys(self) -> List[Dict[str, Any]]:
+        """Load active keys from Supabase or the backend API"""
+        if self.use_direct_supabase:
+            response = await execute_async(self.supabase.table('api_keys').select('*').eq('is_active', True))
+            return response.data or []
+        
         try:
-            if self.use_direct_supabase:
-                response = self.supabase.table('api_keys').select('*').eq('is_active', True).execute()
-                self.api_keys = response.data or []
-            else:
-                try:
-                    # Try fast endpoint first
-                    ai_response = await self.client.get(f"{self.base_url}/api/keys/for-ai-service")
-                    if ai_response.status_code == 200:
-                        ai_keys_data = ai_response.json()
-                        self.api_keys = ai_keys_data.get('keys', [])
-                        logger.info(f"Got {len(self.api_keys)} keys from fast endpoint")
-                    else:
-                        raise Exception("Fast endpoint failed")
-                except Exception as fast_error:
-                    logger.warning(f"Fast endpoint failed, using heavy endpoint: {fast_error}")
-                    # Fallback to heavy endpoint only if fast one fails
-                    response = await self.client.get(f"{self.base_url}/api/keys/")
-                    response.raise_for_status()
-                    keys_data = response.json()
-                    
-                    if keys_data.get('status') == 'ok' and 'key_management' in keys_data:
-                        keys_status = keys_data['key_management'].get('keys_status', [])
-                        self.api_keys = []
-                        for i, key_stat in enumerate(keys_status):
-                            self.api_keys.append({
-                                'id': key_stat.get('id', i + 8),
-                                'key_name': f'Key {i}',
-                                'is_active': True,
-                                'index': i
-                            })
-                    else:
-                        self.api_keys = keys_data.get('keys', [])
-            
-            self.last_refresh = datetime.now()
+            # Try fast endpoint first
+            ai_response = await self.client.get(f"{self.base_url}/api/keys/for-ai-service")
+            if ai_response.status_code == 200:
+                keys = ai_response.json().get('keys', [])
+                logger.info(f"Got {len(keys)} keys from fast endpoint")
+                return keys
+            raise Exception("Fast endpoint failed")
+        except Exception as fast_error:
+            logger.warning(f"Fast endpoint failed, using heavy endpoint: {fast_error}")
+        
+        # Fallback to heavy endpoint only if fast one fails
+        response = await self.client.get(f"{self.base_url}/api/keys/")
+        response.raise_for_status()
+        keys_data = response.json()
+        
+        if keys_data.get('status') == 'ok' and 'key_management' in keys_data:
+            keys_status = keys_data['key_management'].get('keys_status', [])
+            return [
+                {
+                    'id': key_stat.get('id', i + 8),
+                    'key_name': f'Key {i}',
+                    'is_active': True,
+                    'index': i
+                }
+                for i, key_stat in enumerate(keys_status)
+            ]
+        return keys_data.get('keys', [])
+
+    async def refresh_keys(self) -> bool:
+        """Refresh API keys from database into a new snapshot; returns False when the refresh failed"""
+        try:
+            keys = await self._fetch_keys()
+            self._publish(keys, loaded_at=datetime.now())
+            self.last_refresh = self._snapshot.loaded_at
             logger.info(f"Refreshed {len(self.api_keys)} API keys from database")
             
-            # After refreshing keys, try to restore the last active key
+            # After the first load, try to restore the last active key
             if not self._initial_load_done:
                 await self._restore_last_active_key()
+                self._initial_load_done = True
             
             # Verify that the index is valid
             if self.current_key_index >= len(self.api_keys):
                 self.current_key_index = 0
                 logger.warning(f"Key index out of range, reset to 0")
+            return True
                 
         except Exception as e:
             logger.error(f"Failed to refresh API keys: {e}")
             if not self.api_keys:
                 raise Exception("No API keys available and refresh failed")
+            return False
+
+    async def _ensure_keys_loaded(self):
+        """
+        Serve from the current snapshot; the background refresher keeps it fresh.
+        Only a cold start (no keys yet) waits, and concurrent callers share one load.
+        """
+        self._ensure_refresher()
+        if not self.api_keys:
+            await self._refresh_shared()
 
     async def get_available_key(self) -> Optional[Dict[str, Any]]:
         """Get next available API key with smart rotation"""
         try:
-            if not self._initial_load_done:
-                await self.refresh_keys()
-                self._initial_load_done = True
-            
-            if (not self.last_refresh or 
-                (datetime.now() - self.last_refresh).seconds > self.refresh_interval):
-                await self.refresh_keys()
+            await self._ensure_keys_loaded()
             
             key_data = await self._get_next_available_key()
             if not key_data:
                 raise Exception("No available API keys found")
             
             key_id = key_data.get('id')
+            # Callers use the key for a request without a lease, so charge it to the key's RPM bucket here
+            self.governor.take_request(key_id)
             if key_id not in self.key_usage_stats:
                 self.key_usage_stats[key_id] = {'count': 0, 'last_used': time.time()}
             
@@ -215,33 +373,109 @@ class DatabaseKeyManager:
 
     async def record_usage(self, key_id: int, tokens_used: int, requests_count: int = 1):
         """Record API key usage for analytics and rotation decisions"""
+        # Requests are taken from the bucket when a key is leased; tokens are charged here
+        self.governor.record_tokens(key_id, tokens_used)
+        
+        if self.usage_aggregator is not None:
+            self.usage_aggregator.add(key_id, tokens_used, requests_count)
+            logger.debug(f"Queued {tokens_used} tokens usage for key {key_id}")
+            return
+        
         try:
-            if self.use_direct_supabase:
-                from datetime import date, timezone
-                current_time_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
-                
-                self.supabase.table('api_key_usage').insert({
-                    'api_key_id': key_id,
-                    'usage_date': date.today().isoformat(),
-                    'usage_minute': current_time_utc.isoformat(),
-                    'tokens_used': tokens_used,
-                    'requests_count': requests_count
-                }).execute()
-            else:
-                await self.client.post(f"{self.base_url}/api/keys/{key_id}/usage", json={
-                    'tokens_used': tokens_used,
-                    'requests_count': requests_count
-                })
-                
+            await self._write_usage_rows([{
+                'api_key_id': key_id,
+                'tokens_used': tokens_used,
+                'requests_count': requests_count
+            }])
             logger.info(f"Recorded {tokens_used} tokens usage for key {key_id}")
         except Exception as e:
             logger.error(f"Failed to record usage: {e}")
 
+    async def _write_usage_rows(self, rows: List[Dict[str, Any]]):
+        """Write usage rows: one bulk upsert RPC directly, or one backend call per row over HTTP"""
+        if self.use_direct_supabase:
+            from datetime import date, timezone
+            current_minute_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0).isoformat()
+            rows = [{
+                'usage_date': date.today().isoformat(),
+                'usage_minute': current_minute_utc,
+                **row
+            } for row in rows]
+            await execute_async(self.supabase.rpc(self.usage_bulk_function, {'p_rows': rows}))
+        else:
+            for row in rows:
+                response = await self.client.post(f"{self.base_url}/api/keys/{row['api_key_id']}/usage", json={
+                    'tokens_used': row['tokens_used'],
+                    'requests_count': row['requests_count']
+                })
+                response.raise_for_status()
+
+    async def acquire_key(self) -> Optional[KeyLease]:
+        """
+        Lease the key with the most rate headroom (skipping keys in rate-limit cooldown).
+        When every key is saturated, wait briefly for a bucket to refill instead of failing.
+        No network calls are made per request, so concurrent requests spread across all keys.
+        """
+        try:
+            await self._ensure_keys_loaded()
+        except Exception as e:
+            logger.error(f"Error loading keys for lease: {e}")
+        
+        if not self.api_keys:
+            return None
+        
+        deadline = time.monotonic() + self.lease_max_wait
+        while True:
+            index = self._select_key_index()
+            if index is not None:
+                break
+            wait = min(self.governor.wait_time(key_data.get('id')) for key_data in self.api_keys)
+            wait = max(wait, 0.05)
+            if time.monotonic() + wait > deadline:
+                logger.warning(f"All {len(self.api_keys)} API keys are saturated; no key leased")
+                return None
+            logger.debug(f"All API keys saturated, waiting {wait:.2f}s for headroom")
+            await asyncio.sleep(wait)
+        
+        key_data = self.api_keys[index]
+        key_id = key_data.get('id')
+        now = time.time()
+        
+        self.governor.take_request(key_id)
+        self.current_key_index = index
+        self.active_leases[key_id] = self.active_leases.get(key_id, 0) + 1
+        stats = self.key_usage_stats.setdefault(key_id, {'count': 0, 'last_used': now})
+        stats['count'] += 1
+        stats['last_used'] = now
+        
+        logger.debug(f"Leased key {key_data.get('key_name')} ({self.active_leases[key_id]} in flight)")
+        return KeyLease(key_data)
+
+    def release_key(self, lease: Optional[KeyLease]):
+        """Return a leased key; safe to call more than once"""
+        if lease is None or lease.released:
+            return
+        lease.released = True
+        remaining = self.active_leases.get(lease.key_id, 0) - 1
+        if remaining > 0:
+            self.active_leases[lease.key_id] = remaining
+        else:
+            self.active_leases.pop(lease.key_id, None)
+
+    @asynccontextmanager
+    async def lease_key(self) -> AsyncIterator[Optional[KeyLease]]:
+        """Lease a key for the duration of a request"""
+        lease = await self.acquire_key()
+        try:
+            yield lease
+        finally:
+            self.release_key(lease)
+
     async def mark_rate_limited(self, key_id: int):
         """Mark a key as rate-limited for temporary avoidance"""
-        if key_id in self.key_usage_stats:
-            self.key_usage_stats[key_id]['last_rate_limit'] = time.time()
-            logger.warning(f"Key {key_id} marked as rate-limited")
+        self.key_usage_stats.setdefault(key_id, {'count': 0, 'last_used': time.time()})['last_rate_limit'] = time.time()
+        self.governor.drain(key_id)
+        logger.warning(f"Key {key_id} marked as rate-limited")
 
     async def ensure_available_key(self) -> Optional[Dict[str, Any]]:
         """Backward compatibility - same as get_available_key"""
@@ -257,17 +491,19 @@ class DatabaseKeyManager:
             'total_keys': len(self.api_keys),
             'current_key_index': self.current_key_index,
             'last_refresh': self.last_refresh.isoformat() if self.last_refresh else None,
+            'snapshot_version': self._snapshot.version,
+            'refresher_running': bool(self._auto_refresh_task and not self._auto_refresh_task.done()),
             'key_usage_stats': self.key_usage_stats,
-            'rotation_threshold': self.rotation_threshold
+            'active_leases': dict(self.active_leases),
+            'rate_buckets': self.governor.snapshot(),
+            'usage_aggregator': self.usage_aggregator.get_stats() if self.usage_aggregator else None
         }
 
     async def get_detailed_status(self) -> Dict[str, Any]:
         """Get detailed status with all keys information for frontend display"""
         logger.info("Getting detailed status...")
         
-        if not self._initial_load_done:
-            await self.refresh_keys()
-            self._initial_load_done = True
+        await self._ensure_keys_loaded()
         
         try:
             from datetime import date, timezone, datetime
@@ -276,38 +512,17 @@ class DatabaseKeyManager:
             
             key_ids = [key_data.get('id') for key_data in self.api_keys]
             
-            daily_response = self.supabase.table("api_key_usage")\
-                .select("api_key_id,tokens_used,requests_count")\
-                .in_("api_key_id", key_ids)\
-                .eq("usage_date", today)\
-                .execute()
+            # One trigger-maintained rollup row per key instead of scanning api_key_usage
+            rollups_table = getattr(get_database_config(), 'KEY_USAGE_ROLLUPS_TABLE', 'api_key_usage_rollups')
+            rollup_response = await execute_async(
+                self.supabase.table(rollups_table).select("*").in_("api_key_id", key_ids)
+            )
+            daily_usage, minute_usage = split_usage_rollups(rollup_response.data, today, current_minute_utc)
             
-            minute_response = self.supabase.table("api_key_usage")\
-                .select("api_key_id,tokens_used,requests_count")\
-                .in_("api_key_id", key_ids)\
-                .eq("usage_minute", current_minute_utc.isoformat())\
-                .execute()
-            
-            daily_usage = {}
-            for row in daily_response.data:
-                key_id = row["api_key_id"]
-                if key_id not in daily_usage:
-                    daily_usage[key_id] = {"tokens": 0, "requests": 0}
-                daily_usage[key_id]["tokens"] += row["tokens_used"]
-                daily_usage[key_id]["requests"] += row["requests_count"]
-            
-            minute_usage = {}
-            for row in minute_response.data:
-                key_id = row["api_key_id"]
-                if key_id not in minute_usage:
-                    minute_usage[key_id] = {"tokens": 0, "requests": 0}
-                minute_usage[key_id]["tokens"] += row["tokens_used"]
-                minute_usage[key_id]["requests"] += row["requests_count"]
-            
-            logger.info(f"Batch query complete: {len(daily_response.data)} daily records, {len(minute_response.data)} minute records")
+            logger.info(f"Rollup query complete: {len(rollup_response.data or [])} key rows")
             
         except Exception as e:
-            logger.error(f"Error in batch queries: {e}")
+            logger.error(f"Error reading usage rollups: {e}")
             daily_usage = {}
             minute_usage = {}
         
@@ -367,6 +582,25 @@ class DatabaseKeyManager:
         logger.info(f"Returning optimized status with {len(keys_status)} keys, current: {self.current_key_index}")
         return result
 
+    async def close(self):
+        """Flush pending usage, stop the key refresher and release the HTTP client"""
+        if self.usage_aggregator is not None:
+            await self.usage_aggregator.close()
+        
+        if self._auto_refresh_task and not self._auto_refresh_task.done():
+            self._auto_refresh_task.cancel()
+            try:
+                await self._auto_refresh_task
+            except (asyncio.CancelledError, Exception):
+                pass
+        self._auto_refresh_task = None
+        
+        if not self.use_direct_supabase:
+            try:
+                await self.client.aclose()
+            except Exception as e:
+                logger.debug(f"Error closing key manager HTTP client: {e}")
+
     def __del__(self):
         """Clean up background tasks"""
         if self._auto_refresh_task and not self._auto_refresh_task.done():
@@ -375,58 +609,33 @@ class DatabaseKeyManager:
     async def _get_next_available_key(self) -> Optional[Dict[str, Any]]:
         """Find next available key with intelligent rotation"""
         if not self.api_keys:
-            await self.refresh_keys()
+            await self._ensure_keys_loaded()
         
         if not self.api_keys:
             return None
         
-        # Smarter selection of the next key
         old_index = self.current_key_index
         
-        # Instead of always moving to the next key, first check if current key is still available
-        # Only rotate if there's a reason (e.g. usage threshold)
-        should_rotate = False
-        
-        if self.api_keys and old_index < len(self.api_keys):
-            current_key = self.api_keys[old_index]
-            key_id = current_key.get('id')
-            
-            # Check if rotation is needed based on usage
-            usage_count = self.key_usage_stats.get(key_id, {}).get('count', 0)
-            if usage_count >= self.rotation_threshold:
-                should_rotate = True
-                logger.info(f"Key {current_key.get('key_name')} reached rotation threshold ({usage_count})")
-        else:
-            should_rotate = True  # No valid current key
+        # Keep the current key while it has headroom; otherwise move to the key with the most
+        should_rotate = True
+        if old_index < len(self.api_keys):
+            should_rotate = await self._should_rotate_key(self.api_keys[old_index])
         
         if should_rotate:
-            # Smart rotation - looking for key with low usage
-            best_key_index = (old_index + 1) % len(self.api_keys)
-            min_usage = float('inf')
-            
-            for i in range(len(self.api_keys)):
-                check_index = (old_index + 1 + i) % len(self.api_keys)
-                key_data = self.api_keys[check_index]
-                key_id = key_data.get('id')
-                usage_count = self.key_usage_stats.get(key_id, {}).get('count', 0)
-                
-                # Prefer key with lower usage
-                if usage_count < min_usage:
-                    min_usage = usage_count
-                    best_key_index = check_index
-                
-                # If found a key without usage, use it immediately
-                if usage_count == 0:
-                    break
-            
-            self.current_key_index = best_key_index
-            logger.info(f"🔄 [KEY-ROTATION] Intelligent rotation: {old_index} → {self.current_key_index} (usage: {min_usage})")
+            best_index = self._select_key_index()
+            if best_index is None:
+                # Every key is saturated; stay put rather than fail, the lease path queues instead
+                best_index = old_index if old_index < len(self.api_keys) else 0
+                logger.warning("All API keys are low on headroom, keeping current key")
+            self.current_key_index = best_index
+            if self.current_key_index != old_index:
+                logger.info(f"🔄 [KEY-ROTATION] {old_index} → {self.current_key_index} "
+                            f"(headroom: {self.governor.headroom(self.api_keys[best_index].get('id')):.2f})")
+                # Update backend about the new key for dashboard sync
+                await self._notify_backend_key_change(old_index, self.current_key_index)
         else:
-            logger.info(f"♻️ [KEY-REUSE] Continuing with current key {self.current_key_index}")
-        
-        # Update backend about the new key (even if not changed)
-        await self._notify_backend_key_change(old_index, self.current_key_index)
+            logger.debug(f"♻️ [KEY-REUSE] Continuing with current key {self.current_key_index}")
         
         current_key = self.api_keys[self.current_key_index]
         logger.info(f"Selected key: {current_key.get('key_name', f'Key {self.current_key_index}')} (index: {self.current_key_index})")
-        return current_key
\ No newline at end of file
+        return current_key
@@ -8,7 +8,8 @@ from typing import Optional, List, Dict, Any
 import google.generativeai as genai
 from .token_persistence import TokenUsagePersistence
 import asyncio
-from .database_key_manager import DatabaseKeyManager
+from .database_key_manager import DatabaseKeyManager, is_rate_limit_error
+from .request_scheduler import LANE_INGESTION, scheduled
 
 logger = logging.getLogger(__name__)
 
@@ -95,9 +96,20 @@ class GeminiKeyManager:
     async def _load_keys_from_database(self):
         """Load keys from database"""
         await self.database_manager.refresh_keys()
-        self.api_keys = [key["api_key"] for key in self.database_manager.api_keys]
+        # Applies the loaded keys now and every later refresh that changes them
+        self.database_manager.subscribe(self._apply_key_snapshot)
         print(f"Loaded {len(self.api_keys)} keys from database")
 
+    def _apply_key_snapshot(self, snapshot):
+        """Follow key changes pushed by the database manager"""
+        self.api_keys = [key["api_key"] for key in snapshot.keys if key.get("api_key")]
+        usage = getattr(self, 'usage', None)
+        if usage is not None:
+            for key in self.api_keys:
+                usage.setdefault(key, KeyUsage())
+        if self.current_key_index >= len(self.api_keys):
+            self.current_key_index = 0
+
     async def get_next_available_key(self):
         """Get next available key"""
         available_key = await self.database_manager.get_available_key()
@@ -196,34 +208,23 @@ class GeminiKeyManager:
             logger.error(f"Failed to save to local persistence: {persistence_err}")
         
         try:
-            logger.info("Scheduling database save...")
+            logger.info("Queueing database save...")
             if self.database_manager.api_keys and len(self.database_manager.api_keys) > self.current_key_index:
                 current_key_data = self.database_manager.api_keys[self.current_key_index]
+                aggregator = self.database_manager.usage_aggregator
                 
-                import threading
-                
-                def run_async_save():
-                    try:
-                        loop = asyncio.new_event_loop()
-                        asyncio.set_event_loop(loop)
-                        loop.run_until_complete(
-                            self.database_manager.record_usage(
-                                current_key_data["id"], 
-                                tokens_used, 
-                                1
-                            )
-                        )
-                        loop.close()
-                        logger.info(f"Successfully saved to database for key ID {current_key_data['id']}")
-                    except Exception as async_err:
-                        logger.error(f"Background database save failed: {async_err}")
-                
-                threading.Thread(target=run_async_save, daemon=True).start()
-                logger.info(f"Database save scheduled for key ID {current_key_data['id']}")
+                if aggregator is not None:
+                    # Aggregated per key and minute, written by the aggregator's background task
+                    aggregator.add(current_key_data["id"], tokens_used, 1)
+                else:
+                    asyncio.get_running_loop().create_task(
+                        self.database_manager.record_usage(current_key_data["id"], tokens_used, 1)
+                    )
+                logger.info(f"Database save queued for key ID {current_key_data['id']}")
             else:
                 logger.warning(f"No database key data available for index {self.current_key_index}")
         except Exception as db_err:
-            logger.error(f"Failed to schedule database save: {db_err}")
+            logger.error(f"Failed to queue database save: {db_err}")
         
         logger.info("Checking if key switch is needed after usage...")
         try:
@@ -407,84 +408,90 @@ class GeminiKeyManager:
             requests_count
         )
 
-async def safe_generate_content(*args, **kwargs) -> Any:
-    """Safe wrapper for generative content"""
+async def safe_generate_content(*args, lane: str = LANE_INGESTION, **kwargs) -> Any:
+    """Safe wrapper for generative content; runs in the given scheduler lane (bulk ingestion by default)"""
+    try:
+        from ..services.rag import gemini_client
+    except ImportError:
+        from src.ai.services.rag import gemini_client
     manager = get_key_manager()
     
-    key = await manager.get_available_key()
-    if not key:
-        raise Exception("No available Gemini API keys")
+    async with scheduled(lane, manager):
+        lease = await manager.acquire_key()
+        if not lease:
+            raise Exception("No available Gemini API keys")
     
-    logger.info(f"Using key #{manager.current_key_index} for content generation")
+        logger.info(f"Using key {lease.key_name or lease.key_id} for content generation")
     
-    try:
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')  # type: ignore
-        response = model.generate_content(*args, **kwargs)
+        try:
+            model = genai.GenerativeModel('gemini-2.0-flash-exp')  # type: ignore
+            # Client bound to the leased key; never reconfigures the process-global genai key
+            response = await gemini_client.generate_content(model, *args, api_key=lease.api_key, **kwargs)
         
-        estimated_tokens = len(str(args)) // 4 if args else 100
+            estimated_tokens = len(str(args)) // 4 if args else 100
         
-        logger.info(f"Generated content with key #{manager.current_key_index}, tracking {estimated_tokens} tokens")
+            logger.info(f"Generated content with key {lease.key_id}, tracking {estimated_tokens} tokens")
         
-        # Get key_id from current key data for DatabaseKeyManager
-        current_key_data = manager.api_keys[manager.current_key_index]
-        key_id = current_key_data.get("id")
-        if key_id:
-            await manager.track_usage(key_id, tokens_used=estimated_tokens)
+            if lease.key_id:
+                await manager.track_usage(lease.key_id, tokens_used=estimated_tokens)
         
-        return response
+            return response
             
-    except Exception as e:
-        logger.error(f"Gemini API error: {e}")
-        raise
+        except Exception as e:
+            logger.error(f"Gemini API error: {e}")
+            if lease.key_id and is_rate_limit_error(e):
+                # Drain the key's bucket so the governor stops handing it out
+                await manager.mark_rate_limited(lease.key_id)
+            raise
+        finally:
+            manager.release_key(lease)
 
-async def safe_embed_content(*args, **kwargs) -> Any:
-    """Safe wrapper for embedding content"""
+async def safe_embed_content(*args, lane: str = LANE_INGESTION, **kwargs) -> Any:
+    """Safe wrapper for embedding content; runs in the given scheduler lane (bulk ingestion by default)"""
+    try:
+        from ..services.rag import gemini_client
+    except ImportError:
+        from src.ai.services.rag import gemini_client
     manager = get_key_manager()
     
-    key = await manager.get_available_key()
-    if not key:
-        raise Exception("No available Gemini API keys")
+    async with scheduled(lane, manager):
+        lease = await manager.acquire_key()
+        if not lease:
+            raise Exception("No available Gemini API keys")
     
-    logger.info(f"Using key #{manager.current_key_index} for embedding")
+        logger.info(f"Using key {lease.key_name or lease.key_id} for embedding")
     
-    try:
-        response = genai.embed_content(*args, **kwargs)  # type: ignore
+        try:
+            # Runs off the event loop on a client bound to the leased key; content may be a list for batch requests
+            response = await gemini_client.embed_content(*args, api_key=lease.api_key, **kwargs)
         
-        estimated_tokens = len(str(args)) // 4 if args else 50
+            content = kwargs.get("content")
+            if isinstance(content, list):
+                estimated_tokens = max(sum(len(str(item)) for item in content) // 4, 50)
+            else:
+                estimated_tokens = len(str(args)) // 4 if args else 50
         
-        logger.info(f"Generated embedding with key #{manager.current_key_index}, tracking {estimated_tokens} tokens")
+            logger.info(f"Generated embedding with key {lease.key_id}, tracking {estimated_tokens} tokens")
         
-        # Get key_id from current key data for DatabaseKeyManager
-        current_key_data = manager.api_keys[manager.current_key_index]
-        key_id = current_key_data.get("id")
-        if key_id:
-            await manager.track_usage(key_id, tokens_used=estimated_tokens)
+            if lease.key_id:
+                await manager.track_usage(lease.key_id, tokens_used=estimated_tokens)
         
-        return response
+            return response
         
-    except Exception as e:
-        logger.error(f"Gemini Embedding API error: {e}")
-        raise
-
-_key_manager = None
+        except Exception as e:
+            logger.error(f"Gemini Embedding API error: {e}")
+            if lease.key_id and is_rate_limit_error(e):
+                # Drain the key's bucket so the governor stops handing it out
+                await manager.mark_rate_limited(lease.key_id)
+            raise
+        finally:
+            manager.release_key(lease)
 
 def get_key_manager():
-    """Get global key manager instance - now uses DatabaseKeyManager"""
-    from .database_key_manager import DatabaseKeyManager
-    import threading
-    global _key_manager
-    
-    thread_id = threading.current_thread().ident
-    process_id = os.getpid()
-    
-    logger.info(f"get_key_manager called - Thread ID: {thread_id}, Process ID: {process_id}")
-    logger.info(f"Current instance: {id(_key_manager) if _key_manager else 'None'}")
-    
-    if _key_manager is None:
-        logger.info("Creating NEW Database Key Manager instance")
-        _key_manager = DatabaseKeyManager()
-        logger.info(f"Created instance with ID: {id(_key_manager)}")
-    else:
-        logger.info(f"Using EXISTING Database Key Manager instance ID: {id(_key_manager)}")
-        
-    return _key_manager
\ No newline at end of file
+    """Process-wide DatabaseKeyManager, shared with the RAG pipeline pool.
+    Ingestion, chat and the request scheduler must see one rate governor per key, not one per caller."""
+    try:
+        from ..services.rag.pipeline_pool import get_pipeline_pool
+    except ImportError:
+        from src.ai.services.rag.pipeline_pool import get_pipeline_pool
+    return get_pipeline_pool().get_key_manager()
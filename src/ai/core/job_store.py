@@ -0,0 +1,231 @@
+"""
+Job Store - Durable ingestion jobs with leases
+Jobs are claimed with a time-limited lease that workers renew while they run, so a job held by a
+crashed or restarted process becomes claimable again once its lease expires.
+SupabaseJobStore keeps jobs in the ingestion_jobs table; SQLiteJobStore is a local stand-in with
+the same behaviour for development and single-host deployments.
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterator, Optional
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    document_id INTEGER NOT NULL,
+    file_path TEXT,
+    host TEXT,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 5,
+    available_at TEXT NOT NULL,
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    progress REAL NOT NULL DEFAULT 0,
+    progress_note TEXT,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS ingestion_jobs_one_active_per_document
+    ON ingestion_jobs(document_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_claim ON ingestion_jobs(status, available_at);
+"""
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _iso(value: datetime) -> str:
+    return value.isoformat()
+
+
+class SQLiteJobStore:
+    """ingestion_jobs in a local SQLite (WAL) file; every state change is one short transaction"""
+
+    def __init__(self, path: str = "ingestion_jobs.sqlite3"):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+        columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(ingestion_jobs)")}
+        if "host" not in columns:
+            self._conn.execute("ALTER TABLE ingestion_jobs ADD COLUMN host TEXT")
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, document_id: int, file_path: Optional[str] = None, max_attempts: int = 5,
+                host: Optional[str] = None) -> int:
+        """Queue a document; returns the active job for it when one already exists.
+        `host` pins the job to workers on the host that holds `file_path`"""
+        now = _iso(_now())
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM ingestion_jobs WHERE document_id = ? AND status IN (?, ?)",
+                (document_id, *ACTIVE_STATUSES)
+            ).fetchone()
+            if row is not None:
+                if file_path:
+                    conn.execute("UPDATE ingestion_jobs SET file_path = ?, host = ?, updated_at = ? WHERE id = ?",
+                                 (file_path, host, now, row["id"]))
+                return row["id"]
+            cursor = conn.execute(
+                "INSERT INTO ingestion_jobs (document_id, file_path, host, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (document_id, file_path, host, max_attempts, now, now, now)
+            )
+            return cursor.lastrowid
+
+    def claim(self, worker_id: str, lease_seconds: float, host: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Lease the oldest runnable job (queued and due, or running with an expired lease)
+        that is not pinned to another host"""
+        now = _now()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT id FROM ingestion_jobs "
+                "WHERE ((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?)) "
+                "AND (host IS NULL OR host = ?) "
+                "ORDER BY available_at, id LIMIT 1",
+                (QUEUED, _iso(now), RUNNING, _iso(now), host)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE ingestion_jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, worker_id, _iso(now + timedelta(seconds=lease_seconds)), _iso(now), row["id"])
+            )
+            return dict(conn.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (row["id"],)).fetchone())
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float,
+                  progress: Optional[float] = None, note: Optional[str] = None) -> bool:
+        """Extend the lease and record progress; False when the worker no longer holds the job"""
+        now = _now()
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE ingestion_jobs SET lease_expires_at = ?, progress = COALESCE(?, progress), "
+                "progress_note = COALESCE(?, progress_note), updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (_iso(now + timedelta(seconds=lease_seconds)), progress, note, _iso(now), job_id, RUNNING, worker_id)
+            )
+            return cursor.rowcount == 1
+
+    def finish(self, job_id: int, worker_id: str, status: str, error: Optional[str] = None,
+               retry_in: float = 0.0) -> bool:
+        """
+        End a lease: COMPLETED, FAILED, or QUEUED to retry after retry_in seconds.
+        "released" hands the job back without using up an attempt (e.g. on shutdown).
+        """
+        now = _now()
+        with self._transaction() as conn:
+            if status == COMPLETED:
+                sql = ("UPDATE ingestion_jobs SET status = ?, progress = 1, lease_owner = NULL, "
+                       "lease_expires_at = NULL, updated_at = ? WHERE id = ? AND lease_owner = ?")
+                params = (COMPLETED, _iso(now), job_id, worker_id)
+            elif status == "released":
+                sql = ("UPDATE ingestion_jobs SET status = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, "
+                       "lease_expires_at = NULL, available_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ?")
+                params = (QUEUED, _iso(now), _iso(now), job_id, worker_id)
+            else:
+                sql = ("UPDATE ingestion_jobs SET status = ?, last_error = ?, lease_owner = NULL, "
+                       "lease_expires_at = NULL, available_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ?")
+                params = (status, error, _iso(now + timedelta(seconds=retry_in)), _iso(now), job_id, worker_id)
+            return conn.execute(sql, params).rowcount == 1
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM ingestion_jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) AS jobs FROM ingestion_jobs GROUP BY status").fetchall()
+        return {row["status"]: row["jobs"] for row in rows}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class SupabaseJobStore:
+    """ingestion_jobs in Postgres; claims use FOR UPDATE SKIP LOCKED so any number of workers can share it"""
+
+    def __init__(self, supabase: Any, table: str = "ingestion_jobs"):
+        self.supabase = supabase
+        self.table = table
+
+    def enqueue(self, document_id: int, file_path: Optional[str] = None, max_attempts: int = 5,
+                host: Optional[str] = None) -> int:
+        response = self.supabase.rpc("enqueue_ingestion_job", {
+            "p_document_id": document_id,
+            "p_file_path": file_path,
+            "p_max_attempts": max_attempts,
+            "p_host": host,
+        }).execute()
+        return response.data
+
+    def claim(self, worker_id: str, lease_seconds: float, host: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        response = self.supabase.rpc("claim_ingestion_job", {
+            "p_worker": worker_id,
+            "p_lease_seconds": int(lease_seconds),
+            "p_host": host,
+        }).execute()
+        return response.data[0] if response.data else None
+
+    def heartbeat(self, job_id: int, worker_id: str, lease_seconds: float,
+                  progress: Optional[float] = None, note: Optional[str] = None) -> bool:
+        response = self.supabase.rpc("heartbeat_ingestion_job", {
+            "p_job_id": job_id,
+            "p_worker": worker_id,
+            "p_lease_seconds": int(lease_seconds),
+            "p_progress": progress,
+            "p_note": note,
+        }).execute()
+        return bool(response.data)
+
+    def finish(self, job_id: int, worker_id: str, status: str, error: Optional[str] = None,
+               retry_in: float = 0.0) -> bool:
+        response = self.supabase.rpc("finish_ingestion_job", {
+            "p_job_id": job_id,
+            "p_worker": worker_id,
+            "p_status": status,
+            "p_error": error,
+            "p_retry_seconds": int(retry_in),
+        }).execute()
+        return bool(response.data)
+
+    def get(self, job_id: int) -> Optional[Dict[str, Any]]:
+        response = self.supabase.table(self.table).select("*").eq("id", job_id).execute()
+        return response.data[0] if response.data else None
+
+    def counts(self) -> Dict[str, int]:
+        response = self.supabase.rpc("ingestion_job_counts", {}).execute()
+        return {row["status"]: row["jobs"] for row in response.data or []}
+
+    def close(self):
+        pass
@@ -0,0 +1,124 @@
+"""
+Rate Governor - In-process RPM/TPM token buckets per API key
+Requests are taken from a key's bucket when the key is leased and tokens are charged when
+usage is recorded, so key selection can follow real headroom without asking the database.
+"""
+
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously up to its per-minute capacity"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def resize(self, per_minute: float, now: float):
+        """Apply a new per-minute limit; tokens already spent stay spent"""
+        self._refill(now)
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = min(self.level, self.capacity)
+
+    def available(self, now: float) -> float:
+        self._refill(now)
+        return self.level
+
+    def take(self, amount: float, now: float):
+        """Remove tokens; the level may go negative when actual usage exceeds the estimate"""
+        self._refill(now)
+        self.level -= amount
+
+    def seconds_until(self, amount: float, now: float) -> float:
+        """Time until the bucket holds the given amount"""
+        self._refill(now)
+        missing = amount - self.level
+        return max(0.0, missing / self.rate) if self.rate else float("inf")
+
+
+class KeyRateGovernor:
+    """Request and token buckets for every key, with headroom-based selection helpers"""
+
+    def __init__(self, requests_per_minute: int = 15, tokens_per_minute: int = 1000000):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self._buckets: Dict[Any, Dict[str, TokenBucket]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key_id: Any, rpm: Optional[int] = None) -> Dict[str, TokenBucket]:
+        buckets = self._buckets.get(key_id)
+        if buckets is None:
+            buckets = self._buckets[key_id] = {
+                "requests": TokenBucket(rpm or self.requests_per_minute),
+                "tokens": TokenBucket(self.tokens_per_minute),
+            }
+        return buckets
+
+    def configure_key(self, key_id: Any, requests_per_minute: Optional[int] = None):
+        """Use a key-specific RPM limit (e.g. api_keys.minute_limit_requests)"""
+        if not requests_per_minute:
+            return
+        with self._lock:
+            bucket = self._get(key_id, requests_per_minute)["requests"]
+            if bucket.capacity != requests_per_minute:
+                bucket.resize(requests_per_minute, time.monotonic())
+
+    def headroom(self, key_id: Any) -> float:
+        """Fraction of the tighter of the two limits still available (can be negative)"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._get(key_id)
+            return min(
+                buckets["requests"].available(now) / buckets["requests"].capacity,
+                buckets["tokens"].available(now) / buckets["tokens"].capacity,
+            )
+
+    def can_admit(self, key_id: Any) -> bool:
+        """A request fits when a whole request token is available and the token budget is not overdrawn"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._get(key_id)
+            return buckets["requests"].available(now) >= 1 and buckets["tokens"].available(now) > 0
+
+    def wait_time(self, key_id: Any) -> float:
+        """Seconds until the key can admit another request"""
+        now = time.monotonic()
+        with self._lock:
+            buckets = self._get(key_id)
+            return max(buckets["requests"].seconds_until(1, now), buckets["tokens"].seconds_until(1, now))
+
+    def take_request(self, key_id: Any):
+        with self._lock:
+            self._get(key_id)["requests"].take(1, time.monotonic())
+
+    def record_tokens(self, key_id: Any, tokens: int):
+        with self._lock:
+            self._get(key_id)["tokens"].take(tokens, time.monotonic())
+
+    def drain(self, key_id: Any):
+        """Empty a key's request bucket after the API reported a rate limit"""
+        with self._lock:
+            bucket = self._get(key_id)["requests"]
+            bucket.take(bucket.available(time.monotonic()), time.monotonic())
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        now = time.monotonic()
+        with self._lock:
+            return {
+                str(key_id): {
+                    "requests_available": round(buckets["requests"].available(now), 2),
+                    "requests_per_minute": buckets["requests"].capacity,
+                    "tokens_available": round(buckets["tokens"].available(now)),
+                    "tokens_per_minute": buckets["tokens"].capacity,
+                }
+                for key_id, buckets in self._buckets.items()
+            }
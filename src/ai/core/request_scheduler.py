@@ -0,0 +1,235 @@
+"""
+Request Scheduler - Priority lanes for Gemini calls
+Interactive chat is admitted before title generation, which is admitted before bulk ingestion.
+Every lane has its own concurrency limit, and lower lanes only start while the keys still have
+enough rate headroom, so ingestion soaks up leftover quota without starving live chats.
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from .rate_governor import KeyRateGovernor
+
+logger = logging.getLogger(__name__)
+
+LANE_CHAT = "chat"
+LANE_TITLE = "title"
+LANE_INGESTION = "ingestion"
+
+LANE_PRIORITY = {LANE_CHAT: 0, LANE_TITLE: 1, LANE_INGESTION: 2}
+
+
+class _Waiter:
+    __slots__ = ("lane", "future", "granted", "abandoned")
+
+    def __init__(self, lane: str, future: asyncio.Future):
+        self.lane = lane
+        self.future = future
+        self.granted = False
+        self.abandoned = False
+
+
+class RequestScheduler:
+    """
+    Admits Gemini calls lane by lane in priority order.
+    State is guarded by a threading lock and waiters are woken on their own loop, so callers
+    running on other event loops (e.g. a background ingestion thread) share the same limits.
+    """
+
+    def __init__(self, concurrency: Dict[str, int], min_headroom: Optional[Dict[str, float]] = None,
+                 recheck_interval: float = 0.25):
+        self.concurrency = dict(concurrency)
+        self.min_headroom = dict(min_headroom or {})
+        self.recheck_interval = recheck_interval
+        self._active = {lane: 0 for lane in self.concurrency}
+        self._waiters: List[Any] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self._headroom_source: Optional[Callable[[], float]] = None
+        self.stats = {lane: {"admitted": 0, "queued": 0, "wait_ms_total": 0.0} for lane in self.concurrency}
+
+    def set_headroom_source(self, source: Optional[Callable[[], float]]):
+        """Callable returning the best key headroom (fraction of the per-minute quota left)"""
+        self._headroom_source = source
+
+    def attach_key_manager(self, key_manager: Any):
+        """Use a key manager's rate governor as the quota source (first manager wins)"""
+        governor = getattr(key_manager, 'governor', None)
+        if self._headroom_source is not None or not isinstance(governor, KeyRateGovernor):
+            return
+        self._headroom_source = lambda: max(
+            (governor.headroom(key_data.get('id')) for key_data in key_manager.api_keys), default=1.0
+        )
+
+    def _headroom(self) -> float:
+        if self._headroom_source is None:
+            return 1.0
+        try:
+            return self._headroom_source()
+        except Exception as e:
+            logger.debug(f"Could not read key headroom: {e}")
+            return 1.0
+
+    def _can_start(self, lane: str, headroom: float) -> bool:
+        if self._active[lane] >= self.concurrency[lane]:
+            return False
+        required = self.min_headroom.get(lane)
+        return required is None or headroom >= required
+
+    def _has_waiters(self, priority: int) -> bool:
+        """Whether a live waiter of the same or higher priority is queued"""
+        return any(entry[0] <= priority and not entry[2].abandoned for entry in self._waiters)
+
+    def _dispatch(self):
+        """Admit queued waiters in priority order while lanes and quota allow"""
+        grants: List[_Waiter] = []
+        with self._lock:
+            if not self._waiters:
+                return
+            headroom = self._headroom()
+            blocked = set()
+            remaining = []
+            while self._waiters:
+                entry = heapq.heappop(self._waiters)
+                waiter = entry[2]
+                if waiter.abandoned:
+                    continue
+                if waiter.lane in blocked or not self._can_start(waiter.lane, headroom):
+                    blocked.add(waiter.lane)
+                    remaining.append(entry)
+                    continue
+                self._active[waiter.lane] += 1
+                waiter.granted = True
+                grants.append(waiter)
+            for entry in remaining:
+                heapq.heappush(self._waiters, entry)
+
+        for waiter in grants:
+            waiter.future.get_loop().call_soon_threadsafe(self._grant, waiter)
+
+    def _grant(self, waiter: _Waiter):
+        """Runs on the waiter's loop; hands the slot back if the waiter already gave up"""
+        if waiter.abandoned or waiter.future.done():
+            self.release(waiter.lane)
+            return
+        waiter.future.set_result(None)
+
+    async def acquire(self, lane: str):
+        if lane not in self.concurrency:
+            raise ValueError(f"Unknown scheduler lane: {lane}")
+        priority = LANE_PRIORITY.get(lane, len(LANE_PRIORITY))
+
+        with self._lock:
+            self.stats[lane]["admitted"] += 1
+            if not self._has_waiters(priority) and self._can_start(lane, self._headroom()):
+                self._active[lane] += 1
+                return
+            waiter = _Waiter(lane, asyncio.get_running_loop().create_future())
+            heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+            self.stats[lane]["queued"] += 1
+
+        started = time.perf_counter()
+        try:
+            while True:
+                self._dispatch()
+                try:
+                    # Re-check periodically: quota refills without any slot being released
+                    await asyncio.wait_for(asyncio.shield(waiter.future), timeout=self.recheck_interval)
+                    break
+                except asyncio.TimeoutError:
+                    continue
+        except BaseException:
+            with self._lock:
+                waiter.abandoned = True
+                granted = waiter.granted
+            if granted and waiter.future.done() and not waiter.future.cancelled():
+                self.release(lane)
+            raise
+        self.stats[lane]["wait_ms_total"] += (time.perf_counter() - started) * 1000
+
+    def release(self, lane: str):
+        with self._lock:
+            self._active[lane] = max(0, self._active[lane] - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, lane: str) -> AsyncIterator[None]:
+        """Hold a slot in the given lane for the duration of a Gemini call"""
+        await self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release(lane)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waiting = {lane: 0 for lane in self.concurrency}
+            for entry in self._waiters:
+                if not entry[2].abandoned:
+                    waiting[entry[2].lane] += 1
+            return {
+                "headroom": round(self._headroom(), 3),
+                "lanes": {
+                    lane: {
+                        "active": self._active[lane],
+                        "waiting": waiting[lane],
+                        "concurrency": self.concurrency[lane],
+                        "min_headroom": self.min_headroom.get(lane),
+                        "admitted": stats["admitted"],
+                        "queued": stats["queued"],
+                        "avg_queue_wait_ms": round(stats["wait_ms_total"] / stats["queued"], 2) if stats["queued"] else 0,
+                    }
+                    for lane, stats in self.stats.items()
+                },
+            }
+
+
+_scheduler: Optional[RequestScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_request_scheduler() -> Optional[RequestScheduler]:
+    """Process-wide request scheduler, or None when disabled"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                try:
+                    from ..config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                if not getattr(config, 'SCHEDULER_ENABLED', True):
+                    return None
+                _scheduler = RequestScheduler(
+                    concurrency={
+                        LANE_CHAT: getattr(config, 'SCHEDULER_CHAT_CONCURRENCY', 32),
+                        LANE_TITLE: getattr(config, 'SCHEDULER_TITLE_CONCURRENCY', 4),
+                        LANE_INGESTION: getattr(config, 'SCHEDULER_INGESTION_CONCURRENCY', 2),
+                    },
+                    min_headroom={
+                        LANE_TITLE: getattr(config, 'SCHEDULER_TITLE_MIN_HEADROOM', 0.1),
+                        LANE_INGESTION: getattr(config, 'SCHEDULER_INGESTION_MIN_HEADROOM', 0.3),
+                    }
+                )
+    return _scheduler
+
+
+@asynccontextmanager
+async def scheduled(lane: str, key_manager: Any = None) -> AsyncIterator[None]:
+    """Run the enclosed Gemini call in a scheduler lane (no-op when the scheduler is disabled)"""
+    scheduler = get_request_scheduler()
+    if scheduler is None:
+        yield
+        return
+    if key_manager is not None:
+        scheduler.attach_key_manager(key_manager)
+    async with scheduler.slot(lane):
+        yield
@@ -1,262 +1,290 @@
+"""
+Token usage persistence - append-only SQLite (WAL) log with in-memory rollups
+Every update is a single INSERT; reads are answered from per-key rollups kept in memory.
+Events from previous days are periodically compacted into one row per key and day.
+"""
+
 import json
 import os
+import sqlite3
+import threading
+from contextlib import contextmanager
 from datetime import datetime, date, timedelta, timezone
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Optional
 import logging
 
 logger = logging.getLogger(__name__)
 
+MINUTES_TO_KEEP = 5
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    day TEXT NOT NULL,
+    minute TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    key_index INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    requests INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_usage_events_day ON usage_events(day);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    day TEXT NOT NULL,
+    key_index INTEGER NOT NULL,
+    tokens INTEGER NOT NULL,
+    requests INTEGER NOT NULL,
+    first_request TEXT,
+    last_request TEXT,
+    PRIMARY KEY (day, key_index)
+);
+CREATE TABLE IF NOT EXISTS key_switches (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    old_key INTEGER NOT NULL,
+    new_key INTEGER NOT NULL
+);
+"""
+
+
+def _empty_key_usage() -> Dict[str, Any]:
+    return {
+        "tokens_used": 0,
+        "requests_count": 0,
+        "first_request": None,
+        "last_request": None,
+        "current_minute_data": {}
+    }
+
+
 class TokenUsagePersistence:
     """Persistent storage for token usage data"""
-    
-    def __init__(self, data_file: str = "token_usage_data.json"):
+
+    def __init__(self, data_file: str = "token_usage.sqlite3", legacy_file: str = "token_usage_data.json",
+                 compact_every: int = 1000, max_key_switches: int = 100):
         self.data_file = data_file
-        self.data = self._load_data()
-    
-    def _load_data(self) -> Dict[str, Any]:
-        """Load data from file"""
-        if os.path.exists(self.data_file):
+        self.compact_every = compact_every
+        self.max_key_switches = max_key_switches
+        self._lock = threading.Lock()
+        self._writes_since_compaction = 0
+
+        # Rollups for today only: key_id -> usage dict
+        self._day: Optional[str] = None
+        self._keys_usage: Dict[str, Dict[str, Any]] = {}
+        self._daily_total = {"total_tokens": 0, "total_requests": 0, "active_keys": []}
+
+        is_new = not os.path.exists(data_file)
+        self._conn = sqlite3.connect(data_file, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._conn.executescript(_SCHEMA)
+
+        if is_new and legacy_file and os.path.exists(legacy_file):
+            self._import_legacy_json(legacy_file)
+
+        self.compact()
+        self._load_today()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """Explicit transaction (the connection runs in autocommit mode so single appends stay cheap)"""
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _import_legacy_json(self, legacy_file: str):
+        """One-time import of the old JSON file into daily rollups"""
+        try:
+            with open(legacy_file, 'r') as f:
+                legacy = json.load(f)
+            rows = []
+            for key_id, days in legacy.get("keys_usage", {}).items():
+                key_index = int(str(key_id).replace("key_", ""))
+                for day, day_data in days.items():
+                    rows.append((day, key_index, day_data.get("tokens_used", 0), day_data.get("requests_count", 0),
+                                 day_data.get("first_request"), day_data.get("last_request")))
+            with self._transaction():
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO daily_rollups VALUES (?, ?, ?, ?, ?, ?)", rows
+                )
+            logger.info(f"Imported {len(rows)} daily usage rows from {legacy_file}")
+        except Exception as e:
+            logger.error(f"Error importing legacy token data: {e}")
+
+    def _reset_day(self, today: str):
+        self._day = today
+        self._keys_usage = {}
+        self._daily_total = {"total_tokens": 0, "total_requests": 0, "active_keys": []}
+
+    def _apply(self, key_index: int, tokens: int, requests: int, last_request: Optional[str],
+               first_request: Optional[str] = None, minute: Optional[str] = None):
+        """Add usage to today's in-memory rollups"""
+        usage = self._keys_usage.setdefault(f"key_{key_index}", _empty_key_usage())
+        usage["tokens_used"] += tokens
+        usage["requests_count"] += requests
+        first_request = first_request or last_request
+        if first_request and (usage["first_request"] is None or first_request < usage["first_request"]):
+            usage["first_request"] = first_request
+        if last_request and (usage["last_request"] is None or last_request > usage["last_request"]):
+            usage["last_request"] = last_request
+
+        if minute is not None:
+            minutes = usage["current_minute_data"]
+            bucket = minutes.setdefault(minute, {"tokens": 0, "requests": 0})
+            bucket["tokens"] += tokens
+            bucket["requests"] += requests
+            if len(minutes) > MINUTES_TO_KEEP:
+                for old_minute in sorted(minutes)[:-MINUTES_TO_KEEP]:
+                    del minutes[old_minute]
+
+        self._daily_total["total_tokens"] += tokens
+        self._daily_total["total_requests"] += requests
+        if key_index not in self._daily_total["active_keys"]:
+            self._daily_total["active_keys"].append(key_index)
+
+    def _load_today(self):
+        """Rebuild today's rollups from the log"""
+        today = date.today().isoformat()
+        with self._lock:
+            self._reset_day(today)
             try:
-                with open(self.data_file, 'r') as f:
-                    return json.load(f)
+                for key_index, tokens, requests, first_request, last_request in self._conn.execute(
+                    "SELECT key_index, tokens, requests, first_request, last_request FROM daily_rollups WHERE day = ?",
+                    (today,)
+                ):
+                    self._apply(key_index, tokens, requests, last_request, first_request)
+
+                for key_index, tokens, requests, created_at, minute in self._conn.execute(
+                    "SELECT key_index, tokens, requests, created_at, minute FROM usage_events WHERE day = ? ORDER BY id",
+                    (today,)
+                ):
+                    self._apply(key_index, tokens, requests, created_at, minute=minute)
             except Exception as e:
                 logger.error(f"Error loading token data: {e}")
-        
-        return {
-            "keys_usage": {},
-            "daily_totals": {},
-            "last_updated": None
-        }
-    
-    def _save_data(self):
-        """Save data to file"""
-        try:
-            with open(self.data_file, 'w') as f:
-                json.dump(self.data, f, indent=2, default=str)
-        except Exception as e:
-            logger.error(f"Error saving token data: {e}")
-    
+
     def update_usage(self, key_index: int, tokens_used: int, requests_count: int = 1):
         """Update usage for a key"""
-        logger.info(f"Updating persistent usage - Key: {key_index}, Tokens: {tokens_used}, Requests: {requests_count}")
-        
         today = date.today().isoformat()
         current_time_utc = datetime.now(timezone.utc)
         current_time = current_time_utc.isoformat()
         current_minute = current_time_utc.strftime("%Y-%m-%d %H:%M")
-        
-        logger.info(f"Date: {today}, Current minute: {current_minute}")
-        
-        key_id = f"key_{key_index}"
-        if key_id not in self.data["keys_usage"]:
-            logger.info(f"Creating new key entry: {key_id}")
-            self.data["keys_usage"][key_id] = {}
-        
-        if today not in self.data["keys_usage"][key_id]:
-            logger.info(f"Creating new day entry for {key_id}: {today}")
-            self.data["keys_usage"][key_id][today] = {
-                "tokens_used": 0,
-                "requests_count": 0,
-                "first_request": current_time,
-                "last_request": current_time,
-                "current_minute_data": {}
-            }
-        
-        day_data = self.data["keys_usage"][key_id][today]
-        
-        logger.info(f"Before update - {key_id} {today}: Tokens={day_data['tokens_used']}, Requests={day_data['requests_count']}")
-        
-        day_data["tokens_used"] += tokens_used
-        day_data["requests_count"] += requests_count
-        day_data["last_request"] = current_time
-        
-        if "current_minute_data" not in day_data:
-            day_data["current_minute_data"] = {}
-        
-        if current_minute not in day_data["current_minute_data"]:
-            logger.info(f"Creating new minute entry: {current_minute}")
-            day_data["current_minute_data"][current_minute] = {
-                "tokens": 0,
-                "requests": 0
-            }
-        
-        minute_data = day_data["current_minute_data"][current_minute]
-        logger.info(f"Before minute update - {current_minute}: Tokens={minute_data['tokens']}, Requests={minute_data['requests']}")
-        
-        day_data["current_minute_data"][current_minute]["tokens"] += tokens_used
-        day_data["current_minute_data"][current_minute]["requests"] += requests_count
-        
-        logger.info(f"After minute update - {current_minute}: Tokens={minute_data['tokens']}, Requests={minute_data['requests']}")
-        
-        current_dt = datetime.now(timezone.utc)
-        minutes_to_keep = []
-        for i in range(5):
-            minute_dt = current_dt - timedelta(minutes=i)
-            minutes_to_keep.append(minute_dt.strftime("%Y-%m-%d %H:%M"))
-        
-        old_minutes_count = len(day_data["current_minute_data"])
-        
-        day_data["current_minute_data"] = {
-            minute: data for minute, data in day_data["current_minute_data"].items()
-            if minute in minutes_to_keep
-        }
-        
-        new_minutes_count = len(day_data["current_minute_data"])
-        logger.info(f"Cleaned old minutes: {old_minutes_count} -> {new_minutes_count}")
-        
-        logger.info(f"After update - {key_id} {today}: Tokens={day_data['tokens_used']}, Requests={day_data['requests_count']}")
-        
-        if today not in self.data["daily_totals"]:
-            logger.info(f"Creating new daily totals entry: {today}")
-            self.data["daily_totals"][today] = {
-                "total_tokens": 0,
-                "total_requests": 0,
-                "active_keys": []
-            }
-        
-        self.data["daily_totals"][today]["total_tokens"] += tokens_used
-        self.data["daily_totals"][today]["total_requests"] += requests_count
-        
-        if key_index not in self.data["daily_totals"][today]["active_keys"]:
-            self.data["daily_totals"][today]["active_keys"].append(key_index)
-        
-        self.data["last_updated"] = current_time
-        
-        logger.info(f"Saving data to file: {self.data_file}")
-        try:
-            self._save_data()
-            logger.info("Successfully saved data to file")
-        except Exception as save_err:
-            logger.error(f"Error saving data: {save_err}")
-    
+
+        with self._lock:
+            if self._day != today:
+                self._reset_day(today)
+            self._apply(key_index, tokens_used, requests_count, current_time, minute=current_minute)
+
+            try:
+                self._conn.execute(
+                    "INSERT INTO usage_events (day, minute, created_at, key_index, tokens, requests) VALUES (?, ?, ?, ?, ?, ?)",
+                    (today, current_minute, current_time, key_index, tokens_used, requests_count)
+                )
+                self._writes_since_compaction += 1
+            except Exception as e:
+                logger.error(f"Error saving token data: {e}")
+
+        logger.debug(f"Recorded usage - Key: {key_index}, Tokens: {tokens_used}, Requests: {requests_count}")
+
+        if self._writes_since_compaction >= self.compact_every:
+            self.compact()
+
+    def compact(self):
+        """Fold events from previous days into daily rollups and trim the key switch log"""
+        today = date.today().isoformat()
+        with self._lock:
+            self._writes_since_compaction = 0
+            try:
+                with self._transaction():
+                    self._conn.execute(
+                        """
+                        INSERT INTO daily_rollups (day, key_index, tokens, requests, first_request, last_request)
+                        SELECT day, key_index, SUM(tokens), SUM(requests), MIN(created_at), MAX(created_at)
+                        FROM usage_events WHERE day < ? GROUP BY day, key_index
+                        ON CONFLICT(day, key_index) DO UPDATE SET
+                            tokens = tokens + excluded.tokens,
+                            requests = requests + excluded.requests,
+                            first_request = MIN(COALESCE(first_request, excluded.first_request), excluded.first_request),
+                            last_request = MAX(COALESCE(last_request, excluded.last_request), excluded.last_request)
+                        """,
+                        (today,)
+                    )
+                    self._conn.execute("DELETE FROM usage_events WHERE day < ?", (today,))
+                    self._conn.execute(
+                        "DELETE FROM key_switches WHERE id <= (SELECT MAX(id) FROM key_switches) - ?",
+                        (self.max_key_switches,)
+                    )
+            except Exception as e:
+                logger.error(f"Error compacting token data: {e}")
+
+    def _today_usage(self) -> Dict[str, Dict[str, Any]]:
+        today = date.today().isoformat()
+        if self._day != today:
+            self._reset_day(today)
+        return self._keys_usage
+
     def get_current_minute_usage(self, key_index: int) -> Dict[str, int]:
         """Get current or most recent minute usage"""
-        today = date.today().isoformat()
+        with self._lock:
+            usage = self._today_usage().get(f"key_{key_index}")
+            minutes = dict(usage["current_minute_data"]) if usage else {}
+
+        if not minutes:
+            return {"tokens": 0, "requests": 0}
+
         current_minute = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M")
-        key_id = f"key_{key_index}"
-        
-        logger.info(f"Getting current minute usage for {key_id}, minute: {current_minute}")
-        
-        if (key_id in self.data["keys_usage"] and 
-            today in self.data["keys_usage"][key_id] and
-            "current_minute_data" in self.data["keys_usage"][key_id][today]):
-            
-            minute_data_dict = self.data["keys_usage"][key_id][today]["current_minute_data"]
-            logger.info(f"Available minutes: {list(minute_data_dict.keys())}")
-            
-            if current_minute in minute_data_dict:
-                minute_data = minute_data_dict[current_minute]
-                result = {
-                    "tokens": minute_data.get("tokens", 0),
-                    "requests": minute_data.get("requests", 0)
-                }
-                logger.info(f"Found current minute data for {key_id}: {result}")
-                return result
-            
-            if minute_data_dict:
-                sorted_minutes = sorted(minute_data_dict.keys(), reverse=True)
-                latest_minute = sorted_minutes[0]
-                
-                try:
-                    latest_dt = datetime.strptime(latest_minute, "%Y-%m-%d %H:%M")
-                    current_dt = datetime.now(timezone.utc)
-                    time_diff = current_dt - latest_dt
-                    
-                    if time_diff.total_seconds() <= 300:
-                        minute_data = minute_data_dict[latest_minute]
-                        result = {
-                            "tokens": minute_data.get("tokens", 0),
-                            "requests": minute_data.get("requests", 0)
-                        }
-                        logger.info(f"Found latest minute data for {key_id} ({latest_minute}): {result}")
-                        return result
-                    else:
-                        logger.info(f"Latest minute {latest_minute} is too old ({time_diff.total_seconds()}s)")
-                except Exception as time_err:
-                    logger.error(f"Error parsing time: {time_err}")
-        
-        logger.info(f"No recent minute data found for {key_id}, returning zeros")
-        return {"tokens": 0, "requests": 0}
-    
+        latest_minute = current_minute if current_minute in minutes else max(minutes)
+        try:
+            latest_dt = datetime.strptime(latest_minute, "%Y-%m-%d %H:%M").replace(tzinfo=timezone.utc)
+            if datetime.now(timezone.utc) - latest_dt > timedelta(minutes=MINUTES_TO_KEEP):
+                return {"tokens": 0, "requests": 0}
+        except Exception as time_err:
+            logger.error(f"Error parsing time: {time_err}")
+            return {"tokens": 0, "requests": 0}
+
+        minute_data = minutes[latest_minute]
+        return {"tokens": minute_data.get("tokens", 0), "requests": minute_data.get("requests", 0)}
+
     def get_key_usage_today(self, key_index: int) -> Dict[str, Any]:
         """Get today's usage for a key"""
-        today = date.today().isoformat()
-        key_id = f"key_{key_index}"
-        
-        if key_id in self.data["keys_usage"] and today in self.data["keys_usage"][key_id]:
-            return self.data["keys_usage"][key_id][today]
-        
-        return {
-            "tokens_used": 0,
-            "requests_count": 0,
-            "first_request": None,
-            "last_request": None,
-            "current_minute_data": {}
-        }
-    
+        with self._lock:
+            usage = self._today_usage().get(f"key_{key_index}")
+            if usage is None:
+                return _empty_key_usage()
+            return {**usage, "current_minute_data": dict(usage["current_minute_data"])}
+
     def get_all_keys_usage_today(self) -> Dict[str, Any]:
         """Get today's usage for all keys"""
-        logger.info("Getting all keys usage for today")
-        
-        today = date.today().isoformat()
-        logger.info(f"Today date: {today}")
-        logger.info(f"Available keys in data: {list(self.data['keys_usage'].keys())}")
-        
-        result = {}
-        
-        for key_id, key_data in self.data["keys_usage"].items():
-            logger.info(f"Processing key: {key_id}")
-            logger.info(f"Key data dates: {list(key_data.keys())}")
-            
-            if today in key_data:
-                result[key_id] = key_data[today]
-                logger.info(f"Found today's data for {key_id}: tokens={key_data[today].get('tokens_used', 0)}, requests={key_data[today].get('requests_count', 0)}")
-            else:
-                result[key_id] = {
-                    "tokens_used": 0,
-                    "requests_count": 0,
-                    "first_request": None,
-                    "last_request": None,
-                    "current_minute_data": {}
-                }
-                logger.info(f"No today's data for {key_id}, using defaults")
-        
-        logger.info(f"Final result keys: {list(result.keys())}")
-        
-        return result
-    
+        with self._lock:
+            return {
+                key_id: {**usage, "current_minute_data": dict(usage["current_minute_data"])}
+                for key_id, usage in self._today_usage().items()
+            }
+
     def get_daily_summary(self) -> Dict[str, Any]:
         """Get daily summary"""
-        today = date.today().isoformat()
-        
-        if today in self.data["daily_totals"]:
-            return self.data["daily_totals"][today]
-        
-        return {
-            "total_tokens": 0,
-            "total_requests": 0,
-            "active_keys": []
-        }
-    
+        with self._lock:
+            self._today_usage()
+            return {**self._daily_total, "active_keys": list(self._daily_total["active_keys"])}
+
     def log_key_switch(self, old_key: int, new_key: int):
         """Log key switch event"""
         logger.info(f"Key switch logged: {old_key} -> {new_key}")
-        
-        if "key_switches" not in self.data:
-            self.data["key_switches"] = []
-        
-        switch_event = {
-            "timestamp": datetime.now(timezone.utc).isoformat(),
-            "old_key": old_key,
-            "new_key": new_key
-        }
-        
-        self.data["key_switches"].append(switch_event)
-        
-        # Keep only last 100 switch events
-        self.data["key_switches"] = self.data["key_switches"][-100:]
-        
+
         try:
-            self._save_data()
+            with self._lock:
+                self._conn.execute(
+                    "INSERT INTO key_switches (created_at, old_key, new_key) VALUES (?, ?, ?)",
+                    (datetime.now(timezone.utc).isoformat(), old_key, new_key)
+                )
         except Exception as e:
-            logger.error(f"Error saving key switch data: {e}")
\ No newline at end of file
+            logger.error(f"Error saving key switch data: {e}")
+
+    def close(self):
+        """Compact and close the database"""
+        self.compact()
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,157 @@
+"""
+Usage Aggregator - Accumulates API key usage in memory and writes it in batches
+Every embedding/generation call adds to a (key, minute) bucket; a single background task
+upserts the buckets every few seconds instead of inserting one api_key_usage row per call
+"""
+
+import asyncio
+import logging
+import threading
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+UsageWriter = Callable[[List[Dict[str, Any]]], Awaitable[None]]
+
+
+class UsageAggregator:
+    """
+    Per-key, per-minute usage counters with a background flusher.
+    add() is thread-safe and never touches the database; rows that fail to write
+    are merged back into the pending buckets and retried with exponential backoff.
+    """
+
+    def __init__(self, writer: UsageWriter, flush_interval: float = 5.0, max_backoff: float = 60.0):
+        self.writer = writer
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self._pending: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._failures = 0
+        self.stats = {"calls": 0, "rows_written": 0, "flushes": 0, "failed_flushes": 0}
+
+    def add(self, key_id: int, tokens_used: int, requests_count: int = 1) -> None:
+        """Count usage against the current UTC minute of a key"""
+        minute = datetime.now(timezone.utc).replace(second=0, microsecond=0).isoformat()
+        with self._lock:
+            bucket = self._pending.get((key_id, minute))
+            if bucket is None:
+                bucket = self._pending[(key_id, minute)] = {
+                    "api_key_id": key_id,
+                    "usage_date": date.today().isoformat(),
+                    "usage_minute": minute,
+                    "tokens_used": 0,
+                    "requests_count": 0,
+                }
+            bucket["tokens_used"] += tokens_used
+            bucket["requests_count"] += requests_count
+            self.stats["calls"] += 1
+        self._ensure_started()
+
+    def _ensure_started(self):
+        """Start the background flusher on the running loop the first time it is needed"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Back off exponentially while the database keeps failing
+            await asyncio.sleep(min(self.flush_interval * (2 ** self._failures), self.max_backoff))
+            await self.flush()
+
+    def _take_pending(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending = {}
+        return rows
+
+    def _merge_back(self, rows: List[Dict[str, Any]]):
+        """Return unwritten rows to the pending buckets, adding to anything counted since"""
+        with self._lock:
+            for row in rows:
+                bucket = self._pending.get((row["api_key_id"], row["usage_minute"]))
+                if bucket is None:
+                    self._pending[(row["api_key_id"], row["usage_minute"])] = row
+                else:
+                    bucket["tokens_used"] += row["tokens_used"]
+                    bucket["requests_count"] += row["requests_count"]
+
+    async def flush(self) -> bool:
+        """Write all pending buckets; returns False when the write failed"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            rows = self._take_pending()
+            if not rows:
+                return True
+
+            try:
+                await self.writer(rows)
+                self._failures = 0
+                self.stats["rows_written"] += len(rows)
+                self.stats["flushes"] += 1
+                logger.debug(f"Flushed {len(rows)} aggregated key usage rows")
+                return True
+            except Exception as e:
+                self._failures += 1
+                self.stats["failed_flushes"] += 1
+                self._merge_back(rows)
+                logger.warning(f"Failed to write {len(rows)} key usage rows (attempt {self._failures}): {e}")
+                return False
+
+    async def close(self, timeout: float = 5.0):
+        """Stop the background task and write what is left (used on shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+        try:
+            await asyncio.wait_for(self.flush(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Key usage flush timed out on shutdown")
+        if self._pending:
+            logger.warning(f"Discarding {len(self._pending)} unwritten key usage rows on shutdown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            pending = len(self._pending)
+        return {**self.stats, "pending_rows": pending, "consecutive_failures": self._failures}
+
+
+def _parse_minute(value: Any) -> Optional[datetime]:
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def split_usage_rollups(rows: List[Dict[str, Any]], usage_date: str,
+                        usage_minute: datetime) -> Tuple[Dict[Any, Dict[str, int]], Dict[Any, Dict[str, int]]]:
+    """
+    Turn api_key_usage_rollups rows into (daily_usage, minute_usage) keyed by api_key_id.
+    A rollup row holds the latest day and minute written for its key, so older ones count as zero.
+    """
+    daily_usage: Dict[Any, Dict[str, int]] = {}
+    minute_usage: Dict[Any, Dict[str, int]] = {}
+    for row in rows or []:
+        key_id = row["api_key_id"]
+        if str(row.get("usage_date")) == usage_date:
+            daily_usage[key_id] = {"tokens": row.get("daily_tokens") or 0, "requests": row.get("daily_requests") or 0}
+        if _parse_minute(row.get("usage_minute")) == usage_minute:
+            minute_usage[key_id] = {"tokens": row.get("minute_tokens") or 0, "requests": row.get("minute_requests") or 0}
+    return daily_usage, minute_usage
@@ -0,0 +1,144 @@
+#!/usr/bin/env python
+"""
+Benchmark for SmartChunker._split_into_sections against the previous implementation
+on synthetic Hebrew regulation documents.
+
+Usage:
+    python -m src.ai.scripts.benchmark_section_splitter --pages 10 50 500 --legacy-max-pages 50
+"""
+
+import re
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+import logging
+from pathlib import Path
+from typing import List, Tuple, Dict, Callable
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent.parent))
+
+from src.ai.services.smart_chunker import SmartChunker
+
+logging.basicConfig(level=logging.WARNING, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+HEBREW_WORDS = [
+    "סטודנט", "תקנון", "בחינה", "מועד", "ציון", "קורס", "סמסטר", "זכאי", "מילואים",
+    "הכרה", "נקודות", "זכות", "חובה", "מזכירות", "פקולטה", "ועדה", "ערעור", "היעדרות",
+    "שכר", "לימוד", "מלגה", "הנחה", "דרישות", "תואר", "מחלקה", "מרצה", "עבודה", "הגשה",
+]
+
+LEGACY_SECTION_PATTERNS = [
+    r'(?:^|\n)\s*(\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
+    r'(?:^|\n)\s*(\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
+    r'(?:^|\n)\s*(\d+\.\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
+    r'(?:^|\n)\s*סעיף\s+(\d+(?:\.\d+)*)\s*[:\-]?\s*([^\n]*(?:\n(?!\s*(?:סעיף\s+)?\d+\.)[^\n]*)*)',
+    r'(\d+(?:\.\d+){0,3})\s*[:\-]\s*([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
+]
+
+
+def legacy_split_into_sections(text: str) -> List[Tuple[str, Dict]]:
+    """Previous implementation (per-character position set), kept for comparison"""
+    all_sections = []
+    used_positions = set()
+
+    for pattern in LEGACY_SECTION_PATTERNS:
+        for match in re.finditer(pattern, text, re.MULTILINE | re.UNICODE):
+            start_pos = match.start()
+            end_pos = match.end()
+            if not any(start_pos <= pos <= end_pos for pos in used_positions):
+                section_info = {
+                    'type': 'section',
+                    'number': match.group(1),
+                    'start_pos': start_pos,
+                    'end_pos': end_pos
+                }
+                all_sections.append((match.group(0).strip(), section_info))
+                for pos in range(start_pos, end_pos + 1):
+                    used_positions.add(pos)
+
+    if not all_sections:
+        paragraphs = text.split('\n\n')
+        result = []
+        for i, para in enumerate(paragraphs):
+            if para.strip():
+                result.append((para.strip(), {'type': 'paragraph', 'number': str(i + 1)}))
+        return result if result else [(text, {'type': 'full_document'})]
+
+    all_sections.sort(key=lambda x: x[1]['start_pos'])
+    seen_numbers = set()
+    unique_sections = []
+    for section_text, section_info in all_sections:
+        section_number = section_info.get('number', '')
+        if section_number not in seen_numbers:
+            seen_numbers.add(section_number)
+            unique_sections.append((section_text, section_info))
+    return unique_sections
+
+
+def generate_hebrew_document(pages: int, seed: int = 42) -> str:
+    """Synthetic regulation text: ~3000 characters per page with numbered sections"""
+    rng = random.Random(seed)
+    lines = []
+    section = 0
+    target_length = pages * 3000
+    length = 0
+
+    while length < target_length:
+        section += 1
+        section_lines = [f"פרק {section}: {' '.join(rng.choices(HEBREW_WORDS, k=3))}"]
+        for sub in range(1, rng.randint(2, 5)):
+            sentence = ' '.join(rng.choices(HEBREW_WORDS, k=rng.randint(12, 30)))
+            if rng.random() < 0.2:
+                section_lines.append(f"סעיף {section}.{sub}: {sentence}")
+            else:
+                section_lines.append(f"{section}.{sub} {sentence}")
+            for subsub in range(1, rng.randint(1, 3)):
+                section_lines.append(f"{section}.{sub}.{subsub} {' '.join(rng.choices(HEBREW_WORDS, k=15))}")
+        section_lines.append("")
+        lines.extend(section_lines)
+        length += sum(len(line) + 1 for line in section_lines)
+
+    return '\n'.join(lines)
+
+
+def measure(func: Callable[[str], List], text: str) -> Tuple[float, float, List]:
+    """Return (seconds, peak MiB, result); timing and memory are measured in separate runs"""
+    start = time.perf_counter()
+    result = func(text)
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func(text)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / (1024 * 1024), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the SmartChunker section splitter")
+    parser.add_argument("--pages", type=int, nargs="+", default=[10, 50, 500])
+    parser.add_argument("--legacy-max-pages", type=int, default=50,
+                        help="Skip the quadratic legacy implementation above this size")
+    args = parser.parse_args()
+
+    chunker = SmartChunker()
+
+    print(f"{'pages':>6} {'chars':>10} {'sections':>9} {'new (s)':>9} {'new MiB':>8} {'legacy (s)':>11} {'legacy MiB':>11} {'same':>5}")
+    for pages in args.pages:
+        text = generate_hebrew_document(pages)
+        new_time, new_mem, new_result = measure(chunker._split_into_sections, text)
+
+        if pages <= args.legacy_max_pages:
+            old_time, old_mem, old_result = measure(legacy_split_into_sections, text)
+            legacy_cols = f"{old_time:>11.3f} {old_mem:>11.1f} {str(old_result == new_result):>5}"
+        else:
+            legacy_cols = f"{'skipped':>11} {'-':>11} {'-':>5}"
+
+        print(f"{pages:>6} {len(text):>10} {len(new_result):>9} {new_time:>9.3f} {new_mem:>8.1f} {legacy_cols}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 import os
 import asyncio
 import logging
-from typing import List, Dict, Any, Optional, Union
+from typing import List, Dict, Any, Callable, Optional, Union
 from pathlib import Path
 import hashlib
 import json
@@ -17,7 +17,8 @@ import tiktoken
 from supabase import create_client, Client
 import PyPDF2
 from docx import Document as DocxDocument
-from ..core.gemini_key_manager import get_key_manager, safe_embed_content
+from ..core.gemini_key_manager import safe_embed_content
+from ..core.request_scheduler import LANE_CHAT, LANE_INGESTION
 
 
 
@@ -31,12 +32,22 @@ from ..config.rag_config import (
 
 # Import vector utilities
 from ..utils.vector_utils import ensure_768_dimensions, log_vector_info
+from ..utils.async_db import run_db
+from ..utils.embedding_store import get_embedding_store
+from ..utils.vector_index import get_vector_index
+from ..utils.search_cache import bump_corpus_version
 
 
-key_manager = get_key_manager()
-
 logger = logging.getLogger(__name__)
 
+# Errors meaning the API (or our local key pool) is out of capacity, not that the input is bad
+_QUOTA_ERROR_MARKERS = ("quota", "rate limit", "resource_exhausted", "429", "no available gemini api keys")
+
+
+def _is_quota_error(error: Exception) -> bool:
+    return any(marker in str(error).lower() for marker in _QUOTA_ERROR_MARKERS)
+
+
 class DocumentProcessor:
     def __init__(self):
         logger.debug("Initializing DocumentProcessor...")
@@ -93,19 +104,24 @@ class DocumentProcessor:
         
         self.enhanced_processor = None
         
+        # Persistent embedding cache; unchanged chunks are not re-embedded on re-upload
+        self.embedding_store = get_embedding_store()
+        
         logger.info(f"DocumentProcessor initialized successfully with config - "
                    f"Max chunks per doc: {self.chunk_config.MAX_CHUNKS_PER_DOCUMENT}, "
                    f"Chunk size: {self.chunk_config.DEFAULT_CHUNK_SIZE}")
 
-    async def process_document(self, document_id: int, file_path: str) -> Dict[str, Any]:
+    async def process_document(self, document_id: int, file_path: str,
+                               progress: Optional[Callable[[float, str], None]] = None) -> Dict[str, Any]:
         """
         Processes a document: splits into chunks, generates embeddings with contextual headers,
         and saves them to the database including metadata for references.
+        `progress(fraction, note)` is called as each stage finishes (used by the ingestion queue).
         """
         logger.info(f"Starting process_document for ID: {document_id}, Path: {file_path}")
         try:
             logger.debug(f"Fetching document name for ID: {document_id}")
-            doc_result = self.supabase.table(self.db_config.DOCUMENTS_TABLE).select("name").eq("id", document_id).execute()
+            doc_result = await run_db(self.supabase.table(self.db_config.DOCUMENTS_TABLE).select("name").eq("id", document_id).execute)
             if doc_result.data and doc_result.data[0].get("name"):
                 document_name = doc_result.data[0]["name"]
                 logger.debug(f"Document name '{document_name}' found for ID: {document_id}.")
@@ -123,6 +139,7 @@ class DocumentProcessor:
             logger.debug(f"Calling _load_and_split_document for file: {file_path}")
             raw_chunks = await self._load_and_split_document(file_path)
             logger.info(f"Document ID: {document_id} ('{document_name}') split into {len(raw_chunks)} raw chunks using {type(self.text_splitter).__name__}.")
+            self._report_progress(progress, 0.2, f"Split into {len(raw_chunks)} chunks")
             
             # Check if number of chunks exceeds limit from config
             if len(raw_chunks) > self.chunk_config.MAX_CHUNKS_PER_DOCUMENT:
@@ -138,39 +155,51 @@ class DocumentProcessor:
                 await self._update_document_status(document_id, "failed", note="Missing GEMINI_API_KEY")
                 return {"success": False, "error": "Missing GEMINI_API_KEY", "document_id": document_id}
 
+            # Prepare chunk texts first so embeddings can be generated in batches
+            prepared_chunks = []
+            for i, chunk_doc in enumerate(raw_chunks):
+                if not chunk_doc.page_content.strip():
+                    logger.warning(f"Empty content in chunk {i} from Langchain Splitter (doc ID: {document_id}), skipping.")
+                    continue
+                
+                # Check if we've reached the vector limit during processing
+                if len(prepared_chunks) >= self.chunk_config.MAX_CHUNKS_PER_DOCUMENT:
+                    logger.warning(f"Maximum number of vectors ({self.chunk_config.MAX_CHUNKS_PER_DOCUMENT}) "
+                                 f"reached during processing for document ID: {document_id}")
+                    break
+                
+                # Determine header from metadata if available
+                header_to_use = chunk_doc.metadata.get('header', f"Chunk {i+1}")
+                
+                # Original text (without header) for token count
+                original_chunk_text = chunk_doc.page_content
+                
+                # Text to be embedded and stored (potentially with header prepended)
+                chunk_text_with_header = f"{header_to_use}\n\n{original_chunk_text}" if header_to_use else original_chunk_text
+                
+                prepared_chunks.append({
+                    "chunk_index": i,
+                    "header": header_to_use,
+                    "original_text": original_chunk_text,
+                    "text": chunk_text_with_header
+                })
+            
+            embedding_vectors = await self._generate_embeddings_batch([chunk["text"] for chunk in prepared_chunks])
+            self._report_progress(progress, 0.7, f"Embedded {len(prepared_chunks)} chunks")
+
             processed_chunks_for_db = []
             chunk_meta_info_for_bc = []
 
-            for i, chunk_doc in enumerate(raw_chunks):
+            for chunk_info, embedding_vector in zip(prepared_chunks, embedding_vectors):
+                i = chunk_info["chunk_index"]
                 try:
-                    if not chunk_doc.page_content.strip():
-                        logger.warning(f"Empty content in chunk {i} from Langchain Splitter (doc ID: {document_id}), skipping.")
-                        continue
-                        
-                    # Determine header and page number from metadata if available
-                    header_to_use = chunk_doc.metadata.get('header', f"Chunk {i+1}")
-                    page_number = chunk_doc.metadata.get('page_number')
-
-                    # Original text (without header) for token count
-                    original_chunk_text = chunk_doc.page_content
-                    
-                    # Text to be embedded and stored (potentially with header prepended)
-                    chunk_text_with_header = f"{header_to_use}\n\n{original_chunk_text}" if header_to_use else original_chunk_text
-
-                    # Check if we've reached the vector limit during processing
-                    if len(processed_chunks_for_db) >= self.chunk_config.MAX_CHUNKS_PER_DOCUMENT:
-                        logger.warning(f"Maximum number of vectors ({self.chunk_config.MAX_CHUNKS_PER_DOCUMENT}) "
-                                     f"reached during processing for document ID: {document_id}")
-                        break
-
-                    embedding_vector = await self._generate_embedding(chunk_text_with_header)
                     if not embedding_vector or len(embedding_vector) == 0:
                         logger.error(f"Empty embedding returned for chunk {i} (doc ID: {document_id}). "
-                                   f"Original text snippet: {original_chunk_text[:100]}...")
+                                   f"Original text snippet: {chunk_info['original_text'][:100]}...")
                         continue
                     
                     # Token count using configured encoding
-                    token_count = len(self.encoding.encode(original_chunk_text))
+                    token_count = len(self.encoding.encode(chunk_info["original_text"]))
                     
                     # Check token limits from config
                     if token_count > self.chunk_config.MAX_TOKENS_PER_CHUNK:
@@ -181,112 +210,74 @@ class DocumentProcessor:
 
                     processed_chunks_for_db.append({
                         "document_id": document_id,
-                        "chunk_text": chunk_text_with_header,
+                        "chunk_index": i,
+                        "chunk_text": chunk_info["text"],
                         "embedding": embedding_vector,
                         "content_token_count": token_count
                     })
                     
                     chunk_meta_info_for_bc.append({
                         "chunk_index": i, 
-                        "original_text": original_chunk_text, 
-                        "header": header_to_use
+                        "original_text": chunk_info["original_text"], 
+                        "header": chunk_info["header"]
                     })
-                    
-                    logger.info(f"Generated embedding for chunk {i+1}/{len(raw_chunks)} "
-                              f"(doc ID: {document_id}, tokens: {token_count})")
                               
                 except Exception as e_emb:
-                    logger.error(f"Error generating embedding or preparing chunk {i} (doc ID: {document_id}): {e_emb}", exc_info=True)
+                    logger.error(f"Error preparing chunk {i} (doc ID: {document_id}): {e_emb}", exc_info=True)
                     continue
             
+            logger.info(f"Generated embeddings for {len(processed_chunks_for_db)}/{len(prepared_chunks)} chunks (doc ID: {document_id})")
+            
+            missing_chunks = len(prepared_chunks) - len(processed_chunks_for_db)
+            if missing_chunks and processed_chunks_for_db:
+                # Replacing the stored chunks with a partial set would lose content; keep them and let the job retry
+                reason = (f"{missing_chunks}/{len(prepared_chunks)} chunks could not be embedded; "
+                          f"previously stored chunks were kept")
+                logger.error(f"Not saving a partial chunk set for doc ID {document_id}: {reason}")
+                await self._update_document_status(document_id, "failed", reason)
+                return {"success": False, "document_id": document_id, "chunks_created": 0, "error": reason}
+            
             if not processed_chunks_for_db:
                 logger.warning(f"No processable chunks with embeddings found for document {document_id}")
                 await self._update_document_status(document_id, "failed", "No processable chunks with embeddings after generation.")
                 return {"success": False, "document_id": document_id, "chunks_created": 0, 
                        "error": "No processable chunks with embeddings after generation"}
 
-            # Save chunks to database using RPC
+            # Save chunks to database in bulk, one transactional RPC call per batch
             logger.info(f"Attempting to save {len(processed_chunks_for_db)} processed chunks to "
-                       f"'{self.db_config.CHUNKS_TABLE}' via RPC for doc ID: {document_id}.")
+                       f"'{self.db_config.CHUNKS_TABLE}' via bulk RPC for doc ID: {document_id}.")
             
-            successful_rpc_inserts = 0
-            any_rpc_insert_failed = False
-            first_rpc_error_message = ""
+            insert_result = await self._bulk_insert_chunks(document_id, processed_chunks_for_db)
+            successful_rpc_inserts = insert_result["inserted"]
 
-            for i, chunk_data_to_insert in enumerate(processed_chunks_for_db):
-                try:
-                    logger.debug(f"Preparing to insert chunk {i+1}/{len(processed_chunks_for_db)} via RPC for doc ID: {document_id}. "
-                                f"Snippet: '{chunk_data_to_insert['chunk_text'][:50]}...', "
-                                f"Emb Dim: {len(chunk_data_to_insert['embedding']) if chunk_data_to_insert.get('embedding') else 'N/A'}")
-
-                    params_for_rpc = {
-                        "p_document_id": chunk_data_to_insert["document_id"],
-                        "p_chunk_text": chunk_data_to_insert["chunk_text"],
-                        "p_embedding": chunk_data_to_insert["embedding"],
-                        "p_content_token_count": chunk_data_to_insert["content_token_count"]
-                    }
-                    
-                    rpc_response = self.supabase.rpc("insert_document_chunk_basic", params_for_rpc).execute()
-
-                    if hasattr(rpc_response, 'data') and rpc_response.data and len(rpc_response.data) > 0:
-                        inserted_chunk_id = rpc_response.data[0].get('id', 'N/A') # RPC returns the inserted row
-                        logger.info(f"Successfully inserted chunk {i+1}/{len(processed_chunks_for_db)} via RPC for doc ID: {document_id}. Inserted '{self.db_config.CHUNKS_TABLE}' ID: {inserted_chunk_id}")
-                        successful_rpc_inserts += 1
-                    else:
-                        # Handle error cases more robustly
-                        error_msg = f"RPC call for '{self.db_config.CHUNKS_TABLE}' chunk {i+1} (doc ID: {document_id}) returned no data"
-                        logger.error(error_msg)
-                        any_rpc_insert_failed = True
-                        if not first_rpc_error_message: 
-                            first_rpc_error_message = error_msg
-                except Exception as e_rpc_call:
-                    error_msg = f"Exception during RPC call for '{self.db_config.CHUNKS_TABLE}' chunk {i+1} (doc ID: {document_id}): {e_rpc_call}"
-                    logger.error(error_msg, exc_info=True)
-                    any_rpc_insert_failed = True
-                    if not first_rpc_error_message: first_rpc_error_message = error_msg
-            
-            logger.info(f"Finished RPC inserts for '{self.db_config.CHUNKS_TABLE}' for doc ID: {document_id}. Successfully inserted: {successful_rpc_inserts}/{len(processed_chunks_for_db)}.")
-
-            if any_rpc_insert_failed or (len(processed_chunks_for_db) > 0 and successful_rpc_inserts == 0):
-                final_status_reason = first_rpc_error_message or "One or more chunks failed to insert into '{self.db_config.CHUNKS_TABLE}' via RPC."
-                logger.error(f"Overall '{self.db_config.CHUNKS_TABLE}' RPC insertion for doc ID {document_id} failed or partially failed. Error: {final_status_reason}")
+            if not insert_result["success"]:
+                final_status_reason = insert_result["error"]
+                logger.error(f"Bulk '{self.db_config.CHUNKS_TABLE}' insertion for doc ID {document_id} failed. Error: {final_status_reason}")
                 await self._update_document_status(document_id, "failed", final_status_reason)
-                return {"success": False, "document_id": document_id, "chunks_created": successful_rpc_inserts, "error": final_status_reason}
-            
-            # If we reach here, all RPC inserts to '{self.db_config.CHUNKS_TABLE}' were successful.
-            logger.info(f"All {successful_rpc_inserts} chunks for document ID {document_id} saved successfully to '{self.db_config.CHUNKS_TABLE}' via RPC.")
-            
-            # --- Backward Compatibility: Save to 'embeddings' table ---
-            # This uses 'chunk_meta_info_for_bc' and 'processed_chunks_for_db' which should be aligned.
-            if successful_rpc_inserts > 0: # Only proceed if primary chunks were saved
-                logger.info(f"Attempting to save {len(chunk_meta_info_for_bc)} items to 'embeddings' table for backward compatibility (doc ID: {document_id}).")
-                bc_inserts_count = 0
-                for i, meta_info in enumerate(chunk_meta_info_for_bc):
-                    # Find the corresponding processed chunk data for the embedding
-                    # This assumes processed_chunks_for_db[i] corresponds to chunk_meta_info_for_bc[i]
-                    if i < len(processed_chunks_for_db):
-                        embedding_vector_for_bc = processed_chunks_for_db[i]["embedding"]
-                        
-                        embedding_data_for_bc_table = {
-                            "content": meta_info["original_text"], 
-                            "metadata": {"document_id": document_id, "chunk_index": meta_info["chunk_index"], "header": meta_info.get("header")},
-                            "embedding": embedding_vector_for_bc,
-                        }
-                        try:
-                            bc_response = self.supabase.table("embeddings").insert(embedding_data_for_bc_table).execute()
-                            if hasattr(bc_response, 'data') and bc_response.data:
-                                bc_inserts_count += 1
-                            else:
-                                logger.error(f"BC Save: Error inserting item {i+1} to 'embeddings' for doc {document_id}")
-                        except Exception as e_bc_insert_exc:
-                            logger.error(f"BC Save: Exception inserting item {i+1} to 'embeddings' for doc {document_id}: {e_bc_insert_exc}", exc_info=True)
-                    else:
-                        logger.warning(f"BC Save: Mismatch between chunk_meta_info_for_bc and processed_chunks_for_db at index {i}. Cannot save to 'embeddings' table.")
-                
-                logger.info(f"Backward compatibility: Saved {bc_inserts_count}/{len(chunk_meta_info_for_bc)} items to 'embeddings' table for doc ID: {document_id}.")
+                return {"success": False, "document_id": document_id, "chunks_created": 0, "error": final_status_reason}
+            
+            logger.info(f"All {successful_rpc_inserts} chunks for document ID {document_id} saved successfully to '{self.db_config.CHUNKS_TABLE}'.")
+            self._report_progress(progress, 0.9, f"Saved {successful_rpc_inserts} chunks")
+            
+            # Keep the in-process indexes and search cache in sync with the stored chunks
+            await self._sync_local_indexes(document_id, document_name, processed_chunks_for_db, insert_result.get("chunk_ids", {}))
+            
+            # --- Backward Compatibility: Save to 'embeddings' table as multi-row inserts ---
+            if successful_rpc_inserts > 0:
+                bc_rows = [
+                    {
+                        "content": meta_info["original_text"],
+                        "metadata": {"document_id": document_id, "chunk_index": meta_info["chunk_index"], "header": meta_info.get("header")},
+                        "embedding": chunk_data["embedding"],
+                    }
+                    for meta_info, chunk_data in zip(chunk_meta_info_for_bc, processed_chunks_for_db)
+                ]
+                bc_inserts_count = await self._bulk_insert_legacy_embeddings(document_id, bc_rows)
+                logger.info(f"Backward compatibility: Saved {bc_inserts_count}/{len(bc_rows)} items to 'embeddings' table for doc ID: {document_id}.")
             
             # Update main document status and content (if all primary chunks saved)
             await self._update_document_status(document_id, "completed")
+            self._report_progress(progress, 1.0, "Completed")
             
             # Only try to update document content if we processed fewer than MAX_VECTORS_PER_DOCUMENT
             if len(raw_chunks) <= self.chunk_config.MAX_CHUNKS_PER_DOCUMENT:
@@ -307,11 +298,89 @@ class DocumentProcessor:
             await self._update_document_status(document_id, "failed", str(e))
             return {"success": False, "document_id": document_id, "chunks_created": 0, "error": str(e)}
 
+    @staticmethod
+    def _report_progress(progress: Optional[Callable[[float, str], None]], fraction: float, note: str):
+        """Progress callbacks must never fail document processing"""
+        if progress is None:
+            return
+        try:
+            progress(fraction, note)
+        except Exception as e:
+            logger.debug(f"Progress callback error: {e}")
+
+    async def _bulk_insert_chunks(self, document_id: int, chunks: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        Replaces the document's chunk set with one bulk RPC call.
+        The RPC deletes the old chunks and inserts the new ones in a single transaction, so a failed
+        write leaves the previous chunk set untouched instead of an empty or partial one
+        (MAX_CHUNKS_PER_DOCUMENT bounds the payload).
+        """
+        function_name = getattr(self.db_config, 'BULK_INSERT_CHUNKS_FUNCTION', 'insert_document_chunks_bulk')
+        params = {
+            "p_document_id": document_id,
+            "p_chunks": [
+                {
+                    "chunk_text": chunk["chunk_text"],
+                    "chunk_index": chunk.get("chunk_index"),
+                    "embedding": chunk["embedding"],
+                    "content_token_count": chunk["content_token_count"]
+                }
+                for chunk in chunks
+            ],
+            "p_replace_existing": True
+        }
+        try:
+            response = await run_db(self.supabase.rpc(function_name, params).execute)
+            inserted = len(response.data) if getattr(response, 'data', None) else 0
+            if inserted != len(chunks):
+                raise ValueError(f"Bulk insert returned {inserted} rows for {len(chunks)} chunks")
+        except Exception as e:
+            error_msg = f"Bulk insert of {len(chunks)} chunks failed for doc ID {document_id}: {e}"
+            logger.error(error_msg, exc_info=True)
+            return {"success": False, "inserted": 0, "error": error_msg, "chunk_ids": {}}
+
+        logger.info(f"Inserted {inserted} chunks for doc ID: {document_id}")
+        chunk_ids = {row.get("chunk_index"): row.get("id") for row in response.data}
+        return {"success": True, "inserted": inserted, "error": None, "chunk_ids": chunk_ids}
+
+    async def _sync_local_indexes(self, document_id: int, document_name: Optional[str],
+                                 chunks: List[Dict[str, Any]], chunk_ids: Dict[Any, int]):
+        """Mirror a document's chunk set into the local indexes and invalidate cached search results"""
+        bump_corpus_version()
+        try:
+            # Rebuilding the matrix and BM25 snapshot is O(corpus); keep it off the event loop
+            await asyncio.to_thread(
+                get_vector_index().replace_document,
+                document_id,
+                [{**chunk, "id": chunk_ids.get(chunk.get("chunk_index"))} for chunk in chunks],
+                document_name=document_name
+            )
+        except Exception as e:
+            logger.warning(f"Failed to update local vector index for doc ID {document_id}: {e}")
+
+    async def _bulk_insert_legacy_embeddings(self, document_id: int, rows: List[Dict[str, Any]]) -> int:
+        """Writes backward-compatible rows to the 'embeddings' table as multi-row inserts"""
+        batch_size = max(1, getattr(self.db_config, 'BULK_INSERT_BATCH_SIZE', 250))
+        inserted = 0
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            try:
+                response = await run_db(self.supabase.table("embeddings").insert(batch).execute)
+                inserted += len(response.data) if getattr(response, 'data', None) else 0
+            except Exception as e:
+                logger.error(f"BC Save: Exception inserting {len(batch)} items to 'embeddings' for doc {document_id}: {e}", exc_info=True)
+        return inserted
+
     async def _load_and_split_document(self, file_path: str) -> List[Document]:
         """
         Loads a document from file_path and splits it into chunks.
         Returns list of Document objects with metadata.
         """
+        # PDF/DOCX extraction and splitting are CPU-bound; keep them off the event loop
+        return await asyncio.to_thread(self._split_document_file, file_path)
+
+    def _split_document_file(self, file_path: str) -> List[Document]:
+        """Blocking part of _load_and_split_document: extract the text and split it"""
         logger.debug(f"Starting _load_and_split_document for file: {file_path}")
         
         try:
@@ -387,6 +456,92 @@ class DocumentProcessor:
             logger.error(f"Error extracting DOCX text from {file_path}: {str(e)}", exc_info=True)
             raise
 
+    async def _generate_embeddings_batch(self, texts: List[str], is_query: bool = False) -> List[Optional[List[float]]]:
+        """
+        Creates embeddings for many texts using batched API requests.
+        Texts already in the persistent embedding store are not sent to the API.
+        Batches run with bounded concurrency. A batch rejected for quota/saturation is retried whole
+        with exponential backoff (and the error raised once retries run out, so the ingestion job is
+        retried later); any other failure falls back to per-text embedding, so the result list is
+        aligned with `texts` and holds None only for texts that failed. Quota errors in the per-text
+        fallback are raised the same way.
+        """
+        task_type = "retrieval_query" if is_query else "retrieval_document"
+        batch_size = max(1, getattr(self.embedding_config, 'BATCH_SIZE', 50))
+        max_concurrent = max(1, getattr(self.embedding_config, 'MAX_CONCURRENT_BATCHES', 4))
+        max_retries = max(0, getattr(self.embedding_config, 'MAX_RETRIES', 3))
+        retry_delay = getattr(self.embedding_config, 'RETRY_DELAY_SECONDS', 1.0)
+        semaphore = asyncio.Semaphore(max_concurrent)
+        results: List[Optional[List[float]]] = [None] * len(texts)
+
+        cached = {}
+        if self.embedding_store:
+            cached = await asyncio.to_thread(
+                self.embedding_store.get_many, self.embedding_config.MODEL_NAME, task_type, texts
+            )
+            for index, embedding in cached.items():
+                results[index] = embedding
+            if cached:
+                logger.info(f"Reused {len(cached)}/{len(texts)} embeddings from the persistent store")
+        pending = [i for i in range(len(texts)) if i not in cached]
+
+        async def embed_batch(start: int):
+            indices = pending[start:start + batch_size]
+            batch = [texts[i] for i in indices]
+            async with semaphore:
+                attempt = 0
+                while True:
+                    try:
+                        response = await safe_embed_content(
+                            model=self.embedding_config.MODEL_NAME,
+                            content=batch,
+                            task_type=task_type
+                        )
+                        raw_embeddings = response["embedding"] if response and 'embedding' in response else None
+                        if not raw_embeddings or len(raw_embeddings) != len(batch):
+                            raise ValueError(f"Expected {len(batch)} embeddings, got {len(raw_embeddings) if raw_embeddings else 0}")
+                        
+                        for index, raw_embedding in zip(indices, raw_embeddings):
+                            results[index] = ensure_768_dimensions(raw_embedding) if raw_embedding else None
+                        logger.debug(f"Embedded batch of {len(batch)} texts starting at {start}")
+                        return
+                    except Exception as e:
+                        if not _is_quota_error(e):
+                            logger.warning(f"Batch embedding failed for pending texts {start}-{start + len(batch) - 1}: {e}. "
+                                           f"Falling back to per-text embedding.")
+                            break
+                        # Splitting the batch would only multiply requests against the exhausted quota
+                        if attempt >= max_retries:
+                            raise
+                        delay = retry_delay * (2 ** attempt)
+                        attempt += 1
+                        logger.warning(f"Batch embedding for pending texts {start}-{start + len(batch) - 1} hit the quota: {e}. "
+                                       f"Retrying the batch in {delay:.1f}s ({attempt}/{max_retries})")
+                        await asyncio.sleep(delay)
+                
+                for index, text in zip(indices, batch):
+                    results[index] = await self._generate_embedding(text, is_query=is_query)
+
+        outcomes = await asyncio.gather(
+            *(embed_batch(start) for start in range(0, len(pending), batch_size)), return_exceptions=True
+        )
+        quota_error = next((outcome for outcome in outcomes if isinstance(outcome, BaseException)), None)
+        
+        if self.embedding_store and pending:
+            new_items = [(texts[i], results[i]) for i in pending if results[i]]
+            await asyncio.to_thread(
+                self.embedding_store.put_many, self.embedding_config.MODEL_NAME, task_type, new_items
+            )
+        
+        if quota_error is not None:
+            # Embeddings that did succeed are in the store, so the retried job only sends the rest
+            raise quota_error
+        
+        failed = sum(1 for embedding in results if not embedding)
+        if failed:
+            logger.warning(f"{failed}/{len(texts)} texts could not be embedded")
+        return results
+
     async def _generate_embedding(self, text: str, is_query: bool = False) -> Optional[List[float]]:
         """Creates embedding for text"""
         task_type = "retrieval_query" if is_query else "retrieval_document"
@@ -403,15 +558,24 @@ class DocumentProcessor:
             logger.error("GEMINI_API_KEY not found when trying to generate embedding.")
             return None
         
+        if self.embedding_store:
+            stored = await asyncio.to_thread(
+                self.embedding_store.get, self.embedding_config.MODEL_NAME, task_type, text
+            )
+            if stored:
+                return stored
+        
         try:
             # The model name for embeddings might be different from generative models.
             # Using the model specified for embeddings, e.g., "models/embedding-001"
             # Task types: "retrieval_query", "retrieval_document", "semantic_similarity", "classification", "clustering"
             logger.debug(f"Calling genai.embed_content with model {self.embedding_config.MODEL_NAME} and task_type {task_type}")
+            # Query embeddings answer a live search; document chunks go through the ingestion lane
             result = await safe_embed_content(
                 model=self.embedding_config.MODEL_NAME,
                 content=text,
-                task_type=task_type
+                task_type=task_type,
+                lane=LANE_CHAT if is_query else LANE_INGESTION
             )
             
             raw_embedding = result["embedding"] if result and 'embedding' in result else None
@@ -429,9 +593,17 @@ class DocumentProcessor:
                 log_vector_info(embedding, f"Adjusted {task_type} embedding")
             
             logger.debug(f"Successfully generated embedding for task_type: {task_type}. Final embedding length: {len(embedding)}")
+            if self.embedding_store:
+                await asyncio.to_thread(
+                    self.embedding_store.put, self.embedding_config.MODEL_NAME, task_type, text, embedding
+                )
             return embedding
             
         except Exception as e:
+            if _is_quota_error(e):
+                # Out of capacity, not a bad text: let the caller (and the ingestion job) retry later
+                logger.warning(f"Gemini embedding for task_type {task_type} hit the quota: {e}")
+                raise
             logger.error(f"Error generating Gemini embedding for task_type {task_type}: {e}", exc_info=True)
             return None
 
@@ -443,7 +615,7 @@ class DocumentProcessor:
             if note is not None:
                 update_data["processing_notes"] = note
             
-            response = self.supabase.table(self.db_config.DOCUMENTS_TABLE).update(update_data).eq("id", document_id).execute()
+            response = await run_db(self.supabase.table(self.db_config.DOCUMENTS_TABLE).update(update_data).eq("id", document_id).execute)
             # Check response for errors (Supabase client specific)
             if hasattr(response, 'data') and response.data:
                 logger.debug(f"Successfully updated status for document ID {document_id} to {status}. Response: {response.data}")
@@ -464,7 +636,7 @@ class DocumentProcessor:
                 "total_chunks": len(raw_chunks)
             }
             
-            response = self.supabase.table(self.db_config.DOCUMENTS_TABLE).update(update_data).eq("id", document_id).execute()
+            response = await run_db(self.supabase.table(self.db_config.DOCUMENTS_TABLE).update(update_data).eq("id", document_id).execute)
             
             if hasattr(response, 'data') and response.data:
                 logger.debug(f"Successfully updated content for document ID {document_id}")
@@ -486,7 +658,7 @@ class DocumentProcessor:
         try:
             # Delete chunks from 'advanced_document_chunks' table (new system)
             logger.debug(f"Deleting chunks for document_id: {document_id} from 'advanced_document_chunks' table.")
-            delete_advanced_chunks_response = self.supabase.table("advanced_document_chunks").delete().eq("document_id", document_id).execute()
+            delete_advanced_chunks_response = await run_db(self.supabase.table("advanced_document_chunks").delete().eq("document_id", document_id).execute)
             
             if delete_advanced_chunks_response.data:
                 deleted_advanced_chunks_count = len(delete_advanced_chunks_response.data)
@@ -494,7 +666,7 @@ class DocumentProcessor:
             
 
             logger.debug(f"Deleting chunks for document_id: {document_id} from 'document_chunks' table.")
-            delete_chunks_response = self.supabase.table("document_chunks").delete().eq("document_id", document_id).execute()
+            delete_chunks_response = await run_db(self.supabase.table("document_chunks").delete().eq("document_id", document_id).execute)
             
             if delete_chunks_response.data:
                 deleted_chunks_count = len(delete_chunks_response.data)
@@ -502,7 +674,9 @@ class DocumentProcessor:
 
             # Delete the document from 'documents' table
             logger.debug(f"Deleting document record for document_id: {document_id} from 'documents' table.")
-            delete_document_response = self.supabase.table(self.db_config.DOCUMENTS_TABLE).delete().eq("id", document_id).execute()
+            await self._sync_local_indexes(document_id, None, [], {})
+            
+            delete_document_response = await run_db(self.supabase.table(self.db_config.DOCUMENTS_TABLE).delete().eq("id", document_id).execute)
 
             document_deleted_successfully = bool(delete_document_response.data)
             
@@ -520,6 +694,22 @@ class DocumentProcessor:
             logger.error(f"Exception in delete_document_and_all_chunks for document_id {document_id}: {e}", exc_info=True)
             return {"success": False, "error": str(e), "deleted_chunks_count": deleted_chunks_count, "document_deleted": False}
 
+    async def delete_legacy_embeddings(self, document_id: int) -> int:
+        """
+        Deletes the document's rows in the legacy 'embeddings' and 'advanced_document_chunks' tables only.
+        Used before retrying ingestion: 'document_chunks' is replaced atomically by the bulk RPC, so the
+        previous chunk set stays searchable until a retry succeeds.
+        """
+        deleted = 0
+        for table in ("advanced_document_chunks", "embeddings"):
+            try:
+                response = await run_db(self.supabase.table(table).delete().eq("document_id", document_id).execute)
+                deleted += len(response.data) if response.data else 0
+            except Exception as e:
+                logger.warning(f"Exception during deletion from '{table}' for document_id {document_id}: {e}")
+        logger.info(f"Deleted {deleted} legacy embedding rows for document_id: {document_id}")
+        return deleted
+
     async def delete_document_embeddings(self, document_id: int) -> Dict[str, Any]:
         """
         Deletes all embeddings (chunks) for a given document ID from both old and new systems.
@@ -529,22 +719,23 @@ class DocumentProcessor:
         try:
             # Delete from new advanced_document_chunks table
             logger.info(f"Deleting chunks from 'advanced_document_chunks' for document_id: {document_id}")
-            delete_advanced_response = self.supabase.table("advanced_document_chunks").delete().eq("document_id", document_id).execute()
+            delete_advanced_response = await run_db(self.supabase.table("advanced_document_chunks").delete().eq("document_id", document_id).execute)
             
             advanced_deleted_count = len(delete_advanced_response.data) if delete_advanced_response.data else 0
             logger.info(f"Deleted {advanced_deleted_count} chunks from 'advanced_document_chunks' for document_id: {document_id}")
 
 
             logger.info(f"Deleting chunks from 'document_chunks' for document_id: {document_id}")
-            delete_old_response = self.supabase.table("document_chunks").delete().eq("document_id", document_id).execute()
+            delete_old_response = await run_db(self.supabase.table("document_chunks").delete().eq("document_id", document_id).execute)
             
             old_deleted_count = len(delete_old_response.data) if delete_old_response.data else 0
             logger.info(f"Deleted {old_deleted_count} chunks from 'document_chunks' for document_id: {document_id}")
+            await self._sync_local_indexes(document_id, None, [], {})
 
 
             try:
                 logger.info(f"Attempting to delete old embeddings from 'embeddings' table for document_id: {document_id}.")
-                delete_old_embeddings_response = self.supabase.table("embeddings").delete().eq("document_id", document_id).execute()
+                delete_old_embeddings_response = await run_db(self.supabase.table("embeddings").delete().eq("document_id", document_id).execute)
                 
                 embeddings_deleted_count = len(delete_old_embeddings_response.data) if delete_old_embeddings_response.data else 0
                 logger.info(f"Deleted {embeddings_deleted_count} entries from 'embeddings' table for document_id: {document_id}")
@@ -588,14 +779,14 @@ class DocumentProcessor:
                 logger.error("Failed to generate query embedding for fallback")
                 return []
             
-            response = self.supabase.rpc(
+            response = await run_db(self.supabase.rpc(
                 "advanced_semantic_search",
                 {
                     "query_embedding": query_embedding,
                     "similarity_threshold": threshold,
                     "match_count": limit,
                 },
-            ).execute()
+            ).execute)
             
             if response.data:
                 logger.info(f"Fallback search found {len(response.data)} results")
@@ -626,9 +817,9 @@ class DocumentProcessor:
     async def _get_all_document_chunks(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get a set of document chunks for local processing"""
         try:
-            response = self.supabase.table("document_chunks").select(
+            response = await run_db(self.supabase.table("document_chunks").select(
                 "id,document_id,chunk_text,chunk_header,page_number,section,documents(name)"
-            ).limit(limit).execute()
+            ).limit(limit).execute)
             
             if hasattr(response, 'data') and response.data:
                 # Transform the results to match our expected format
@@ -0,0 +1,434 @@
+"""
+Ingestion Queue - Worker pool for durable document ingestion jobs
+Uploads enqueue a job and return immediately; a fixed pool of async workers claims jobs from the
+job store, renews each job's lease while it runs and retries failures with exponential backoff.
+Jobs live in the store, so work queued or interrupted before a restart is picked up afterwards.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlparse
+
+from ..core.job_store import SQLiteJobStore, SupabaseJobStore, COMPLETED, FAILED, QUEUED
+from ..utils.async_db import run_db, execute_async
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_PATH = Path(__file__).parent.parent / "ingestion_jobs.sqlite3"
+
+
+class PermanentJobError(Exception):
+    """A failure that retrying cannot fix, e.g. the uploaded file is gone"""
+
+
+def _default_processor_factory():
+    from .document_processor import DocumentProcessor
+    return DocumentProcessor()
+
+
+class IngestionQueue:
+    """
+    Runs `workers` concurrent ingestion jobs on the event loop that called start().
+    Enqueueing wakes an idle worker at once; the idle poll only picks up jobs queued by other
+    processes, retries that became due and leases that expired.
+    With the local SQLite store no database trigger queues documents inserted as pending, so idle
+    workers sweep them in every `pending_sweep` seconds.
+    """
+
+    def __init__(self, store: Any, processor_factory: Optional[Callable[[], Any]] = None,
+                 workers: int = 2, lease_seconds: float = 300, max_attempts: int = 5,
+                 retry_base: float = 10.0, retry_max: float = 600.0, idle_poll: float = 5.0,
+                 pending_sweep: float = 30.0):
+        self.store = store
+        self.processor_factory = processor_factory or _default_processor_factory
+        self.workers = max(1, workers)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.idle_poll = idle_poll
+        self.pending_sweep = pending_sweep
+        self.host = socket.gethostname()
+        self.worker_id = f"{self.host}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+        self._processor = None
+        self._tasks: List[asyncio.Task] = []
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._active = 0
+        self._stopping = False
+        self._last_sweep = 0.0
+        self.stats = {"enqueued": 0, "completed": 0, "retried": 0, "failed": 0}
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    def _get_processor(self):
+        if self._processor is None:
+            self._processor = self.processor_factory()
+        return self._processor
+
+    async def start(self):
+        """Queue documents left pending and start the workers (idempotent)"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._last_sweep = time.monotonic()
+        try:
+            await self.enqueue_pending_documents()
+        except Exception as e:
+            logger.warning(f"Could not enqueue pending documents: {e}")
+        self._tasks = [
+            asyncio.create_task(self._worker(index), name=f"ingestion-worker-{index}")
+            for index in range(self.workers)
+        ]
+        logger.info(f"Ingestion queue started with {self.workers} workers ({self.worker_id})")
+
+    async def close(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        tasks, self._tasks = self._tasks, []
+        self._stopping = True
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def enqueue(self, document_id: int, file_path: Optional[str] = None) -> Any:
+        """Queue a document for ingestion; returns the job id (an existing active job is reused).
+        A local file_path pins the job to this host, since workers elsewhere cannot read it"""
+        job_id = await run_db(self.store.enqueue, document_id, file_path, self.max_attempts,
+                              self.host if file_path else None)
+        self.stats["enqueued"] += 1
+        self._notify()
+        logger.info(f"Queued ingestion job {job_id} for document {document_id}")
+        return job_id
+
+    async def enqueue_pending_documents(self) -> int:
+        """Queue every document still marked pending (recovery after restarts or manual resets)"""
+        processor = self._get_processor()
+        result = await execute_async(
+            processor.supabase.table(processor.db_config.DOCUMENTS_TABLE).select("id, url").eq("processing_status", "pending")
+        )
+        documents = result.data or []
+        for document in documents:
+            # Local uploads still on this host are pinned here; an active job keeps its existing pin
+            url = document.get("url") or ""
+            local_path = url[len("temp://"):] if url.startswith("temp://") else None
+            if local_path and os.path.exists(local_path):
+                await run_db(self.store.enqueue, document["id"], local_path, self.max_attempts, self.host)
+            else:
+                await run_db(self.store.enqueue, document["id"], None, self.max_attempts)
+        if documents:
+            logger.info(f"Queued {len(documents)} pending documents for ingestion")
+            self._notify()
+        return len(documents)
+
+    async def get_job(self, job_id: Any) -> Optional[Dict[str, Any]]:
+        return await run_db(self.store.get, job_id)
+
+    async def get_stats(self) -> Dict[str, Any]:
+        return {
+            "worker_id": self.worker_id,
+            "workers": self.workers,
+            "running": self.running,
+            "active_jobs": self._active,
+            **self.stats,
+            "jobs": await run_db(self.store.counts),
+        }
+
+    async def drain(self) -> int:
+        """Run due jobs on the current task until none are left (single-run mode); returns the count"""
+        processed = 0
+        while True:
+            job = await run_db(self.store.claim, self.worker_id, self.lease_seconds, self.host)
+            if job is None:
+                return processed
+            await self._run_job(job)
+            processed += 1
+
+    def retry_delay(self, attempts: int) -> float:
+        return min(self.retry_max, self.retry_base * (2 ** max(0, attempts - 1)))
+
+    def _notify(self):
+        """Wake idle workers, also when called from another thread's event loop"""
+        if self._wake is None or self._loop is None or self._loop.is_closed():
+            return
+        try:
+            current = asyncio.get_running_loop()
+        except RuntimeError:
+            current = None
+        if current is self._loop:
+            self._wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def _worker(self, index: int):
+        while True:
+            # Clear before claiming: a job enqueued while the claim is in flight sets the event again
+            self._wake.clear()
+            try:
+                job = await run_db(self.store.claim, self.worker_id, self.lease_seconds, self.host)
+            except Exception as e:
+                logger.error(f"Ingestion worker {index} could not claim a job: {e}")
+                job = None
+
+            if job is None:
+                await self._sweep_pending_if_due()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.idle_poll)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            # More jobs may be waiting; let an idle worker check
+            self._wake.set()
+            await self._run_job(job)
+
+    async def _sweep_pending_if_due(self):
+        """Queue pending documents periodically when no trigger does it (local SQLite store only)"""
+        if not isinstance(self.store, SQLiteJobStore) or self.pending_sweep <= 0:
+            return
+        now = time.monotonic()
+        if now - self._last_sweep < self.pending_sweep:
+            return
+        # Claimed before awaiting so other idle workers skip this round
+        self._last_sweep = now
+        try:
+            await self.enqueue_pending_documents()
+        except Exception as e:
+            logger.warning(f"Could not enqueue pending documents: {e}")
+
+    async def _run_job(self, job: Dict[str, Any]):
+        job_id, document_id = job["id"], job["document_id"]
+        progress = {"fraction": None, "note": None, "changed": asyncio.Event()}
+
+        def report(fraction: float, note: str):
+            progress.update(fraction=fraction, note=note)
+            progress["changed"].set()
+
+        logger.info(f"Running ingestion job {job_id} for document {document_id} (attempt {job.get('attempts')})")
+        work = asyncio.create_task(self._process(job, report))
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, progress, work))
+        self._active += 1
+        error, permanent = None, False
+        try:
+            result = await work
+            if not result.get("success"):
+                error = result.get("error") or "Document processing failed"
+        except asyncio.CancelledError:
+            if progress.get("lost") and not self._stopping:
+                # Another worker owns the job now; it records the outcome
+                logger.warning(f"Stopped ingestion job {job_id} for document {document_id} after losing its lease")
+                return
+            await self._finish(job_id, "released")
+            raise
+        except PermanentJobError as e:
+            error, permanent = str(e), True
+        except Exception as e:
+            logger.error(f"Ingestion job {job_id} raised: {e}", exc_info=True)
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+            self._active -= 1
+
+        if error is None:
+            await self._finish(job_id, COMPLETED)
+            self.stats["completed"] += 1
+            self._discard_upload(job)
+            logger.info(f"Ingestion job {job_id} for document {document_id} completed")
+        elif await self._fail(job, error, permanent):
+            self._discard_upload(job)
+
+    async def _process(self, job: Dict[str, Any], report: Callable[[float, str], None]) -> Dict[str, Any]:
+        processor = self._get_processor()
+        document_id = job["document_id"]
+        if (job.get("attempts") or 1) > 1:
+            # An earlier attempt may have left legacy rows behind; document_chunks is replaced
+            # atomically on success, so the previous chunk set stays in place until then
+            await processor.delete_legacy_embeddings(document_id)
+
+        file_path = job.get("file_path")
+        if file_path and os.path.exists(file_path):
+            return await processor.process_document(document_id, file_path, progress=report)
+
+        url = await self._source_url(processor, document_id)
+        if url.startswith("temp://"):
+            # Uploads queued without a path (e.g. recovered from a pending document) keep it in the URL;
+            # recording it on the job lets _discard_upload remove the file once no retry needs it
+            local_path = url[len("temp://"):]
+            if not os.path.exists(local_path):
+                raise PermanentJobError(f"Source file for document {document_id} is no longer available")
+            job["file_path"] = local_path
+            return await processor.process_document(document_id, local_path, progress=report)
+
+        downloaded = await self._download(url, document_id)
+        try:
+            return await processor.process_document(document_id, downloaded, progress=report)
+        finally:
+            try:
+                os.unlink(downloaded)
+            except OSError:
+                pass
+
+    async def _source_url(self, processor: Any, document_id: int) -> str:
+        result = await execute_async(
+            processor.supabase.table(processor.db_config.DOCUMENTS_TABLE).select("url").eq("id", document_id)
+        )
+        if not result.data:
+            raise PermanentJobError(f"Document {document_id} not found")
+        return result.data[0].get("url") or ""
+
+    async def _download(self, url: str, document_id: int) -> str:
+        """Fetch the document's stored file into a temporary file"""
+        if not url.startswith(("http://", "https://")):
+            raise PermanentJobError(f"Source file for document {document_id} is no longer available")
+
+        import httpx
+
+        async with httpx.AsyncClient(timeout=60.0, follow_redirects=True) as client:
+            response = await client.get(url)
+            response.raise_for_status()
+
+        suffix = Path(urlparse(url).path).suffix or ".pdf"
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            temp_file.write(response.content)
+            return temp_file.name
+
+    async def _heartbeat(self, job_id: Any, progress: Dict[str, Any], work: asyncio.Task):
+        """Renew the lease every third of its length, and right away when progress changes.
+        Cancels `work` once the lease is lost so two workers never ingest the same document"""
+        interval = max(1.0, self.lease_seconds / 3)
+        changed: asyncio.Event = progress["changed"]
+        while True:
+            try:
+                await asyncio.wait_for(changed.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            changed.clear()
+            try:
+                held = await run_db(self.store.heartbeat, job_id, self.worker_id, self.lease_seconds,
+                                    progress["fraction"], progress["note"])
+            except Exception as e:
+                logger.warning(f"Heartbeat for ingestion job {job_id} failed: {e}")
+                continue
+            if not held:
+                logger.warning(f"Lease on ingestion job {job_id} was lost; cancelling its processing")
+                progress["lost"] = True
+                work.cancel()
+                return
+
+    async def _fail(self, job: Dict[str, Any], error: str, permanent: bool) -> bool:
+        """Schedule a retry, or fail the job for good; returns True when no retry follows"""
+        job_id, document_id = job["id"], job["document_id"]
+        attempts = job.get("attempts") or 1
+        max_attempts = job.get("max_attempts") or self.max_attempts
+
+        if permanent or attempts >= max_attempts:
+            await self._finish(job_id, FAILED, error)
+            self.stats["failed"] += 1
+            logger.error(f"Ingestion job {job_id} for document {document_id} failed after {attempts} attempts: {error}")
+            await self._mark_document(document_id, "failed", error)
+            return True
+
+        delay = self.retry_delay(attempts)
+        await self._finish(job_id, QUEUED, error, delay)
+        self.stats["retried"] += 1
+        logger.warning(f"Ingestion job {job_id} attempt {attempts}/{max_attempts} failed, retrying in {delay:.0f}s: {error}")
+        await self._mark_document(
+            document_id, "pending", f"Attempt {attempts}/{max_attempts} failed, retrying in {delay:.0f}s: {error}"
+        )
+        return False
+
+    async def _mark_document(self, document_id: int, status: str, note: str):
+        """Show the job outcome on the document row (the processor only does so when it got to run)"""
+        try:
+            processor = self._get_processor()
+            await execute_async(
+                processor.supabase.table(processor.db_config.DOCUMENTS_TABLE).update({
+                    "processing_status": status,
+                    "processing_notes": note,
+                }).eq("id", document_id)
+            )
+        except Exception as e:
+            logger.warning(f"Could not mark document {document_id} {status}: {e}")
+
+    async def _finish(self, job_id: Any, status: str, error: Optional[str] = None, retry_in: float = 0.0):
+        try:
+            if not await run_db(self.store.finish, job_id, self.worker_id, status, error, retry_in):
+                logger.warning(f"Ingestion job {job_id} was no longer leased by this worker when finishing ({status})")
+        except Exception as e:
+            # The lease will expire and another worker will pick the job up again
+            logger.error(f"Could not record outcome '{status}' for ingestion job {job_id}: {e}")
+
+    @staticmethod
+    def _discard_upload(job: Dict[str, Any]):
+        """Remove the uploaded temp file once no retry needs it"""
+        file_path = job.get("file_path")
+        if not file_path or not os.path.exists(file_path):
+            return
+        if os.path.dirname(os.path.abspath(file_path)) != os.path.abspath(tempfile.gettempdir()):
+            return
+        try:
+            os.unlink(file_path)
+        except OSError as e:
+            logger.warning(f"Failed to clean up temporary file {file_path}: {e}")
+
+
+_queue: Optional[IngestionQueue] = None
+_queue_lock = threading.Lock()
+
+
+def _create_store(config: Any) -> Any:
+    try:
+        from ..config.rag_config import get_database_config
+    except ImportError:
+        from src.ai.config.rag_config import get_database_config
+
+    backend = (os.getenv("INGESTION_QUEUE_BACKEND") or getattr(config, 'INGESTION_QUEUE_BACKEND', "supabase")).lower()
+    if backend == "supabase":
+        # The job functions are executable by service_role only; the anon key cannot use them
+        supabase_url = os.getenv("SUPABASE_URL")
+        service_key = os.getenv("SUPABASE_SERVICE_KEY")
+        if supabase_url and service_key:
+            from supabase import create_client
+            table = getattr(get_database_config(), 'INGESTION_JOBS_TABLE', "ingestion_jobs")
+            return SupabaseJobStore(create_client(supabase_url, service_key), table=table)
+        logger.warning("SUPABASE_URL or SUPABASE_SERVICE_KEY missing, using the local SQLite ingestion queue")
+
+    path = os.getenv("INGESTION_QUEUE_PATH") or getattr(config, 'INGESTION_QUEUE_SQLITE_PATH', "") or str(DEFAULT_QUEUE_PATH)
+    return SQLiteJobStore(path)
+
+
+def get_ingestion_queue() -> IngestionQueue:
+    """Process-wide ingestion queue"""
+    global _queue
+    if _queue is None:
+        with _queue_lock:
+            if _queue is None:
+                try:
+                    from ..config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                _queue = IngestionQueue(
+                    store=_create_store(config),
+                    workers=getattr(config, 'INGESTION_WORKERS', 2),
+                    lease_seconds=getattr(config, 'INGESTION_LEASE_SECONDS', 300),
+                    max_attempts=getattr(config, 'INGESTION_MAX_ATTEMPTS', 5),
+                    retry_base=getattr(config, 'INGESTION_RETRY_BASE_SECONDS', 10.0),
+                    retry_max=getattr(config, 'INGESTION_RETRY_MAX_SECONDS', 600.0),
+                    idle_poll=getattr(config, 'INGESTION_IDLE_POLL_SECONDS', 5.0),
+                    pending_sweep=getattr(config, 'INGESTION_PENDING_SWEEP_SECONDS', 30.0),
+                )
+    return _queue
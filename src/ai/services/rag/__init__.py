@@ -10,6 +10,11 @@ This package contains the refactored RAG service split into modular components:
 - context_builder: Context assembly and prompt building
 - answer_generator: Answer generation with retry logic
 - search_analytics: Analytics and usage tracking
+- analytics_writer: Buffered, batched analytics writes off the response path
+- pipeline_pool: Process-wide pool of pipelines keyed by profile
+- gemini_client: Non-blocking wrappers around the Gemini SDK
+- embedding_batcher: Micro-batching of concurrent query embeddings
+- answer_cache: Reuse of complete answers for repeated questions
 """
 
 from .rag_orchestrator import RAGOrchestrator
@@ -18,6 +23,7 @@ from .search_services import SearchService
 from .context_builder import ContextBuilder
 from .answer_generator import AnswerGenerator
 from .search_analytics import SearchAnalytics
+from .pipeline_pool import RAGPipelinePool, get_pipeline_pool
 
 # Backwards compatibility - maintain the same interface
 def get_rag_service():
@@ -31,5 +37,7 @@ __all__ = [
     'ContextBuilder',
     'AnswerGenerator',
     'SearchAnalytics',
+    'RAGPipelinePool',
+    'get_pipeline_pool',
     'get_rag_service'
 ] 
\ No newline at end of file
@@ -0,0 +1,198 @@
+"""
+Analytics Writer - Buffers search analytics events and writes them in batches
+Events are queued in memory and flushed by a background task through a bulk-insert RPC,
+so logging analytics never adds a database round trip to a chat response
+"""
+
+import asyncio
+import logging
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+try:
+    from ...utils.async_db import execute_async
+except ImportError:
+    from src.ai.utils.async_db import execute_async
+
+logger = logging.getLogger(__name__)
+
+# SQLSTATE classes that retrying cannot fix: data exceptions, constraint violations,
+# syntax/access errors (undefined function 42883, insufficient privilege 42501)
+_PERMANENT_SQLSTATE_CLASSES = ("22", "23", "42")
+# PostgREST connection/schema-cache errors; every other PGRST code is a client error
+_TRANSIENT_POSTGREST_CODES = ("PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+
+def _is_permanent_error(error: Exception) -> bool:
+    """Whether a failed write would fail the same way on every retry"""
+    code = str(getattr(error, 'code', None) or "")
+    if code.startswith("PGRST"):
+        return code not in _TRANSIENT_POSTGREST_CODES
+    if len(code) == 5 and code[:2] in _PERMANENT_SQLSTATE_CLASSES:
+        return True
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    return isinstance(status, int) and 400 <= status < 500 and status not in (408, 429)
+
+
+class AnalyticsWriter:
+    """
+    Bounded in-process queue of analytics rows with a background flusher.
+    Flushes when a batch fills up or after flush_interval seconds; when the queue is full
+    (e.g. the database is unreachable) the oldest events are dropped first. A batch that fails
+    permanently, or max_batch_attempts times in a row, is discarded so it cannot block the queue.
+    """
+
+    def __init__(self, supabase: Any, function_name: str = "log_search_analytics_bulk",
+                 max_queue_size: int = 5000, batch_size: int = 100, flush_interval: float = 2.0,
+                 max_backoff: float = 60.0, max_batch_attempts: int = 5):
+        self.supabase = supabase
+        self.function_name = function_name
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_backoff = max_backoff
+        self.max_batch_attempts = max(1, max_batch_attempts)
+        self._queue: Deque[Dict[str, Any]] = deque(maxlen=max_queue_size)
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._failures = 0
+        self._head_attempts = 0
+        self.stats = {"enqueued": 0, "written": 0, "dropped": 0, "batches": 0, "failed_batches": 0,
+                      "discarded_batches": 0}
+
+    def enqueue(self, event: Dict[str, Any]) -> None:
+        """Queue an event without waiting for the database"""
+        if len(self._queue) >= self.max_queue_size:
+            self.stats["dropped"] += 1
+        self._queue.append(event)
+        self.stats["enqueued"] += 1
+        self._ensure_started()
+        if len(self._queue) >= self.batch_size and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_started(self):
+        """Start the background flusher on the running loop the first time it is needed"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Back off exponentially while the database keeps failing
+            delay = min(self.flush_interval * (2 ** self._failures), self.max_backoff)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._queue:
+                if not await self.flush_batch():
+                    break
+
+    async def flush_batch(self) -> bool:
+        """Write up to batch_size queued events; returns False when the batch was kept for a retry"""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch: List[Dict[str, Any]] = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            if not batch:
+                return True
+
+            try:
+                await execute_async(self.supabase.rpc(self.function_name, {"p_events": batch}))
+                self._failures = 0
+                self._head_attempts = 0
+                self.stats["written"] += len(batch)
+                self.stats["batches"] += 1
+                return True
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                # A failed batch goes back to the front, so the next flush retries the same events
+                self._head_attempts += 1
+                if _is_permanent_error(e) or self._head_attempts >= self.max_batch_attempts:
+                    self._head_attempts = 0
+                    self.stats["discarded_batches"] += 1
+                    self.stats["dropped"] += len(batch)
+                    logger.error(f"Discarding {len(batch)} analytics events that cannot be written: {e}")
+                    return True
+                self._failures += 1
+                self._requeue(batch)
+                logger.warning(f"Failed to write {len(batch)} analytics events (attempt {self._head_attempts}): {e}")
+                return False
+
+    def _requeue(self, batch: List[Dict[str, Any]]):
+        """Put a failed batch back in front of newer events, keeping only what fits"""
+        room = self.max_queue_size - len(self._queue)
+        kept = batch[-room:] if room > 0 else []
+        self.stats["dropped"] += len(batch) - len(kept)
+        self._queue.extendleft(reversed(kept))
+
+    async def close(self, timeout: float = 5.0):
+        """Stop the background task and flush what is left (used on shutdown)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+        async def drain():
+            while self._queue:
+                if not await self.flush_batch():
+                    break
+
+        try:
+            await asyncio.wait_for(drain(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Analytics flush timed out with {len(self._queue)} events pending")
+        if self._queue:
+            logger.warning(f"Discarding {len(self._queue)} unwritten analytics events on shutdown")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "pending": len(self._queue), "consecutive_failures": self._failures}
+
+
+_writer: Optional[AnalyticsWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_analytics_writer(supabase: Any = None) -> Optional[AnalyticsWriter]:
+    """Process-wide analytics writer, or None when buffering is disabled"""
+    global _writer
+    if _writer is None and supabase is not None:
+        with _writer_lock:
+            if _writer is None:
+                try:
+                    from ...config.rag_config import get_performance_config, get_database_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config, get_database_config
+
+                config = get_performance_config()
+                if not getattr(config, 'ANALYTICS_BUFFER_ENABLED', True):
+                    return None
+                _writer = AnalyticsWriter(
+                    supabase,
+                    function_name=getattr(get_database_config(), 'LOG_ANALYTICS_BULK_FUNCTION', 'log_search_analytics_bulk'),
+                    max_queue_size=getattr(config, 'ANALYTICS_BUFFER_MAX_SIZE', 5000),
+                    batch_size=getattr(config, 'ANALYTICS_BATCH_SIZE', 100),
+                    flush_interval=getattr(config, 'ANALYTICS_FLUSH_INTERVAL_SECONDS', 2.0),
+                    max_batch_attempts=getattr(config, 'ANALYTICS_MAX_BATCH_ATTEMPTS', 5)
+                )
+    return _writer
+
+
+async def shutdown_analytics_writer():
+    """Flush pending analytics events before the application exits"""
+    if _writer is not None:
+        await _writer.close()
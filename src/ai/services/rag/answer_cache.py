@@ -0,0 +1,311 @@
+"""
+Answer Cache - Reuses complete RAG answers for repeated questions
+AnswerCache matches exact (normalized) questions over the same retrieved chunks;
+SemanticAnswerCache matches rephrased questions by embedding similarity
+"""
+
+import re
+import copy
+import json
+import time
+import random
+import hashlib
+import logging
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+try:
+    from ...utils.embedding_store import normalize_text
+    from ...utils.search_cache import get_corpus_version
+except ImportError:
+    from src.ai.utils.embedding_store import normalize_text
+    from src.ai.utils.search_cache import get_corpus_version
+
+logger = logging.getLogger(__name__)
+
+
+def prompt_version(prompt: str, query: str, context: str) -> str:
+    """Fingerprint of the prompt template and system prompt, independent of query and context"""
+    template = prompt.replace(context, "").replace(query, "") if context else prompt.replace(query, "")
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+class AnswerCache:
+    """LRU + TTL cache of generated answers with their citations"""
+
+    def __init__(self, max_size: int = 300, ttl_seconds: float = 1800):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def make_key(query: str, chunk_ids: Iterable[Any], prompt_version: str, llm_config: Any) -> str:
+        payload = json.dumps({
+            "query": normalize_text(query),
+            "chunks": sorted(str(chunk_id) for chunk_id in chunk_ids),
+            "prompt": prompt_version,
+            "llm": [
+                getattr(llm_config, 'MODEL_NAME', None),
+                getattr(llm_config, 'TEMPERATURE', None),
+                getattr(llm_config, 'MAX_OUTPUT_TOKENS', None),
+            ],
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Cached answer payload (as a deep copy) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return copy.deepcopy(entry[1])
+
+    def put(self, key: str, payload: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), copy.deepcopy(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate_percent": round(self.stats["hits"] / lookups * 100, 2) if lookups else 0,
+        }
+
+
+_answer_cache: Optional[AnswerCache] = None
+_answer_cache_lock = threading.Lock()
+
+
+def get_answer_cache() -> Optional[AnswerCache]:
+    """Process-wide answer cache, or None when disabled"""
+    global _answer_cache
+    if _answer_cache is None:
+        with _answer_cache_lock:
+            if _answer_cache is None:
+                try:
+                    from ...config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                if not getattr(config, 'ANSWER_CACHE_ENABLED', True):
+                    return None
+                _answer_cache = AnswerCache(
+                    max_size=getattr(config, 'ANSWER_CACHE_SIZE', 300),
+                    ttl_seconds=getattr(config, 'ANSWER_CACHE_TTL_SECONDS', 1800)
+                )
+    return _answer_cache
+
+
+# Digit runs ("3.2", "2024") and standalone Hebrew letters used as ordinals ("שנה א", "מועד ב'")
+_MARKER_PATTERN = re.compile(r"\d+(?:[.\-/]\d+)*|(?<![\w])[\u05d0-\u05ea](?![\w])")
+
+
+def query_markers(query: Optional[str]) -> Tuple[str, ...]:
+    """
+    Tokens that distinguish otherwise near-identical questions (section numbers, years, ordinals).
+    Questions differing only in these embed far above any similarity threshold, so they must match exactly.
+    """
+    return tuple(sorted(set(_MARKER_PATTERN.findall(query or ""))))
+
+
+class SemanticAnswerCache:
+    """
+    Nearest-neighbour answer cache over past question embeddings.
+    A hit needs cosine similarity above the threshold, the same scope (profile, search method,
+    LLM settings), the same numbers/ordinals in the question (query_markers) and an unchanged
+    corpus version. Hits can be audited against a fresh retrieval.
+    """
+
+    def __init__(self, threshold: float = 0.95, max_entries: int = 1000, ttl_seconds: float = 1800,
+                 audit_rate: float = 0.1, audit_min_overlap: float = 0.5, dimension: int = 768):
+        self.threshold = threshold
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.audit_rate = audit_rate
+        self.audit_min_overlap = audit_min_overlap
+        self._vectors = np.zeros((self.max_entries, dimension), dtype=np.float32)
+        self._active = np.zeros(self.max_entries, dtype=bool)
+        self._entries: List[Optional[Dict[str, Any]]] = [None] * self.max_entries
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stale": 0, "stores": 0, "evictions": 0,
+                      "marker_mismatches": 0, "audits": 0, "false_hits": 0}
+        self.recent_hits: Deque[Dict[str, Any]] = deque(maxlen=50)
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _drop(self, slot: int):
+        self._active[slot] = False
+        self._entries[slot] = None
+
+    def lookup(self, embedding: List[float], scope: str, query: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Closest cached answer within the threshold whose question has the same markers, or None"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return None
+        markers = query_markers(query)
+
+        with self._lock:
+            if not self._active.any():
+                self.stats["misses"] += 1
+                return None
+            scores = self._vectors @ vector
+            scores[~self._active] = -1.0
+            now = time.monotonic()
+            corpus_version = get_corpus_version()
+
+            for slot in np.argsort(-scores)[:5]:
+                similarity = float(scores[slot])
+                if similarity < self.threshold:
+                    break
+                entry = self._entries[slot]
+                if entry["scope"] != scope:
+                    continue
+                if entry["markers"] != markers:
+                    self.stats["marker_mismatches"] += 1
+                    continue
+                if entry["corpus_version"] != corpus_version or now - entry["created_at"] > self.ttl_seconds:
+                    self._drop(slot)
+                    self.stats["stale"] += 1
+                    continue
+
+                entry["last_used"] = now
+                entry["hits"] += 1
+                self.stats["hits"] += 1
+                self.recent_hits.append({"query": entry["query"], "similarity": round(similarity, 4)})
+                return {
+                    "entry_id": entry["id"],
+                    "similarity": similarity,
+                    "matched_query": entry["query"],
+                    "chunk_ids": list(entry["chunk_ids"]),
+                    "payload": copy.deepcopy(entry["payload"]),
+                }
+
+            self.stats["misses"] += 1
+            return None
+
+    def store(self, embedding: List[float], query: str, scope: str, chunk_ids: Iterable[Any],
+              payload: Dict[str, Any]) -> None:
+        """Remember an answered question; evicts the least recently used entry when full"""
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            free = np.flatnonzero(~self._active)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = min(range(self.max_entries), key=lambda i: self._entries[i]["last_used"])
+                self.stats["evictions"] += 1
+
+            now = time.monotonic()
+            self._next_id += 1
+            self._vectors[slot] = vector
+            self._active[slot] = True
+            self._entries[slot] = {
+                "id": self._next_id,
+                "query": query,
+                "markers": query_markers(query),
+                "scope": scope,
+                "chunk_ids": [str(chunk_id) for chunk_id in chunk_ids],
+                "payload": copy.deepcopy(payload),
+                "corpus_version": get_corpus_version(),
+                "created_at": now,
+                "last_used": now,
+                "hits": 0,
+            }
+            self.stats["stores"] += 1
+
+    def should_audit(self) -> bool:
+        return random.random() < self.audit_rate
+
+    def record_audit(self, entry_id: int, fresh_chunk_ids: Iterable[Any], cached_chunk_ids: Iterable[Any]) -> bool:
+        """
+        Compare a hit's cached chunks with a fresh retrieval for the new query.
+        Low overlap counts as a false hit and removes the entry. Returns True when the hit held up.
+        """
+        fresh = {str(chunk_id) for chunk_id in fresh_chunk_ids}
+        cached = {str(chunk_id) for chunk_id in cached_chunk_ids}
+        union = fresh | cached
+        overlap = len(fresh & cached) / len(union) if union else 1.0
+
+        with self._lock:
+            self.stats["audits"] += 1
+            if overlap >= self.audit_min_overlap:
+                return True
+            self.stats["false_hits"] += 1
+            for slot, entry in enumerate(self._entries):
+                if entry is not None and entry["id"] == entry_id:
+                    self._drop(slot)
+                    break
+        logger.warning(f"Semantic answer cache false hit (chunk overlap {overlap:.2f}); entry {entry_id} removed")
+        return False
+
+    def clear(self) -> None:
+        with self._lock:
+            self._active[:] = False
+            self._entries = [None] * self.max_entries
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        audits = self.stats["audits"]
+        return {
+            **self.stats,
+            "size": int(self._active.sum()),
+            "threshold": self.threshold,
+            "hit_rate_percent": round(self.stats["hits"] / lookups * 100, 2) if lookups else 0,
+            "false_hit_rate_percent": round(self.stats["false_hits"] / audits * 100, 2) if audits else 0,
+            "recent_hits": list(self.recent_hits)[-10:],
+        }
+
+
+_semantic_cache: Optional[SemanticAnswerCache] = None
+
+
+def get_semantic_answer_cache() -> Optional[SemanticAnswerCache]:
+    """Process-wide semantic answer cache, or None when disabled"""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _answer_cache_lock:
+            if _semantic_cache is None:
+                try:
+                    from ...config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                if not getattr(config, 'SEMANTIC_CACHE_ENABLED', False):
+                    return None
+                _semantic_cache = SemanticAnswerCache(
+                    threshold=getattr(config, 'SEMANTIC_CACHE_THRESHOLD', 0.95),
+                    max_entries=getattr(config, 'SEMANTIC_CACHE_MAX_ENTRIES', 1000),
+                    ttl_seconds=getattr(config, 'SEMANTIC_CACHE_TTL_SECONDS', 1800),
+                    audit_rate=getattr(config, 'SEMANTIC_CACHE_AUDIT_RATE', 0.1),
+                    audit_min_overlap=getattr(config, 'SEMANTIC_CACHE_AUDIT_MIN_OVERLAP', 0.5)
+                )
+    return _semantic_cache
@@ -3,11 +3,24 @@ Answer Generator - Handles LLM-based answer generation
 """
 
 import os
+import time
 import asyncio
 import logging
-from typing import Dict, Any, Optional
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
 import google.generativeai as genai
 
+from . import gemini_client
+
+try:
+    from ...utils.latency import span, record_stage
+    from ...core.request_scheduler import LANE_CHAT, scheduled
+    from ...core.database_key_manager import is_rate_limit_error
+except ImportError:
+    from src.ai.utils.latency import span, record_stage
+    from src.ai.core.request_scheduler import LANE_CHAT, scheduled
+    from src.ai.core.database_key_manager import is_rate_limit_error
+
 logger = logging.getLogger(__name__)
 
 class AnswerGenerator:
@@ -67,42 +80,55 @@ class AnswerGenerator:
         except Exception as e:
             logger.error(f"Failed to track usage: {e}")
 
+    @asynccontextmanager
+    async def _lease_api_key(self, attempt: int = 0) -> AsyncIterator[Tuple[str, Optional[int]]]:
+        """
+        Lease a key from the key manager for one call, falling back to GEMINI_API_KEY;
+        yields (api_key, key_id) and releases the lease on exit. The call holds a chat-lane
+        scheduler slot, taken before the lease so queued calls never sit on a key
+        """
+        async with scheduled(LANE_CHAT, self.key_manager):
+            lease = None
+            if self.key_manager:
+                try:
+                    lease = await self.key_manager.acquire_key()
+                except Exception as key_error:
+                    logger.warning(f"Key manager error: {key_error}")
+            
+            try:
+                if lease is not None and lease.api_key:
+                    logger.debug(f"Using API key ID: {lease.key_id} for generation (attempt {attempt + 1})")
+                    yield lease.api_key, lease.key_id
+                else:
+                    api_key = os.getenv("GEMINI_API_KEY")
+                    if not api_key:
+                        raise ValueError("No API key available")
+                    logger.debug(f"Using fallback key for generation (attempt {attempt + 1})")
+                    yield api_key, None
+            finally:
+                if lease is not None:
+                    self.key_manager.release_key(lease)
+
+    async def _handle_key_error(self, error: Exception, key_id: Optional[int]):
+        """Put a key into cooldown when Gemini reports it is over quota"""
+        if is_rate_limit_error(error):
+            logger.info(f"API key quota/rate limit reached: {error}")
+            if self.key_manager and key_id:
+                try:
+                    await self.key_manager.mark_rate_limited(key_id)
+                except Exception as mark_error:
+                    logger.debug(f"Could not mark key {key_id} as rate-limited: {mark_error}")
+
     async def generate_with_retry(self, prompt: str, max_retries: int = 3) -> str:
         """Generate response with automatic retries and error handling"""
         last_error = None
         
         for attempt in range(max_retries):
+            key_id = None
             try:
-                key_id = None
-                if self.key_manager:
-                    try:
-                        api_key_data = await self.key_manager.get_available_key()
-                        if api_key_data and 'key' in api_key_data:
-                            genai.configure(api_key=api_key_data['key'])
-                            key_id = api_key_data.get('id')
-                            logger.debug(f"Using API key ID: {key_id} for generation (attempt {attempt + 1})")
-                        else:
-                            fallback_key = os.getenv("GEMINI_API_KEY")
-                            if fallback_key:
-                                genai.configure(api_key=fallback_key)
-                                logger.debug(f"Using fallback key for generation (attempt {attempt + 1})")
-                            else:
-                                raise ValueError("No API key available")
-                    except Exception as key_error:
-                        logger.warning(f"Key manager error: {key_error}")
-                        fallback_key = os.getenv("GEMINI_API_KEY")
-                        if fallback_key:
-                            genai.configure(api_key=fallback_key)
-                        else:
-                            raise ValueError("No API key available")
-                else:
-                    fallback_key = os.getenv("GEMINI_API_KEY")
-                    if fallback_key:
-                        genai.configure(api_key=fallback_key)
-                    else:
-                        raise ValueError("No API key available")
-                
-                response = self.model.generate_content(prompt)
+                async with self._lease_api_key(attempt) as (api_key, key_id):
+                    with span("generation.llm"):
+                        response = await gemini_client.generate_content(self.model, prompt, api_key=api_key)
                 
                 if response and hasattr(response, 'text') and response.text:
                     response_text = response.text.strip()
@@ -125,10 +151,7 @@ class AnswerGenerator:
             except Exception as e:
                 last_error = e
                 logger.warning(f"Generation attempt {attempt + 1} failed: {str(e)}")
-                
-                error_str = str(e).lower()
-                if any(keyword in error_str for keyword in ['quota', 'rate limit', 'resource_exhausted']):
-                    logger.info(f"API key quota/rate limit reached: {error_str}")
+                await self._handle_key_error(e, key_id)
                 
                 if attempt < max_retries - 1:
                     await asyncio.sleep(2 ** attempt)
@@ -140,11 +163,56 @@ class AnswerGenerator:
     async def generate_answer(self, prompt: str) -> str:
         """Generate answer using the configured model"""
         try:
-            return await self.generate_with_retry(prompt)
+            with span("generation"):
+                return await self.generate_with_retry(prompt)
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
             raise
 
+    async def generate_answer_stream(self, prompt: str, max_retries: int = 3) -> AsyncIterator[str]:
+        """
+        Stream answer text from Gemini as it is generated.
+        Retries only while nothing has been yielded; a failure mid-stream is raised to the caller.
+        """
+        last_error = None
+        
+        for attempt in range(max_retries):
+            emitted = []
+            key_id = None
+            try:
+                async with self._lease_api_key(attempt) as (api_key, key_id):
+                    started = time.perf_counter()
+                    async for text in gemini_client.stream_content(self.model, prompt, api_key=api_key):
+                        if not emitted:
+                            record_stage("generation.first_token", (time.perf_counter() - started) * 1000)
+                        emitted.append(text)
+                        yield text
+                
+                if not emitted:
+                    raise ValueError("Empty or invalid response from Gemini")
+                
+                if key_id:
+                    try:
+                        await self._track_generation_usage(prompt, "".join(emitted), key_id)
+                    except Exception as track_error:
+                        logger.warning(f"Failed to track token usage: {track_error}")
+                return
+                
+            except Exception as e:
+                if emitted:
+                    logger.error(f"Streaming generation failed mid-answer: {e}")
+                    raise
+                last_error = e
+                logger.warning(f"Streaming attempt {attempt + 1} failed: {str(e)}")
+                await self._handle_key_error(e, key_id)
+                
+                if attempt < max_retries - 1:
+                    await asyncio.sleep(2 ** attempt)
+        
+        error_msg = f"Streaming generation failed after {max_retries} attempts. Last error: {str(last_error)}"
+        logger.error(error_msg)
+        raise Exception(error_msg)
+
     def get_model_config(self) -> Dict[str, Any]:
         """Return current model configuration"""
         return {
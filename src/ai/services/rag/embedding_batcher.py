@@ -0,0 +1,92 @@
+"""
+Embedding Batcher - Micro-batches concurrent query embeddings into single API calls
+Requests arriving within a short window (or until the batch is full) share one embed_content call
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+EmbedBatchFunc = Callable[[List[str]], Awaitable[List[List[float]]]]
+
+
+class EmbeddingBatcher:
+    """Collects pending texts and embeds them together, fanning results back to callers"""
+
+    def __init__(self, embed_batch: EmbedBatchFunc, window_ms: float = 10, max_batch_size: int = 32):
+        self._embed_batch = embed_batch
+        self.window_seconds = max(0.0, window_ms) / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batch_tasks: Set[asyncio.Task] = set()
+        self.stats = {"requests": 0, "batches": 0, "failed_batches": 0, "largest_batch": 0}
+
+    async def embed(self, text: str) -> List[float]:
+        """Queue one text and wait for its embedding"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.stats["requests"] += 1
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.window_seconds, self._flush)
+
+        return await future
+
+    def _flush(self):
+        """Send everything queued so far as one batch"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]):
+        texts = [text for text, _ in batch]
+        self.stats["batches"] += 1
+        self.stats["largest_batch"] = max(self.stats["largest_batch"], len(batch))
+
+        try:
+            try:
+                embeddings = await self._embed_batch(texts)
+                if len(embeddings) != len(texts):
+                    raise ValueError(f"Expected {len(texts)} embeddings, got {len(embeddings)}")
+            except Exception as e:
+                self.stats["failed_batches"] += 1
+                logger.warning(f"Embedding batch of {len(texts)} failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            logger.debug(f"Embedded micro-batch of {len(texts)} queries")
+            for (_, future), embedding in zip(batch, embeddings):
+                if not future.done():
+                    future.set_result(embedding)
+        finally:
+            # Cancelled batch (shutdown/loop teardown): fail the callers instead of leaving them waiting forever
+            unresolved = [future for _, future in batch if not future.done()]
+            if unresolved:
+                self.stats["failed_batches"] += 1
+                for future in unresolved:
+                    future.set_exception(RuntimeError("Embedding batch was cancelled"))
+
+    def get_stats(self):
+        requests = self.stats["requests"]
+        batches = self.stats["batches"]
+        return {
+            **self.stats,
+            "pending": len(self._pending),
+            "avg_batch_size": round(requests / batches, 2) if batches else 0,
+            "window_ms": self.window_seconds * 1000,
+            "max_batch_size": self.max_batch_size,
+        }
@@ -3,6 +3,7 @@ Embedding Service - Handles vector generation and caching
 """
 
 import os
+import asyncio
 import logging
 import hashlib
 from typing import List, Optional, Dict, Any
@@ -11,11 +12,20 @@ from collections import OrderedDict
 import google.generativeai as genai
 
 try:
-    from ...core.database_key_manager import DatabaseKeyManager
+    from ...core.database_key_manager import DatabaseKeyManager, is_rate_limit_error
     from ...utils.vector_utils import ensure_768_dimensions, log_vector_info
+    from ...utils.embedding_store import get_embedding_store
+    from ...utils.latency import span
+    from ...core.request_scheduler import LANE_CHAT, scheduled
 except ImportError:
-    from src.ai.core.database_key_manager import DatabaseKeyManager
+    from src.ai.core.database_key_manager import DatabaseKeyManager, is_rate_limit_error
     from src.ai.utils.vector_utils import ensure_768_dimensions, log_vector_info
+    from src.ai.utils.embedding_store import get_embedding_store
+    from src.ai.utils.latency import span
+    from src.ai.core.request_scheduler import LANE_CHAT, scheduled
+
+from . import gemini_client
+from .embedding_batcher import EmbeddingBatcher
 
 logger = logging.getLogger(__name__)
 
@@ -55,7 +65,9 @@ class EmbeddingService:
     
     # Class-level cache with size limit
     _embedding_cache = None
-    _cache_stats = {"hits": 0, "misses": 0, "total_requests": 0}
+    _cache_stats = {"hits": 0, "misses": 0, "persistent_hits": 0, "coalesced": 0, "total_requests": 0}
+    # In-flight embedding tasks by cache key, shared by concurrent callers
+    _in_flight: Dict[str, asyncio.Task] = {}
     
     def __init__(self, key_manager: Optional[DatabaseKeyManager] = None):
         self.key_manager = key_manager
@@ -74,6 +86,18 @@ class EmbeddingService:
             cache_size = getattr(self.performance_config, 'EMBEDDING_CACHE_SIZE', 1000)
             EmbeddingService._embedding_cache = LRUCache(max_size=cache_size)
         
+        # Persistent store shared across restarts and workers (None if disabled)
+        self.embedding_store = get_embedding_store()
+        
+        # Micro-batch concurrent query embeddings into shared API calls
+        self.batcher = None
+        if getattr(self.performance_config, 'EMBEDDING_MICRO_BATCHING_ENABLED', True):
+            self.batcher = EmbeddingBatcher(
+                self._embed_texts,
+                window_ms=getattr(self.performance_config, 'EMBEDDING_BATCH_WINDOW_MS', 10),
+                max_batch_size=getattr(self.performance_config, 'EMBEDDING_BATCH_MAX_SIZE', 32)
+            )
+        
         # Initialize Gemini
         self._init_gemini()
         logger.info("EmbeddingService initialized with LRU cache")
@@ -110,68 +134,125 @@ class EmbeddingService:
     
     async def generate_query_embedding(self, query: str) -> List[float]:
         """Generate embedding for query with caching"""
-        # Update cache stats
-        self._cache_stats["total_requests"] += 1
+        with span("embedding"):
+            # Update cache stats
+            self._cache_stats["total_requests"] += 1
+            
+            # Check cache
+            cache_key = self._generate_cache_key(query)
+            cache_entry = self._embedding_cache.get(cache_key)
+            if cache_entry and self._is_cache_valid(cache_entry):
+                self._cache_stats["hits"] += 1
+                return cache_entry['embedding']
+            
+            # Join an identical request that is already in flight instead of calling the API again
+            task = self._in_flight.get(cache_key)
+            if task is not None and not task.done():
+                self._cache_stats["coalesced"] += 1
+                return await asyncio.shield(task)
+            
+            task = asyncio.ensure_future(self._compute_query_embedding(query, cache_key))
+            self._in_flight[cache_key] = task
+            task.add_done_callback(lambda done: self._release_in_flight(cache_key, done))
+            # Shield so a cancelled caller does not cancel the shared call for the others
+            return await asyncio.shield(task)
+    
+    def _release_in_flight(self, cache_key: str, task: asyncio.Task):
+        """Forget a finished task unless a newer one already replaced it"""
+        if self._in_flight.get(cache_key) is task:
+            del self._in_flight[cache_key]
+    
+    async def _compute_query_embedding(self, query: str, cache_key: str) -> List[float]:
+        """Resolve a query embedding from the persistent store or the API"""
+        model_name = getattr(self.embedding_config, 'MODEL_NAME', 'models/embedding-001')
+        task_type = getattr(self.embedding_config, 'TASK_TYPE_QUERY', 'retrieval_query')
         
-        # Check cache
-        cache_key = self._generate_cache_key(query)
-        cache_entry = self._embedding_cache.get(cache_key)
-        if cache_entry and self._is_cache_valid(cache_entry):
-            self._cache_stats["hits"] += 1
-            return cache_entry['embedding']
+        # Check persistent store before calling the API
+        if self.embedding_store:
+            stored = await asyncio.to_thread(self.embedding_store.get, model_name, task_type, query)
+            if stored:
+                self._cache_stats["persistent_hits"] += 1
+                self._embedding_cache.put(cache_key, {
+                    'embedding': stored,
+                    'timestamp': datetime.now(),
+                    'query': query[:100]
+                })
+                return stored
         
         # Cache miss - generate new embedding
         self._cache_stats["misses"] += 1
         logger.debug(f"Generating embedding for query: {query[:50]}...")
         
         try:
-            # Get API key if available
-            key_id = None
-            if self.key_manager:
-                try:
-                    api_key_data = await self.key_manager.get_available_key()
-                    if api_key_data and 'key' in api_key_data:
-                        genai.configure(api_key=api_key_data['key'])
-                        key_id = api_key_data.get('id')
-                except Exception as e:
-                    logger.warning(f"Key manager error: {e}")
+            if self.batcher:
+                embedding = await self.batcher.embed(query)
+            else:
+                embedding = (await self._embed_texts([query]))[0]
+            log_vector_info(embedding, f"Query embedding for: {query[:30]}...")
             
-            # Generate embedding
-            model_name = getattr(self.embedding_config, 'MODEL_NAME', 'models/embedding-001')
-            response = genai.embed_content(
-                model=model_name,
-                content=query,
-                task_type="retrieval_query"
-            )
+            # Cache the result
+            self._embedding_cache.put(cache_key, {
+                'embedding': embedding,
+                'timestamp': datetime.now(),
+                'query': query[:100]  # Store first 100 chars for debugging
+            })
+            if self.embedding_store:
+                await asyncio.to_thread(self.embedding_store.put, model_name, task_type, query, embedding)
             
-            if response and 'embedding' in response:
-                embedding = response['embedding']
-                
-                # Ensure correct dimensions
-                embedding = ensure_768_dimensions(embedding)
-                log_vector_info(embedding, f"Query embedding for: {query[:30]}...")
-                
-                # Cache the result
-                self._embedding_cache.put(cache_key, {
-                    'embedding': embedding,
-                    'timestamp': datetime.now(),
-                    'query': query[:100]  # Store first 100 chars for debugging
-                })
-                
-                # Track usage
-                if key_id:
-                    await self._track_embedding_usage(query, key_id)
-                
-                logger.debug(f"Generated embedding for query: {query[:50]}...")
-                return embedding
-            else:
-                raise ValueError("No embedding in response")
+            logger.debug(f"Generated embedding for query: {query[:50]}...")
+            return embedding
                 
         except Exception as e:
             logger.error(f"Error generating query embedding: {e}")
             # Return a zero vector as fallback
             return [0.0] * 768
     
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """Embed one or more query texts with a single API call"""
+        model_name = getattr(self.embedding_config, 'MODEL_NAME', 'models/embedding-001')
+        task_type = getattr(self.embedding_config, 'TASK_TYPE_QUERY', 'retrieval_query')
+        
+        # Query embeddings serve live chats, so they run in the chat lane of the scheduler
+        async with scheduled(LANE_CHAT, self.key_manager):
+            # Lease a key for this call; the client is bound to it, so parallel calls can use different keys
+            lease = None
+            if self.key_manager:
+                try:
+                    lease = await self.key_manager.acquire_key()
+                except Exception as e:
+                    logger.warning(f"Key manager error: {e}")
+            api_key = lease.api_key if lease is not None else None
+            key_id = lease.key_id if lease is not None and api_key else None
+            
+            # Generate embeddings off the event loop; a list content returns one vector per text
+            try:
+                with span("embedding.api"):
+                    response = await gemini_client.embed_content(
+                        api_key=api_key,
+                        model=model_name,
+                        content=texts[0] if len(texts) == 1 else texts,
+                        task_type=task_type
+                    )
+            except Exception as e:
+                if key_id and is_rate_limit_error(e):
+                    # Drain the key's bucket so the governor stops handing it out
+                    await self.key_manager.mark_rate_limited(key_id)
+                raise
+            finally:
+                if lease is not None:
+                    self.key_manager.release_key(lease)
+        if not response or 'embedding' not in response:
+            raise ValueError("No embedding in response")
+        
+        raw_embeddings = [response['embedding']] if len(texts) == 1 else response['embedding']
+        embeddings = [ensure_768_dimensions(embedding) for embedding in raw_embeddings]
+        
+        # Track usage
+        if key_id:
+            await self._track_embedding_usage(" ".join(texts), key_id)
+        
+        return embeddings
+    
     async def generate_text_embedding(self, text: str) -> List[float]:
         """Generate embedding for text content"""
         return await self.generate_query_embedding(text)
@@ -188,8 +269,13 @@ class EmbeddingService:
             "total_requests": total,
             "cache_hits": hits,
             "cache_misses": misses,
+            "persistent_hits": self._cache_stats["persistent_hits"],
+            "coalesced_requests": self._cache_stats["coalesced"],
+            "in_flight": len(self._in_flight),
             "hit_rate_percent": round(hit_rate, 2),
-            "cache_size": self._embedding_cache.size()
+            "cache_size": self._embedding_cache.size(),
+            "persistent_store": self.embedding_store.get_stats() if self.embedding_store else None,
+            "micro_batching": self.batcher.get_stats() if self.batcher else None
         }
     
     def clear_cache(self):
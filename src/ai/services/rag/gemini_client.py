@@ -0,0 +1,138 @@
+"""
+Gemini Client - Non-blocking access to the synchronous Gemini SDK
+Runs SDK calls on a bounded, process-wide thread pool so they never block the event loop.
+Calls made with an api_key use a client bound to that key instead of the process-global
+genai.configure(), so concurrent requests can safely run on different keys.
+"""
+
+import asyncio
+import copy
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Iterable, Optional
+
+import google.generativeai as genai
+from google.ai import generativelanguage as glm
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared executor sized from the performance config"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                try:
+                    from ...config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                workers = getattr(get_performance_config(), 'GEMINI_EXECUTOR_WORKERS', 16)
+                _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="gemini")
+                logger.info(f"Gemini executor started with {workers} workers")
+    return _executor
+
+
+async def run_blocking(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking Gemini SDK call on the shared executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+_clients: Dict[str, Any] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_key: str) -> Any:
+    """Generative service client bound to one API key (clients are thread-safe and reused per key)"""
+    client = _clients.get(api_key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = glm.GenerativeServiceClient(client_options={"api_key": api_key})
+                _clients[api_key] = client
+    return client
+
+
+def retain_clients(api_keys: Iterable[Optional[str]]):
+    """Drop cached clients for keys that are no longer in use"""
+    keep = {key for key in api_keys if key}
+    with _clients_lock:
+        for key in [key for key in _clients if key not in keep]:
+            _clients.pop(key, None)
+
+
+def bind_model(model: Any, api_key: Optional[str]) -> Any:
+    """Shallow copy of a GenerativeModel that sends its requests with the given key"""
+    if not api_key:
+        return model
+    bound = copy.copy(model)
+    bound._client = get_client(api_key)
+    return bound
+
+
+async def embed_content(*args, api_key: Optional[str] = None, **kwargs) -> Any:
+    """Async wrapper around genai.embed_content"""
+    if api_key:
+        kwargs["client"] = get_client(api_key)
+    return await run_blocking(genai.embed_content, *args, **kwargs)
+
+
+async def generate_content(model: Any, prompt: Any, api_key: Optional[str] = None, **kwargs) -> Any:
+    """Async wrapper around GenerativeModel.generate_content"""
+    return await run_blocking(bind_model(model, api_key).generate_content, prompt, **kwargs)
+
+
+async def stream_content(model: Any, prompt: Any, api_key: Optional[str] = None, **kwargs) -> AsyncIterator[str]:
+    """
+    Async iterator over the text of a streaming GenerativeModel.generate_content call.
+    The SDK iterator is drained on the shared executor and handed to the event loop through a queue.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stopped = threading.Event()
+
+    bound = bind_model(model, api_key)
+
+    def produce():
+        try:
+            response = bound.generate_content(prompt, stream=True, **kwargs)
+            for chunk in response:
+                if stopped.is_set():
+                    return
+                text = getattr(chunk, 'text', '')
+                if text:
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    loop.run_in_executor(_get_executor(), produce)
+    try:
+        while True:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # Stop draining the SDK stream when the consumer goes away early
+        stopped.set()
+
+
+def shutdown_executor(wait: bool = False):
+    """Stop the shared executor (used on application shutdown)"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=wait)
+            _executor = None
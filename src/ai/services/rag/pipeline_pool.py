@@ -0,0 +1,117 @@
+"""
+RAG Pipeline Pool - Process-wide cache of RAG pipelines keyed by profile
+Pipelines are built once, share a single key manager and are reused across requests
+"""
+
+import logging
+import os
+import threading
+from typing import Dict, Iterable, Optional, Any
+
+from . import gemini_client
+from .rag_orchestrator import RAGOrchestrator
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_PROFILE = "balanced"
+
+
+class RAGPipelinePool:
+    """Long-lived pool of RAGOrchestrator instances, one per profile"""
+
+    def __init__(self, key_manager=None):
+        self._pipelines: Dict[str, RAGOrchestrator] = {}
+        self._lock = threading.Lock()
+        self._key_manager = key_manager
+        self._stats = {"hits": 0, "misses": 0}
+
+    def get_key_manager(self):
+        """Shared key manager for every pipeline in the pool"""
+        if self._key_manager is None:
+            try:
+                from ...core.database_key_manager import DatabaseKeyManager
+            except ImportError:
+                from src.ai.core.database_key_manager import DatabaseKeyManager
+
+            self._key_manager = DatabaseKeyManager(use_direct_supabase=True)
+            self._key_manager.subscribe(_retain_key_clients)
+        return self._key_manager
+
+    def get(self, profile: Optional[str] = None) -> RAGOrchestrator:
+        """Return the pipeline for a profile, building it on first use"""
+        profile = profile or DEFAULT_POOL_PROFILE
+
+        pipeline = self._pipelines.get(profile)
+        if pipeline is not None:
+            self._stats["hits"] += 1
+            return pipeline
+
+        with self._lock:
+            pipeline = self._pipelines.get(profile)
+            if pipeline is None:
+                self._stats["misses"] += 1
+                logger.info(f"Building RAG pipeline for profile '{profile}'")
+                pipeline = RAGOrchestrator(
+                    config_profile=profile,
+                    key_manager=self.get_key_manager()
+                )
+                self._pipelines[profile] = pipeline
+            return pipeline
+
+    def warm_up(self, profiles: Iterable[str]) -> Dict[str, bool]:
+        """Pre-build pipelines so the first request does not pay construction cost"""
+        results = {}
+        for profile in profiles:
+            try:
+                self.get(profile)
+                results[profile] = True
+            except Exception as e:
+                logger.warning(f"Failed to warm up RAG pipeline '{profile}': {e}")
+                results[profile] = False
+        return results
+
+    def invalidate(self, profile: Optional[str] = None):
+        """Drop one pipeline (or all of them) so it is rebuilt on next use"""
+        with self._lock:
+            if profile is None:
+                self._pipelines.clear()
+            else:
+                self._pipelines.pop(profile, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool statistics for monitoring"""
+        return {
+            "profiles": list(self._pipelines.keys()),
+            "size": len(self._pipelines),
+            "hits": self._stats["hits"],
+            "misses": self._stats["misses"],
+        }
+
+    async def close(self):
+        """Release pipelines and stop the shared key manager"""
+        self.invalidate()
+        if self._key_manager is not None and hasattr(self._key_manager, "close"):
+            try:
+                await self._key_manager.close()
+            except Exception as e:
+                logger.warning(f"Error closing pipeline pool key manager: {e}")
+
+
+def _retain_key_clients(snapshot):
+    """Keep Gemini clients only for keys in the latest snapshot (plus the env fallback key)"""
+    keys = [key_data.get('api_key') or key_data.get('key') for key_data in snapshot.keys]
+    gemini_client.retain_clients(keys + [os.getenv("GEMINI_API_KEY")])
+
+
+_pipeline_pool: Optional[RAGPipelinePool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pipeline_pool() -> RAGPipelinePool:
+    """Get the process-wide RAG pipeline pool"""
+    global _pipeline_pool
+    if _pipeline_pool is None:
+        with _pool_lock:
+            if _pipeline_pool is None:
+                _pipeline_pool = RAGPipelinePool()
+    return _pipeline_pool
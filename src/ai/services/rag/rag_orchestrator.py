@@ -6,8 +6,10 @@ Coordinates all RAG services and maintains backwards compatibility
 import os
 import time
 import re
+import json
+import asyncio
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
 from supabase import create_client, Client
 from pathlib import Path
 from dotenv import load_dotenv
@@ -24,13 +26,33 @@ from .search_services import SearchService
 from .context_builder import ContextBuilder
 from .answer_generator import AnswerGenerator
 from .search_analytics import SearchAnalytics
+from .answer_cache import AnswerCache, get_answer_cache, get_semantic_answer_cache, prompt_version
+
+try:
+    from ...utils.latency import span, start_trace, current_trace, record_stage, get_latency_registry
+except ImportError:
+    from src.ai.utils.latency import span, start_trace, current_trace, record_stage, get_latency_registry
 
 logger = logging.getLogger(__name__)
 
+CITATION_PATTERN = re.compile(r'\[מקורות:[^\]]+\]')
+CITATION_MARKER = '[מקורות'
+
+
+def _streamable_text(text: str) -> str:
+    """Longest prefix of a partial answer that cannot be part of a trailing citation marker"""
+    marker_at = text.find(CITATION_MARKER)
+    if marker_at >= 0:
+        return text[:marker_at]
+    for size in range(min(len(CITATION_MARKER), len(text)), 0, -1):
+        if text.endswith(CITATION_MARKER[:size]):
+            return text[:-size]
+    return text
+
 class RAGOrchestrator:
     """Main orchestrator for RAG operations"""
     
-    def __init__(self, config_profile: Optional[str] = None, test_mode: bool = False):
+    def __init__(self, config_profile: Optional[str] = None, test_mode: bool = False, key_manager=None):
         """Initialize RAG Orchestrator with all sub-services"""
         
         # Check for test mode
@@ -62,15 +84,20 @@ class RAGOrchestrator:
             self.context_builder = None
             self.answer_generator = None
             self.analytics = None
+            self.answer_cache = None
+            self.semantic_cache = None
             logger.info("Test mode: Services not initialized")
         else:
-            # Initialize Database Key Manager
-            try:
-                from ...core.database_key_manager import DatabaseKeyManager
-            except ImportError:
-                from src.ai.core.database_key_manager import DatabaseKeyManager
+            # Initialize Database Key Manager (shared when provided by the pipeline pool)
+            if key_manager is None:
+                try:
+                    from ...core.gemini_key_manager import get_key_manager
+                except ImportError:
+                    from src.ai.core.gemini_key_manager import get_key_manager
+                
+                key_manager = get_key_manager()
             
-            self.key_manager = DatabaseKeyManager(use_direct_supabase=True)
+            self.key_manager = key_manager
             
             # Initialize sub-services
             self.embedding_service = EmbeddingService(self.key_manager)
@@ -78,6 +105,9 @@ class RAGOrchestrator:
             self.context_builder = ContextBuilder()
             self.answer_generator = AnswerGenerator(self.key_manager)
             self.analytics = SearchAnalytics(self.supabase)
+            self.answer_cache = get_answer_cache()
+            self.semantic_cache = get_semantic_answer_cache()
+        self._audit_tasks = set()
         
         logger.info(f"🚀 RAGOrchestrator initialized with profile '{self.profile_name}'")
     
@@ -137,8 +167,200 @@ class RAGOrchestrator:
         """Section-specific search"""
         return await self.search_service.section_specific_search(query, target_section)
 
-    async def generate_answer(self, query: str, search_method: str = 'hybrid', document_id=None):
-        """Main method for generating complete RAG answers"""
+    async def _execute_search(self, query: str, search_method: str, document_id=None) -> List[Dict[str, Any]]:
+        """Pick the search strategy for the query and run it"""
+        section_keywords = ['סעיף', 'בסעיף', 'פרק', 'תקנה']
+        with span("search"):
+            if any(keyword in query for keyword in section_keywords):
+                return await self.section_specific_search(query)
+            if search_method == 'semantic':
+                return await self.semantic_search(query, document_id)
+            if search_method == 'hybrid':
+                return await self.hybrid_search(query, document_id)
+            if search_method == 'contextual':
+                return await self.contextual_search(query)
+            raise ValueError(f"Unknown search method: {search_method}")
+
+    def _semantic_cache_scope(self, search_method: str, document_id=None) -> str:
+        """Settings a cached answer must share with the new question"""
+        return json.dumps([
+            self.profile_name, search_method, document_id,
+            getattr(self.llm_config, 'MODEL_NAME', None),
+            getattr(self.llm_config, 'TEMPERATURE', None),
+            getattr(self.llm_config, 'MAX_OUTPUT_TOKENS', None),
+        ], default=str)
+
+    async def _semantic_cache_lookup(self, query: str, search_method: str, document_id=None) -> Tuple[Optional[Dict[str, Any]], Optional[List[float]]]:
+        """Return (hit, query_embedding); the embedding is reused by search through the embedding cache"""
+        if self.semantic_cache is None:
+            return None, None
+        try:
+            with span("semantic_cache"):
+                query_embedding = await self.embedding_service.generate_query_embedding(query)
+                hit = self.semantic_cache.lookup(query_embedding, self._semantic_cache_scope(search_method, document_id), query)
+            return hit, query_embedding
+        except Exception as e:
+            logger.warning(f"Semantic cache lookup failed: {e}")
+            return None, None
+
+    def _semantic_cache_store(self, query_embedding: Optional[List[float]], query: str, search_method: str, document_id,
+                              search_results: List[Dict[str, Any]], answer_data: Dict[str, Any]):
+        if self.semantic_cache is None or query_embedding is None:
+            return
+        payload = {
+            "answer": answer_data["answer"],
+            "sources": answer_data["sources"],
+            "chunks_selected": answer_data["chunks_selected"],
+            "cited_sources": answer_data["cited_sources"],
+            "search_results_count": len(search_results),
+            "top_score": search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)),
+        }
+        self.semantic_cache.store(
+            query_embedding, query, self._semantic_cache_scope(search_method, document_id),
+            [row.get('id') for row in search_results], payload
+        )
+
+    async def _semantic_cache_response(self, query: str, hit: Dict[str, Any], search_method: str, document_id,
+                                       start_time: float) -> Dict[str, Any]:
+        """Build the response for a semantic cache hit and schedule a sampled false-hit audit"""
+        payload = hit["payload"]
+        logger.info(f"Semantic cache hit ({hit['similarity']:.3f}) for: {query[:50]}... matched: {hit['matched_query'][:50]}...")
+        
+        if self.semantic_cache.should_audit():
+            task = asyncio.create_task(self._audit_semantic_hit(query, search_method, document_id, hit))
+            self._audit_tasks.add(task)
+            task.add_done_callback(self._audit_tasks.discard)
+        
+        response_time = int((time.time() - start_time) * 1000)
+        await self._log_analytics(
+            query, search_method, payload["search_results_count"], payload["top_score"], response_time, document_id
+        )
+        
+        return {
+            "answer": payload["answer"],
+            "sources": payload["sources"],
+            "chunks_selected": payload["chunks_selected"],
+            "search_results_count": payload["search_results_count"],
+            "response_time_ms": response_time,
+            "search_method": search_method,
+            "query": query,
+            "cited_sources": payload["cited_sources"],
+            "answer_cache_hit": True,
+            "semantic_cache_hit": True,
+            "matched_query": hit["matched_query"],
+            "semantic_similarity": round(hit["similarity"], 4)
+        }
+
+    async def _audit_semantic_hit(self, query: str, search_method: str, document_id, hit: Dict[str, Any]):
+        """Re-run retrieval for an audited hit; a diverging chunk set is recorded as a false hit"""
+        try:
+            search_results = await self._execute_search(query, search_method, document_id)
+            self.semantic_cache.record_audit(
+                hit["entry_id"], [row.get('id') for row in search_results], hit["chunk_ids"]
+            )
+        except Exception as e:
+            logger.warning(f"Semantic cache audit failed: {e}")
+
+    def _prepare_answer(self, query: str, search_results: List[Dict[str, Any]], conversation_context: str = "") -> Dict[str, Any]:
+        """Build context and prompt; returns a cached answer when one exists for the same question and chunks"""
+        context, citations, included_chunks = self.context_builder.build_context(search_results)
+        
+        # Create prompt with conversation context if provided
+        if conversation_context:
+            prompt = self.context_builder.create_rag_prompt_with_conversation_context(
+                query, context, conversation_context
+            )
+        else:
+            prompt = self.context_builder.create_rag_prompt(query, context)
+        
+        # The answer cache is bypassed whenever conversation context shapes the answer
+        cache_key = None
+        cached = None
+        if self.answer_cache is not None and not conversation_context:
+            cache_key = AnswerCache.make_key(
+                query,
+                [chunk.get('id') for chunk in included_chunks],
+                prompt_version(prompt, query, context),
+                self.llm_config
+            )
+            cached = self.answer_cache.get(cache_key)
+            if cached is not None:
+                logger.info(f"Answer cache hit for: {query[:50]}...")
+        
+        return {
+            "prompt": prompt,
+            "citations": citations,
+            "included_chunks": included_chunks,
+            "cache_key": cache_key,
+            "cached": cached
+        }
+
+    def _finalize_answer(self, query: str, answer: str, prepared: Dict[str, Any]) -> Dict[str, Any]:
+        """Resolve citations, clean the answer, attach relevant segments and fill the answer cache"""
+        citations = prepared["citations"]
+        
+        # Process citations
+        cited_source_names = self.context_builder.extract_cited_sources(answer, citations)
+        cited_chunks = self.context_builder.get_cited_chunks(prepared["included_chunks"], cited_source_names, citations)
+        
+        # Clean answer
+        clean_answer = CITATION_PATTERN.sub('', answer).strip()
+        
+        # Add relevant segments
+        for chunk in cited_chunks:
+            chunk_text = chunk.get('chunk_text', chunk.get('content', ''))
+            if chunk_text:
+                relevant_segment = self.context_builder.extract_relevant_chunk_segment(
+                    chunk_text, query, clean_answer, max_length=500
+                )
+                chunk['relevant_segment'] = relevant_segment
+        
+        answer_data = {
+            "answer": clean_answer,
+            "sources": citations,
+            "chunks_selected": cited_chunks,
+            "cited_sources": cited_source_names
+        }
+        if prepared["cache_key"] is not None:
+            self.answer_cache.put(prepared["cache_key"], answer_data)
+        return {**answer_data, "cache_hit": False}
+
+    async def _answer_from_results(self, query: str, search_results: List[Dict[str, Any]], conversation_context: str = "") -> Dict[str, Any]:
+        """Build context, generate the answer and attach cited chunks; reuses cached answers when allowed"""
+        with span("context_build"):
+            prepared = self._prepare_answer(query, search_results, conversation_context)
+        if prepared["cached"] is not None:
+            return {**prepared["cached"], "cache_hit": True}
+        
+        answer = await self.answer_generator.generate_answer(prepared["prompt"])
+        with span("citations"):
+            return self._finalize_answer(query, answer, prepared)
+
+    async def _log_analytics(self, query: str, search_method: str, results_count: int, top_score: float,
+                             response_time: int, document_id=None):
+        """Log search analytics together with the request's stage timings"""
+        if not self.analytics.is_analytics_enabled():
+            return
+        trace = current_trace()
+        with span("analytics"):
+            await self.analytics.log_search_analytics(
+                query, search_method, results_count, top_score, response_time, document_id,
+                stage_timings=trace.timings() if trace is not None else None
+            )
+
+    def _finish_trace(self, result: Dict[str, Any], debug: bool = False) -> Dict[str, Any]:
+        """Record the request total; attach per-stage timings when debugging"""
+        trace = current_trace()
+        if trace is None:
+            return result
+        timings = trace.timings()
+        get_latency_registry().record("total", timings["total"])
+        if debug or getattr(getattr(self, 'performance_config', None), 'INCLUDE_STAGE_TIMINGS', False):
+            result["timings_ms"] = timings
+        return result
+
+    async def generate_answer(self, query: str, search_method: str = 'hybrid', document_id=None, debug: bool = False):
+        """Main method for generating complete RAG answers; debug adds per-stage timings_ms"""
         start_time = time.time()
         
         # Test mode response
@@ -154,25 +376,18 @@ class RAGOrchestrator:
                 "test_mode": True
             }
         
+        start_trace()
         try:
-            # Determine search strategy
-            section_keywords = ['סעיף', 'בסעיף', 'פרק', 'תקנה']
-            is_section_query = any(keyword in query for keyword in section_keywords)
+            # Rephrasings of an already answered question are served from the semantic cache
+            semantic_hit, query_embedding = await self._semantic_cache_lookup(query, search_method, document_id)
+            if semantic_hit is not None:
+                result = await self._semantic_cache_response(query, semantic_hit, search_method, document_id, start_time)
+                return self._finish_trace(result, debug)
             
-            # Execute search
-            if is_section_query:
-                search_results = await self.section_specific_search(query)
-            elif search_method == 'semantic':
-                search_results = await self.semantic_search(query, document_id)
-            elif search_method == 'hybrid':
-                search_results = await self.hybrid_search(query, document_id)
-            elif search_method == 'contextual':
-                search_results = await self.contextual_search(query)
-            else:
-                raise ValueError(f"Unknown search method: {search_method}")
+            search_results = await self._execute_search(query, search_method, document_id)
             
             if not search_results:
-                return {
+                return self._finish_trace({
                     "answer": "לא נמצא מידע רלוונטי בתקנונים לשאלה זו.",
                     "sources": [],
                     "chunks_selected": [],
@@ -180,61 +395,40 @@ class RAGOrchestrator:
                     "response_time_ms": int((time.time() - start_time) * 1000),
                     "search_method": search_method,
                     "query": query
-                }
+                }, debug)
             
-            # Build context
-            context, citations, included_chunks = self.context_builder.build_context(search_results)
-            
-            # Create prompt
-            prompt = self.context_builder.create_rag_prompt(query, context)
-            
-            # Generate answer
-            answer = await self.answer_generator.generate_answer(prompt)
-            
-            # Process citations
-            cited_source_names = self.context_builder.extract_cited_sources(answer, citations)
-            cited_chunks = self.context_builder.get_cited_chunks(included_chunks, cited_source_names, citations)
-            
-            # Clean answer
-            clean_answer = re.sub(r'\[מקורות:[^\]]+\]', '', answer).strip()
-            
-            # Add relevant segments
-            for chunk in cited_chunks:
-                chunk_text = chunk.get('chunk_text', chunk.get('content', ''))
-                if chunk_text:
-                    relevant_segment = self.context_builder.extract_relevant_chunk_segment(
-                        chunk_text, query, clean_answer, max_length=500
-                    )
-                    chunk['relevant_segment'] = relevant_segment
+            # Build context, generate (or reuse) the answer and attach cited segments
+            answer_data = await self._answer_from_results(query, search_results)
+            self._semantic_cache_store(query_embedding, query, search_method, document_id, search_results, answer_data)
             
             response_time = int((time.time() - start_time) * 1000)
             
             # Log analytics
-            if self.analytics.is_analytics_enabled():
-                await self.analytics.log_search_analytics(
-                    query, search_method, len(search_results),
-                    search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)) if search_results else 0.0,
-                    response_time, document_id
-                )
+            await self._log_analytics(
+                query, search_method, len(search_results),
+                search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)),
+                response_time, document_id
+            )
             
             result = {
-                "answer": clean_answer,
-                "sources": citations,
-                "chunks_selected": cited_chunks,
+                "answer": answer_data["answer"],
+                "sources": answer_data["sources"],
+                "chunks_selected": answer_data["chunks_selected"],
                 "search_results_count": len(search_results),
                 "response_time_ms": response_time,
                 "search_method": search_method,
                 "query": query,
-                "cited_sources": cited_source_names
+                "cited_sources": answer_data["cited_sources"],
+                "answer_cache_hit": answer_data["cache_hit"]
             }
             
-            return result
+            return self._finish_trace(result, debug)
             
         except Exception as e:
             logger.error(f"Error generating answer: {e}")
             raise
 
-    async def generate_answer_with_context(self, query: str, conversation_context: str = "", search_method: str = 'hybrid', document_id=None):
+    async def generate_answer_with_context(self, query: str, conversation_context: str = "", search_method: str = 'hybrid', document_id=None, debug: bool = False):
         """Generate RAG answer with separate conversation context for consistent search results"""
         start_time = time.time()
         
@@ -251,30 +445,27 @@ class RAGOrchestrator:
                 "test_mode": True
             }
         
+        start_trace()
         try:
             # Log the separation
             logger.info(f"Using original query: '{query}'")
             if conversation_context:
                 logger.info(f"Adding conversation context: '{conversation_context[:100]}...'")
             
-            # Determine search strategy using ORIGINAL query only
-            section_keywords = ['סעיף', 'בסעיף', 'פרק', 'תקנה']
-            is_section_query = any(keyword in query for keyword in section_keywords)
+            # Semantic cache applies only when conversation context does not shape the answer
+            semantic_hit, query_embedding = None, None
+            if not conversation_context:
+                semantic_hit, query_embedding = await self._semantic_cache_lookup(query, search_method, document_id)
+                if semantic_hit is not None:
+                    result = await self._semantic_cache_response(query, semantic_hit, search_method, document_id, start_time)
+                    result["conversation_context"] = conversation_context
+                    return self._finish_trace(result, debug)
             
             # Execute search with ORIGINAL query for consistent results
-            if is_section_query:
-                search_results = await self.section_specific_search(query)
-            elif search_method == 'semantic':
-                search_results = await self.semantic_search(query, document_id)
-            elif search_method == 'hybrid':
-                search_results = await self.hybrid_search(query, document_id)
-            elif search_method == 'contextual':
-                search_results = await self.contextual_search(query)
-            else:
-                raise ValueError(f"Unknown search method: {search_method}")
+            search_results = await self._execute_search(query, search_method, document_id)
             
             if not search_results:
-                return {
+                return self._finish_trace({
                     "answer": "לא נמצא מידע רלוונטי בתקנונים לשאלה זו.",
                     "sources": [],
                     "chunks_selected": [],
@@ -282,68 +473,129 @@ class RAGOrchestrator:
                     "response_time_ms": int((time.time() - start_time) * 1000),
                     "search_method": search_method,
                     "query": query
-                }
+                }, debug)
             
-            # Build context from search results
-            context, citations, included_chunks = self.context_builder.build_context(search_results)
-            
-            # Create prompt with conversation context if provided
-            if conversation_context:
-                # Enhanced prompt with conversation context
-                prompt = self.context_builder.create_rag_prompt_with_conversation_context(
-                    query, context, conversation_context
-                )
-            else:
-                # Regular prompt
-                prompt = self.context_builder.create_rag_prompt(query, context)
-            
-            # Generate answer
-            answer = await self.answer_generator.generate_answer(prompt)
-            
-            # Process citations
-            cited_source_names = self.context_builder.extract_cited_sources(answer, citations)
-            cited_chunks = self.context_builder.get_cited_chunks(included_chunks, cited_source_names, citations)
-            
-            # Clean answer
-            clean_answer = re.sub(r'\[מקורות:[^\]]+\]', '', answer).strip()
-            
-            # Add relevant segments
-            for chunk in cited_chunks:
-                chunk_text = chunk.get('chunk_text', chunk.get('content', ''))
-                if chunk_text:
-                    relevant_segment = self.context_builder.extract_relevant_chunk_segment(
-                        chunk_text, query, clean_answer, max_length=500
-                    )
-                    chunk['relevant_segment'] = relevant_segment
+            # Build context, generate the answer (cached only without conversation context)
+            answer_data = await self._answer_from_results(query, search_results, conversation_context)
+            if not conversation_context:
+                self._semantic_cache_store(query_embedding, query, search_method, document_id, search_results, answer_data)
             
             response_time = int((time.time() - start_time) * 1000)
             
             # Log analytics
-            if self.analytics.is_analytics_enabled():
-                await self.analytics.log_search_analytics(
-                    query, search_method, len(search_results),
-                    search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)) if search_results else 0.0,
-                    response_time, document_id
-                )
+            await self._log_analytics(
+                query, search_method, len(search_results),
+                search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)),
+                response_time, document_id
+            )
             
             result = {
-                "answer": clean_answer,
-                "sources": citations,
-                "chunks_selected": cited_chunks,
+                "answer": answer_data["answer"],
+                "sources": answer_data["sources"],
+                "chunks_selected": answer_data["chunks_selected"],
                 "search_results_count": len(search_results),
                 "response_time_ms": response_time,
                 "search_method": search_method,
                 "query": query,
-                "cited_sources": cited_source_names,
-                "conversation_context": conversation_context
+                "cited_sources": answer_data["cited_sources"],
+                "conversation_context": conversation_context,
+                "answer_cache_hit": answer_data["cache_hit"]
             }
             
-            return result
+            return self._finish_trace(result, debug)
             
         except Exception as e:
             logger.error(f"Error generating answer with context: {e}")
             raise
 
+    async def generate_answer_stream(self, query: str, conversation_context: str = "", search_method: str = 'hybrid', document_id=None, debug: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a RAG answer as events: 'sources' as soon as retrieval finishes, 'token' for answer text
+        as Gemini produces it, and 'complete' with the same result dict as generate_answer_with_context
+        """
+        start_time = time.time()
+        
+        if self.test_mode:
+            result = await self.generate_answer_with_context(query, conversation_context, search_method, document_id, debug)
+            yield {"type": "token", "content": result["answer"]}
+            yield {"type": "complete", "result": result}
+            return
+        
+        start_trace()
+        semantic_hit, query_embedding = None, None
+        if not conversation_context:
+            semantic_hit, query_embedding = await self._semantic_cache_lookup(query, search_method, document_id)
+            if semantic_hit is not None:
+                result = await self._semantic_cache_response(query, semantic_hit, search_method, document_id, start_time)
+                result["conversation_context"] = conversation_context
+                yield {"type": "sources", "sources": result["sources"], "chunks": len(result["chunks_selected"]),
+                       "search_results_count": result["search_results_count"]}
+                yield {"type": "token", "content": result["answer"]}
+                yield {"type": "complete", "result": self._finish_trace(result, debug)}
+                return
+        
+        search_results = await self._execute_search(query, search_method, document_id)
+        
+        if not search_results:
+            yield {"type": "complete", "result": self._finish_trace({
+                "answer": "לא נמצא מידע רלוונטי בתקנונים לשאלה זו.",
+                "sources": [],
+                "chunks_selected": [],
+                "search_results_count": 0,
+                "response_time_ms": int((time.time() - start_time) * 1000),
+                "search_method": search_method,
+                "query": query
+            }, debug)}
+            return
+        
+        with span("context_build"):
+            prepared = self._prepare_answer(query, search_results, conversation_context)
+        yield {"type": "sources", "sources": prepared["citations"], "chunks": len(prepared["included_chunks"]),
+               "search_results_count": len(search_results)}
+        
+        if prepared["cached"] is not None:
+            answer_data = {**prepared["cached"], "cache_hit": True}
+            yield {"type": "token", "content": answer_data["answer"]}
+        else:
+            # Stream the visible text and hold back anything that may turn into the citation marker
+            raw_answer = ""
+            streamed = 0
+            generation_started = time.perf_counter()
+            async for text in self.answer_generator.generate_answer_stream(prepared["prompt"]):
+                raw_answer += text
+                visible = _streamable_text(raw_answer)
+                if len(visible) > streamed:
+                    yield {"type": "token", "content": visible[streamed:]}
+                    streamed = len(visible)
+            # Includes time the consumer spent on each token; the first-token latency is recorded separately
+            record_stage("generation", (time.perf_counter() - generation_started) * 1000)
+            with span("citations"):
+                answer_data = self._finalize_answer(query, raw_answer, prepared)
+        
+        if not conversation_context:
+            self._semantic_cache_store(query_embedding, query, search_method, document_id, search_results, answer_data)
+        
+        response_time = int((time.time() - start_time) * 1000)
+        
+        await self._log_analytics(
+            query, search_method, len(search_results),
+            search_results[0].get('similarity_score', search_results[0].get('combined_score', 0.0)),
+            response_time, document_id
+        )
+        
+        yield {"type": "complete", "result": self._finish_trace({
+            "answer": answer_data["answer"],
+            "sources": answer_data["sources"],
+            "chunks_selected": answer_data["chunks_selected"],
+            "search_results_count": len(search_results),
+            "response_time_ms": response_time,
+            "search_method": search_method,
+            "query": query,
+            "cited_sources": answer_data["cited_sources"],
+            "conversation_context": conversation_context,
+            "answer_cache_hit": answer_data["cache_hit"]
+        }, debug)}
+
     async def get_search_statistics(self, days_back: int = 30):
         """Get search statistics"""
         return await self.analytics.get_search_statistics(days_back)
@@ -351,6 +603,14 @@ class RAGOrchestrator:
     def get_current_config(self):
         """Get current configuration"""
         return {"profile": self.profile_name}
+    
+    def get_answer_cache_stats(self) -> Dict[str, Any]:
+        """Get answer cache statistics"""
+        return self.answer_cache.get_stats() if self.answer_cache else {"enabled": False}
+    
+    def get_semantic_cache_stats(self) -> Dict[str, Any]:
+        """Get semantic answer cache statistics, including false-hit audits"""
+        return self.semantic_cache.get_stats() if self.semantic_cache else {"enabled": False}
 
 
 # Factory function for backwards compatibility
@@ -7,6 +7,13 @@ import logging
 from typing import Dict, Any, Optional
 from supabase import Client
 
+try:
+    from ...utils.async_db import execute_async
+except ImportError:
+    from src.ai.utils.async_db import execute_async
+
+from .analytics_writer import get_analytics_writer
+
 logger = logging.getLogger(__name__)
 
 class SearchAnalytics:
@@ -26,6 +33,7 @@ class SearchAnalytics:
         self.db_config = get_database_config()
         self.performance_config = get_performance_config()
         self.get_current_profile = get_current_profile
+        self.writer = get_analytics_writer(supabase)
         logger.info("SearchAnalytics initialized")
     
     async def log_search_analytics(
@@ -35,9 +43,10 @@ class SearchAnalytics:
         results_count: int,
         top_score: float, 
         response_time_ms: int,
-        document_id: Optional[int] = None
+        document_id: Optional[int] = None,
+        stage_timings: Optional[Dict[str, int]] = None
     ):
-        """Log search analytics to analytics table"""
+        """Log search analytics to analytics table, with per-stage timings when available"""
         try:
             # Check if analytics is enabled
             if not getattr(self.performance_config, 'LOG_SEARCH_ANALYTICS', True):
@@ -52,14 +61,21 @@ class SearchAnalytics:
                 "response_time_ms": response_time_ms,
                 "config_profile": self._get_current_profile_safe(),
             }
+            if stage_timings and getattr(self.performance_config, 'LOG_STAGE_TIMINGS', True):
+                analytics_data["stage_timings"] = stage_timings
 
             # The document_id is currently an integer and causes a UUID error in the RPC.
             # Temporarily removing it from the log until the DB schema is fixed.
             # if document_id is not None:
             #     analytics_data["document_id"] = document_id
 
+            # Buffered path: the row is written in a background batch, off the response path
+            if self.writer is not None:
+                self.writer.enqueue(analytics_data)
+                return
+
             function_name = getattr(self.db_config, 'LOG_ANALYTICS_FUNCTION', 'log_search_analytics')
-            response = self.supabase.rpc(function_name, analytics_data).execute()
+            response = await execute_async(self.supabase.rpc(function_name, analytics_data))
             
             # Check for errors in the response
             if hasattr(response, 'data') and response.data is None:
@@ -91,9 +107,9 @@ class SearchAnalytics:
             if not getattr(self.performance_config, 'LOG_SEARCH_ANALYTICS', True):
                 return {"error": "Analytics disabled in configuration"}
                 
-            response = self.supabase.rpc('get_search_statistics', {
+            response = await execute_async(self.supabase.rpc('get_search_statistics', {
                 'days_back': days_back
-            }).execute()
+            }))
             
             if response.data:
                 stats = response.data[0] if isinstance(response.data, list) else response.data
@@ -110,9 +126,9 @@ class SearchAnalytics:
     async def get_analytics_summary(self, hours_back: int = 24) -> Dict[str, Any]:
         """Get analytics summary for recent period"""
         try:
-            response = self.supabase.rpc('get_analytics_summary', {
+            response = await execute_async(self.supabase.rpc('get_analytics_summary', {
                 'hours_back': hours_back
-            }).execute()
+            }))
             
             if response.data:
                 summary = response.data[0] if isinstance(response.data, list) else response.data
@@ -129,10 +145,10 @@ class SearchAnalytics:
     async def get_top_queries(self, limit: int = 10, days_back: int = 7) -> list:
         """Get most frequent queries"""
         try:
-            response = self.supabase.rpc('get_top_queries', {
+            response = await execute_async(self.supabase.rpc('get_top_queries', {
                 'query_limit': limit,
                 'days_back': days_back
-            }).execute()
+            }))
             
             if response.data:
                 logger.info(f"Retrieved top {limit} queries for {days_back} days")
@@ -148,9 +164,9 @@ class SearchAnalytics:
     async def get_performance_metrics(self, days_back: int = 7) -> Dict[str, Any]:
         """Get performance metrics"""
         try:
-            response = self.supabase.rpc('get_performance_metrics', {
+            response = await execute_async(self.supabase.rpc('get_performance_metrics', {
                 'days_back': days_back
-            }).execute()
+            }))
             
             if response.data:
                 metrics = response.data[0] if isinstance(response.data, list) else response.data
@@ -173,5 +189,7 @@ class SearchAnalytics:
         return {
             "enabled": self.is_analytics_enabled(),
             "log_function": getattr(self.db_config, 'LOG_ANALYTICS_FUNCTION', 'log_search_analytics'),
+            "buffered": self.writer is not None,
+            "buffer": self.writer.get_stats() if self.writer is not None else None,
             "current_profile": self._get_current_profile_safe()
         } 
\ No newline at end of file
@@ -19,8 +19,16 @@ from .embedding_service import EmbeddingService
 
 try:
     from ...config.rag_config import get_search_config, get_database_config
+    from ...utils.async_db import execute_async
+    from ...utils.vector_index import get_vector_index
+    from ...utils.search_cache import get_search_cache, SearchResultCache
+    from ...utils.latency import span
 except ImportError:
     from src.ai.config.rag_config import get_search_config, get_database_config  # type: ignore
+    from src.ai.utils.async_db import execute_async  # type: ignore
+    from src.ai.utils.vector_index import get_vector_index  # type: ignore
+    from src.ai.utils.search_cache import get_search_cache, SearchResultCache  # type: ignore
+    from src.ai.utils.latency import span  # type: ignore
 
 logger = logging.getLogger(__name__)
 
@@ -70,19 +78,22 @@ class SearchService:
         self.embedding_service = embedding_service
         self.search_config = type_cast(ConfigProtocol, type_cast(object, get_search_config()))
         self.db_config = type_cast(ConfigProtocol, type_cast(object, get_database_config()))
+        self.vector_index = get_vector_index()
+        self.result_cache = get_search_cache()
         logger.info("🔍 SearchService initialized")
     
     def _get_config_value(self, config: ConfigProtocol, key: str, default: T) -> T:
         """Safely get configuration value with type preservation."""
         return getattr(config, key, default)
     
-    def _execute_rpc(self, function_name: str, params: SearchParams) -> list[SearchResult]:
-        """Execute RPC call and safely handle response"""
+    async def _execute_rpc(self, function_name: str, params: SearchParams) -> list[SearchResult]:
+        """Execute RPC call off the event loop and safely handle response"""
         try:
             # The supabase-py library has incomplete typings for `rpc`.
             # We cast the result to `object` and ignore the specific member
             # type error to satisfy the strict type checker.
-            response = type_cast(object, self.supabase.rpc(function_name, params).execute())  # pyright: ignore [reportUnknownMemberType]
+            with span("search.rpc"):
+                response = type_cast(object, await execute_async(self.supabase.rpc(function_name, params)))  # pyright: ignore [reportUnknownMemberType]
             data = getattr(response, "data", None)
 
             if data is not None and isinstance(data, list):
@@ -96,6 +107,72 @@ class SearchService:
             )
             return []
     
+    def _cached_results(self, method: str, query: str, **params: object) -> tuple[str | None, list[SearchResult] | None]:
+        """Look up cached results; returns (cache key, results or None)"""
+        if self.result_cache is None:
+            return None, None
+        key = SearchResultCache.make_key(method, query, **params)
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            logger.info(f"Search cache hit for {method} search: {query[:50]}...")
+        return key, type_cast(list[SearchResult] | None, cached)
+    
+    def _store_results(self, key: str | None, results: list[SearchResult]) -> None:
+        """Cache non-empty results (empty ones may come from a failed RPC)"""
+        if key is not None and results and self.result_cache is not None:
+            self.result_cache.put(key, type_cast(list[dict[str, object]], results))
+    
+    def _local_semantic_search(
+        self,
+        query_embedding: list[float],
+        match_count: int,
+        match_threshold: float,
+        document_id: int | None = None
+    ) -> list[SearchResult] | None:
+        """Top-k from the in-process index; None means use the database RPC instead"""
+        if not self._get_config_value(self.search_config, 'USE_LOCAL_VECTOR_INDEX', True) or not self.vector_index.ready:
+            return None
+        try:
+            with span("search.local_index"):
+                results = self.vector_index.search(query_embedding, match_count, match_threshold, document_id)
+            logger.debug(f"Local vector index returned {len(results)} matches")
+            return type_cast(list[SearchResult], results)
+        except Exception as e:
+            logger.warning(f"Local vector index search failed, falling back to RPC: {e}")
+            return None
+    
+    def _local_hybrid_search(
+        self,
+        query_embedding: list[float],
+        query: str,
+        match_count: int,
+        match_threshold: float,
+        semantic_weight: float,
+        keyword_weight: float,
+        document_id: int | None = None
+    ) -> list[SearchResult] | None:
+        """Semantic + BM25 fusion from the in-process index; None means use the database RPC instead"""
+        if not self._get_config_value(self.search_config, 'USE_LOCAL_VECTOR_INDEX', True) or not self.vector_index.ready:
+            return None
+        try:
+            with span("search.local_index"):
+                results = self.vector_index.hybrid_search(
+                    query_embedding,
+                    query,
+                    match_count=match_count,
+                    match_threshold=match_threshold,
+                    semantic_weight=semantic_weight,
+                    keyword_weight=keyword_weight,
+                    fusion=self._get_config_value(self.search_config, 'HYBRID_FUSION_METHOD', 'weighted'),
+                    rrf_k=self._get_config_value(self.search_config, 'RRF_K', 60),
+                    document_id=document_id
+                )
+            logger.debug(f"Local hybrid index returned {len(results)} matches")
+            return type_cast(list[SearchResult], results)
+        except Exception as e:
+            logger.warning(f"Local hybrid search failed, falling back to RPC: {e}")
+            return None
+    
     async def semantic_search(
         self, 
         query: str, 
@@ -106,14 +183,20 @@ class SearchService:
         try:
             logger.info(f"Starting semantic search for: {query[:50]}...")
             
-            query_embedding = await self.embedding_service.generate_query_embedding(query)
-            
             match_threshold = self._get_config_value(self.search_config, 'SIMILARITY_THRESHOLD', 0.7)
             max_chunks = self._get_config_value(self.search_config, 'MAX_CHUNKS_RETRIEVED', 10)
             match_count = max_results if max_results is not None else max_chunks
             
             function_name = self._get_config_value(self.db_config, 'SEMANTIC_SEARCH_FUNCTION', 'match_documents_semantic')
             
+            cache_key, cached = self._cached_results(
+                "semantic", query, match_threshold=match_threshold, match_count=match_count, document_id=document_id
+            )
+            if cached is not None:
+                return cached
+            
+            query_embedding = await self.embedding_service.generate_query_embedding(query)
+            
             search_params: SearchParams = {
                 'query_embedding': query_embedding,
                 'match_threshold': match_threshold,
@@ -123,13 +206,18 @@ class SearchService:
             if document_id is not None:
                 search_params['document_id'] = document_id
             
-            results = self._execute_rpc(function_name, search_params)
+            local_results = self._local_semantic_search(query_embedding, match_count, match_threshold, document_id)
+            if local_results is not None:
+                results = local_results
+            else:
+                results = await self._execute_rpc(function_name, search_params)
             
             if results:
                 logger.info(f"Found {len(results)} semantic matches")
             else:
                 logger.warning("No semantic search results found")
-                
+            
+            self._store_results(cache_key, results)
             return results
                 
         except Exception as e:
@@ -147,8 +235,6 @@ class SearchService:
         try:
             logger.info(f"Starting hybrid search for: {query[:50]}...")
             
-            query_embedding = await self.embedding_service.generate_query_embedding(query)
-            
             sem_weight = semantic_weight if semantic_weight is not None else self._get_config_value(self.search_config, 'SEMANTIC_WEIGHT', 0.7)
             key_weight = keyword_weight if keyword_weight is not None else self._get_config_value(self.search_config, 'KEYWORD_WEIGHT', 0.3)
             match_threshold = self._get_config_value(self.search_config, 'SIMILARITY_THRESHOLD', 0.7)
@@ -156,6 +242,16 @@ class SearchService:
             
             function_name = self._get_config_value(self.db_config, 'HYBRID_SEARCH_FUNCTION', 'hybrid_search_documents')
             
+            cache_key, cached = self._cached_results(
+                "hybrid", query, match_threshold=match_threshold, match_count=match_count,
+                semantic_weight=sem_weight, keyword_weight=key_weight, document_id=document_id,
+                fusion=self._get_config_value(self.search_config, 'HYBRID_FUSION_METHOD', 'weighted')
+            )
+            if cached is not None:
+                return cached
+            
+            query_embedding = await self.embedding_service.generate_query_embedding(query)
+            
             search_params: SearchParams = {
                 'query_embedding': query_embedding,
                 'query_text': query,
@@ -168,13 +264,20 @@ class SearchService:
             if document_id is not None:
                 search_params['document_id'] = document_id
             
-            results = self._execute_rpc(function_name, search_params)
+            local_results = self._local_hybrid_search(
+                query_embedding, query, match_count, match_threshold, sem_weight, key_weight, document_id
+            )
+            if local_results is not None:
+                results = local_results
+            else:
+                results = await self._execute_rpc(function_name, search_params)
             
             if results:
                 logger.info(f"Found {len(results)} hybrid matches")
             else:
                 logger.warning("No hybrid search results found")
-                
+            
+            self._store_results(cache_key, results)
             return results
                 
         except Exception as e:
@@ -191,12 +294,19 @@ class SearchService:
         try:
             logger.info(f"Starting contextual search for: {query[:50]}...")
             
-            query_embedding = await self.embedding_service.generate_query_embedding(query)
-            
             match_threshold = self._get_config_value(self.search_config, 'SIMILARITY_THRESHOLD', 0.7)
             match_count = self._get_config_value(self.search_config, 'MAX_CHUNKS_RETRIEVED', 10)
             function_name = self._get_config_value(self.db_config, 'CONTEXTUAL_SEARCH_FUNCTION', 'contextual_search')
             
+            cache_key, cached = self._cached_results(
+                "contextual", query, match_threshold=match_threshold, match_count=match_count,
+                section_filter=section_filter, content_type_filter=content_type_filter
+            )
+            if cached is not None:
+                return cached
+            
+            query_embedding = await self.embedding_service.generate_query_embedding(query)
+            
             search_params: SearchParams = {
                 'query_embedding': query_embedding,
                 'query_text': query,
@@ -210,13 +320,14 @@ class SearchService:
             if content_type_filter is not None:
                 search_params['content_type_filter'] = content_type_filter
             
-            results = self._execute_rpc(function_name, search_params)
+            results = await self._execute_rpc(function_name, search_params)
             
             if results:
                 logger.info(f"Found {len(results)} contextual matches")
             else:
                 logger.warning("No contextual search results found")
-                
+            
+            self._store_results(cache_key, results)
             return results
                 
         except Exception as e:
@@ -239,12 +350,18 @@ class SearchService:
                     target_section = match.group(1)
                     logger.info(f"Detected section: {target_section}")
             
-            query_embedding = await self.embedding_service.generate_query_embedding(query)
-            
             match_threshold = self._get_config_value(self.search_config, 'SIMILARITY_THRESHOLD', 0.6)
             match_count = self._get_config_value(self.search_config, 'MAX_CHUNKS_RETRIEVED', 15)
             function_name = self._get_config_value(self.db_config, 'SECTION_SEARCH_FUNCTION', 'section_specific_search')
             
+            cache_key, cached = self._cached_results(
+                "section", query, match_threshold=match_threshold, match_count=match_count, target_section=target_section
+            )
+            if cached is not None:
+                return cached
+            
+            query_embedding = await self.embedding_service.generate_query_embedding(query)
+            
             search_params: SearchParams = {
                 'query_embedding': query_embedding,
                 'query_text': query,
@@ -255,13 +372,14 @@ class SearchService:
             if target_section is not None:
                 search_params['target_section'] = target_section
             
-            results = self._execute_rpc(function_name, search_params)
+            results = await self._execute_rpc(function_name, search_params)
             
             if results:
                 logger.info(f"Found {len(results)} section-specific matches")
             else:
                 logger.warning("No section-specific search results found")
-                
+            
+            self._store_results(cache_key, results)
             return results
                 
         except Exception as e:
@@ -4,6 +4,7 @@ Implements the second stage of the strategic plan: Advanced hierarchical chunkin
 """
 
 import re
+import bisect
 import logging
 from typing import List, Dict, Any, Tuple, Optional
 from dataclasses import dataclass
@@ -17,6 +18,42 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Section detection patterns, applied in priority order
+SECTION_PATTERNS = [
+    # Main sections: 1. 2. 3.
+    re.compile(r'(?:^|\n)\s*(\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)', re.MULTILINE | re.UNICODE),
+    # Sub-sections: 1.1, 1.2, etc.
+    re.compile(r'(?:^|\n)\s*(\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)', re.MULTILINE | re.UNICODE),
+    # Sub-sub-sections: 1.1.1, 1.2.3, etc. 
+    re.compile(r'(?:^|\n)\s*(\d+\.\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)', re.MULTILINE | re.UNICODE),
+    # Sections with "section": section 1.5.1
+    re.compile(r'(?:^|\n)\s*סעיף\s+(\d+(?:\.\d+)*)\s*[:\-]?\s*([^\n]*(?:\n(?!\s*(?:סעיף\s+)?\d+\.)[^\n]*)*)', re.MULTILINE | re.UNICODE),
+    # Additional sections that can be in the document
+    re.compile(r'(\d+(?:\.\d+){0,3})\s*[:\-]\s*([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)', re.MULTILINE | re.UNICODE),
+]
+
+
+class _IntervalSet:
+    """Sorted, non-overlapping closed intervals with O(log n) overlap checks"""
+    
+    def __init__(self):
+        self._starts: List[int] = []
+        self._ends: List[int] = []
+    
+    def add_if_free(self, start: int, end: int) -> bool:
+        """Add [start, end] unless it overlaps an existing interval; returns True if added"""
+        # Intervals are disjoint, so the last one starting at or before `end` has the largest end
+        idx = bisect.bisect_right(self._starts, end)
+        if idx > 0 and self._ends[idx - 1] >= start:
+            return False
+        self._starts.insert(idx, start)
+        self._ends.insert(idx, end)
+        return True
+    
+    def __len__(self) -> int:
+        return len(self._starts)
+
+
 @dataclass
 class ChunkMetadata:
     """Full metadata for each chunk"""
@@ -334,34 +371,17 @@ class SmartChunker:
     def _split_into_sections(self, text: str) -> List[Tuple[str, Dict]]:
         """Initial split into sections - improved small section detection"""
         
-        # Multiple section detection patterns
-        section_patterns = [
-            # Main sections: 1. 2. 3.
-            r'(?:^|\n)\s*(\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
-            # Sub-sections: 1.1, 1.2, etc.
-            r'(?:^|\n)\s*(\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
-            # Sub-sub-sections: 1.1.1, 1.2.3, etc. 
-            r'(?:^|\n)\s*(\d+\.\d+\.\d+)\.?\s+([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
-            # Sections with "section": section 1.5.1
-            r'(?:^|\n)\s*סעיף\s+(\d+(?:\.\d+)*)\s*[:\-]?\s*([^\n]*(?:\n(?!\s*(?:סעיף\s+)?\d+\.)[^\n]*)*)',
-            # Additional sections that can be in the document
-            r'(\d+(?:\.\d+){0,3})\s*[:\-]\s*([^\n]*(?:\n(?!\s*\d+\.)[^\n]*)*)',
-        ]
-        
         all_sections = []
-        used_positions = set()
+        captured = _IntervalSet()
         
-        # Search by all patterns
-        for pattern in section_patterns:
-            matches = list(re.finditer(pattern, text, re.MULTILINE | re.UNICODE))
-            for match in matches:
+        # Search by all patterns; a match is kept only if it does not overlap an earlier capture
+        for pattern in SECTION_PATTERNS:
+            for match in pattern.finditer(text):
                 start_pos = match.start()
                 end_pos = match.end()
                 
-                # Check if the position is not already captured
-                if not any(start_pos <= pos <= end_pos for pos in used_positions):
+                if captured.add_if_free(start_pos, end_pos):
                     section_number = match.group(1)
-                    section_content = match.group(2)
                     full_text = match.group(0).strip()
                     
                     section_info = {
@@ -372,10 +392,6 @@ class SmartChunker:
                     }
                     
                     all_sections.append((full_text, section_info))
-                    
-                    # Mark the range as captured
-                    for pos in range(start_pos, end_pos + 1):
-                        used_positions.add(pos)
         
         # If no sections found, simple split by paragraphs
         if not all_sections:
@@ -0,0 +1,55 @@
+"""
+Async Supabase access - runs synchronous supabase-py queries on a bounded thread pool.
+
+The supabase-py client keeps a pooled HTTP connection per client instance, so callers
+share a long-lived client and only the blocking `.execute()` round trip is offloaded.
+"""
+
+import asyncio
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_db_executor: Optional[ThreadPoolExecutor] = None
+_db_executor_lock = threading.Lock()
+
+
+def _get_db_executor() -> ThreadPoolExecutor:
+    """Shared executor sized by DatabaseConfig.MAX_CONNECTIONS"""
+    global _db_executor
+    if _db_executor is None:
+        with _db_executor_lock:
+            if _db_executor is None:
+                try:
+                    from ..config.rag_config import get_database_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_database_config
+
+                workers = getattr(get_database_config(), 'MAX_CONNECTIONS', 20)
+                _db_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="supabase")
+                logger.info(f"Supabase executor started with {workers} workers")
+    return _db_executor
+
+
+async def run_db(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run a blocking database call without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_db_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def execute_async(query: Any) -> Any:
+    """Await a supabase-py query builder (table/rpc) instead of calling .execute() inline"""
+    return await run_db(query.execute)
+
+
+def shutdown_db_executor(wait: bool = False):
+    """Stop the shared executor (used on application shutdown)"""
+    global _db_executor
+    with _db_executor_lock:
+        if _db_executor is not None:
+            _db_executor.shutdown(wait=wait)
+            _db_executor = None
@@ -0,0 +1,123 @@
+"""
+Corpus sync - polls the shared corpus watermark and reacts when another process changes the corpus.
+
+Triggers on document_chunks bump a single watermark row (see the corpus_watermark migration);
+this process reads it every few seconds, so chunks written or deleted by other workers, the
+standalone ingestion script or frontend deletes invalidate local caches here as well.
+The same triggers log which documents each version touched (corpus_changes), so listeners can
+refresh just those documents; they get None when the log cannot account for every version.
+"""
+
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from .async_db import execute_async
+from .search_cache import observe_corpus_watermark
+
+logger = logging.getLogger(__name__)
+
+# listener(watermark, changed document ids or None when unknown)
+CorpusListener = Callable[[int, Optional[Set[int]]], Awaitable[None]]
+
+
+class CorpusSync:
+    """Background poller of the corpus watermark; listeners run when it moves"""
+
+    def __init__(self, supabase: Any, table: str = "corpus_watermark", poll_seconds: float = 10.0,
+                 max_backoff: float = 300.0, changes_table: str = "corpus_changes", max_changes: int = 1000):
+        self.supabase = supabase
+        self.table = table
+        self.changes_table = changes_table
+        self.max_changes = max_changes
+        self.poll_seconds = poll_seconds
+        self.max_backoff = max_backoff
+        self._listeners: List[CorpusListener] = []
+        self._task: Optional[asyncio.Task] = None
+        self._failures = 0
+        self.watermark: Optional[int] = None
+        self.stats = {"checks": 0, "changes": 0, "failed_checks": 0, "listener_errors": 0}
+
+    def add_listener(self, listener: CorpusListener) -> None:
+        self._listeners.append(listener)
+
+    async def read_watermark(self) -> Optional[int]:
+        response = await execute_async(self.supabase.table(self.table).select("version").limit(1))
+        if not response.data:
+            return None
+        return int(response.data[0]["version"])
+
+    async def read_changes(self, since: int, until: int) -> Optional[Set[int]]:
+        """Documents changed by versions in (since, until], or None when the log cannot tell
+        (pruned or missing versions, a TRUNCATE, too many changes, or no change log table)"""
+        try:
+            response = await execute_async(
+                self.supabase.table(self.changes_table).select("version, document_id")
+                .gt("version", since).lte("version", until).limit(self.max_changes + 1)
+            )
+            rows = response.data or []
+        except Exception as e:
+            logger.debug(f"Corpus change log unavailable: {e}")
+            return None
+        versions = {int(row["version"]) for row in rows}
+        if len(rows) > self.max_changes or len(versions) != until - since:
+            return None
+        if any(row.get("document_id") is None for row in rows):
+            return None
+        return {int(row["document_id"]) for row in rows}
+
+    async def check(self) -> bool:
+        """Read the watermark once; returns True (after notifying listeners) when it moved"""
+        self.stats["checks"] += 1
+        try:
+            watermark = await self.read_watermark()
+            self._failures = 0
+        except Exception as e:
+            self._failures += 1
+            self.stats["failed_checks"] += 1
+            logger.warning(f"Failed to read the corpus watermark (attempt {self._failures}): {e}")
+            return False
+        if watermark is None:
+            return False
+
+        previous, self.watermark = self.watermark, watermark
+        if not observe_corpus_watermark(watermark):
+            return False
+
+        self.stats["changes"] += 1
+        document_ids = None
+        if previous is not None and watermark > previous:
+            document_ids = await self.read_changes(previous, watermark)
+        for listener in self._listeners:
+            try:
+                await listener(watermark, document_ids)
+            except Exception as e:
+                self.stats["listener_errors"] += 1
+                logger.warning(f"Corpus change listener failed: {e}")
+        return True
+
+    async def start(self):
+        """Read the current watermark, then keep polling in the background"""
+        if self._task is not None and not self._task.done():
+            return
+        await self.check()
+        if self.poll_seconds > 0:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            # Back off exponentially while the database keeps failing
+            await asyncio.sleep(min(self.poll_seconds * (2 ** self._failures), self.max_backoff))
+            await self.check()
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._task = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "watermark": self.watermark, "consecutive_failures": self._failures}
@@ -0,0 +1,223 @@
+"""
+Persistent embedding store - content-addressed SQLite cache shared across restarts and workers.
+
+Entries are keyed by model name + task type + normalized text and stored as float32 blobs.
+The store is bounded by entry count; the least recently used entries are evicted first.
+Access times are only refreshed once they are `touch_interval` old, so hot entries do not turn
+every read into a write.
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+from array import array
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STORE_PATH = Path(__file__).parent.parent / "embedding_cache.sqlite3"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different inputs share one entry"""
+    return _WHITESPACE_RE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def make_embedding_key(model: str, task_type: str, text: str) -> str:
+    """Content address for an embedding"""
+    payload = f"{model}\x00{task_type}\x00{normalize_text(text)}"
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PersistentEmbeddingStore:
+    """SQLite-backed embedding cache with size-based LRU eviction"""
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = 200000, touch_interval: float = 3600.0):
+        self.path = str(path or DEFAULT_STORE_PATH)
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._writes_since_evict = 0
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                task_type TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_access ON embeddings(last_access)")
+        conn.commit()
+        logger.info(f"Persistent embedding store ready at {self.path} (max {max_entries} entries)")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread; WAL lets several workers share the file"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(vector: List[float]) -> bytes:
+        return array("f", vector).tobytes()
+
+    @staticmethod
+    def _decode(blob: bytes) -> List[float]:
+        values = array("f")
+        values.frombytes(blob)
+        return values.tolist()
+
+    def get(self, model: str, task_type: str, text: str) -> Optional[List[float]]:
+        """Return a stored embedding or None"""
+        return self.get_many(model, task_type, [text]).get(0)
+
+    def get_many(self, model: str, task_type: str, texts: List[str]) -> Dict[int, List[float]]:
+        """Look up several texts at once; returns {index: embedding} for hits only"""
+        if not texts:
+            return {}
+        keys = [make_embedding_key(model, task_type, text) for text in texts]
+        found: Dict[str, bytes] = {}
+        stale: List[str] = []
+        now = time.time()
+        try:
+            conn = self._conn()
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector, last_access FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, vector, last_access in rows:
+                    found[key] = vector
+                    # LRU eviction only needs coarse access times
+                    if now - last_access >= self.touch_interval:
+                        stale.append(key)
+            if stale:
+                with self._write_lock:
+                    conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                        [(now, key) for key in stale],
+                    )
+                    conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding store read failed: {e}")
+            return {}
+
+        results = {i: self._decode(found[key]) for i, key in enumerate(keys) if key in found}
+        self.stats["hits"] += len(results)
+        self.stats["misses"] += len(keys) - len(results)
+        return results
+
+    def put(self, model: str, task_type: str, text: str, vector: List[float]) -> None:
+        """Store one embedding"""
+        self.put_many(model, task_type, [(text, vector)])
+
+    def put_many(self, model: str, task_type: str, items: Iterable[Tuple[str, List[float]]]) -> None:
+        """Store several embeddings in one transaction"""
+        now = time.time()
+        rows = [
+            (make_embedding_key(model, task_type, text), model, task_type, len(vector), self._encode(vector), now, now)
+            for text, vector in items
+            if vector
+        ]
+        if not rows:
+            return
+        try:
+            with self._write_lock:
+                conn = self._conn()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, task_type, dim, vector, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.commit()
+                self.stats["writes"] += len(rows)
+                self._writes_since_evict += len(rows)
+                if self._writes_since_evict >= max(1, self.max_entries // 100):
+                    self._evict(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"Embedding store write failed: {e}")
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Drop least recently used entries above max_entries (caller holds the write lock)"""
+        self._writes_since_evict = 0
+        count = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        conn.execute(
+            "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+            (excess,),
+        )
+        conn.commit()
+        self.stats["evictions"] += excess
+        logger.info(f"Evicted {excess} entries from embedding store")
+
+    def size(self) -> int:
+        try:
+            return self._conn().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        except sqlite3.Error:
+            return 0
+
+    def clear(self) -> None:
+        with self._write_lock:
+            conn = self._conn()
+            conn.execute("DELETE FROM embeddings")
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, int]:
+        return {**self.stats, "size": self.size(), "max_entries": self.max_entries}
+
+
+_store: Optional[PersistentEmbeddingStore] = None
+_store_unavailable = False
+_store_lock = threading.Lock()
+
+
+def get_embedding_store() -> Optional[PersistentEmbeddingStore]:
+    """Process-wide store, or None when disabled or unavailable"""
+    global _store, _store_unavailable
+    if _store is None and not _store_unavailable:
+        with _store_lock:
+            if _store is None and not _store_unavailable:
+                try:
+                    from ..config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                if not getattr(config, 'EMBEDDING_STORE_ENABLED', True):
+                    _store_unavailable = True
+                    return None
+                try:
+                    _store = PersistentEmbeddingStore(
+                        path=os.getenv("EMBEDDING_STORE_PATH") or getattr(config, 'EMBEDDING_STORE_PATH', None),
+                        max_entries=getattr(config, 'EMBEDDING_STORE_MAX_ENTRIES', 200000),
+                        touch_interval=getattr(config, 'EMBEDDING_STORE_TOUCH_INTERVAL_SECONDS', 3600.0),
+                    )
+                except Exception as e:
+                    logger.warning(f"Persistent embedding store unavailable: {e}")
+                    _store_unavailable = True
+                    return None
+    return _store
@@ -0,0 +1,90 @@
+"""
+Keyword index - in-process BM25 inverted index for Hebrew chunk text.
+
+Hebrew attaches prepositions and conjunctions as word prefixes (ו, ה, ב, ל, מ, ש, כ), so every
+token is indexed both as written and with its prefix stripped. Postings are stored as compact
+NumPy arrays holding precomputed BM25 weights, so a query costs one vector add per term.
+"""
+
+import re
+import math
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+_NIQQUD_RE = re.compile("[\u0591-\u05BD\u05BF\u05C1\u05C2\u05C4\u05C5\u05C7]")  # cantillation and vowel points
+
+# Longest combinations first so "וכש" is stripped before "ו"
+HEBREW_PREFIXES = ("וכש", "ומה", "ושה", "כש", "שב", "שה", "של", "וה", "וב", "ול", "ומ", "וש", "מה", "לה", "בה",
+                   "ו", "ה", "ב", "ל", "מ", "ש", "כ")
+MIN_STEM_LENGTH = 3
+
+HEBREW_STOPWORDS = frozenset({
+    "של", "את", "על", "עם", "או", "גם", "כי", "אם", "זה", "זו", "זאת", "הוא", "היא", "הם", "הן",
+    "לא", "יש", "אין", "מה", "כל", "אשר", "אל", "עד", "כמו", "רק", "אך", "לכן",
+})
+
+
+def strip_prefix(token: str) -> str:
+    """Remove one Hebrew prefix combination when a plausible stem remains"""
+    for prefix in HEBREW_PREFIXES:
+        if token.startswith(prefix) and len(token) - len(prefix) >= MIN_STEM_LENGTH:
+            return token[len(prefix):]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Index terms for a text: each token as written plus its prefix-stripped form"""
+    text = _NIQQUD_RE.sub("", unicodedata.normalize("NFC", text or "")).lower()
+    terms = []
+    for token in _TOKEN_RE.findall(text):
+        if len(token) < 2 or token in HEBREW_STOPWORDS:
+            continue
+        terms.append(token)
+        stem = strip_prefix(token)
+        if stem != token:
+            terms.append(stem)
+    return terms
+
+
+class BM25Index:
+    """Immutable BM25 index over a fixed sequence of documents (chunks)"""
+
+    def __init__(self, term_counts: Sequence[Counter] = (), k1: float = 1.5, b: float = 0.75):
+        self.size = len(term_counts)
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        if not self.size:
+            return
+
+        lengths = np.fromiter((sum(counts.values()) for counts in term_counts), dtype=np.float32, count=self.size)
+        avg_length = float(lengths.mean()) or 1.0
+        length_norm = k1 * (1 - b + b * lengths / avg_length)
+
+        doc_lists: Dict[str, List[int]] = {}
+        tf_lists: Dict[str, List[int]] = {}
+        for doc_index, counts in enumerate(term_counts):
+            for term, tf in counts.items():
+                doc_lists.setdefault(term, []).append(doc_index)
+                tf_lists.setdefault(term, []).append(tf)
+
+        for term, docs in doc_lists.items():
+            doc_array = np.asarray(docs, dtype=np.int32)
+            tf_array = np.asarray(tf_lists[term], dtype=np.float32)
+            idf = math.log(1 + (self.size - len(docs) + 0.5) / (len(docs) + 0.5))
+            weights = idf * tf_array * (k1 + 1) / (tf_array + length_norm[doc_array])
+            self._postings[term] = (doc_array, weights.astype(np.float32))
+
+    def scores(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query (zero where no term matches)"""
+        scores = np.zeros(self.size, dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is not None:
+                scores[posting[0]] += posting[1]
+        return scores
+
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
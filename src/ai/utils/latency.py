@@ -0,0 +1,139 @@
+"""
+Latency instrumentation - lightweight per-stage spans for the RAG request path.
+
+A request opens a trace with start_trace(); code along the path wraps stages in span("name").
+Each span is added to the current request's trace (through a ContextVar, so concurrent requests
+never mix) and to process-wide histograms that back the admin latency endpoint.
+"""
+
+import bisect
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended
+BUCKET_BOUNDS_MS: List[float] = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 20000]
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram with approximate percentiles"""
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, duration_ms: float):
+        self.counts[bisect.bisect_left(BUCKET_BOUNDS_MS, duration_ms)] += 1
+        self.count += 1
+        self.total_ms += duration_ms
+        self.max_ms = max(self.max_ms, duration_ms)
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of samples"""
+        if not self.count:
+            return 0.0
+        target = fraction * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return BUCKET_BOUNDS_MS[index] if index < len(BUCKET_BOUNDS_MS) else self.max_ms
+        return self.max_ms
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": {
+                (f"le_{int(bound)}" if index < len(BUCKET_BOUNDS_MS) else "inf"): self.counts[index]
+                for index, bound in enumerate(BUCKET_BOUNDS_MS + [float("inf")])
+            },
+        }
+
+
+class LatencyRegistry:
+    """Process-wide histograms keyed by stage name"""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, duration_ms: float):
+        with self._lock:
+            histogram = self._histograms.get(stage)
+            if histogram is None:
+                histogram = self._histograms[stage] = LatencyHistogram()
+            histogram.record(duration_ms)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {stage: histogram.summary() for stage, histogram in sorted(self._histograms.items())}
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+
+
+class RequestTrace:
+    """Stage timings of a single request; repeated stages accumulate"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def add(self, stage: str, duration_ms: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + duration_ms
+
+    def timings(self) -> Dict[str, int]:
+        """Stage timings in whole milliseconds, plus the elapsed total"""
+        timings = {stage: int(round(duration)) for stage, duration in self.stages.items()}
+        timings["total"] = int(round((time.perf_counter() - self.started) * 1000))
+        return timings
+
+
+_registry = LatencyRegistry()
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("rag_request_trace", default=None)
+
+
+def get_latency_registry() -> LatencyRegistry:
+    return _registry
+
+
+def start_trace() -> RequestTrace:
+    """Begin a trace for the current request (and the tasks it spawns)"""
+    trace = RequestTrace()
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+def record_stage(stage: str, duration_ms: float):
+    """Record an externally measured stage duration"""
+    _registry.record(stage, duration_ms)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, duration_ms)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Time the enclosed block as the given stage (works in sync and async code)"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, (time.perf_counter() - started) * 1000)
@@ -0,0 +1,129 @@
+"""
+Search result cache - bounded TTL cache for retrieval results.
+
+Keys include a corpus version that changes whenever document chunks are added or removed,
+so cached results never outlive the corpus they were computed from. The version combines the
+shared database watermark (bumped by triggers on document_chunks, so writes from any process
+count) with a local counter that invalidates this process immediately, before the next poll.
+"""
+
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .embedding_store import normalize_text
+
+logger = logging.getLogger(__name__)
+
+_corpus_version = 0
+_corpus_watermark: Optional[int] = None
+_corpus_version_lock = threading.Lock()
+
+
+def get_corpus_version() -> Tuple[Optional[int], int]:
+    """(last observed database watermark, local bump count)"""
+    return _corpus_watermark, _corpus_version
+
+
+def observe_corpus_watermark(watermark: int) -> bool:
+    """Record the database watermark; returns True when it moved since the last observation"""
+    global _corpus_watermark
+    with _corpus_version_lock:
+        if watermark == _corpus_watermark:
+            return False
+        changed = _corpus_watermark is not None
+        _corpus_watermark = watermark
+        if changed:
+            logger.debug(f"Corpus watermark moved to {watermark}")
+        return changed
+
+
+def bump_corpus_version() -> int:
+    """Mark the corpus as changed; every cached search result becomes stale"""
+    global _corpus_version
+    with _corpus_version_lock:
+        _corpus_version += 1
+        logger.debug(f"Local corpus version bumped to {_corpus_version}")
+        return _corpus_version
+
+
+class SearchResultCache:
+    """LRU + TTL cache of search results keyed by query, method, parameters and corpus version"""
+
+    def __init__(self, max_size: int = 500, ttl_seconds: float = 600):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+    @staticmethod
+    def make_key(method: str, query: str, **params: Any) -> str:
+        payload = json.dumps(
+            {"method": method, "query": normalize_text(query), "params": params, "corpus": get_corpus_version()},
+            sort_keys=True, ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """Cached results (as fresh copies) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    del self._entries[key]
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return [dict(row) for row in entry[1]]
+
+    def put(self, key: str, results: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), [dict(row) for row in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.stats["stores"] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._entries),
+            "hit_rate_percent": round(self.stats["hits"] / lookups * 100, 2) if lookups else 0,
+            "corpus_version": list(get_corpus_version()),
+        }
+
+
+_cache: Optional[SearchResultCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache() -> Optional[SearchResultCache]:
+    """Process-wide search result cache, or None when disabled"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                try:
+                    from ..config.rag_config import get_performance_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_performance_config
+
+                config = get_performance_config()
+                if not getattr(config, 'SEARCH_CACHE_ENABLED', True):
+                    return None
+                _cache = SearchResultCache(
+                    max_size=getattr(config, 'SEARCH_CACHE_SIZE', 500),
+                    ttl_seconds=getattr(config, 'SEARCH_CACHE_TTL_SECONDS', 600)
+                )
+    return _cache
@@ -0,0 +1,323 @@
+"""
+Local vector index - in-process replica of document_chunks embeddings for top-k search.
+
+Embeddings are kept as one L2-normalized float32 matrix, so cosine similarity for every chunk
+is a single matrix-vector product. A BM25 keyword index is built over the same rows for local
+hybrid search. Mutations build a new snapshot and swap it in, so searches always read a
+consistent view without taking the lock. When the shared corpus watermark moves (chunks changed
+by another process), only the documents named in the corpus change log are reloaded, or the whole
+corpus when the log cannot tell; the current snapshot keeps serving until the new one swaps in.
+"""
+
+import asyncio
+import json
+import time
+import logging
+import threading
+from collections import Counter
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from .keyword_index import BM25Index, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Columns kept per chunk; mirrors what match_documents_semantic returns
+CHUNK_COLUMNS = ["id", "document_id", "chunk_text", "chunk_header", "page_number", "section", "chunk_index"]
+
+
+def _parse_embedding(value: Any) -> Optional[List[float]]:
+    """pgvector columns arrive from PostgREST as '[0.1,0.2,...]' strings"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    return value
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+class _Snapshot(NamedTuple):
+    """Everything a search reads, published as one object"""
+    matrix: np.ndarray
+    doc_ids: np.ndarray
+    rows: List[Dict[str, Any]]
+    terms: List[Counter]
+    keywords: BM25Index
+
+
+class LocalVectorIndex:
+    """Normalized dot-product top-k index over document chunks, with BM25 over the same rows"""
+
+    def __init__(self, dimension: int = 768, bm25_k1: float = 1.5, bm25_b: float = 0.75):
+        self.dimension = dimension
+        self.bm25_k1 = bm25_k1
+        self.bm25_b = bm25_b
+        self._lock = threading.Lock()
+        self._snapshot = _Snapshot(np.zeros((0, dimension), dtype=np.float32), np.zeros(0, dtype=np.int64), [], [], BM25Index())
+        self._document_names: Dict[int, str] = {}
+        self.ready = False
+        self.loaded_at: Optional[float] = None
+        self.stats = {"searches": 0, "hybrid_searches": 0, "loads": 0, "updates": 0, "resyncs": 0}
+
+    def size(self) -> int:
+        return len(self._snapshot.rows)
+
+    def load(self, supabase: Any, chunks_table: str = "document_chunks",
+             documents_table: str = "documents", page_size: int = 1000) -> int:
+        """Replace the index contents with every chunk in the database (blocking)"""
+        started = time.perf_counter()
+        documents = supabase.table(documents_table).select("id, name").execute().data or []
+        document_names = {doc["id"]: doc.get("name") for doc in documents}
+
+        rows: List[Dict[str, Any]] = []
+        vectors: List[List[float]] = []
+        columns = ", ".join(CHUNK_COLUMNS + ["embedding"])
+        start = 0
+        while True:
+            page = (supabase.table(chunks_table).select(columns)
+                    .order("id").range(start, start + page_size - 1).execute().data or [])
+            for chunk in page:
+                embedding = _parse_embedding(chunk.get("embedding"))
+                if not embedding or len(embedding) != self.dimension:
+                    continue
+                rows.append({column: chunk.get(column) for column in CHUNK_COLUMNS})
+                vectors.append(embedding)
+            if len(page) < page_size:
+                break
+            start += page_size
+
+        matrix = _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension))
+        terms = [Counter(tokenize(row.get("chunk_text"))) for row in rows]
+        with self._lock:
+            self._document_names = document_names
+            self._swap(rows, matrix, terms)
+            self.ready = True
+            self.loaded_at = time.time()
+            self.stats["loads"] += 1
+
+        logger.info(f"Local vector index loaded {len(rows)} chunks in {time.perf_counter() - started:.2f}s")
+        return len(rows)
+
+    def reload_documents(self, supabase: Any, document_ids: Set[int], chunks_table: str = "document_chunks",
+                         documents_table: str = "documents", page_size: int = 1000) -> int:
+        """Re-read the chunks of the given documents and swap them in together (blocking).
+        Documents that no longer have chunks (or no longer exist) are dropped"""
+        started = time.perf_counter()
+        ids = sorted(document_ids)
+        documents = supabase.table(documents_table).select("id, name").in_("id", ids).execute().data or []
+        document_names = {doc["id"]: doc.get("name") for doc in documents}
+
+        chunks_by_document: Dict[int, List[Dict[str, Any]]] = {document_id: [] for document_id in ids}
+        columns = ", ".join(CHUNK_COLUMNS + ["embedding"])
+        start = 0
+        while True:
+            page = (supabase.table(chunks_table).select(columns).in_("document_id", ids)
+                    .order("id").range(start, start + page_size - 1).execute().data or [])
+            for chunk in page:
+                chunks_by_document.setdefault(chunk["document_id"], []).append(chunk)
+            if len(page) < page_size:
+                break
+            start += page_size
+
+        prepared = {document_id: self._prepare(document_id, chunks) for document_id, chunks in chunks_by_document.items()}
+        with self._lock:
+            self._apply(prepared)
+            for document_id in ids:
+                if document_names.get(document_id):
+                    self._document_names[document_id] = document_names[document_id]
+                else:
+                    self._document_names.pop(document_id, None)
+
+        reloaded = sum(len(rows) for rows, _, _ in prepared.values())
+        logger.info(f"Local vector index reloaded {reloaded} chunks of {len(ids)} changed documents "
+                    f"in {time.perf_counter() - started:.2f}s")
+        return reloaded
+
+    async def resync(self, supabase: Any, document_ids: Optional[Set[int]] = None,
+                     chunks_table: str = "document_chunks", documents_table: str = "documents",
+                     page_size: int = 1000) -> int:
+        """Catch up with a corpus change in a worker thread while the current snapshot keeps serving.
+        Only `document_ids` are reloaded when known; otherwise the whole corpus is"""
+        with self._lock:
+            self.stats["resyncs"] += 1
+        if document_ids is not None and self.ready:
+            if not document_ids:
+                return 0
+            return await asyncio.to_thread(self.reload_documents, supabase, document_ids,
+                                           chunks_table, documents_table, page_size)
+        return await asyncio.to_thread(self.load, supabase, chunks_table, documents_table, page_size)
+
+    def _swap(self, rows: List[Dict[str, Any]], matrix: np.ndarray, terms: List[Counter]):
+        """Publish a new snapshot (caller holds the lock)"""
+        doc_ids = np.fromiter((row["document_id"] for row in rows), dtype=np.int64, count=len(rows))
+        keywords = BM25Index(terms, k1=self.bm25_k1, b=self.bm25_b)
+        self._snapshot = _Snapshot(matrix, doc_ids, rows, terms, keywords)
+
+    def _prepare(self, document_id: int,
+                 chunks: Iterable[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], np.ndarray, List[Counter]]:
+        """Rows, normalized matrix and term counts for one document's chunks (no lock needed)"""
+        new_rows = []
+        new_vectors = []
+        for chunk in chunks:
+            embedding = _parse_embedding(chunk.get("embedding"))
+            if not embedding or len(embedding) != self.dimension:
+                continue
+            row = {column: chunk.get(column) for column in CHUNK_COLUMNS}
+            row["document_id"] = document_id
+            new_rows.append(row)
+            new_vectors.append(embedding)
+
+        new_matrix = _normalize_rows(np.asarray(new_vectors, dtype=np.float32).reshape(-1, self.dimension))
+        new_terms = [Counter(tokenize(row.get("chunk_text"))) for row in new_rows]
+        return new_rows, new_matrix, new_terms
+
+    def _apply(self, prepared: Dict[int, Tuple[List[Dict[str, Any]], np.ndarray, List[Counter]]]):
+        """Replace the chunks of every document in `prepared` in one snapshot swap (caller holds the lock)"""
+        current = self._snapshot
+        keep = ~np.isin(current.doc_ids, np.fromiter(prepared.keys(), dtype=np.int64, count=len(prepared)))
+        rows = [row for row, kept in zip(current.rows, keep) if kept]
+        terms = [counts for counts, kept in zip(current.terms, keep) if kept]
+        matrices = [current.matrix[keep]]
+        for new_rows, new_matrix, new_terms in prepared.values():
+            rows += new_rows
+            terms += new_terms
+            matrices.append(new_matrix)
+        self._swap(rows, np.vstack(matrices), terms)
+        self.stats["updates"] += len(prepared)
+
+    def replace_document(self, document_id: int, chunks: Iterable[Dict[str, Any]],
+                         document_name: Optional[str] = None):
+        """Swap in the chunks of one document, dropping any it had before"""
+        prepared = self._prepare(document_id, chunks)
+        with self._lock:
+            self._apply({document_id: prepared})
+            if document_name:
+                self._document_names[document_id] = document_name
+        logger.debug(f"Local vector index now holds {len(prepared[0])} chunks for document {document_id}")
+
+    def remove_document(self, document_id: int):
+        """Drop every chunk of one document"""
+        self.replace_document(document_id, [])
+        with self._lock:
+            self._document_names.pop(document_id, None)
+
+    def _query_scores(self, snapshot: _Snapshot, query_embedding: List[float]) -> Optional[np.ndarray]:
+        query = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or not snapshot.rows:
+            return None
+        return snapshot.matrix @ (query / norm)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, candidates: np.ndarray, k: int) -> np.ndarray:
+        """Candidate positions with the k highest scores, best first"""
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+    def _result_row(self, snapshot: _Snapshot, i: int, **scores: float) -> Dict[str, Any]:
+        row = snapshot.rows[i]
+        return {**row, "document_name": self._document_names.get(row["document_id"]), **scores}
+
+    def search(self, query_embedding: List[float], match_count: int = 10, match_threshold: float = 0.0,
+               document_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Top-k chunks by cosine similarity, shaped like match_documents_semantic rows"""
+        snapshot = self._snapshot
+        self.stats["searches"] += 1
+        scores = self._query_scores(snapshot, query_embedding)
+        if scores is None or match_count <= 0:
+            return []
+
+        candidates = np.flatnonzero(scores > match_threshold)
+        if document_id is not None:
+            candidates = candidates[snapshot.doc_ids[candidates] == document_id]
+
+        return [
+            self._result_row(snapshot, i, similarity=float(scores[i]))
+            for i in self._top_k(scores, candidates, match_count)
+        ]
+
+    def hybrid_search(self, query_embedding: List[float], query_text: str, match_count: int = 10,
+                      match_threshold: float = 0.0, semantic_weight: float = 0.7, keyword_weight: float = 0.3,
+                      fusion: str = "weighted", rrf_k: int = 60,
+                      document_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Semantic + BM25 search fused locally, shaped like hybrid_search_documents rows.
+        Candidates are chunks above the similarity threshold or with any keyword match.
+        'weighted' fuses similarity with max-normalized BM25; 'rrf' uses weighted reciprocal ranks.
+        """
+        snapshot = self._snapshot
+        self.stats["hybrid_searches"] += 1
+        semantic = self._query_scores(snapshot, query_embedding)
+        if semantic is None or match_count <= 0:
+            return []
+        keyword = snapshot.keywords.scores(query_text)
+
+        candidates = np.flatnonzero((semantic > match_threshold) | (keyword > 0))
+        if document_id is not None:
+            candidates = candidates[snapshot.doc_ids[candidates] == document_id]
+        if not len(candidates):
+            return []
+
+        combined = np.zeros_like(semantic)
+        if fusion == "rrf":
+            semantic_order = candidates[np.argsort(-semantic[candidates], kind="stable")]
+            combined[semantic_order] += semantic_weight / (rrf_k + np.arange(1, len(semantic_order) + 1))
+            matched = candidates[keyword[candidates] > 0]
+            keyword_order = matched[np.argsort(-keyword[matched], kind="stable")]
+            combined[keyword_order] += keyword_weight / (rrf_k + np.arange(1, len(keyword_order) + 1))
+        else:
+            max_keyword = float(keyword[candidates].max())
+            normalized = keyword / max_keyword if max_keyword > 0 else keyword
+            combined[candidates] = semantic[candidates] * semantic_weight + normalized[candidates] * keyword_weight
+
+        return [
+            self._result_row(
+                snapshot, i,
+                similarity=float(semantic[i]),
+                text_match_rank=float(keyword[i]),
+                combined_score=float(combined[i])
+            )
+            for i in self._top_k(combined, candidates, match_count)
+        ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        snapshot = self._snapshot
+        return {
+            **self.stats,
+            "ready": self.ready,
+            "chunks": len(snapshot.rows),
+            "documents": len(set(snapshot.doc_ids.tolist())),
+            "keyword_terms": snapshot.keywords.vocabulary_size(),
+            "loaded_at": self.loaded_at,
+            "memory_mb": round(snapshot.matrix.nbytes / (1024 * 1024), 2),
+        }
+
+
+_index: Optional[LocalVectorIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_vector_index() -> LocalVectorIndex:
+    """Process-wide local vector index"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                try:
+                    from ..config.rag_config import get_search_config
+                except ImportError:
+                    from src.ai.config.rag_config import get_search_config
+
+                config = get_search_config()
+                _index = LocalVectorIndex(
+                    bm25_k1=getattr(config, 'BM25_K1', 1.5),
+                    bm25_b=getattr(config, 'BM25_B', 0.75)
+                )
+    return _index
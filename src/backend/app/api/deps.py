@@ -1,4 +1,5 @@
 import logging
+from typing import Optional
 from fastapi import HTTPException, Security, Depends
 from fastapi.security import APIKeyHeader
 from supabase import create_client, Client
@@ -6,7 +7,7 @@ from supabase import create_client, Client
 from ..config.settings import settings
 from ..core.interfaces import IDocumentService, IChatService, IChatSessionService, IMessageService, IDocumentRepository
 from ..services.document_service import DocumentService
-from ..services.chat_service import ChatService
+from ..services.chat_service import get_chat_service as get_shared_chat_service
 from ..services.chat_session_service import ChatSessionService
 from ..services.message_service import MessageService
 from ..repositories.supabase_repo import SupabaseDocumentRepository
@@ -63,6 +64,18 @@ async def get_supabase_client() -> Client:
     
     return _supabase_client
 
+_supabase_service_client = None
+
+async def get_supabase_service_client() -> Optional[Client]:
+    """Service-role Supabase client for maintenance RPCs, or None when SUPABASE_SERVICE_KEY is not set."""
+    global _supabase_service_client
+    
+    if _supabase_service_client is None and settings.SUPABASE_SERVICE_KEY and settings.SUPABASE_URL:
+        _supabase_service_client = create_client(settings.SUPABASE_URL, settings.SUPABASE_SERVICE_KEY)
+        logger.info("Supabase service-role client initialized")
+    
+    return _supabase_service_client
+
 # --- Repository Dependency ---
 async def get_document_repository() -> IDocumentRepository:
     """Get document repository (with fallback to mock)."""
@@ -75,8 +88,8 @@ async def get_document_repository() -> IDocumentRepository:
 
 # --- Service Dependencies ---
 def get_chat_service() -> IChatService:
-    """Get chat service instance."""
-    return ChatService()
+    """Get the shared, long-lived chat service instance."""
+    return get_shared_chat_service()
 
 async def get_document_service() -> IDocumentService:
     """Get document service instance with repository dependency."""
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, Request
 from typing import List, Dict, Any, Optional
 from ...services.api_key_services import ApiKeyService
+from src.ai.utils.async_db import execute_async
 from ..deps import get_supabase_client
 import logging
 import json
@@ -54,21 +55,22 @@ async def get_api_keys(
         
         key_ids = [key["id"] for key in keys]
         
-        # 🔧 שיפור: קריאה אחת עם aggregation במקום שתיים נפרדות
-        logger.info("[API-KEYS] Starting aggregated usage queries...")
+        logger.info("[API-KEYS] Reading usage rollups...")
         start_time = time.time()
         
-        # קריאה יחידה עם סינון מתקדם לשני סוגי הנתונים
         try:
-            # 🚀 נסה להשתמש בfunction החדש שמחזיר הכל בקריאה אחת
-            all_stats_response = supabase_client.rpc("get_all_keys_usage_stats", {
+            # One trigger-maintained rollup row per key: no aggregation over api_key_usage
+            daily_usage, minute_usage = await service.get_usage_rollups(key_ids)
+            logger.info(f"[API-KEYS] ✅ Read {len(key_ids)} key rollups in {time.time() - start_time:.2f}s")
+            
+        except Exception as e:
+            logger.warning(f"[API-KEYS] 🔄 Usage rollups not available, using aggregated RPC: {e}")
+            
+            all_stats_response = await execute_async(supabase_client.rpc("get_all_keys_usage_stats", {
                 "target_date": today,
                 "target_minute": current_minute_utc.isoformat()
-            }).execute()
+            }))
             
-            logger.info(f"[API-KEYS] Single comprehensive query took {time.time() - start_time:.2f}s")
-            
-            # המרה לפורמט הישן של המערכת
             daily_usage = {}
             minute_usage = {}
             
@@ -84,80 +86,7 @@ async def get_api_keys(
                         "requests": row["minute_requests"]
                     }
             
-            logger.info(f"[API-KEYS] ✅ Used optimized RPC - processed {len(daily_usage)} keys in {time.time() - start_time:.2f}s")
-            
-        except Exception as e:
-            logger.warning(f"[API-KEYS] 🔄 Optimized RPC not available, using fallback aggregation: {e}")
-            
-            # Fallback לRPC functions נפרדים
-            try:
-                # Daily aggregation בקריאה אחת
-                daily_response = supabase_client.rpc("aggregate_daily_usage", {
-                    "target_date": today,
-                    "key_ids": key_ids
-                }).execute()
-                
-                minute_response = supabase_client.rpc("aggregate_minute_usage", {
-                    "target_minute": current_minute_utc.isoformat(),
-                    "key_ids": key_ids
-                }).execute()
-                
-                # המרה לפורמט רצוי
-                daily_usage = {}
-                minute_usage = {}
-                
-                if daily_response.data:
-                    for row in daily_response.data:
-                        daily_usage[row["api_key_id"]] = {
-                            "tokens": row["total_tokens"],
-                            "requests": row["total_requests"]
-                        }
-                
-                if minute_response.data:
-                    for row in minute_response.data:
-                        minute_usage[row["api_key_id"]] = {
-                            "tokens": row["total_tokens"],
-                            "requests": row["total_requests"]
-                        }
-                
-                logger.info(f"[API-KEYS] ✅ Used separate RPC functions in {time.time() - start_time:.2f}s")
-                
-            except Exception as e2:
-                logger.warning(f"[API-KEYS] 🔄 RPC functions not available, using manual queries: {e2}")
-                
-                # Fallback לקריאות מקוריות
-                daily_response = supabase_client.table("api_key_usage")\
-                    .select("api_key_id,tokens_used,requests_count")\
-                    .in_("api_key_id", key_ids)\
-                    .eq("usage_date", today)\
-                    .limit(10000)\
-                    .execute()  # 🔧 הגבלת תוצאות
-
-                minute_response = supabase_client.table("api_key_usage")\
-                    .select("api_key_id,tokens_used,requests_count")\
-                    .in_("api_key_id", key_ids)\
-                    .eq("usage_minute", current_minute_utc.isoformat())\
-                    .limit(1000)\
-                    .execute()  # 🔧 הגבלת תוצאות למניעת עומס
-                
-                # חזרה לעיבוד הישן
-                daily_usage = {}
-                for row in daily_response.data:
-                    key_id = row["api_key_id"]
-                    if key_id not in daily_usage:
-                        daily_usage[key_id] = {"tokens": 0, "requests": 0}
-                    daily_usage[key_id]["tokens"] += row["tokens_used"]
-                    daily_usage[key_id]["requests"] += row["requests_count"]
-                
-                minute_usage = {}
-                for row in minute_response.data:
-                    key_id = row["api_key_id"]
-                    if key_id not in minute_usage:
-                        minute_usage[key_id] = {"tokens": 0, "requests": 0}
-                    minute_usage[key_id]["tokens"] += row["tokens_used"]
-                    minute_usage[key_id]["requests"] += row["requests_count"]
-                
-                logger.info(f"[API-KEYS] ⚠️ Used legacy manual queries in {time.time() - start_time:.2f}s")
+            logger.info(f"[API-KEYS] Used aggregated RPC - processed {len(daily_usage)} keys in {time.time() - start_time:.2f}s")
         
         query_time = time.time() - start_time
         logger.info(f"[API-KEYS] Total query time: {query_time:.2f}s")
@@ -282,8 +211,7 @@ async def record_usage(
         service = ApiKeyService(supabase_client)
         await service.record_usage(key_id, tokens_used, requests_count)
         
-        # 🔧 בטל קאש כדי שהדשבורד יעדכן מיד
-        invalidate_cache()
+        # No cache invalidation: status reads are O(keys) and the status cache expires within seconds
         
         logger.info(f"[USAGE-API] Recorded {tokens_used} tokens, {requests_count} requests for key {key_id}")
         return {"status": "recorded", "tokens_used": tokens_used, "requests_count": requests_count}
@@ -397,10 +325,11 @@ async def get_keys_for_ai_service(
         
         logger.info("[AI-SERVICE] Cache miss - fetching fresh data")
         
-        response = supabase_client.table("api_keys")\
-            .select("id, key_name, api_key, is_active, created_at")\
-            .eq("is_active", True)\
-            .execute()
+        response = await execute_async(
+            supabase_client.table("api_keys")
+            .select("id, key_name, api_key, is_active, created_at")
+            .eq("is_active", True)
+        )
         
         keys = response.data or []
         logger.info(f"[AI-SERVICE] Found {len(keys)} active API keys")
@@ -8,17 +8,12 @@ from ...core.interfaces import IChatService
 from ...domain.models import ChatRequest
 from ...api.deps import get_chat_service
 from ...config.settings import settings
-from ...services.chat_service import ChatService
 from ...core.auth import get_current_user
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Chat"])
 
-def get_chat_service() -> IChatService:
-    """Factory to get the chat service"""
-    return ChatService()
-
-# Initialize the chat service
+# Shared, long-lived chat service
 chat_service = get_chat_service()
 
 @router.post("/api/chat")
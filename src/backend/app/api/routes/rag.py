@@ -45,6 +45,15 @@ except ImportError:
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["RAG Management"])
 
+def _invalidate_pipeline(profile_id: str):
+    """Drop the pooled RAG pipeline for a profile so its next use picks up the changed config"""
+    try:
+        from src.ai.services.rag import get_pipeline_pool
+        get_pipeline_pool().invalidate(profile_id)
+        logger.info(f"Invalidated pooled RAG pipeline for profile: {profile_id}")
+    except Exception as e:
+        logger.warning(f"Could not invalidate RAG pipeline for profile {profile_id}: {e}")
+
 def _get_fresh_available_profiles():
     """Get fresh list of available profiles including dynamically created ones"""
     logger.info("_get_fresh_available_profiles called")
@@ -360,6 +369,7 @@ async def activate_rag_profile(profile_id: str):
                 detail=f"Failed to activate profile: {profile_id}"
             )
         
+        _invalidate_pipeline(profile_id)
         logger.info(f"Successfully activated RAG profile: {profile_id}")
         
         return JSONResponse(
@@ -419,7 +429,7 @@ async def test_rag_query(request: Dict[str, Any]):
             
             rag_service = RAGService()
             
-            result = await rag_service.generate_answer(query, search_method="hybrid")
+            result = await rag_service.generate_answer(query, search_method="hybrid", debug=True)
             
             chunk_text = ""
             chunks_selected = result.get("chunks_selected", [])
@@ -436,7 +446,8 @@ async def test_rag_query(request: Dict[str, Any]):
                     "chunks": len(result.get("chunks_selected", [])),
                     "searchMethod": result.get("search_method", "unknown"),
                     "configUsed": result.get("config_used", {}),
-                    "chunkText": chunk_text
+                    "chunkText": chunk_text,
+                    "stageTimings": result.get("timings_ms", {})
                 }
             )
             
@@ -488,6 +499,7 @@ async def create_rag_profile(request: Dict[str, Any]):
         
         try:
             save_new_profile(profile_id, profile_data)
+            _invalidate_pipeline(profile_id)
             logger.info(f"Successfully saved custom profile: {profile_id}")
             
             created_profile = {
@@ -565,6 +577,7 @@ async def delete_rag_profile(profile_id: str, force: bool = False, permanent: bo
             success = manager.set_profile_hidden(profile_id, True)
             
             if success:
+                _invalidate_pipeline(profile_id)
                 logger.info(f"Successfully hidden built-in profile: {profile_id}")
                 return {
                     "message": f"Successfully deleted built-in profile: {profile_id}",
@@ -585,6 +598,7 @@ async def delete_rag_profile(profile_id: str, force: bool = False, permanent: bo
                 message = f"Successfully permanently deleted custom profile: {profile_id}"
             
             if success:
+                _invalidate_pipeline(profile_id)
                 logger.info(f"Successfully {action} custom profile: {profile_id}")
                 return {
                     "message": message,
@@ -616,6 +630,7 @@ async def restore_rag_profile(profile_id: str):
         success = manager.set_profile_hidden(profile_id, False)
         
         if success:
+            _invalidate_pipeline(profile_id)
             logger.info(f"Successfully restored profile: {profile_id}")
             return JSONResponse(
                 content={
@@ -697,6 +712,7 @@ async def permanently_delete_profile(profile_id: str, confirm: bool = False):
         success = manager.hard_delete_profile(profile_id)
         
         if success:
+            _invalidate_pipeline(profile_id)
             logger.warning(f"PERMANENTLY DELETED profile: {profile_id}")
             return {
                 "message": f"Profile '{profile_id}' has been permanently deleted from the database",
@@ -709,4 +725,29 @@ async def permanently_delete_profile(profile_id: str, confirm: bool = False):
         
     except Exception as e:
         logger.error(f"Error permanently deleting profile {profile_id}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Error permanently deleting profile: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error permanently deleting profile: {str(e)}")
+
+@router.get("/latency")
+async def get_latency_histograms():
+    """Per-stage latency histograms of the RAG pipeline since startup (or the last reset)"""
+    try:
+        from src.ai.utils.latency import get_latency_registry
+        
+        return JSONResponse(content={"stages": get_latency_registry().snapshot()})
+        
+    except Exception as e:
+        logger.exception(f"Error getting latency histograms: {e}")
+        raise HTTPException(status_code=500, detail="Error retrieving latency histograms")
+
+@router.delete("/latency")
+async def reset_latency_histograms():
+    """Clear the per-stage latency histograms"""
+    try:
+        from src.ai.utils.latency import get_latency_registry
+        
+        get_latency_registry().reset()
+        return JSONResponse(content={"message": "Latency histograms reset"})
+        
+    except Exception as e:
+        logger.exception(f"Error resetting latency histograms: {e}")
+        raise HTTPException(status_code=500, detail="Error resetting latency histograms")
@@ -3,14 +3,16 @@ from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 import google.generativeai as genai
 import os
+from contextlib import AsyncExitStack
 from typing import Optional
 
+from src.ai.services.rag import gemini_client, get_pipeline_pool
+from src.ai.core.request_scheduler import LANE_TITLE, scheduled
+
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Title Generation"])
 
 GEMINI_API_KEY = os.environ.get("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 class TitleGenerationRequest(BaseModel):
     prompt: str
@@ -24,14 +26,6 @@ class TitleGenerationResponse(BaseModel):
 async def generate_title(request: TitleGenerationRequest):
     """Generate automatic title for conversation based on content"""
     try:
-        if not GEMINI_API_KEY:
-            logger.error("GEMINI_API_KEY not configured")
-            return TitleGenerationResponse(
-                title="שיחה חדשה",
-                success=False,
-                error="AI service not available"
-            )
-
         if not request.prompt or not request.prompt.strip():
             return TitleGenerationResponse(
                 title="שיחה חדשה",
@@ -53,7 +47,32 @@ async def generate_title(request: TitleGenerationRequest):
 
 כותרת:"""
 
-        response = await model.generate_content_async(enhanced_prompt)
+        # Lease a key from the shared key manager so titles never change the key other requests use;
+        # the title lane yields to live chats and only runs while the keys have spare headroom
+        # (GEMINI_API_KEY alone is still enough when the database-backed key manager is unavailable)
+        try:
+            key_manager = get_pipeline_pool().get_key_manager()
+        except Exception as e:
+            logger.warning(f"Key manager unavailable for title generation, using GEMINI_API_KEY: {e}")
+            key_manager = None
+        
+        async with AsyncExitStack() as stack:
+            await stack.enter_async_context(scheduled(LANE_TITLE, key_manager))
+            lease = None
+            if key_manager is not None:
+                try:
+                    lease = await stack.enter_async_context(key_manager.lease_key())
+                except Exception as e:
+                    logger.warning(f"Could not lease a key for title generation, using GEMINI_API_KEY: {e}")
+            api_key = lease.api_key if lease is not None and lease.api_key else GEMINI_API_KEY
+            if not api_key:
+                logger.error("No Gemini API key available for title generation")
+                return TitleGenerationResponse(
+                    title="שיחה חדשה",
+                    success=False,
+                    error="AI service not available"
+                )
+            response = await gemini_client.generate_content(model, enhanced_prompt, api_key=api_key)
         
         if not response or not response.text:
             logger.warning("Empty response from Gemini model")
@@ -1,12 +1,16 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
 from fastapi.responses import JSONResponse
 from typing import Any, Annotated
+import asyncio
 import os
 import tempfile
 import logging
 from pathlib import Path
 
 from src.ai.services.document_processor import DocumentProcessor
+from src.ai.services.ingestion_queue import get_ingestion_queue
+from src.ai.utils.vector_index import get_vector_index
+from src.ai.utils.search_cache import bump_corpus_version
 from src.backend.app.core.auth import get_current_user
 from src.backend.app.api.deps import get_supabase_client
 
@@ -26,7 +30,6 @@ def get_doc_processor():
 
 @router.post("/upload-document")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: Annotated[UploadFile, File(...)],
     current_user: Annotated[dict[str, Any], Depends(get_current_user)]
 ):
@@ -68,78 +71,39 @@ async def upload_document(
         
         document_id = result.data[0]["id"]
         
-        # Process document in background
-        background_tasks.add_task(
-            process_document_wrapper,
-            document_id,
-            temp_file_path
-        )
+        # Queue for the ingestion workers; the job survives restarts and is retried on failure
+        try:
+            job_id = await get_ingestion_queue().enqueue(document_id, temp_file_path)
+        except Exception as e:
+            # Nothing would ever process the upload; undo it so the client can simply retry
+            logger.error(f"Could not queue document {document_id} for ingestion: {e}")
+            try:
+                supabase.table("documents").delete().eq("id", document_id).execute()
+            except Exception as cleanup_error:
+                logger.warning(f"Could not remove document {document_id} after the failed enqueue: {cleanup_error}")
+            try:
+                os.unlink(temp_file_path)
+            except OSError:
+                pass
+            raise HTTPException(status_code=503, detail="Ingestion queue unavailable, please retry the upload")
         
         return JSONResponse(
             status_code=202,
             content={
-                "message": "Document uploaded successfully and processing started",
+                "message": "Document uploaded successfully and queued for processing",
                 "document_id": document_id,
+                "job_id": job_id,
                 "filename": filename,
-                "status": "processing"
+                "status": "pending"
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-def process_document_wrapper(document_id: int, file_path: str):
-    """Wrapper for synchronous call to asynchronous function"""
-    import asyncio
-    try:
-        # Create new event loop for background task
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(process_document_background(document_id, file_path))
-        loop.close()
-        return result
-    except Exception as e:
-        logger.error(f"Error in process_document_wrapper for document {document_id}: {str(e)}", exc_info=True)
-        return {"success": False, "error": str(e)}
-
-async def process_document_background(document_id: int, file_path: str):
-    """Background document processing"""
-    try:
-        logger.info(f"Starting background processing for document {document_id} at path {file_path}")
-        result = await get_doc_processor().process_document(document_id, file_path)
-        logger.info(f"Background processing completed for document {document_id}: {result}")
-        
-        # Update document status to completed if successful
-        if result.get("success", False):
-            logger.info(f"Document {document_id} processed successfully")
-        else:
-            logger.error(f"Document {document_id} processing failed: {result.get('error', 'Unknown error')}")
-            
-    except Exception as e:
-        logger.error(f"Background processing failed for document {document_id}: {str(e)}", exc_info=True)
-        
-        # Update document status to failed
-        try:
-            from src.backend.app.api.deps import get_supabase_client
-            import asyncio
-            supabase = asyncio.run(get_supabase_client())
-            if supabase:
-                _ = supabase.table("documents").update({
-                    "processing_status": "failed"
-                }).eq("id", document_id).execute()
-                logger.info(f"Updated document {document_id} status to failed")
-        except Exception as status_error:
-            logger.error(f"Failed to update document {document_id} status to failed: {status_error}")
-    finally:
-        # Clean up temporary file
-        try:
-            if os.path.exists(file_path):
-                os.unlink(file_path)
-                logger.info(f"Cleaned up temporary file: {file_path}")
-        except Exception as cleanup_error:
-            logger.error(f"Failed to clean up temporary file {file_path}: {cleanup_error}")
-
 @router.get("/document/{document_id}/status")
 async def get_document_status(document_id: int):
     """Get document processing status"""
@@ -330,6 +294,8 @@ async def delete_document_with_embeddings(
             raise HTTPException(status_code=500, detail=f"Error in chunk deletion process: {str(chunks_error)}")
         
         logger.info(f"Finished batch deletion of chunks for document_id: {document_id}. Total chunks deleted: {total_chunks_deleted}")
+        await asyncio.to_thread(get_vector_index().remove_document, document_id)
+        bump_corpus_version()
         
         # Delete the document
         logger.info(f"Deleting document record for document_id: {document_id}")
@@ -474,7 +440,6 @@ async def list_documents_with_status(
 @router.post("/document/{document_id}/reprocess")
 async def reprocess_document(
     document_id: int,
-    _background_tasks: BackgroundTasks,
     _current_user: Annotated[dict[str, Any], Depends(get_current_user)]
 ):
     """Reprocess existing document"""
@@ -499,15 +464,39 @@ async def reprocess_document(
                 detail="Original file not available for reprocessing"
             )
         
+        _ = supabase.table("documents").update({"processing_status": "pending"}).eq("id", document_id).execute()
+        job_id = await get_ingestion_queue().enqueue(document_id)
+        
         return {
-            "message": "Embeddings cleared. Please re-upload the document for reprocessing.",
-            "document_id": document_id
+            "message": "Embeddings cleared and document queued for reprocessing",
+            "document_id": document_id,
+            "job_id": job_id
         }
         
     except Exception as e:
         logger.error(f"Error reprocessing document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/jobs/{job_id}")
+async def get_ingestion_job(
+    job_id: int,
+    _current_user: Annotated[dict[str, Any], Depends(get_current_user)]
+):
+    """Ingestion job status, attempts and progress"""
+    try:
+        job = await get_ingestion_queue().get_job(job_id)
+    except Exception as e:
+        logger.error(f"Error getting ingestion job {job_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    job.pop("file_path", None)
+    job.pop("lease_owner", None)
+    job["progress_percentage"] = round((job.get("progress") or 0) * 100)
+    return job
+
 @router.get("/stats")
 async def get_vector_stats(
     _current_user: Annotated[dict[str, Any], Depends(get_current_user)]
@@ -529,10 +518,17 @@ async def get_vector_stats(
                 status = doc.get("processing_status", "unknown")
                 status_counts[status] = status_counts.get(status, 0) + 1
         
+        try:
+            ingestion_stats = await get_ingestion_queue().get_stats()
+        except Exception as e:
+            logger.warning(f"Ingestion queue stats unavailable: {e}")
+            ingestion_stats = None
+        
         return {
             "total_documents": len(docs_result.data) if docs_result.data else 0,
             "total_chunks": len(chunks_result.data) if chunks_result.data else 0,
             "status_breakdown": status_counts,
+            "ingestion_queue": ingestion_stats,
             "embedding_model": "gemini-embedding-001"
         }
         
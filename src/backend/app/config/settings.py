@@ -34,6 +34,7 @@ class Settings(BaseSettings):
     # Supabase Configuration
     SUPABASE_URL: str = Field(default=os.environ.get("SUPABASE_URL", ""))
     SUPABASE_KEY: str = Field(default=os.environ.get("SUPABASE_KEY", ""))
+    SUPABASE_SERVICE_KEY: str = Field(default=os.environ.get("SUPABASE_SERVICE_KEY", ""))
     
     # Google Gemini API Key Configuration
     GEMINI_API_KEY: Optional[str] = Field(default=os.environ.get("GEMINI_API_KEY"))
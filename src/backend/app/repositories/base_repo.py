@@ -3,6 +3,7 @@ from supabase import Client
 from ..utils.common_types import Dict, Any, List, Optional
 from ..utils.logger import get_logger
 from ..core.exceptions import RepositoryError
+from ....ai.utils.async_db import execute_async, run_db
 
 logger = get_logger(__name__)
 
@@ -38,7 +39,7 @@ class BaseRepository(ABC):
     async def safe_execute(self, query_func, operation: str):
         """Safely execute a Supabase query with error handling"""
         try:
-            response = query_func()
+            response = await run_db(query_func)
             return self._check_response_data(response, operation)
         except Exception as e:
             if isinstance(e, RepositoryError):
@@ -53,7 +54,7 @@ class BaseRepository(ABC):
             if order_by:
                 query = query.order(order_by, desc=desc)
             
-            response = query.execute()
+            response = await execute_async(query)
             
             if hasattr(response, 'data') and isinstance(response.data, list):
                 return response.data
@@ -68,7 +69,7 @@ class BaseRepository(ABC):
     async def get_by_id_base(self, record_id: Any, id_field: str = 'id') -> Dict[str, Any]:
         """Base implementation for get_by_id with common patterns"""
         try:
-            response = self.client.table(self.table_name).select('*').eq(id_field, record_id).single().execute()
+            response = await execute_async(self.client.table(self.table_name).select('*').eq(id_field, record_id).single())
             
             if hasattr(response, 'data') and response.data:
                 return response.data
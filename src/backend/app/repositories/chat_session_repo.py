@@ -7,6 +7,7 @@ import time
 from .interfaces import IChatSessionRepository
 from ..core.exceptions import RepositoryError
 from ..utils.cache import sessions_cache
+from ....ai.utils.async_db import execute_async
 
 logger = logging.getLogger(__name__)
 
@@ -33,7 +34,7 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
                 "updated_at": current_time
             }
             
-            response = self.client.table(self.table_name).insert(session_data).execute()
+            response = await execute_async(self.client.table(self.table_name).insert(session_data))
             
             if hasattr(response, 'data') and response.data:
                 logger.info(f"Created chat session with ID: {response.data[0].get('id')}")
@@ -47,7 +48,7 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
                         "updated_at": current_time,
                         "is_active": True
                     }
-                    self.client.table("conversations").insert(conversation_data).execute()
+                    await execute_async(self.client.table("conversations").insert(conversation_data))
                 except Exception as conv_err:
                     logger.warning(f"Could not create conversation record: {conv_err}")
                 
@@ -84,17 +85,18 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
             logger.info(f"[CACHE-MISS] Fetching chat sessions for user: {user_id}")
             
             try:
-                self.client.table(self.table_name).select("id").limit(0).execute()
+                await execute_async(self.client.table(self.table_name).select("id").limit(0))
             except Exception as table_err:
                 logger.warning(f"Chat sessions table may not exist: {table_err}")
                 return []
             
-            response = self.client.table(self.table_name)\
-                .select("id, user_id, title, created_at, updated_at")\
-                .eq("user_id", user_id)\
-                .order("updated_at", desc=True)\
-                .limit(limit)\
-                .execute()
+            response = await execute_async(
+                self.client.table(self.table_name)
+                .select("id, user_id, title, created_at, updated_at")
+                .eq("user_id", user_id)
+                .order("updated_at", desc=True)
+                .limit(limit)
+            )
             
             if hasattr(response, 'data') and response.data:
                 sessions = response.data
@@ -119,12 +121,12 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
             logger.info(f"Fetching chat session with ID: {session_id}")
             
             try:
-                test_query = self.client.table(self.table_name).select("count").limit(1).execute()
+                test_query = await execute_async(self.client.table(self.table_name).select("count").limit(1))
             except Exception as table_err:
                 logger.warning(f"Chat sessions table may not exist: {table_err}")
                 return {"id": session_id, "messages": []}
             
-            session_result = self.client.table(self.table_name).select("*").eq("id", session_id).single().execute()
+            session_result = await execute_async(self.client.table(self.table_name).select("*").eq("id", session_id).single())
             
             if not hasattr(session_result, 'data') or not session_result.data:
                 logger.warning(f"Chat session with ID {session_id} not found")
@@ -132,7 +134,7 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
             
             try:
                 logger.info(f"Searching for messages with conversation_id: {session_id}")
-                messages_result = self.client.table("messages").select("*").eq("conversation_id", session_id).order("created_at").execute()
+                messages_result = await execute_async(self.client.table("messages").select("*").eq("conversation_id", session_id).order("created_at"))
                 raw_messages = messages_result.data if hasattr(messages_result, 'data') else []
                 
                 logger.info(f"Found {len(raw_messages)} raw messages in database")
@@ -228,7 +230,7 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
             if 'updated_at' not in data:
                 data['updated_at'] = datetime.now().isoformat()
                 
-            result = self.client.table(self.table_name).update(data).eq("id", session_id).execute()
+            result = await execute_async(self.client.table(self.table_name).update(data).eq("id", session_id))
             
             try:
                 conversation_update = {
@@ -238,7 +240,7 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
                 if 'title' in data:
                     conversation_update['title'] = data['title']
                     
-                self.client.table("conversations").update(conversation_update).eq("conversation_id", session_id).execute()
+                await execute_async(self.client.table("conversations").update(conversation_update).eq("conversation_id", session_id))
             except Exception as conv_err:
                 logger.warning(f"Error updating conversation: {conv_err}")
             
@@ -259,18 +261,18 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
             logger.info(f"Deleting chat session with ID: {session_id}")
             
             try:
-                self.client.table("messages").delete().eq("conversation_id", session_id).execute()
+                await execute_async(self.client.table("messages").delete().eq("conversation_id", session_id))
                 logger.info(f"Deleted messages for session: {session_id}")
             except Exception as msg_err:
                 logger.warning(f"Error deleting messages: {msg_err}")
             
             try:
-                self.client.table("conversations").delete().eq("conversation_id", session_id).execute()
+                await execute_async(self.client.table("conversations").delete().eq("conversation_id", session_id))
                 logger.info(f"Deleted conversation record for session: {session_id}")
             except Exception as conv_err:
                 logger.warning(f"Error deleting conversation: {conv_err}")
             
-            result = self.client.table(self.table_name).delete().eq("id", session_id).execute()
+            result = await execute_async(self.client.table(self.table_name).delete().eq("id", session_id))
             
             logger.info(f"Successfully deleted chat session: {session_id}")
             return True
@@ -284,18 +286,18 @@ class SupabaseChatSessionRepository(IChatSessionRepository):
         try:
             logger.info(f"Searching chat sessions for user {user_id} with term: {search_term}")
             
-            title_result = self.client.table(self.table_name).select("*").eq("user_id", user_id).ilike("title", f"%{search_term}%").execute()
+            title_result = await execute_async(self.client.table(self.table_name).select("*").eq("user_id", user_id).ilike("title", f"%{search_term}%"))
             title_matches = title_result.data if hasattr(title_result, 'data') else []
             
             try:
-                message_result = self.client.table("messages").select("conversation_id").eq("user_id", user_id).or_(f"request.ilike.%{search_term}%,response.ilike.%{search_term}%").execute()
+                message_result = await execute_async(self.client.table("messages").select("conversation_id").eq("user_id", user_id).or_(f"request.ilike.%{search_term}%,response.ilike.%{search_term}%"))
                 message_matches = message_result.data if hasattr(message_result, 'data') else []
                 
                 session_ids = list(set([msg.get("conversation_id") for msg in message_matches if msg.get("conversation_id")]))
                 
                 content_match_sessions = []
                 if session_ids:
-                    content_result = self.client.table(self.table_name).select("*").eq("user_id", user_id).in_("id", session_ids).execute()
+                    content_result = await execute_async(self.client.table(self.table_name).select("*").eq("user_id", user_id).in_("id", session_ids))
                     content_match_sessions = content_result.data if hasattr(content_result, 'data') else []
             except Exception as msg_err:
                 logger.warning(f"Error searching messages: {msg_err}")
@@ -7,6 +7,7 @@ from typing import Dict, Any, List, Optional
 
 from .interfaces import IMessageRepository
 from ..core.exceptions import RepositoryError
+from ....ai.utils.async_db import execute_async
 
 logger = logging.getLogger(__name__)
 
@@ -27,11 +28,11 @@ class SupabaseMessageRepository(IMessageRepository):
             insert_data = data.copy()
             logger.info(f"Insert data: {insert_data}")
             
-            test_query = self.client.table(self.table_name).select("count").limit(1).execute()
+            test_query = await execute_async(self.client.table(self.table_name).select("count").limit(1))
             logger.info(f"Table {self.table_name} test query successful")
             
             logger.info(f"Attempting to insert message with data: {insert_data}")
-            result = self.client.table(self.table_name).insert(insert_data).execute()
+            result = await execute_async(self.client.table(self.table_name).insert(insert_data))
             
             logger.info(f"Insert result type: {type(result)}")
             logger.info(f"Insert result attributes: {dir(result) if result else 'None'}")
@@ -86,9 +87,9 @@ class SupabaseMessageRepository(IMessageRepository):
     async def get_messages(self, conversation_id: str) -> List[Dict[str, Any]]:
         """Get all messages for a conversation"""
         try:
-            test_query = self.client.table(self.table_name).select("count").limit(1).execute()
+            test_query = await execute_async(self.client.table(self.table_name).select("count").limit(1))
             
-            result = self.client.table(self.table_name).select("*").eq("conversation_id", conversation_id).order("created_at").execute()
+            result = await execute_async(self.client.table(self.table_name).select("*").eq("conversation_id", conversation_id).order("created_at"))
             
             if result.data:
                 return result.data
@@ -102,7 +103,7 @@ class SupabaseMessageRepository(IMessageRepository):
     async def update_message(self, message_id: str, data: Dict[str, Any]) -> Dict[str, Any]:
         """Update a message"""
         try:
-            result = self.client.table(self.table_name).update(data).eq("id", message_id).execute()
+            result = await execute_async(self.client.table(self.table_name).update(data).eq("id", message_id))
             if result.data and len(result.data) > 0:
                 return result.data[0]
             else:
@@ -114,7 +115,7 @@ class SupabaseMessageRepository(IMessageRepository):
     async def delete_message(self, message_id: str) -> bool:
         """Delete a message"""
         try:
-            result = self.client.table(self.table_name).delete().eq("id", message_id).execute()
+            result = await execute_async(self.client.table(self.table_name).delete().eq("id", message_id))
             return True
         except Exception as e:
             logger.error(f"Error deleting message: {e}")
@@ -123,7 +124,7 @@ class SupabaseMessageRepository(IMessageRepository):
     async def get_message_schema(self) -> List[str]:
         """Get the message table schema"""
         try:
-            result = self.client.table(self.table_name).select("*").limit(1).execute()
+            result = await execute_async(self.client.table(self.table_name).select("*").limit(1))
             
             if result.data and len(result.data) > 0:
                 return list(result.data[0].keys())
@@ -7,6 +7,7 @@ from supabase import Client
 from .interfaces import IDocumentRepository
 from ..domain.models import Document
 from ..core.exceptions import RepositoryError
+from ....ai.utils.async_db import execute_async
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
     async def get_all(self) -> List[Dict[str, Any]]:
         """Get all documents from Supabase."""
         try:
-            response = self.client.table(self.table_name).select('*').order('created_at', desc=True).execute()
+            response = await execute_async(self.client.table(self.table_name).select('*').order('created_at', desc=True))
             
             if hasattr(response, 'data') and isinstance(response.data, list):
                 return response.data
@@ -36,7 +37,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
     async def get_by_id(self, doc_id: int) -> Dict[str, Any]:
         """Get a document by ID from Supabase."""
         try:
-            response = self.client.table(self.table_name).select('*').eq('id', doc_id).single().execute()
+            response = await execute_async(self.client.table(self.table_name).select('*').eq('id', doc_id).single())
             
             if hasattr(response, 'data') and response.data:
                 return response.data
@@ -69,7 +70,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
                 # Some Supabase setups require JSON to be stored as strings
                 doc_dict['tags'] = json.dumps(doc_dict['tags'])
             
-            response = self.client.table(self.table_name).insert(doc_dict).execute()
+            response = await execute_async(self.client.table(self.table_name).insert(doc_dict))
             
             if hasattr(response, 'data') and response.data and len(response.data) > 0:
                 new_id = response.data[0].get('id')
@@ -97,7 +98,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
             if 'tags' in update_data and isinstance(update_data['tags'], list):
                 update_data['tags'] = json.dumps(update_data['tags'])
             
-            response = self.client.table(self.table_name).update(update_data).eq('id', doc_id).execute()
+            response = await execute_async(self.client.table(self.table_name).update(update_data).eq('id', doc_id))
             
             if hasattr(response, 'data') and response.data and len(response.data) > 0:
                 return response.data[0]
@@ -117,7 +118,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
             # Ensure the document exists first
             await self.get_by_id(doc_id)
             
-            response = self.client.table(self.table_name).delete().eq('id', doc_id).execute()
+            response = await execute_async(self.client.table(self.table_name).delete().eq('id', doc_id))
             
             if hasattr(response, 'data'):
                 logger.info(f"🗑️ Deleted document with ID {doc_id}")
@@ -147,7 +148,7 @@ class SupabaseDocumentRepository(IDocumentRepository):
                 query = query.eq('category', category)
                 
             # Execute query
-            response = query.execute()
+            response = await execute_async(query)
             
             if hasattr(response, 'data') and isinstance(response.data, list):
                 return response.data
@@ -1,4 +1,4 @@
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, date, timedelta, timezone
 import logging
 from supabase import Client
@@ -6,6 +6,10 @@ import httpx
 import os
 from functools import lru_cache
 
+from src.ai.config.rag_config import get_database_config
+from src.ai.core.usage_aggregator import split_usage_rollups
+from src.ai.utils.async_db import execute_async
+
 logger = logging.getLogger(__name__)
 
 class ApiKeyService:
@@ -17,7 +21,7 @@ class ApiKeyService:
     async def get_all_keys(self) -> List[Dict[str, Any]]:
         """Get all active keys"""
         try:
-            response = self.supabase.table("api_keys").select("*").eq("is_active", True).execute()
+            response = await execute_async(self.supabase.table("api_keys").select("*").eq("is_active", True))
             return response.data
         except Exception as e:
             logger.error(f"Error fetching API keys: {e}")
@@ -42,73 +46,79 @@ class ApiKeyService:
             logger.warning(f"Could not get current key from AI service: {e}")
             return 0
     
-    async def get_key_current_usage(self, key_id: int) -> Dict[str, int]:
-        """Get current usage of key with cache"""
+    async def get_usage_rollups(self, key_ids: List[int]) -> Tuple[Dict[int, Dict[str, int]], Dict[int, Dict[str, int]]]:
+        """Today's and this minute's usage per key, read from the trigger-maintained rollups (one row per key)"""
         today = date.today().isoformat()
         current_minute_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+        rollups_table = getattr(get_database_config(), 'KEY_USAGE_ROLLUPS_TABLE', 'api_key_usage_rollups')
         
+        response = await execute_async(
+            self.supabase.table(rollups_table)
+            .select("*")
+            .in_("api_key_id", key_ids)
+        )
+        return split_usage_rollups(response.data, today, current_minute_utc)
+    
+    async def get_key_current_usage(self, key_id: int) -> Dict[str, int]:
+        """Get current usage of a key from its rollup row"""
         try:
-            daily_response = self.supabase.table("api_key_usage")\
-                .select("tokens_used,requests_count")\
-                .eq("api_key_id", key_id)\
-                .eq("usage_date", today)\
-                .execute()
-            
-            daily_tokens = sum([row["tokens_used"] for row in daily_response.data])
-            daily_requests = sum([row["requests_count"] for row in daily_response.data])
-            
-            minute_response = self.supabase.table("api_key_usage")\
-                .select("tokens_used,requests_count")\
-                .eq("api_key_id", key_id)\
-                .eq("usage_minute", current_minute_utc.isoformat())\
-                .execute()
+            daily_usage, minute_usage = await self.get_usage_rollups([key_id])
+            daily = daily_usage.get(key_id, {"tokens": 0, "requests": 0})
+            minute = minute_usage.get(key_id, {"tokens": 0, "requests": 0})
             
-            minute_tokens = sum([row["tokens_used"] for row in minute_response.data])
-            minute_requests = sum([row["requests_count"] for row in minute_response.data])
+            logger.info(f"Key {key_id}: Daily={daily['tokens']}t/{daily['requests']}r, Minute={minute['tokens']}t/{minute['requests']}r")
             
-            logger.info(f"Key {key_id}: Daily={daily_tokens}t/{daily_requests}r, Minute={minute_tokens}t/{minute_requests}r")
-            
-            usage_data = {
-                "daily_tokens": daily_tokens,
-                "daily_requests": daily_requests,
-                "minute_tokens": minute_tokens,
-                "minute_requests": minute_requests
+            return {
+                "daily_tokens": daily["tokens"],
+                "daily_requests": daily["requests"],
+                "minute_tokens": minute["tokens"],
+                "minute_requests": minute["requests"]
             }
             
-            return usage_data
-            
         except Exception as e:
             logger.error(f"Error fetching usage for key {key_id}: {e}")
             return {"daily_tokens": 0, "daily_requests": 0, "minute_tokens": 0, "minute_requests": 0}
     
+    async def maintain_usage_partitions(self) -> Optional[int]:
+        """Create upcoming api_key_usage partitions and drop expired ones; returns partitions dropped"""
+        function_name = getattr(get_database_config(), 'KEY_USAGE_MAINTENANCE_FUNCTION', 'maintain_api_key_usage_partitions')
+        try:
+            response = await execute_async(self.supabase.rpc(function_name, {}))
+            return response.data
+        except Exception as e:
+            logger.warning(f"API key usage partition maintenance failed: {e}")
+            return None
+    
     async def record_usage(self, key_id: int, tokens_used: int, requests_count: int = 1):
         """Record usage"""
         try:
             current_minute_utc = datetime.now(timezone.utc).replace(second=0, microsecond=0)
             
-            existing = self.supabase.table("api_key_usage")\
-                .select("id,tokens_used,requests_count")\
-                .eq("api_key_id", key_id)\
-                .eq("usage_minute", current_minute_utc.isoformat())\
-                .execute()
+            existing = await execute_async(
+                self.supabase.table("api_key_usage")
+                .select("id,tokens_used,requests_count")
+                .eq("api_key_id", key_id)
+                .eq("usage_minute", current_minute_utc.isoformat())
+            )
             
             if existing.data:
                 record_id = existing.data[0]["id"]
                 new_tokens = existing.data[0]["tokens_used"] + tokens_used
                 new_requests = existing.data[0]["requests_count"] + requests_count
                 
-                self.supabase.table("api_key_usage")\
-                    .update({"tokens_used": new_tokens, "requests_count": new_requests})\
-                    .eq("id", record_id)\
-                    .execute()
+                await execute_async(
+                    self.supabase.table("api_key_usage")
+                    .update({"tokens_used": new_tokens, "requests_count": new_requests})
+                    .eq("id", record_id)
+                )
             else:
-                self.supabase.table("api_key_usage").insert({
+                await execute_async(self.supabase.table("api_key_usage").insert({
                     "api_key_id": key_id,
                     "usage_date": date.today().isoformat(),
                     "usage_minute": current_minute_utc.isoformat(),
                     "tokens_used": tokens_used,
                     "requests_count": requests_count
-                }).execute()
+                }))
                 
             logger.info(f"Recorded usage for key {key_id}: {tokens_used} tokens, {requests_count} requests")
             
@@ -2,7 +2,7 @@ import logging
 import json
 import sys
 import os
-from typing import Dict, Any, List, Optional, AsyncGenerator
+from typing import Dict, Any, List, Optional, AsyncGenerator, Tuple
 from fastapi import HTTPException
 from pathlib import Path
 from pydantic import SecretStr
@@ -21,10 +21,12 @@ from ..config.settings import settings
 from ..domain.models import ChatMessageHistoryItem
 try:
     from ....ai.services.rag_service import RAGService
+    from ....ai.services.rag import get_pipeline_pool
     from ....ai.services.document_processor import DocumentProcessor
     rag_available = True
 except ImportError as e:
     RAGService = None
+    get_pipeline_pool = None
     DocumentProcessor = None
     rag_available = False
 
@@ -38,7 +40,6 @@ from langchain.prompts import (
     HumanMessagePromptTemplate,
 )
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
-from ....ai.core.gemini_key_manager import get_key_manager
 
 try:
     from google import genai
@@ -64,10 +65,7 @@ class ChatService(IChatService):
     
     def __init__(self):
         self.llm = None
-        self.conversation_chain = None
-        
-        self.rag_service = None
-        self.current_profile_cache = None
+        self.prompt_template = None
         
         self.MAX_HISTORY_LENGTH = 5
         
@@ -76,8 +74,6 @@ class ChatService(IChatService):
             return
 
         try:
-            key_manager = get_key_manager()
-            
             current_key = settings.GEMINI_API_KEY
             
             if not current_key:
@@ -91,127 +87,198 @@ class ChatService(IChatService):
                 max_tokens=settings.GEMINI_MAX_TOKENS
             )
             
-            prompt_template = ChatPromptTemplate.from_messages([
+            self.prompt_template = ChatPromptTemplate.from_messages([
                 SystemMessagePromptTemplate.from_template(settings.GEMINI_SYSTEM_PROMPT),
                 MessagesPlaceholder(variable_name="chat_history_buffer"),
                 HumanMessagePromptTemplate.from_template("{input}")
             ])
-
-            self.memory = ConversationBufferWindowMemory(
-                k=settings.LANGCHAIN_HISTORY_K,
-                return_messages=True, 
-                memory_key="chat_history_buffer"
-            )
-            
-            self.conversation_chain = ConversationChain(
-                llm=self.llm,
-                prompt=prompt_template,
-                memory=self.memory,
-                verbose=settings.LANGCHAIN_VERBOSE 
-            )
             logger.info("ChatService initialized with LangChain and Google Gemini")
             logger.debug(f"Using model: {settings.GEMINI_MODEL_NAME}, temp: {settings.GEMINI_TEMPERATURE}, tokens: {settings.GEMINI_MAX_TOKENS}, history: {settings.LANGCHAIN_HISTORY_K}")
 
         except Exception as e:
             logger.error(f"Error initializing LangChain components with Gemini: {e}", exc_info=True)
             self.llm = None
-            self.conversation_chain = None
+            self.prompt_template = None
+
+    @property
+    def is_initialized(self) -> bool:
+        """Whether the shared LLM components are ready"""
+        return self.llm is not None and self.prompt_template is not None
+
+    def _build_conversation_chain(
+        self, 
+        history: Optional[List[ChatMessageHistoryItem]] = None
+    ) -> ConversationChain:
+        """Build a per-request conversation chain with its own memory on top of the shared LLM"""
+        memory = ConversationBufferWindowMemory(
+            k=settings.LANGCHAIN_HISTORY_K,
+            return_messages=True, 
+            memory_key="chat_history_buffer"
+        )
+        
+        if history and len(history) > 0:
+            limited_history = history[-self.MAX_HISTORY_LENGTH:]
+            logger.debug(f"Rehydrating memory with {len(limited_history)} of {len(history)} messages (max: {self.MAX_HISTORY_LENGTH})")
+            
+            for msg in limited_history:
+                if msg.type == 'user':
+                    memory.chat_memory.add_user_message(msg.content)
+                elif msg.type == 'bot':
+                    memory.chat_memory.add_ai_message(msg.content)
+        
+        return ConversationChain(
+            llm=self.llm,
+            prompt=self.prompt_template,
+            memory=memory,
+            verbose=settings.LANGCHAIN_VERBOSE 
+        )
 
     async def _track_token_usage(self, user_message: str, ai_response: str, method: str = "chat"):
-        """Track token usage with the key manager"""
+        """Log the estimated token usage of a ChatService call.
+        Nothing is charged to the key pool: the ChatService LLM runs on GEMINI_API_KEY, and RAG answers
+        are already recorded against the key leased by AnswerGenerator"""
         try:
             input_tokens = len(user_message) // 4
             output_tokens = len(ai_response) // 4
             total_tokens = input_tokens + output_tokens + 50
             
-            logger.debug(f"Token usage {method}: {total_tokens} tokens")
-            
-            try:
-                key_manager = get_key_manager()
-                
-                if hasattr(key_manager, 'record_usage') and hasattr(key_manager, 'api_keys'):
-                    current_key = await key_manager.get_available_key()
-                    if current_key and current_key.get('id'):
-                        await key_manager.record_usage(key_id=current_key['id'], tokens_used=total_tokens, requests_count=1)
-                        logger.debug(f"Tracked {total_tokens} tokens for key {current_key['id']}")
-                    
-            except Exception as km_error:
-                logger.debug(f"Key manager tracking failed: {km_error}")
+            logger.debug(f"Token usage {method}: ~{total_tokens} tokens")
             
         except Exception as e:
             logger.debug(f"Error in token tracking: {e}")
 
-    def _get_current_rag_service(self) -> Optional[Any]:
-        """Returns RAGService with direct check from Supabase each time"""
+    async def _get_current_rag_service(self) -> Optional[Any]:
+        """Returns the pooled RAG pipeline for the currently active profile (not stored: the service is shared)"""
+        if not rag_available or get_pipeline_pool is None:
+            logger.warning("RAG service not available - imports failed")
+            return None
+        
+        current_profile = None
         try:
-            profile_changed = False
-            current_profile = None
-            
+            from ....ai.config.current_profile import get_current_profile_name
+            current_profile = get_current_profile_name()
+            logger.debug(f"Current profile: '{current_profile}'")
+        except Exception as e:
+            logger.warning(f"Could not get current profile: {e}")
+        
+        # A pool miss builds a whole pipeline, so it runs off the event loop
+        pool = get_pipeline_pool()
+        try:
+            return await asyncio.to_thread(pool.get, current_profile)
+        except Exception as e:
+            logger.warning(f"Could not get RAG pipeline for profile '{current_profile}': {e}")
             try:
-                from ....ai.config.current_profile import get_current_profile
-                current_profile = get_current_profile()
-                logger.debug(f"Current profile from Supabase: '{current_profile}'")
-                
-                if self.rag_service is None or self.current_profile_cache != current_profile:
-                    profile_changed = True
-                    logger.info(f"Profile update detected: '{self.current_profile_cache}' → '{current_profile}'")
-            except Exception as e:
-                logger.warning(f"Could not get current profile from Supabase: {e}")
-                if self.rag_service is None:
-                    profile_changed = True
-                    logger.debug("No profile found - using default RAG service")
+                rag_service = await asyncio.to_thread(pool.get, "balanced")
+                logger.info("Using balanced RAG pipeline as fallback")
+                return rag_service
+            except Exception as fallback_error:
+                logger.error(f"Failed to get fallback RAG pipeline: {fallback_error}")
+                return None
+
+    async def _prepare_rag_query(
+        self, 
+        user_message: str, 
+        history: Optional[List[ChatMessageHistoryItem]] = None
+    ) -> Tuple[str, str]:
+        """Build the search query (enriched with a summary of earlier questions) and the prompt context"""
+        conversation_context = ""
+        if history and len(history) > 0:
+            limited_history = history[-self.MAX_HISTORY_LENGTH:]
             
-            if self.rag_service is None or profile_changed:
-                logger.debug("Creating new RAG service...")
+            context_messages = []
+            for msg in limited_history:
+                if msg.type == 'user':
+                    context_messages.append(f"משתמש: {msg.content}")
+                elif msg.type == 'bot':
+                    context_messages.append(f"מערכת: {msg.content}")
+            
+            if context_messages:
+                conversation_context = "\n".join(context_messages)
+                logger.debug(f"Built conversation context with {len(limited_history)} messages for LLM")
+        
+        search_query = user_message
+        previous_context = ""
+        
+        if conversation_context and len(conversation_context.strip()) > 0:
+            last_context = ""
+            context_lines = conversation_context.split('\n')
+            for line in reversed(context_lines):
+                if line.startswith('משתמש:') and line != f"משתמש: {user_message}":
+                    last_context = line.replace('משתמש: ', '').strip()
+                    break
+            
+            if last_context and len(last_context) > 10:
+                previous_context = f"בהקשר של השאלה הקודמת: {last_context}"
                 
-                try:
-                    if rag_available and RAGService:
-                        if current_profile:
-                            self.current_profile_cache = current_profile
-                        else:
-                            from ....ai.config.current_profile import get_current_profile
-                            current_profile = get_current_profile()
-                            self.current_profile_cache = current_profile
+                if len(user_message.strip()) < 100:
+                    try:
+                        context_lines = conversation_context.split('\n')
+                        user_messages = []
+                        for line in context_lines:
+                            if line.startswith('משתמש:'):
+                                clean_message = line.replace('משתמש: ', '').strip()
+                                if clean_message != user_message and len(clean_message) > 5:
+                                    user_messages.append(clean_message)
                         
-                        logger.info(f"Creating RAG service with profile: {current_profile}")
-                        self.rag_service = RAGService(config_profile=current_profile)
-                        logger.debug(f"RAG service ready with profile: {current_profile}")
+                        cumulative_context = '\n'.join(user_messages[-4:])
                         
-                        logger.debug(f"   Actual similarity threshold: {self.rag_service.search_config.SIMILARITY_THRESHOLD}")
-                        logger.debug(f"   Actual max chunks: {self.rag_service.search_config.MAX_CHUNKS_RETRIEVED}")
-                        logger.debug(f"   Actual temperature: {self.rag_service.llm_config.TEMPERATURE}")
-                        
-                    else:
-                        logger.warning("RAG service not available - imports failed")
-                        self.rag_service = None
-                        self.current_profile_cache = "unavailable"
-                except Exception as e:
-                    logger.warning(f"Could not get current profile or create RAG service: {e}")
-                    if rag_available and RAGService:
-                        try:
-                            self.rag_service = RAGService(config_profile="balanced")
-                            self.current_profile_cache = "balanced"
-                            logger.info("Created RAG service with balanced profile as fallback")
-                        except Exception as fallback_error:
-                            logger.error(f"Failed to create fallback RAG service: {fallback_error}")
-                            self.rag_service = None
-                            self.current_profile_cache = "error"
-                    else:
-                        logger.warning("RAG service not available - imports failed")
-                        self.rag_service = None
-                        self.current_profile_cache = "unavailable"
-                    
+                        if cumulative_context and len(cumulative_context.strip()) > 10:
+                            summary_prompt = f"""בהקשר של השיחה הבאה, תן סיכום מצטבר של הנושאים העיקריים ב-5-12 מילות מפתח בעברית:
+
+היסטוריית השיחה:
+{cumulative_context}
+
+השאלה הנוכחית: {user_message}
+
+תן תשובה קצרה עם מילות המפתח שמתארות את כל הנושאים בשיחה, מופרדות בפסיקים.
+דוגמאות:
+- שיחה על חנייה → "חנייה, קנסות, עבירות תנועה, פעמים חוזרות"
+- שיחה על לימודים → "ציונים, מתמטיקה, קורסים, בחינות, דרישות"  
+- שיחה על מילואים → "מילואים, זכויות סטודנטים, היעדרויות, הכרה"
+"""
+
+                            if self.llm:
+                                cumulative_summary = (await self.llm.ainvoke(summary_prompt)).content.strip()
+                                if cumulative_summary and len(cumulative_summary) < 80 and len(cumulative_summary) > 8:
+                                    enhanced_query = f"{cumulative_summary}. {user_message}"
+                                    search_query = enhanced_query
+                                    logger.info(f"[CUMULATIVE-AI] Search query: '{search_query}' (GEMINI cumulative summary: '{cumulative_summary}')")
+                                else:
+                                    logger.info(f"[SEARCH] Using original query: '{search_query}' (cumulative summary not suitable: '{cumulative_summary}')")
+                            else:
+                                logger.info(f"[SEARCH] Using original query: '{search_query}' (no LLM available for cumulative summarization)")
+                        else:
+                            if last_context:
+                                summary_prompt = f"""סכם בקצרה (מקסימום 8 מילים) את הנושא המרכזי מהשאלה הבאה:
+"{last_context}"
+
+תן תשובה קצרה עם מילות המפתח העיקריות בלבד (למשל: "חנייה קנסות", "לימודים ציונים", "מילואים זכויות")."""
+
+                                if self.llm:
+                                    context_summary = (await self.llm.ainvoke(summary_prompt)).content.strip()
+                                    if context_summary and len(context_summary) < 50 and len(context_summary) > 5:
+                                        enhanced_query = f"{context_summary} {user_message}"
+                                        search_query = enhanced_query
+                                        logger.info(f"[SINGLE-AI] Search query: '{search_query}' (GEMINI single summary: '{context_summary}')")
+                                    else:
+                                        logger.info(f"[SEARCH] Using original query: '{search_query}' (single summary not suitable: '{context_summary}')")
+                                else:
+                                    logger.info(f"[SEARCH] Using original query: '{search_query}' (no LLM available)")
+                    except Exception as e:
+                        logger.warning(f"Failed to generate cumulative AI context summary: {e}")
+                        logger.info(f"[SEARCH] Using original query: '{search_query}' (fallback due to error)")
+                else:
+                    logger.info(f"[SEARCH] Using original query: '{search_query}' (long question, no enhancement needed)")
+                
+                logger.info(f"[CONTEXT] Enhanced prompt context: '{previous_context[:100]}...'")
             else:
-                logger.debug(f"Using cached RAG service with profile: {self.current_profile_cache}")
-            
-            return self.rag_service
-            
-        except Exception as e:
-            logger.error(f"Error getting RAG service: {e}")
-            if self.rag_service is not None:
-                logger.warning("Using existing RAG service instance despite error")
-                return self.rag_service
-            return None
+                logger.debug(f"[CONTEXT] No meaningful previous context found")
+                logger.info(f"[SEARCH] Using original query: '{search_query}'")
+        else:
+            logger.debug(f"[CONTEXT] No conversation history available")
+            logger.info(f"[SEARCH] Using original query: '{search_query}'")
+        
+        return search_query, previous_context
 
     async def process_chat_message(
         self, 
@@ -224,21 +291,11 @@ class ChatService(IChatService):
         logger.info(f"[CHAT-SERVICE] Processing: '{user_message[:50]}...' for {user_id}")
         logger.info(f"[CHAT-SERVICE] History: {len(history) if history else 0} messages")
 
-        if not self.conversation_chain:
+        if not self.is_initialized:
             logger.error("ConversationChain (Gemini) is not initialized. GEMINI_API_KEY might be missing or initialization failed.")
             raise HTTPException(status_code=500, detail="AI Service (Gemini/LangChain) not initialized. Check GEMINI_API_KEY and server logs.")
 
-        self.memory.clear()
-        
-        if history and len(history) > 0:
-            limited_history = history[-self.MAX_HISTORY_LENGTH:]
-            logger.debug(f"Rehydrating memory with {len(limited_history)} of {len(history)} messages (max: {self.MAX_HISTORY_LENGTH})")
-            
-            for msg in limited_history:
-                if msg.type == 'user':
-                    self.memory.chat_memory.add_user_message(msg.content)
-                elif msg.type == 'bot':
-                    self.memory.chat_memory.add_ai_message(msg.content)
+        conversation_chain = self._build_conversation_chain(history)
         
         is_conversation_question = self._is_conversation_question(user_message)
         
@@ -259,7 +316,7 @@ class ChatService(IChatService):
                 enhanced_conversation_prompt = f"""אתה עוזר ידידותי ומקצועי של מכללת אפקה.
 ענה בחמימות ובאופן טבעי לשאלה: {user_message}"""
             
-            response_content = self.conversation_chain.predict(input=enhanced_conversation_prompt)
+            response_content = await conversation_chain.apredict(input=enhanced_conversation_prompt)
             logger.debug(f"LangChain conversation response: {response_content[:100]}...")
             
             logger.info(f"[CHAT-SERVICE] Tracking tokens for conversation response")
@@ -271,109 +328,14 @@ class ChatService(IChatService):
                 "chunks": 0
             }
         
-        rag_service = self._get_current_rag_service()
-        logger.debug(f"Using RAG service with profile: {self.current_profile_cache}")
+        rag_service = await self._get_current_rag_service()
+        logger.debug(f"Using RAG service with profile: {getattr(rag_service, 'profile_name', None)}")
         
         try:
             if rag_service:
                 logger.info(f"Calling RAG service for question: '{user_message}'")
                 
-                conversation_context = ""
-                if history and len(history) > 0:
-                    limited_history = history[-self.MAX_HISTORY_LENGTH:]
-                    
-                    context_messages = []
-                    for msg in limited_history:
-                        if msg.type == 'user':
-                            context_messages.append(f"משתמש: {msg.content}")
-                        elif msg.type == 'bot':
-                            context_messages.append(f"מערכת: {msg.content}")
-                    
-                    if context_messages:
-                        conversation_context = "\n".join(context_messages)
-                        logger.debug(f"Built conversation context with {len(limited_history)} messages for LLM")
-                
-                search_query = user_message
-                previous_context = ""
-                
-                if conversation_context and len(conversation_context.strip()) > 0:
-                    last_context = ""
-                    context_lines = conversation_context.split('\n')
-                    for line in reversed(context_lines):
-                        if line.startswith('משתמש:') and line != f"משתמש: {user_message}":
-                            last_context = line.replace('משתמש: ', '').strip()
-                            break
-                    
-                    if last_context and len(last_context) > 10:
-                        previous_context = f"בהקשר של השאלה הקודמת: {last_context}"
-                        
-                        if len(user_message.strip()) < 100:
-                            try:
-                                context_lines = conversation_context.split('\n')
-                                user_messages = []
-                                for line in context_lines:
-                                    if line.startswith('משתמש:'):
-                                        clean_message = line.replace('משתמש: ', '').strip()
-                                        if clean_message != user_message and len(clean_message) > 5:
-                                            user_messages.append(clean_message)
-                                
-                                cumulative_context = '\n'.join(user_messages[-4:])
-                                
-                                if cumulative_context and len(cumulative_context.strip()) > 10:
-                                    summary_prompt = f"""בהקשר של השיחה הבאה, תן סיכום מצטבר של הנושאים העיקריים ב-5-12 מילות מפתח בעברית:
-
-היסטוריית השיחה:
-{cumulative_context}
-
-השאלה הנוכחית: {user_message}
-
-תן תשובה קצרה עם מילות המפתח שמתארות את כל הנושאים בשיחה, מופרדות בפסיקים.
-דוגמאות:
-- שיחה על חנייה → "חנייה, קנסות, עבירות תנועה, פעמים חוזרות"
-- שיחה על לימודים → "ציונים, מתמטיקה, קורסים, בחינות, דרישות"  
-- שיחה על מילואים → "מילואים, זכויות סטודנטים, היעדרויות, הכרה"
-"""
-
-                                    if self.llm:
-                                        cumulative_summary = self.llm.invoke(summary_prompt).content.strip()
-                                        if cumulative_summary and len(cumulative_summary) < 80 and len(cumulative_summary) > 8:
-                                            enhanced_query = f"{cumulative_summary}. {user_message}"
-                                            search_query = enhanced_query
-                                            logger.info(f"[CUMULATIVE-AI] Search query: '{search_query}' (GEMINI cumulative summary: '{cumulative_summary}')")
-                                        else:
-                                            logger.info(f"[SEARCH] Using original query: '{search_query}' (cumulative summary not suitable: '{cumulative_summary}')")
-                                    else:
-                                        logger.info(f"[SEARCH] Using original query: '{search_query}' (no LLM available for cumulative summarization)")
-                                else:
-                                    if last_context:
-                                        summary_prompt = f"""סכם בקצרה (מקסימום 8 מילים) את הנושא המרכזי מהשאלה הבאה:
-"{last_context}"
-
-תן תשובה קצרה עם מילות המפתח העיקריות בלבד (למשל: "חנייה קנסות", "לימודים ציונים", "מילואים זכויות")."""
-
-                                        if self.llm:
-                                            context_summary = self.llm.invoke(summary_prompt).content.strip()
-                                            if context_summary and len(context_summary) < 50 and len(context_summary) > 5:
-                                                enhanced_query = f"{context_summary} {user_message}"
-                                                search_query = enhanced_query
-                                                logger.info(f"[SINGLE-AI] Search query: '{search_query}' (GEMINI single summary: '{context_summary}')")
-                                            else:
-                                                logger.info(f"[SEARCH] Using original query: '{search_query}' (single summary not suitable: '{context_summary}')")
-                                        else:
-                                            logger.info(f"[SEARCH] Using original query: '{search_query}' (no LLM available)")
-                            except Exception as e:
-                                logger.warning(f"Failed to generate cumulative AI context summary: {e}")
-                                logger.info(f"[SEARCH] Using original query: '{search_query}' (fallback due to error)")
-                        else:
-                            logger.info(f"[SEARCH] Using original query: '{search_query}' (long question, no enhancement needed)")
-                        
-                        logger.info(f"[CONTEXT] Enhanced prompt context: '{previous_context[:100]}...'")
-                    else:
-                        logger.debug(f"[CONTEXT] No meaningful previous context found")
-                        logger.info(f"[SEARCH] Using original query: '{search_query}'")
-                else:
-                    logger.debug(f"[CONTEXT] No conversation history available")
-                    logger.info(f"[SEARCH] Using original query: '{search_query}'")
+                search_query, previous_context = await self._prepare_rag_query(user_message, history)
                 
                 rag_response = await rag_service.generate_answer_with_context(
                     query=search_query, 
@@ -405,9 +367,6 @@ class ChatService(IChatService):
                 if sources_count > 0:
                     logger.info(f"RAG generated answer with {sources_count} sources, {chunks_count} chunks")
                     
-                    self.memory.chat_memory.add_user_message(user_message)
-                    self.memory.chat_memory.add_ai_message(rag_response["answer"])
-                    
                     await self._track_token_usage(user_message, rag_response["answer"], "rag")
                     
                     return {
@@ -424,6 +383,16 @@ class ChatService(IChatService):
             logger.warning(f"RAG service error: {e}")
             logger.debug("Using regular LLM as fallback")
         
+        response_content = await self._generate_fallback_response(user_message, conversation_chain)
+        
+        return {
+            "response": response_content,
+            "sources": [],
+            "chunks": 0
+        }
+    
+    async def _generate_fallback_response(self, user_message: str, conversation_chain: ConversationChain) -> str:
+        """Answer with the plain LLM when RAG has nothing to offer"""
         try:
             from src.ai.config.system_prompts import get_fallback_prompt
             enhanced_prompt = get_fallback_prompt(user_message)
@@ -434,17 +403,12 @@ class ChatService(IChatService):
 שאלה: {user_message}
 """
         
-        response_content = self.conversation_chain.predict(input=enhanced_prompt)
+        response_content = await conversation_chain.apredict(input=enhanced_prompt)
         
         logger.info(f"LangChain fallback response generated (length: {len(response_content)})")
         
         await self._track_token_usage(user_message, response_content, "fallback")
-        
-        return {
-            "response": response_content,
-            "sources": [],
-            "chunks": 0
-        }
+        return response_content
     
     def _is_conversation_question(self, message: str) -> bool:
         """Smart detection: conversation vs information requests"""
@@ -532,13 +496,13 @@ class ChatService(IChatService):
                 
                 full_prompt = f"{conversation_text}משתמש: {enhanced_conversation_prompt}\nעוזר:"
                 
-                response = client.models.generate_content_stream(
+                response = await client.aio.models.generate_content_stream(
                     model="gemini-2.0-flash-exp",
                     contents=full_prompt
                 )
                 
                 accumulated_text = ""
-                for chunk in response:
+                async for chunk in response:
                     if chunk.text:
                         accumulated_text += chunk.text
                         yield {
@@ -564,30 +528,100 @@ class ChatService(IChatService):
             logger.info(f"[STREAM] Treating as information request (will use RAG)")
             
             try:
-                rag_result = await self.process_chat_message(user_message, user_id, history)
+                rag_result = None
+                accumulated_text = ""
+                rag_service = await self._get_current_rag_service()
                 
-                response_content = rag_result.get("response", "")
-                sources = rag_result.get("sources", [])
-                chunks_count = rag_result.get("chunks", 0)
+                if rag_service and hasattr(rag_service, 'generate_answer_stream'):
+                    try:
+                        search_query, previous_context = await self._prepare_rag_query(user_message, history)
+                        
+                        # Sources arrive as soon as retrieval finishes, then tokens as Gemini generates them
+                        async for event in rag_service.generate_answer_stream(
+                            query=search_query,
+                            conversation_context=previous_context,
+                            search_method="hybrid"
+                        ):
+                            if event["type"] == "sources":
+                                yield {
+                                    "type": "sources",
+                                    "sources": event["sources"],
+                                    "chunks": event["chunks"]
+                                }
+                            elif event["type"] == "token":
+                                accumulated_text += event["content"]
+                                yield {
+                                    "type": "chunk",
+                                    "content": event["content"],
+                                    "accumulated": accumulated_text
+                                }
+                            elif event["type"] == "complete":
+                                rag_result = event["result"]
+                    except Exception as e:
+                        # Once tokens reached the client there is nothing to fall back to
+                        if accumulated_text:
+                            raise
+                        logger.warning(f"[STREAM] RAG service error: {e}")
                 
-                chunk_size = 50
-                for i in range(0, len(response_content), chunk_size):
-                    chunk = response_content[i:i + chunk_size]
+                if rag_result and rag_result.get("answer") and rag_result.get("sources"):
+                    sources = rag_result["sources"]
+                    await self._track_token_usage(user_message, rag_result["answer"], "streaming_rag")
+                    
                     yield {
-                        "type": "chunk",
-                        "content": chunk,
-                        "accumulated": response_content[:i + len(chunk)]
+                        "type": "complete",
+                        "content": rag_result["answer"],
+                        "sources": sources,
+                        "chunks": len(rag_result.get("chunks_selected", []))
                     }
+                    
+                    logger.info(f"[STREAM] RAG-based streaming complete with {len(sources)} sources")
+                    return
+
+                if accumulated_text:
+                    # The client already has this answer; finish it rather than sending a second one
+                    answer = (rag_result or {}).get("answer") or accumulated_text
+                    await self._track_token_usage(user_message, answer, "streaming_rag")
+                    yield {
+                        "type": "complete",
+                        "content": answer,
+                        "sources": [],
+                        "chunks": 0
+                    }
+                    logger.info("[STREAM] RAG streamed an answer without sources, completing without fallback")
+                    return
+
+                # Nothing retrieved: fall back to the plain LLM, as process_chat_message does
+                logger.info("[STREAM] RAG returned no sourced answer, falling back to regular LLM")
+                if not self.is_initialized:
+                    yield {"type": "error", "content": "AI Service not initialized"}
+                    return
                 
+                response_content = await self._generate_fallback_response(
+                    user_message, self._build_conversation_chain(history)
+                )
+                yield {
+                    "type": "chunk",
+                    "content": response_content,
+                    "accumulated": response_content
+                }
                 yield {
                     "type": "complete",
                     "content": response_content,
-                    "sources": sources,
-                    "chunks": chunks_count
+                    "sources": [],
+                    "chunks": 0
                 }
                 
-                logger.info(f"[STREAM] RAG-based streaming complete with {len(sources)} sources")
-                
             except Exception as e:
                 logger.exception(f"[CHAT-STREAM] RAG streaming error: {e}")
-                yield {"type": "error", "content": f"Error processing your request: {str(e)}"}
\ No newline at end of file
+                yield {"type": "error", "content": f"Error processing your request: {str(e)}"}
+
+
+_chat_service_instance: Optional[ChatService] = None
+
+
+def get_chat_service() -> ChatService:
+    """Get the process-wide ChatService; per-request state lives in each call"""
+    global _chat_service_instance
+    if _chat_service_instance is None:
+        _chat_service_instance = ChatService()
+    return _chat_service_instance
@@ -51,7 +51,7 @@ class CacheManager(Generic[T]):
         logger.info("[CACHE-CLEAR] All entries cleared")
 
 # Pre-configured cache instances for different use cases
-api_keys_cache = CacheManager[Dict[str, Any]](ttl=600)  # 10 minutes
+api_keys_cache = CacheManager[Dict[str, Any]](ttl=10)  # 10 seconds; reads come from per-key rollups
 sessions_cache = CacheManager[list](ttl=60)  # 1 minute
 fast_cache = CacheManager[Any](ttl=1800)  # 30 minutes
 
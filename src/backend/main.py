@@ -15,7 +15,6 @@ import os
 import sys
 import logging
 import uvicorn
-import threading
 import asyncio
 from pathlib import Path
 from contextlib import asynccontextmanager
@@ -31,43 +30,124 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def background_document_processor():
-    """Run document processor in background thread"""
-    import asyncio
-    try:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        
-        from src.ai.scripts.auto_process_documents import run_processor
-        loop.run_until_complete(run_processor(interval=30))
-    except Exception as e:
-        logger.error(f"Background document processor error: {e}")
-    finally:
-        try:
-            loop.close()
-        except:
-            pass
-
 @asynccontextmanager
 async def lifespan(app):
     """Application lifespan manager for startup and shutdown events"""
     logger.info("Starting Afeka ChatBot API...")
     
     try:
-        logger.info("Starting automatic document processing service...")
+        from src.ai.services.rag import get_pipeline_pool
+        from src.ai.config.current_profile import get_current_profile_name
+        from src.backend.app.services.chat_service import get_chat_service
         
-        processor_thread = threading.Thread(target=background_document_processor, daemon=True)
-        processor_thread.start()
-        logger.info("Document processor thread started successfully")
+        get_chat_service()
+        warmed = await asyncio.to_thread(get_pipeline_pool().warm_up, [get_current_profile_name()])
+        logger.info(f"RAG pipeline pool warmed up: {warmed}")
         
+        # Load API keys now and keep them refreshed in the background, so requests never wait on it
+        await get_pipeline_pool().get_key_manager().start()
+        logger.info("API key refresher started")
     except Exception as e:
-        logger.warning(f"Background document processor initialization warning: {e}")
+        logger.warning(f"RAG pipeline pool warm-up warning: {e}")
+    
+    try:
+        # Make sure today's and upcoming api_key_usage partitions exist (pg_cron repeats this daily).
+        # Only service_role may run the maintenance function, so the anon client cannot do it.
+        from src.backend.app.api.deps import get_supabase_service_client
+        from src.backend.app.services.api_key_services import ApiKeyService
+        
+        service_client = await get_supabase_service_client()
+        if service_client is not None:
+            await ApiKeyService(service_client).maintain_usage_partitions()
+        else:
+            logger.warning("SUPABASE_SERVICE_KEY is not set; api_key_usage partition maintenance relies on pg_cron")
+    except Exception as e:
+        logger.warning(f"API key usage partition maintenance warning: {e}")
+    
+    try:
+        # Ingestion workers claim queued jobs (including ones left over from before a restart)
+        from src.ai.services.ingestion_queue import get_ingestion_queue
+        
+        await get_ingestion_queue().start()
+    except Exception as e:
+        logger.warning(f"Ingestion queue startup warning: {e}")
+    
+    try:
+        from src.ai.services.rag import get_pipeline_pool
+        from src.ai.config.current_profile import get_current_profile_name
+        from src.ai.config.rag_config import get_search_config, get_database_config
+        from src.ai.utils.vector_index import get_vector_index
+        
+        search_config = get_search_config()
+        if getattr(search_config, 'USE_LOCAL_VECTOR_INDEX', True):
+            db_config = get_database_config()
+            pipeline = get_pipeline_pool().get(get_current_profile_name())
+            loaded = await asyncio.to_thread(
+                get_vector_index().load,
+                pipeline.supabase,
+                db_config.CHUNKS_TABLE,
+                db_config.DOCUMENTS_TABLE,
+                getattr(search_config, 'LOCAL_INDEX_LOAD_PAGE_SIZE', 1000)
+            )
+            logger.info(f"Local vector index loaded with {loaded} chunks")
+    except Exception as e:
+        logger.warning(f"Local vector index load warning (database search will be used): {e}")
+    
+    corpus_sync = None
+    try:
+        # Follow corpus changes made by other processes (workers, scripts, frontend deletes)
+        from src.ai.services.rag import get_pipeline_pool
+        from src.ai.config.current_profile import get_current_profile_name
+        from src.ai.config.rag_config import get_performance_config, get_database_config, get_search_config
+        from src.ai.utils.corpus_sync import CorpusSync
+        from src.ai.utils.vector_index import get_vector_index
+        
+        search_config = get_search_config()
+        db_config = get_database_config()
+        pipeline = get_pipeline_pool().get(get_current_profile_name())
+        corpus_sync = CorpusSync(
+            pipeline.supabase,
+            db_config.CORPUS_WATERMARK_TABLE,
+            getattr(get_performance_config(), 'CORPUS_WATERMARK_POLL_SECONDS', 10.0),
+            changes_table=getattr(db_config, 'CORPUS_CHANGES_TABLE', "corpus_changes")
+        )
+        if getattr(search_config, 'USE_LOCAL_VECTOR_INDEX', True):
+            # Reload the documents that changed (all of them when unknown); the old snapshot serves meanwhile
+            corpus_sync.add_listener(lambda watermark, document_ids: get_vector_index().resync(
+                pipeline.supabase,
+                document_ids,
+                db_config.CHUNKS_TABLE,
+                db_config.DOCUMENTS_TABLE,
+                getattr(search_config, 'LOCAL_INDEX_LOAD_PAGE_SIZE', 1000)
+            ))
+        await corpus_sync.start()
+    except Exception as e:
+        logger.warning(f"Corpus watermark polling warning: {e}")
     
     logger.info("Application startup complete")
     
     yield
     
     logger.info("Shutting down Afeka ChatBot API...")
+    if corpus_sync is not None:
+        await corpus_sync.close()
+    try:
+        from src.ai.services.ingestion_queue import get_ingestion_queue
+        
+        await get_ingestion_queue().close()
+    except Exception as e:
+        logger.warning(f"Ingestion queue shutdown warning: {e}")
+    try:
+        from src.ai.services.rag import get_pipeline_pool
+        from src.ai.services.rag.gemini_client import shutdown_executor
+        from src.ai.services.rag.analytics_writer import shutdown_analytics_writer
+        from src.ai.utils.async_db import shutdown_db_executor
+        await shutdown_analytics_writer()
+        await get_pipeline_pool().close()
+        shutdown_executor()
+        shutdown_db_executor()
+    except Exception as e:
+        logger.warning(f"RAG pipeline pool shutdown warning: {e}")
     logger.info("Application shutdown complete")
 
 app = create_application(lifespan=lifespan)
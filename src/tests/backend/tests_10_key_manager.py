@@ -12,7 +12,7 @@ import os
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
 
 from src.ai.core.gemini_key_manager import safe_embed_content, safe_generate_content, get_key_manager
-from src.ai.core.database_key_manager import DatabaseKeyManager
+from src.ai.core.database_key_manager import DatabaseKeyManager, KeyLease
 
 
 class TestGeminiKeyManager:
@@ -25,7 +25,7 @@ class TestGeminiKeyManager:
         # Mock the database key manager
         with patch('src.ai.core.gemini_key_manager.get_key_manager') as mock_get_manager:
             mock_manager = MagicMock()
-            mock_manager.get_available_key = AsyncMock(return_value={"api_key": "test_key", "id": 123})
+            mock_manager.acquire_key = AsyncMock(return_value=KeyLease({"api_key": "test_key", "id": 123}))
             mock_manager.current_key_index = 0
             mock_manager.api_keys = [{"id": 123, "api_key": "test_key"}]
             mock_manager.track_usage = AsyncMock()
@@ -58,7 +58,7 @@ class TestGeminiKeyManager:
         # Mock the database key manager
         with patch('src.ai.core.gemini_key_manager.get_key_manager') as mock_get_manager:
             mock_manager = MagicMock()
-            mock_manager.get_available_key = AsyncMock(return_value={"api_key": "test_key", "id": 456})
+            mock_manager.acquire_key = AsyncMock(return_value=KeyLease({"api_key": "test_key", "id": 456}))
             mock_manager.current_key_index = 1
             mock_manager.api_keys = [{"id": 123}, {"id": 456, "api_key": "test_key"}]
             mock_manager.track_usage = AsyncMock()
@@ -113,7 +113,7 @@ class TestGeminiKeyManager:
         
         with patch('src.ai.core.gemini_key_manager.get_key_manager') as mock_get_manager:
             mock_manager = MagicMock()
-            mock_manager.get_available_key = AsyncMock(return_value={"api_key": "test_key"})  # No 'id' field
+            mock_manager.acquire_key = AsyncMock(return_value=KeyLease({"api_key": "test_key"}))  # No 'id' field
             mock_manager.current_key_index = 0
             mock_manager.api_keys = [{"api_key": "test_key"}]  # No 'id' field
             mock_manager.track_usage = AsyncMock()
@@ -146,7 +146,7 @@ class TestGeminiKeyManager:
         
         with patch('src.ai.core.gemini_key_manager.get_key_manager') as mock_get_manager:
             mock_manager = MagicMock()
-            mock_manager.get_available_key = AsyncMock(return_value={"api_key": "test_key", "id": 123})
+            mock_manager.acquire_key = AsyncMock(return_value=KeyLease({"api_key": "test_key", "id": 123}))
             mock_manager.current_key_index = 0
             mock_manager.api_keys = [{"id": 123, "api_key": "test_key"}]
             mock_manager.track_usage = AsyncMock()
@@ -194,4 +194,13 @@ class TestDatabaseKeyManager:
         
         # key_id should be required (no default value)
         key_id_param = signature.parameters['key_id']
-        assert key_id_param.default == inspect.Parameter.empty, "key_id parameter should be required" 
\ No newline at end of file
+        assert key_id_param.default == inspect.Parameter.empty, "key_id parameter should be required" 
+
+    def test_km006_ingestion_and_pipelines_share_one_key_manager(self):
+        """KM-006: get_key_manager should return the pipeline pool's manager, so one governor sees every call"""
+        from src.ai.services.rag.pipeline_pool import RAGPipelinePool
+
+        pool = RAGPipelinePool(key_manager=MagicMock())
+        with patch('src.ai.services.rag.pipeline_pool.get_pipeline_pool', return_value=pool):
+            assert get_key_manager() is pool.get_key_manager()
+            assert get_key_manager() is get_key_manager()
@@ -0,0 +1,86 @@
+"""
+RAG Pipeline Pool Tests
+Testing that RAG pipelines are built once per profile and share a key manager
+"""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag.pipeline_pool import RAGPipelinePool
+
+
+class TestRAGPipelinePool:
+    """Test RAG pipeline pool functionality"""
+
+    def test_pp001_pipeline_built_once_per_profile(self):
+        """PP-001: Repeated lookups for the same profile should reuse one pipeline"""
+        key_manager = MagicMock()
+        pool = RAGPipelinePool(key_manager=key_manager)
+
+        with patch('src.ai.services.rag.pipeline_pool.RAGOrchestrator') as mock_orchestrator:
+            mock_orchestrator.side_effect = lambda **kwargs: MagicMock(profile_name=kwargs["config_profile"])
+
+            first = pool.get("balanced")
+            second = pool.get("balanced")
+            other = pool.get("maximum_accuracy")
+
+            assert first is second
+            assert other is not first
+            assert mock_orchestrator.call_count == 2
+            for call in mock_orchestrator.call_args_list:
+                assert call.kwargs["key_manager"] is key_manager
+
+        stats = pool.get_stats()
+        assert stats["size"] == 2
+        assert stats["hits"] == 1
+        assert stats["misses"] == 2
+
+    def test_pp002_warm_up_reports_failures(self):
+        """PP-002: warm_up should build pipelines and report failures without raising"""
+        pool = RAGPipelinePool(key_manager=MagicMock())
+
+        def build(**kwargs):
+            if kwargs["config_profile"] == "broken":
+                raise ValueError("boom")
+            return MagicMock()
+
+        with patch('src.ai.services.rag.pipeline_pool.RAGOrchestrator', side_effect=build):
+            results = pool.warm_up(["balanced", "broken"])
+
+        assert results == {"balanced": True, "broken": False}
+        assert pool.get_stats()["profiles"] == ["balanced"]
+
+    @pytest.mark.asyncio
+    async def test_pp003_close_stops_shared_key_manager(self):
+        """PP-003: close should clear pipelines and close the shared key manager"""
+        key_manager = MagicMock()
+        key_manager.close = AsyncMock()
+        pool = RAGPipelinePool(key_manager=key_manager)
+
+        with patch('src.ai.services.rag.pipeline_pool.RAGOrchestrator', return_value=MagicMock()):
+            pool.get("balanced")
+
+        await pool.close()
+
+        key_manager.close.assert_awaited_once()
+        assert pool.get_stats()["size"] == 0
+
+    @pytest.mark.asyncio
+    async def test_pp004_activating_profile_rebuilds_its_pipeline(self):
+        """PP-004: Activating a profile should drop its pooled pipeline so new config is used"""
+        from src.backend.app.api.routes import rag as rag_routes
+
+        pool = RAGPipelinePool(key_manager=MagicMock())
+        with patch('src.ai.services.rag.pipeline_pool.RAGOrchestrator', side_effect=lambda **kwargs: MagicMock()):
+            stale = pool.get("balanced")
+
+            with patch.object(rag_routes, 'get_available_profiles', return_value={"balanced": "Balanced"}), \
+                 patch.object(rag_routes, 'set_current_profile', return_value=True), \
+                 patch('src.ai.services.rag.get_pipeline_pool', return_value=pool):
+                await rag_routes.activate_rag_profile("balanced")
+
+            assert pool.get("balanced") is not stale
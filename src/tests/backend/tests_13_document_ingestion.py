@@ -0,0 +1,221 @@
+"""
+Document Ingestion Tests
+Testing batched embedding and chunk persistence in DocumentProcessor
+"""
+import threading
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.document_processor import DocumentProcessor
+from src.ai.config.rag_config import EmbeddingConfig, DatabaseConfig, ChunkConfig
+
+
+def make_processor(batch_size=2, max_concurrent=2):
+    """Build a DocumentProcessor without touching Supabase or Gemini"""
+    processor = DocumentProcessor.__new__(DocumentProcessor)
+    processor.embedding_config = EmbeddingConfig()
+    processor.embedding_config.BATCH_SIZE = batch_size
+    processor.embedding_config.MAX_CONCURRENT_BATCHES = max_concurrent
+    processor.db_config = DatabaseConfig()
+    processor.supabase = MagicMock()
+    processor.embedding_store = None
+    return processor
+
+
+def make_chunks(count):
+    """Build processed chunk rows as produced by process_document"""
+    return [
+        {"document_id": 1, "chunk_index": i, "chunk_text": f"chunk {i}",
+         "embedding": [0.1] * 768, "content_token_count": 10}
+        for i in range(count)
+    ]
+
+
+class TestBatchedEmbedding:
+    """Test batched chunk embedding"""
+
+    @pytest.mark.asyncio
+    async def test_di001_texts_are_embedded_in_batches(self):
+        """DI-001: Texts should be sent as list batches and results kept in order"""
+        processor = make_processor(batch_size=2)
+        texts = ["a", "b", "c", "d", "e"]
+
+        async def fake_embed(model, content, task_type):
+            return {"embedding": [[float(ord(text))] * 768 for text in content]}
+
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=fake_embed) as mock_embed:
+            results = await processor._generate_embeddings_batch(texts)
+
+        assert mock_embed.call_count == 3
+        assert [vector[0] for vector in results] == [float(ord(text)) for text in texts]
+        assert all(len(vector) == 768 for vector in results)
+
+    @pytest.mark.asyncio
+    async def test_di002_failed_batch_falls_back_per_chunk(self):
+        """DI-002: A failed batch should fall back to per-chunk embedding, keeping partial failures isolated"""
+        processor = make_processor(batch_size=3)
+
+        async def failing_batch(model, content, task_type):
+            raise RuntimeError("batch rejected")
+
+        async def single(text, is_query=False):
+            return None if text == "bad" else [0.5] * 768
+
+        processor._generate_embedding = AsyncMock(side_effect=single)
+
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=failing_batch):
+            results = await processor._generate_embeddings_batch(["ok1", "bad", "ok2"])
+
+        assert processor._generate_embedding.await_count == 3
+        assert results[0] == [0.5] * 768
+        assert results[1] is None
+        assert results[2] == [0.5] * 768
+
+    @pytest.mark.asyncio
+    async def test_di007_quota_errors_retry_the_whole_batch(self):
+        """DI-007: A quota/saturation failure should retry the batch with backoff, never fan out per chunk"""
+        processor = make_processor(batch_size=3)
+        processor.embedding_config.MAX_RETRIES = 2
+        processor.embedding_config.RETRY_DELAY_SECONDS = 0
+        processor._generate_embedding = AsyncMock()
+        outcomes = [Exception("No available Gemini API keys"), {"embedding": [[0.5] * 768] * 3}]
+
+        async def embed(model, content, task_type):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=embed) as mock_embed:
+            results = await processor._generate_embeddings_batch(["a", "b", "c"])
+        assert mock_embed.call_count == 2
+        assert results == [[0.5] * 768] * 3
+
+        quota = RuntimeError("429 RESOURCE_EXHAUSTED")
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=quota) as mock_embed:
+            with pytest.raises(RuntimeError):
+                await processor._generate_embeddings_batch(["a", "b", "c"])
+        assert mock_embed.call_count == 3
+        processor._generate_embedding.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_di008_quota_errors_in_per_text_fallback_are_raised(self, monkeypatch):
+        """DI-008: A quota error while embedding texts one by one should surface, not become a missing embedding"""
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+        processor = make_processor(batch_size=2)
+        outcomes = [RuntimeError("batch rejected"), {"embedding": [0.5] * 768}, RuntimeError("429 quota exceeded")]
+
+        async def embed(model, content, task_type, **kwargs):
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=embed):
+            with pytest.raises(RuntimeError, match="429"):
+                await processor._generate_embeddings_batch(["a", "b"])
+
+
+class TestBulkChunkInsert:
+    """Test bulk chunk persistence"""
+
+    @pytest.mark.asyncio
+    async def test_di003_chunks_replaced_with_one_rpc_call(self):
+        """DI-003: The whole chunk set should be written with one replacing bulk RPC call"""
+        processor = make_processor()
+        processor.supabase.rpc.side_effect = lambda name, params: MagicMock(
+            execute=MagicMock(return_value=MagicMock(data=[
+                {"id": 100 + c["chunk_index"], "chunk_index": c["chunk_index"]} for c in params["p_chunks"]
+            ]))
+        )
+
+        result = await processor._bulk_insert_chunks(1, make_chunks(7))
+
+        assert result == {"success": True, "inserted": 7, "error": None,
+                          "chunk_ids": {i: 100 + i for i in range(7)}}
+        processor.supabase.rpc.assert_called_once()
+        name, params = processor.supabase.rpc.call_args.args
+        assert name == "insert_document_chunks_bulk"
+        assert params["p_replace_existing"] is True and len(params["p_chunks"]) == 7
+
+    @pytest.mark.asyncio
+    async def test_di004_failed_insert_keeps_previous_chunks(self):
+        """DI-004: A failed write should not delete anything, leaving the previous chunk set in place"""
+        processor = make_processor()
+        processor.supabase.rpc.return_value.execute.side_effect = RuntimeError("db down")
+
+        result = await processor._bulk_insert_chunks(1, make_chunks(4))
+
+        assert result["success"] is False
+        assert result["inserted"] == 0
+        processor.supabase.table.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_di009_missing_embeddings_do_not_replace_stored_chunks(self, monkeypatch):
+        """DI-009: If any chunk lacks an embedding, the document should fail without writing a partial chunk set"""
+        monkeypatch.setenv("GEMINI_API_KEY", "test-key")
+        processor = make_processor()
+        processor.chunk_config = ChunkConfig()
+        processor.encoding = MagicMock(encode=lambda text: [0] * 10)
+        processor.text_splitter = MagicMock()
+        processor._load_and_split_document = AsyncMock(return_value=[
+            MagicMock(page_content=f"text {i}", metadata={}) for i in range(3)
+        ])
+        processor._generate_embeddings_batch = AsyncMock(return_value=[[0.1] * 768, None, [0.2] * 768])
+        processor._bulk_insert_chunks = AsyncMock()
+        processor._update_document_status = AsyncMock()
+
+        result = await processor.process_document(1, "doc.txt")
+
+        assert result["success"] is False and "1/3 chunks" in result["error"]
+        processor._bulk_insert_chunks.assert_not_called()
+        processor._update_document_status.assert_awaited_with(1, "failed", result["error"])
+
+
+class TestIngestionOffLoop:
+    """Test that blocking ingestion steps run outside the event loop thread"""
+
+    @pytest.mark.asyncio
+    async def test_di005_extraction_and_db_calls_run_in_threads(self, tmp_path):
+        """DI-005: Text extraction/splitting and Supabase calls should not run on the event loop thread"""
+        processor = make_processor()
+        loop_thread = threading.get_ident()
+        threads = {}
+
+        def split(file_path):
+            threads["split"] = threading.get_ident()
+            return []
+
+        def execute():
+            threads["execute"] = threading.get_ident()
+            return MagicMock(data=[{"id": 1}])
+
+        processor._split_document_file = split
+        processor.supabase.table.return_value.update.return_value.eq.return_value.execute.side_effect = execute
+
+        assert await processor._load_and_split_document(str(tmp_path / "doc.txt")) == []
+        await processor._update_document_status(1, "processing")
+
+        assert set(threads) == {"split", "execute"}
+        assert loop_thread not in threads.values()
+
+    @pytest.mark.asyncio
+    async def test_di006_local_index_rebuild_runs_in_a_thread(self):
+        """DI-006: Swapping a document into the local vector index should not run on the event loop thread"""
+        processor = make_processor()
+        index = MagicMock()
+        threads = []
+        index.replace_document.side_effect = lambda *args, **kwargs: threads.append(threading.get_ident())
+
+        with patch('src.ai.services.document_processor.get_vector_index', return_value=index):
+            await processor._sync_local_indexes(1, "Doc", [{"chunk_index": 0, "embedding": [0.1] * 768}], {0: 10})
+
+        index.replace_document.assert_called_once_with(
+            1, [{"chunk_index": 0, "embedding": [0.1] * 768, "id": 10}], document_name="Doc"
+        )
+        assert threads and threads[0] != threading.get_ident()
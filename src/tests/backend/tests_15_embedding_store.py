@@ -0,0 +1,86 @@
+"""
+Embedding Store Tests
+Testing the persistent embedding cache and its use during ingestion
+"""
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.utils.embedding_store import PersistentEmbeddingStore, make_embedding_key
+from src.tests.backend.tests_13_document_ingestion import make_processor
+
+MODEL = "models/embedding-001"
+
+
+class TestPersistentEmbeddingStore:
+    """Test the SQLite embedding store"""
+
+    def test_es001_roundtrip_survives_reopen(self, tmp_path):
+        """ES-001: Stored embeddings should be readable from a new store instance"""
+        path = tmp_path / "cache.sqlite3"
+        PersistentEmbeddingStore(path=path).put(MODEL, "retrieval_document", "שלום עולם", [0.5, 0.25, -1.0])
+
+        reopened = PersistentEmbeddingStore(path=path)
+        assert reopened.get(MODEL, "retrieval_document", "שלום עולם") == [0.5, 0.25, -1.0]
+        assert reopened.get(MODEL, "retrieval_query", "שלום עולם") is None
+
+    def test_es002_key_normalizes_whitespace(self):
+        """ES-002: Keys should ignore whitespace differences but not model or task type"""
+        key = make_embedding_key(MODEL, "retrieval_query", "מה  הציון\nעובר?")
+        assert key == make_embedding_key(MODEL, "retrieval_query", " מה הציון עובר? ")
+        assert key != make_embedding_key("models/other", "retrieval_query", "מה הציון עובר?")
+
+    def test_es003_least_recently_used_entries_are_evicted(self, tmp_path):
+        """ES-003: The store should stay within max_entries, keeping recently used entries"""
+        store = PersistentEmbeddingStore(path=tmp_path / "cache.sqlite3", max_entries=3, touch_interval=0)
+        for i in range(3):
+            store.put(MODEL, "retrieval_document", f"text {i}", [float(i)])
+        store.get(MODEL, "retrieval_document", "text 0")
+        store.put(MODEL, "retrieval_document", "text 3", [3.0])
+
+        assert store.size() == 3
+        assert store.get(MODEL, "retrieval_document", "text 0") == [0.0]
+        assert store.get(MODEL, "retrieval_document", "text 1") is None
+
+    def test_es005_recent_hits_do_not_write(self, tmp_path):
+        """ES-005: Hits on recently touched entries should not update last_access; stale ones should"""
+        store = PersistentEmbeddingStore(path=tmp_path / "cache.sqlite3", touch_interval=3600)
+        store.put_many(MODEL, "retrieval_document", [("fresh", [1.0]), ("old", [2.0])])
+        conn = store._conn()
+        conn.execute("UPDATE embeddings SET last_access = 100 WHERE key = ?",
+                     (make_embedding_key(MODEL, "retrieval_document", "old"),))
+        conn.commit()
+        accessed = dict(conn.execute("SELECT key, last_access FROM embeddings").fetchall())
+
+        assert store.get_many(MODEL, "retrieval_document", ["fresh", "old"]) == {0: [1.0], 1: [2.0]}
+
+        touched = dict(conn.execute("SELECT key, last_access FROM embeddings").fetchall())
+        fresh_key = make_embedding_key(MODEL, "retrieval_document", "fresh")
+        old_key = make_embedding_key(MODEL, "retrieval_document", "old")
+        assert touched[fresh_key] == accessed[fresh_key]
+        assert touched[old_key] > 100
+
+
+class TestIngestionReuse:
+    """Test that ingestion reuses stored embeddings"""
+
+    @pytest.mark.asyncio
+    async def test_es004_cached_chunks_are_not_reembedded(self, tmp_path):
+        """ES-004: Only texts missing from the store should be sent to the API"""
+        processor = make_processor(batch_size=10)
+        processor.embedding_store = PersistentEmbeddingStore(path=tmp_path / "cache.sqlite3")
+        processor.embedding_store.put(MODEL, "retrieval_document", "b", [2.0] * 768)
+
+        async def fake_embed(model, content, task_type):
+            return {"embedding": [[1.0] * 768 for _ in content]}
+
+        with patch('src.ai.services.document_processor.safe_embed_content', side_effect=fake_embed) as mock_embed:
+            results = await processor._generate_embeddings_batch(["a", "b", "c"])
+
+        assert mock_embed.call_args.kwargs["content"] == ["a", "c"]
+        assert [vector[0] for vector in results] == [1.0, 2.0, 1.0]
+        assert processor.embedding_store.get(MODEL, "retrieval_document", "c") == [1.0] * 768
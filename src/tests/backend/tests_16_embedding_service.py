@@ -0,0 +1,178 @@
+"""
+Embedding Service Tests
+Testing query embedding caching and in-flight request coalescing
+"""
+import asyncio
+import pytest
+from unittest.mock import patch
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag.embedding_service import EmbeddingService, LRUCache
+from src.ai.services.rag.embedding_batcher import EmbeddingBatcher
+from src.ai.config.rag_config import EmbeddingConfig, PerformanceConfig
+
+
+def make_service():
+    """Build an EmbeddingService with a fresh cache and no key manager or persistent store"""
+    service = EmbeddingService.__new__(EmbeddingService)
+    service.key_manager = None
+    service.embedding_store = None
+    service.batcher = None
+    service.embedding_config = EmbeddingConfig()
+    service.performance_config = PerformanceConfig()
+    EmbeddingService._embedding_cache = LRUCache(max_size=100)
+    EmbeddingService._cache_stats = {"hits": 0, "misses": 0, "persistent_hits": 0, "coalesced": 0, "total_requests": 0}
+    EmbeddingService._in_flight = {}
+    return service
+
+
+class TestRequestCoalescing:
+    """Test single-flight deduplication of query embeddings"""
+
+    @pytest.mark.asyncio
+    async def test_em001_concurrent_identical_queries_share_one_call(self):
+        """EM-001: Concurrent callers for the same query should trigger one API call"""
+        service = make_service()
+        calls = []
+
+        async def fake_embed(**kwargs):
+            calls.append(kwargs["content"])
+            await asyncio.sleep(0.05)
+            return {"embedding": [0.3] * 768}
+
+        with patch('src.ai.services.rag.embedding_service.gemini_client.embed_content', side_effect=fake_embed):
+            results = await asyncio.gather(*(service.generate_query_embedding("מתי מועד ב?") for _ in range(5)))
+
+        assert calls == ["מתי מועד ב?"]
+        assert all(result == [0.3] * 768 for result in results)
+        stats = service.get_cache_stats()
+        assert stats["coalesced_requests"] == 4
+        assert stats["cache_misses"] == 1
+        assert stats["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_em002_cancelled_caller_does_not_cancel_shared_call(self):
+        """EM-002: Cancelling the first caller should not fail the callers that joined it"""
+        service = make_service()
+
+        async def fake_embed(**kwargs):
+            await asyncio.sleep(0.05)
+            return {"embedding": [0.7] * 768}
+
+        with patch('src.ai.services.rag.embedding_service.gemini_client.embed_content', side_effect=fake_embed):
+            first = asyncio.create_task(service.generate_query_embedding("שכר לימוד"))
+            await asyncio.sleep(0)
+            second = asyncio.create_task(service.generate_query_embedding("שכר לימוד"))
+            await asyncio.sleep(0)
+            first.cancel()
+            result = await second
+
+        assert result == [0.7] * 768
+
+    @pytest.mark.asyncio
+    async def test_em003_different_queries_are_not_coalesced(self):
+        """EM-003: Distinct queries should each get their own API call"""
+        service = make_service()
+
+        async def fake_embed(**kwargs):
+            await asyncio.sleep(0.01)
+            return {"embedding": [float(len(kwargs["content"]))] * 768}
+
+        with patch('src.ai.services.rag.embedding_service.gemini_client.embed_content', side_effect=fake_embed) as mock_embed:
+            await asyncio.gather(service.generate_query_embedding("א"), service.generate_query_embedding("בב"))
+
+        assert mock_embed.call_count == 2
+        assert service.get_cache_stats()["coalesced_requests"] == 0
+
+
+class TestMicroBatching:
+    """Test micro-batching of concurrent query embeddings"""
+
+    @pytest.mark.asyncio
+    async def test_em004_concurrent_queries_share_one_batch(self):
+        """EM-004: Distinct queries inside the window should go out as one list request"""
+        service = make_service()
+        service.batcher = EmbeddingBatcher(service._embed_texts, window_ms=20, max_batch_size=32)
+        queries = ["א", "בב", "גגג"]
+
+        async def fake_embed(**kwargs):
+            return {"embedding": [[float(len(text))] * 768 for text in kwargs["content"]]}
+
+        with patch('src.ai.services.rag.embedding_service.gemini_client.embed_content', side_effect=fake_embed) as mock_embed:
+            results = await asyncio.gather(*(service.generate_query_embedding(query) for query in queries))
+
+        assert mock_embed.call_count == 1
+        assert mock_embed.call_args.kwargs["content"] == queries
+        assert [result[0] for result in results] == [1.0, 2.0, 3.0]
+        assert service.get_cache_stats()["micro_batching"]["batches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_em005_full_batch_flushes_before_window(self):
+        """EM-005: Reaching max_batch_size should flush immediately and split the rest"""
+        batches = []
+
+        async def embed_batch(texts):
+            batches.append(list(texts))
+            return [[float(i)] for i in range(len(texts))]
+
+        batcher = EmbeddingBatcher(embed_batch, window_ms=1000, max_batch_size=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(batcher.embed("a"), batcher.embed("b")), timeout=0.5
+        )
+
+        assert batches == [["a", "b"]]
+        assert results == [[0.0], [1.0]]
+
+    @pytest.mark.asyncio
+    async def test_em006_failed_batch_falls_back_to_zero_vector(self):
+        """EM-006: A failed batch should resolve every caller with the zero-vector fallback"""
+        service = make_service()
+        service.batcher = EmbeddingBatcher(service._embed_texts, window_ms=5, max_batch_size=32)
+
+        with patch('src.ai.services.rag.embedding_service.gemini_client.embed_content', side_effect=RuntimeError("quota")):
+            results = await asyncio.gather(service.generate_query_embedding("x"), service.generate_query_embedding("y"))
+
+        assert results == [[0.0] * 768, [0.0] * 768]
+        assert service.get_cache_stats()["micro_batching"]["failed_batches"] == 1
+
+    @pytest.mark.asyncio
+    async def test_em007_in_flight_batches_are_referenced(self):
+        """EM-007: The batcher should hold its batch tasks until they finish"""
+        release = asyncio.Event()
+
+        async def embed_batch(texts):
+            await release.wait()
+            return [[1.0] for _ in texts]
+
+        batcher = EmbeddingBatcher(embed_batch, window_ms=0, max_batch_size=1)
+        caller = asyncio.create_task(batcher.embed("a"))
+        await asyncio.sleep(0.01)
+        assert len(batcher._batch_tasks) == 1
+
+        release.set()
+        assert await caller == [1.0]
+        await asyncio.sleep(0)
+        assert batcher._batch_tasks == set()
+
+    @pytest.mark.asyncio
+    async def test_em008_cancelled_batch_fails_waiting_callers(self):
+        """EM-008: Cancelling a batch task should fail its callers instead of leaving them pending"""
+        started = asyncio.Event()
+
+        async def embed_batch(texts):
+            started.set()
+            await asyncio.Event().wait()
+
+        batcher = EmbeddingBatcher(embed_batch, window_ms=0, max_batch_size=2)
+        callers = [asyncio.create_task(batcher.embed(text)) for text in ("a", "b")]
+        await started.wait()
+        for task in list(batcher._batch_tasks):
+            task.cancel()
+
+        results = await asyncio.wait_for(asyncio.gather(*callers, return_exceptions=True), 1.0)
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert batcher.stats["failed_batches"] == 1
@@ -0,0 +1,194 @@
+"""
+Vector Index Tests
+Testing the in-process vector index replica and its use by SearchService
+"""
+import json
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.utils.vector_index import LocalVectorIndex
+from src.ai.utils.corpus_sync import CorpusSync
+from src.ai.services.rag.search_services import SearchService
+
+
+def unit(*values, dim=768):
+    """Build a dim-sized vector with the given leading values"""
+    vector = [0.0] * dim
+    vector[:len(values)] = values
+    return vector
+
+
+def make_chunk(chunk_id, document_id, embedding, chunk_index=0):
+    return {"id": chunk_id, "document_id": document_id, "chunk_text": f"chunk {chunk_id}",
+            "chunk_index": chunk_index, "embedding": embedding}
+
+
+class TestLocalVectorIndex:
+    """Test local top-k search and incremental sync"""
+
+    def test_vi001_search_ranks_by_cosine_similarity(self):
+        """VI-001: Results should be ordered by similarity, thresholded and limited"""
+        index = LocalVectorIndex()
+        index.replace_document(1, [
+            make_chunk(10, 1, unit(1.0, 0.0)),
+            make_chunk(11, 1, unit(0.6, 0.8)),
+            make_chunk(12, 1, unit(0.0, 1.0)),
+        ], document_name="תקנון")
+
+        results = index.search(unit(2.0, 0.0), match_count=2, match_threshold=0.1)
+
+        assert [row["id"] for row in results] == [10, 11]
+        assert results[0]["similarity"] == pytest.approx(1.0)
+        assert results[1]["similarity"] == pytest.approx(0.6)
+        assert results[0]["document_name"] == "תקנון"
+
+    def test_vi002_replace_and_remove_document(self):
+        """VI-002: Re-ingesting a document replaces its chunks; removing it drops them"""
+        index = LocalVectorIndex()
+        index.replace_document(1, [make_chunk(10, 1, unit(1.0)), make_chunk(11, 1, unit(1.0))])
+        index.replace_document(2, [make_chunk(20, 2, unit(1.0))])
+        index.replace_document(1, [make_chunk(12, 1, unit(1.0))])
+
+        assert sorted(row["id"] for row in index.search(unit(1.0), match_count=10)) == [12, 20]
+        assert [row["id"] for row in index.search(unit(1.0), match_count=10, document_id=2)] == [20]
+
+        index.remove_document(1)
+        assert [row["id"] for row in index.search(unit(1.0), match_count=10)] == [20]
+
+    def test_vi003_load_pages_through_chunks(self):
+        """VI-003: load() should page through document_chunks and parse pgvector strings"""
+        chunks = [make_chunk(i, 1, json.dumps(unit(1.0, float(i)))) for i in range(3)]
+        supabase = MagicMock()
+
+        def table(name):
+            query = MagicMock()
+            if name == "documents":
+                query.select.return_value.execute.return_value.data = [{"id": 1, "name": "doc"}]
+            else:
+                ranged = query.select.return_value.order.return_value.range
+                ranged.side_effect = lambda start, end: MagicMock(
+                    execute=MagicMock(return_value=MagicMock(data=chunks[start:end + 1]))
+                )
+            return query
+
+        supabase.table.side_effect = table
+        index = LocalVectorIndex()
+
+        assert index.load(supabase, page_size=2) == 3
+        assert index.ready
+        assert index.get_stats()["chunks"] == 3
+
+    @pytest.mark.asyncio
+    async def test_vi006_resync_reloads_when_the_corpus_changes(self):
+        """VI-006: A change the log cannot narrow down should reload the corpus while the old snapshot serves"""
+        index = LocalVectorIndex()
+        index.replace_document(1, [make_chunk(10, 1, unit(1.0))])
+        index.ready = True
+        served_while_loading = []
+
+        def load(supabase, chunks_table, documents_table, page_size):
+            served_while_loading.append((index.ready, [row["id"] for row in index.search(unit(1.0))]))
+            index.replace_document(1, [])
+            index.replace_document(2, [make_chunk(20, 2, unit(1.0))])
+            return 1
+
+        supabase = MagicMock()
+        query = supabase.table.return_value.select.return_value.limit.return_value
+        query.execute.return_value = MagicMock(data=[{"version": 7}])
+        changes = supabase.table.return_value.select.return_value.gt.return_value.lte.return_value.limit.return_value
+        changes.execute.return_value = MagicMock(data=[{"version": 8, "document_id": None}])
+        sync = CorpusSync(supabase, poll_seconds=0)
+        await sync.check()
+        sync.add_listener(lambda watermark, document_ids: index.resync(supabase, document_ids))
+
+        with patch.object(index, 'load', side_effect=load) as reload:
+            assert await sync.check() is False
+            reload.assert_not_called()
+            query.execute.return_value = MagicMock(data=[{"version": 8}])
+            assert await sync.check() is True
+
+        reload.assert_called_once_with(supabase, "document_chunks", "documents", 1000)
+        assert served_while_loading == [(True, [10])]
+        assert [row["id"] for row in index.search(unit(1.0), match_count=10)] == [20]
+        assert index.get_stats()["resyncs"] == 1
+
+    @pytest.mark.asyncio
+    async def test_vi007_resync_reloads_only_changed_documents(self):
+        """VI-007: Logged changes should reload just those documents, never the whole corpus"""
+        index = LocalVectorIndex()
+        index.replace_document(1, [make_chunk(10, 1, unit(1.0))], document_name="old")
+        index.replace_document(2, [make_chunk(20, 2, unit(1.0))])
+        index.replace_document(3, [make_chunk(30, 3, unit(1.0))])
+        index.ready = True
+
+        supabase = MagicMock()
+        watermark = supabase.table.return_value.select.return_value.limit.return_value
+        watermark.execute.return_value = MagicMock(data=[{"version": 7}])
+        log = supabase.table.return_value.select.return_value.gt.return_value.lte.return_value.limit.return_value
+        sync = CorpusSync(supabase, poll_seconds=0)
+        await sync.check()
+
+        chunks = supabase.table.return_value.select.return_value.in_.return_value
+        chunks.execute.return_value = MagicMock(data=[{"id": 1, "name": "renamed"}])
+        chunks.order.return_value.range.return_value.execute.return_value = MagicMock(
+            data=[make_chunk(11, 1, unit(1.0)), make_chunk(12, 1, unit(1.0))]
+        )
+        sync.add_listener(lambda version, document_ids: index.resync(supabase, document_ids))
+
+        log.execute.return_value = MagicMock(data=[{"version": 8, "document_id": 1}, {"version": 9, "document_id": 2}])
+        watermark.execute.return_value = MagicMock(data=[{"version": 9}])
+        with patch.object(index, 'load') as full_reload:
+            assert await sync.check() is True
+        full_reload.assert_not_called()
+
+        supabase.table.return_value.select.return_value.gt.assert_called_with("version", 7)
+        assert sorted(row["id"] for row in index.search(unit(1.0), match_count=10)) == [11, 12, 30]
+        assert index.search(unit(1.0), document_id=1)[0]["document_name"] == "renamed"
+
+        # A gap in the logged versions (pruned log) falls back to a full reload
+        log.execute.return_value = MagicMock(data=[{"version": 11, "document_id": 3}])
+        watermark.execute.return_value = MagicMock(data=[{"version": 11}])
+        with patch.object(index, 'load', return_value=0) as full_reload:
+            assert await sync.check() is True
+        full_reload.assert_called_once()
+
+
+class TestSearchServiceLocalIndex:
+    """Test SearchService routing between the local index and the RPC"""
+
+    def make_service(self, index):
+        embedding_service = MagicMock()
+        embedding_service.generate_query_embedding = AsyncMock(return_value=unit(1.0))
+        with patch('src.ai.services.rag.search_services.get_vector_index', return_value=index), \
+             patch('src.ai.services.rag.search_services.get_search_cache', return_value=None):
+            return SearchService(MagicMock(), embedding_service)
+
+    @pytest.mark.asyncio
+    async def test_vi004_semantic_search_uses_ready_index(self):
+        """VI-004: A loaded index should answer semantic search without the RPC"""
+        index = LocalVectorIndex()
+        index.replace_document(1, [make_chunk(10, 1, unit(1.0))])
+        index.ready = True
+        service = self.make_service(index)
+
+        with patch.object(service, '_execute_rpc', new=AsyncMock()) as mock_rpc:
+            results = await service.semantic_search("שאלה")
+
+        mock_rpc.assert_not_called()
+        assert [row["id"] for row in results] == [10]
+
+    @pytest.mark.asyncio
+    async def test_vi005_semantic_search_falls_back_to_rpc(self):
+        """VI-005: An index that is not loaded should fall back to the database RPC"""
+        service = self.make_service(LocalVectorIndex())
+
+        with patch.object(service, '_execute_rpc', new=AsyncMock(return_value=[{"id": 99}])) as mock_rpc:
+            results = await service.semantic_search("שאלה")
+
+        mock_rpc.assert_awaited_once()
+        assert results == [{"id": 99}]
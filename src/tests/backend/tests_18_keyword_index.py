@@ -0,0 +1,101 @@
+"""
+Keyword Index Tests
+Testing Hebrew BM25 scoring and local hybrid fusion
+"""
+import pytest
+from collections import Counter
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.utils.keyword_index import BM25Index, tokenize
+from src.ai.utils.vector_index import LocalVectorIndex
+from src.ai.services.rag.search_services import SearchService
+from src.tests.backend.tests_17_vector_index import unit, make_chunk
+
+
+def make_text_chunk(chunk_id, text, embedding):
+    chunk = make_chunk(chunk_id, 1, embedding)
+    chunk["chunk_text"] = text
+    return chunk
+
+
+class TestHebrewBM25:
+    """Test tokenization and BM25 scoring"""
+
+    def test_ki001_tokenize_strips_prefixes_and_niqqud(self):
+        """KI-001: Prefixed and pointed words should also index their bare stem"""
+        terms = tokenize("וּבַמּוֹעֵד של הסטודנטים")
+
+        assert "ובמועד" in terms
+        assert "מועד" in terms
+        assert "סטודנטים" in terms
+        assert "של" not in terms
+
+    def test_ki002_bm25_prefers_rarer_and_denser_matches(self):
+        """KI-002: Prefixed query words should match bare forms and rank by BM25"""
+        texts = ["מועד מועד בחינה", "מועד הגשה", "שכר לימוד"]
+        index = BM25Index([Counter(tokenize(text)) for text in texts])
+
+        scores = index.scores("במועד הבחינה")
+
+        assert scores[2] == 0
+        assert scores[0] > scores[1] > 0
+
+
+class TestLocalHybridSearch:
+    """Test weighted and RRF fusion over the local index"""
+
+    def make_index(self):
+        index = LocalVectorIndex()
+        index.replace_document(1, [
+            make_text_chunk(10, "נוהל מילואים לסטודנטים", unit(0.0, 1.0)),
+            make_text_chunk(11, "שכר לימוד ומלגות", unit(1.0, 0.0)),
+            make_text_chunk(12, "מועדי בחינות", unit(0.6, 0.8)),
+        ])
+        return index
+
+    @pytest.mark.parametrize("fusion", ["weighted", "rrf"])
+    def test_ki003_keyword_match_is_added_to_candidates(self, fusion):
+        """KI-003: A keyword-only match below the similarity threshold should still be returned"""
+        results = self.make_index().hybrid_search(
+            unit(1.0, 0.0), "מילואים", match_count=5, match_threshold=0.9,
+            semantic_weight=0.5, keyword_weight=0.5, fusion=fusion
+        )
+
+        by_id = {row["id"]: row for row in results}
+        assert set(by_id) == {10, 11}
+        assert by_id[10]["text_match_rank"] > 0
+        assert by_id[11]["text_match_rank"] == 0
+        assert results[0]["combined_score"] >= results[1]["combined_score"]
+
+    def test_ki004_weights_drive_weighted_ranking(self):
+        """KI-004: SEMANTIC_WEIGHT/KEYWORD_WEIGHT should decide between semantic and keyword matches"""
+        index = self.make_index()
+        search = lambda semantic, keyword: index.hybrid_search(
+            unit(1.0, 0.0), "מילואים", match_count=2, match_threshold=0.9,
+            semantic_weight=semantic, keyword_weight=keyword
+        )
+
+        assert search(0.8, 0.2)[0]["id"] == 11
+        assert search(0.2, 0.8)[0]["id"] == 10
+
+    @pytest.mark.asyncio
+    async def test_ki005_hybrid_search_uses_local_index(self):
+        """KI-005: SearchService.hybrid_search should fuse locally when the index is loaded"""
+        index = self.make_index()
+        index.ready = True
+        embedding_service = MagicMock()
+        embedding_service.generate_query_embedding = AsyncMock(return_value=unit(1.0, 0.0))
+        with patch('src.ai.services.rag.search_services.get_vector_index', return_value=index), \
+             patch('src.ai.services.rag.search_services.get_search_cache', return_value=None):
+            service = SearchService(MagicMock(), embedding_service)
+
+        with patch.object(service, '_execute_rpc', new=AsyncMock()) as mock_rpc:
+            results = await service.hybrid_search("מילואים")
+
+        mock_rpc.assert_not_called()
+        assert {row["id"] for row in results} >= {10, 11}
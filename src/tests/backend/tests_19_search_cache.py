@@ -0,0 +1,121 @@
+"""
+Search Cache Tests
+Testing the retrieval result cache and corpus-version invalidation
+"""
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.utils.search_cache import SearchResultCache, bump_corpus_version
+from src.ai.utils.corpus_sync import CorpusSync
+from src.ai.utils.vector_index import LocalVectorIndex
+from src.ai.services.rag.search_services import SearchService
+
+
+def make_service(cache):
+    """SearchService backed by the given cache and an unloaded local index"""
+    embedding_service = MagicMock()
+    embedding_service.generate_query_embedding = AsyncMock(return_value=[0.1] * 768)
+    with patch('src.ai.services.rag.search_services.get_vector_index', return_value=LocalVectorIndex()), \
+         patch('src.ai.services.rag.search_services.get_search_cache', return_value=cache):
+        service = SearchService(MagicMock(), embedding_service)
+    service._execute_rpc = AsyncMock(return_value=[{"id": 1, "chunk_text": "ציון עובר 60"}])
+    return service
+
+
+class TestSearchResultCache:
+    """Test cache keys, bounds and expiry"""
+
+    def test_sr001_key_normalizes_query_and_includes_params(self):
+        """SR-001: Whitespace variants share a key; method and parameters do not"""
+        key = SearchResultCache.make_key("hybrid", "מה  הציון המינימלי", match_count=10)
+
+        assert key == SearchResultCache.make_key("hybrid", " מה הציון המינימלי ", match_count=10)
+        assert key != SearchResultCache.make_key("semantic", "מה הציון המינימלי", match_count=10)
+        assert key != SearchResultCache.make_key("hybrid", "מה הציון המינימלי", match_count=5)
+
+    def test_sr002_cache_is_bounded_and_expires(self):
+        """SR-002: Oldest entries are evicted and expired entries are not returned"""
+        cache = SearchResultCache(max_size=2, ttl_seconds=60)
+        for key in ("a", "b", "c"):
+            cache.put(key, [{"id": key}])
+
+        assert cache.get("a") is None
+        assert cache.get("c") == [{"id": "c"}]
+
+        cache.ttl_seconds = -1
+        assert cache.get("c") is None
+
+    def test_sr003_returned_results_are_copies(self):
+        """SR-003: Mutating returned rows should not change the cached entry"""
+        cache = SearchResultCache()
+        cache.put("k", [{"id": 1}])
+        cache.get("k")[0]["relevance_score"] = 5
+
+        assert cache.get("k") == [{"id": 1}]
+
+
+class TestSearchServiceCaching:
+    """Test that SearchService serves repeated queries from the cache"""
+
+    @pytest.mark.asyncio
+    async def test_sr004_repeated_query_skips_embedding_and_rpc(self):
+        """SR-004: A repeated hybrid query should not embed or call the database again"""
+        service = make_service(SearchResultCache())
+
+        first = await service.hybrid_search("מה הציון המינימלי לעבור קורס")
+        second = await service.hybrid_search("מה הציון המינימלי  לעבור קורס")
+
+        assert first == second
+        service._execute_rpc.assert_awaited_once()
+        service.embedding_service.generate_query_embedding.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_sr005_corpus_change_invalidates_results(self):
+        """SR-005: Bumping the corpus version should force a fresh search"""
+        service = make_service(SearchResultCache())
+
+        await service.semantic_search("שכר לימוד")
+        bump_corpus_version()
+        await service.semantic_search("שכר לימוד")
+
+        assert service._execute_rpc.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_sr006_empty_results_are_not_cached(self):
+        """SR-006: Empty results (possibly from a failed RPC) should not be cached"""
+        service = make_service(SearchResultCache())
+        service._execute_rpc = AsyncMock(return_value=[])
+
+        await service.semantic_search("שאלה")
+        await service.semantic_search("שאלה")
+
+        assert service._execute_rpc.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_sr007_shared_watermark_change_invalidates_results(self):
+        """SR-007: A corpus change made by another process should invalidate results once polled"""
+        service = make_service(SearchResultCache())
+        supabase = MagicMock()
+        query = supabase.table.return_value.select.return_value.limit.return_value
+        query.execute.return_value = MagicMock(data=[{"version": 41}])
+        sync = CorpusSync(supabase, poll_seconds=0)
+        listener = AsyncMock()
+        sync.add_listener(listener)
+
+        await sync.check()
+        await service.semantic_search("שכר לימוד")
+        assert await sync.check() is False
+        await service.semantic_search("שכר לימוד")
+        assert service._execute_rpc.await_count == 1
+
+        query.execute.return_value = MagicMock(data=[{"version": 42}])
+        assert await sync.check() is True
+        await service.semantic_search("שכר לימוד")
+
+        assert service._execute_rpc.await_count == 2
+        listener.assert_awaited_with(42, None)
@@ -0,0 +1,97 @@
+"""
+Answer Cache Tests
+Testing reuse of complete RAG answers in RAGOrchestrator
+"""
+import pytest
+from unittest.mock import MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag.rag_orchestrator import RAGOrchestrator
+from src.ai.services.rag.answer_cache import AnswerCache, prompt_version
+from src.ai.config.rag_config import LLMConfig
+
+SEARCH_RESULTS = [{"id": 7, "chunk_text": "ציון עובר בקורס הוא 60", "similarity": 0.9}]
+
+
+def make_orchestrator(cache=None, system_prompt="SYS"):
+    """Build a RAGOrchestrator with mocked sub-services"""
+    orchestrator = RAGOrchestrator.__new__(RAGOrchestrator)
+    orchestrator.test_mode = False
+    orchestrator.llm_config = LLMConfig()
+    orchestrator.answer_cache = cache
+    orchestrator.semantic_cache = None
+
+    context_builder = MagicMock()
+    context_builder.build_context.side_effect = lambda results: (
+        "\n".join(r["chunk_text"] for r in results), ["מקור 1"], [dict(r) for r in results]
+    )
+    context_builder.create_rag_prompt.side_effect = lambda query, context: f"{system_prompt}\n{context}\n{query}"
+    context_builder.create_rag_prompt_with_conversation_context.side_effect = (
+        lambda query, context, conversation: f"{system_prompt}\n{conversation}\n{context}\n{query}"
+    )
+    context_builder.extract_cited_sources.return_value = ["מקור 1"]
+    context_builder.get_cited_chunks.side_effect = lambda chunks, names, citations: chunks
+    context_builder.extract_relevant_chunk_segment.return_value = "ציון עובר 60"
+    orchestrator.context_builder = context_builder
+
+    orchestrator.search_service = MagicMock()
+    orchestrator.search_service.hybrid_search = AsyncMock(return_value=[dict(r) for r in SEARCH_RESULTS])
+    orchestrator.answer_generator = MagicMock()
+    orchestrator.answer_generator.generate_answer = AsyncMock(return_value="הציון העובר הוא 60 [מקורות: מקור 1]")
+    orchestrator.analytics = MagicMock()
+    orchestrator.analytics.is_analytics_enabled.return_value = False
+    return orchestrator
+
+
+class TestAnswerCache:
+    """Test full-answer caching"""
+
+    @pytest.mark.asyncio
+    async def test_an001_repeated_question_skips_generation(self):
+        """AN-001: The same question over the same chunks should reuse the answer and citations"""
+        orchestrator = make_orchestrator(AnswerCache())
+
+        first = await orchestrator.generate_answer("מה הציון העובר?")
+        second = await orchestrator.generate_answer("מה  הציון העובר?")
+
+        orchestrator.answer_generator.generate_answer.assert_awaited_once()
+        assert first["answer_cache_hit"] is False
+        assert second["answer_cache_hit"] is True
+        assert second["answer"] == first["answer"] == "הציון העובר הוא 60"
+        assert second["chunks_selected"][0]["relevant_segment"] == "ציון עובר 60"
+        assert second["cited_sources"] == ["מקור 1"]
+
+    @pytest.mark.asyncio
+    async def test_an002_conversation_context_bypasses_cache(self):
+        """AN-002: Answers that depend on conversation context should never be cached or reused"""
+        cache = AnswerCache()
+        orchestrator = make_orchestrator(cache)
+
+        await orchestrator.generate_answer_with_context("ומה לגבי מועד ב?", "שאלה קודמת: מועד א")
+        await orchestrator.generate_answer_with_context("ומה לגבי מועד ב?", "שאלה קודמת: מועד א")
+
+        assert orchestrator.answer_generator.generate_answer.await_count == 2
+        assert cache.get_stats()["size"] == 0
+
+    def test_an003_key_tracks_chunks_prompt_and_llm(self):
+        """AN-003: Different chunks, prompt versions or LLM settings should not share an entry"""
+        llm = LLMConfig()
+        other_llm = LLMConfig()
+        other_llm.TEMPERATURE = 0.9
+        key = AnswerCache.make_key("שאלה", [1, 2], "v1", llm)
+
+        assert key == AnswerCache.make_key(" שאלה ", [2, 1], "v1", llm)
+        assert key != AnswerCache.make_key("שאלה", [1, 3], "v1", llm)
+        assert key != AnswerCache.make_key("שאלה", [1, 2], "v2", llm)
+        assert key != AnswerCache.make_key("שאלה", [1, 2], "v1", other_llm)
+
+    def test_an004_prompt_version_ignores_query_and_context(self):
+        """AN-004: The prompt fingerprint should change with the system prompt only"""
+        version = prompt_version("SYS\nctx A\nq1", "q1", "ctx A")
+
+        assert version == prompt_version("SYS\nctx B\nq2", "q2", "ctx B")
+        assert version != prompt_version("NEW SYS\nctx A\nq1", "q1", "ctx A")
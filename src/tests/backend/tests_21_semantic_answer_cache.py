@@ -0,0 +1,147 @@
+"""
+Semantic Answer Cache Tests
+Testing nearest-neighbour reuse of answers for rephrased questions
+"""
+import asyncio
+import pytest
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag.answer_cache import SemanticAnswerCache
+from src.ai.utils.search_cache import bump_corpus_version
+from src.tests.backend.tests_17_vector_index import unit
+from src.tests.backend.tests_20_answer_cache import make_orchestrator
+
+PAYLOAD = {"answer": "הציון העובר הוא 60", "sources": ["מקור 1"]}
+
+
+def make_semantic_orchestrator(cache, embeddings):
+    """Orchestrator whose query embeddings come from the given {query: vector} map"""
+    orchestrator = make_orchestrator()
+    orchestrator.profile_name = "balanced"
+    orchestrator.semantic_cache = cache
+    orchestrator._audit_tasks = set()
+    orchestrator.embedding_service = AsyncMock()
+    orchestrator.embedding_service.generate_query_embedding.side_effect = lambda query: embeddings[query]
+    return orchestrator
+
+
+class TestSemanticAnswerCache:
+    """Test similarity matching, scoping and invalidation"""
+
+    def test_sa001_hit_above_threshold_only(self):
+        """SA-001: A close embedding should hit; a distant one should miss"""
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.store(unit(1.0, 0.0), "מה הציון העובר?", "scope", [7], PAYLOAD)
+
+        hit = cache.lookup(unit(1.0, 0.1), "scope")
+        assert hit["payload"] == PAYLOAD
+        assert hit["matched_query"] == "מה הציון העובר?"
+        assert hit["similarity"] > 0.99
+
+        assert cache.lookup(unit(0.6, 0.8), "scope") is None
+        assert cache.get_stats()["hit_rate_percent"] == 50.0
+
+    def test_sa002_scope_and_corpus_version_are_respected(self):
+        """SA-002: Entries from another scope or an older corpus version should not be served"""
+        cache = SemanticAnswerCache()
+        cache.store(unit(1.0), "שאלה", "hybrid", [7], PAYLOAD)
+
+        assert cache.lookup(unit(1.0), "semantic") is None
+
+        bump_corpus_version()
+        assert cache.lookup(unit(1.0), "hybrid") is None
+        assert cache.get_stats()["stale"] == 1
+        assert cache.get_stats()["size"] == 0
+
+    def test_sa003_bounded_with_lru_eviction(self):
+        """SA-003: The least recently used entry is evicted when the cache is full"""
+        cache = SemanticAnswerCache(max_entries=2)
+        cache.store(unit(1.0, 0.0, 0.0), "a", "s", [1], PAYLOAD)
+        cache.store(unit(0.0, 1.0, 0.0), "b", "s", [2], PAYLOAD)
+        cache.lookup(unit(1.0, 0.0, 0.0), "s")
+        cache.store(unit(0.0, 0.0, 1.0), "c", "s", [3], PAYLOAD)
+
+        assert cache.lookup(unit(0.0, 1.0, 0.0), "s") is None
+        assert cache.lookup(unit(1.0, 0.0, 0.0), "s")["matched_query"] == "a"
+        assert cache.get_stats()["evictions"] == 1
+
+    def test_sa004_false_hit_audit_removes_entry(self):
+        """SA-004: An audit with diverging chunks counts a false hit and drops the entry"""
+        cache = SemanticAnswerCache()
+        cache.store(unit(1.0), "שאלה", "s", [1, 2], PAYLOAD)
+        hit = cache.lookup(unit(1.0), "s")
+
+        assert cache.record_audit(hit["entry_id"], [1, 2], hit["chunk_ids"]) is True
+        assert cache.record_audit(hit["entry_id"], [8, 9], hit["chunk_ids"]) is False
+
+        stats = cache.get_stats()
+        assert stats["audits"] == 2
+        assert stats["false_hits"] == 1
+        assert stats["false_hit_rate_percent"] == 50.0
+        assert cache.lookup(unit(1.0), "s") is None
+
+    def test_sa008_numbers_and_ordinals_must_match(self):
+        """SA-008: Questions differing only in a section number or ordinal should never share an answer"""
+        cache = SemanticAnswerCache(threshold=0.95)
+        cache.store(unit(1.0, 0.0), "מה נאמר בסעיף 3.2?", "s", [1], PAYLOAD)
+        cache.store(unit(0.0, 1.0), "מתי מועד א?", "s", [2], PAYLOAD)
+
+        assert cache.lookup(unit(1.0, 0.01), "s", "מה נאמר בסעיף 3.4?") is None
+        assert cache.lookup(unit(0.01, 1.0), "s", "מתי מועד ב'?") is None
+        assert cache.lookup(unit(1.0, 0.01), "s", "מה כתוב בסעיף 3.2?")["matched_query"] == "מה נאמר בסעיף 3.2?"
+        assert cache.lookup(unit(0.01, 1.0), "s", "מתי מתקיים מועד א׳?") is not None
+        assert cache.get_stats()["marker_mismatches"] == 2
+
+
+class TestOrchestratorSemanticCache:
+    """Test semantic cache integration in RAGOrchestrator"""
+
+    @pytest.mark.asyncio
+    async def test_sa005_rephrased_question_skips_search_and_generation(self):
+        """SA-005: A near-duplicate question should be answered without search or LLM calls"""
+        orchestrator = make_semantic_orchestrator(
+            SemanticAnswerCache(audit_rate=0.0),
+            {"מה הציון העובר?": unit(1.0, 0.0), "מהו ציון המעבר?": unit(1.0, 0.05)}
+        )
+
+        first = await orchestrator.generate_answer("מה הציון העובר?")
+        second = await orchestrator.generate_answer("מהו ציון המעבר?")
+
+        orchestrator.search_service.hybrid_search.assert_awaited_once()
+        orchestrator.answer_generator.generate_answer.assert_awaited_once()
+        assert second["semantic_cache_hit"] is True
+        assert second["matched_query"] == "מה הציון העובר?"
+        assert second["answer"] == first["answer"]
+        assert second["search_results_count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_sa006_audited_hit_reruns_retrieval(self):
+        """SA-006: A sampled hit should be re-checked against a fresh retrieval in the background"""
+        cache = SemanticAnswerCache(audit_rate=1.0)
+        orchestrator = make_semantic_orchestrator(
+            cache, {"qa": unit(1.0, 0.0), "qb": unit(1.0, 0.05)}
+        )
+
+        await orchestrator.generate_answer("qa")
+        await orchestrator.generate_answer("qb")
+        await asyncio.gather(*orchestrator._audit_tasks)
+
+        assert orchestrator.search_service.hybrid_search.await_count == 2
+        assert cache.get_stats()["audits"] == 1
+        assert cache.get_stats()["false_hits"] == 0
+
+    @pytest.mark.asyncio
+    async def test_sa007_conversation_context_bypasses_semantic_cache(self):
+        """SA-007: Follow-up questions with conversation context should not use the semantic cache"""
+        cache = SemanticAnswerCache()
+        orchestrator = make_semantic_orchestrator(cache, {"ומה לגבי מועד ב?": unit(1.0)})
+
+        await orchestrator.generate_answer_with_context("ומה לגבי מועד ב?", "שאלה קודמת: מועד א")
+
+        orchestrator.embedding_service.generate_query_embedding.assert_not_called()
+        assert cache.get_stats()["stores"] == 0
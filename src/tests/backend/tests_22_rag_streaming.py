@@ -0,0 +1,173 @@
+"""
+RAG Streaming Tests
+Testing token streaming from Gemini through AnswerGenerator and RAGOrchestrator
+"""
+import threading
+import pytest
+from types import SimpleNamespace
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag import gemini_client
+from src.ai.services.rag.answer_generator import AnswerGenerator
+from src.ai.services.rag.rag_orchestrator import _streamable_text
+from src.tests.backend.tests_20_answer_cache import make_orchestrator
+
+
+async def fake_stream(*pieces):
+    for piece in pieces:
+        yield piece
+
+
+def make_generator():
+    generator = AnswerGenerator.__new__(AnswerGenerator)
+    generator.key_manager = None
+    generator.model = MagicMock()
+    generator.llm_config = MagicMock()
+    return generator
+
+
+class TestStreamingPrimitives:
+    """Test the Gemini stream bridge and the citation hold-back"""
+
+    @pytest.mark.asyncio
+    async def test_st001_stream_content_yields_chunk_text(self):
+        """ST-001: stream_content should relay each non-empty chunk from the SDK iterator"""
+        model = MagicMock()
+        model.generate_content.return_value = iter([
+            SimpleNamespace(text="שלום "), SimpleNamespace(text=""), SimpleNamespace(text="עולם")
+        ])
+
+        pieces = [piece async for piece in gemini_client.stream_content(model, "prompt")]
+
+        assert pieces == ["שלום ", "עולם"]
+        model.generate_content.assert_called_once_with("prompt", stream=True)
+
+    def test_st002_citation_marker_is_held_back(self):
+        """ST-002: Text that may start the citation marker should not be streamed yet"""
+        assert _streamable_text("הציון הוא 60 ") == "הציון הוא 60 "
+        assert _streamable_text("הציון הוא 60 [מק") == "הציון הוא 60 "
+        assert _streamable_text("הציון הוא 60 [מקורות: מקור 1]") == "הציון הוא 60 "
+
+
+class TestAnswerGeneratorStreaming:
+    """Test retry behaviour of AnswerGenerator.generate_answer_stream"""
+
+    @pytest.mark.asyncio
+    async def test_st003_retries_before_first_token(self):
+        """ST-003: A failure before any text is produced should be retried"""
+        generator = make_generator()
+        attempts = []
+
+        def stream(model, prompt, api_key=None):
+            attempts.append(api_key)
+            if len(attempts) == 1:
+                raise RuntimeError("connection reset")
+            return fake_stream("א", "ב")
+
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "k"}), \
+             patch.object(gemini_client, 'stream_content', side_effect=stream), \
+             patch('src.ai.services.rag.answer_generator.asyncio.sleep'):
+            pieces = [piece async for piece in generator.generate_answer_stream("prompt")]
+
+        assert pieces == ["א", "ב"]
+        assert len(attempts) == 2
+
+    @pytest.mark.asyncio
+    async def test_st004_failure_mid_stream_is_raised(self):
+        """ST-004: Once text was yielded, a failure should surface instead of restarting the answer"""
+        generator = make_generator()
+
+        async def broken(*args, **kwargs):
+            yield "א"
+            raise RuntimeError("stream dropped")
+
+        with patch.dict(os.environ, {"GEMINI_API_KEY": "k"}), \
+             patch.object(gemini_client, 'stream_content', side_effect=broken):
+            with pytest.raises(RuntimeError):
+                async for _ in generator.generate_answer_stream("prompt"):
+                    pass
+
+
+class TestOrchestratorStreaming:
+    """Test the event sequence produced by RAGOrchestrator.generate_answer_stream"""
+
+    @pytest.mark.asyncio
+    async def test_st005_sources_then_tokens_then_complete(self):
+        """ST-005: Sources should precede tokens; the citation marker is never streamed"""
+        orchestrator = make_orchestrator()
+        orchestrator.answer_generator.generate_answer_stream = MagicMock(
+            return_value=fake_stream("הציון ", "העובר הוא 60 ", "[מקורות: ", "מקור 1]")
+        )
+
+        events = [event async for event in orchestrator.generate_answer_stream("מה הציון העובר?")]
+
+        assert [event["type"] for event in events] == ["sources", "token", "token", "complete"]
+        assert events[0]["sources"] == ["מקור 1"]
+        assert "".join(event["content"] for event in events if event["type"] == "token") == "הציון העובר הוא 60 "
+        result = events[-1]["result"]
+        assert result["answer"] == "הציון העובר הוא 60"
+        assert result["cited_sources"] == ["מקור 1"]
+        orchestrator.answer_generator.generate_answer.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_st006_no_results_completes_without_tokens(self):
+        """ST-006: An empty retrieval should complete immediately with no sources"""
+        orchestrator = make_orchestrator()
+        orchestrator.search_service.hybrid_search.return_value = []
+
+        events = [event async for event in orchestrator.generate_answer_stream("שאלה")]
+
+        assert [event["type"] for event in events] == ["complete"]
+        assert events[0]["result"]["sources"] == []
+
+
+class TestChatServiceStreaming:
+    """Test how ChatService finishes a RAG stream"""
+
+    @pytest.mark.asyncio
+    async def test_st007_streamed_answer_without_sources_is_not_replaced(self):
+        """ST-007: Once RAG tokens were sent, a sourceless result should complete instead of falling back"""
+        from src.backend.app.services.chat_service import ChatService
+
+        async def rag_stream(**kwargs):
+            yield {"type": "token", "content": "partial answer"}
+            yield {"type": "complete", "result": {"answer": "partial answer", "sources": []}}
+
+        service = ChatService.__new__(ChatService)
+        service._is_conversation_question = MagicMock(return_value=False)
+        service._get_current_rag_service = AsyncMock(return_value=SimpleNamespace(generate_answer_stream=rag_stream))
+        service._prepare_rag_query = AsyncMock(return_value=("q", ""))
+        service._track_token_usage = AsyncMock()
+        service._generate_fallback_response = AsyncMock(return_value="second answer")
+
+        events = [event async for event in service.process_chat_message_stream("q")]
+
+        assert [event["type"] for event in events] == ["chunk", "complete"]
+        assert events[-1]["content"] == "partial answer" and events[-1]["sources"] == []
+        service._generate_fallback_response.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_st008_pipeline_lookup_runs_off_loop_and_is_not_stored(self):
+        """ST-008: A pool lookup (which may build a pipeline) should run in a thread and leave no per-request state on the service"""
+        from src.backend.app.services.chat_service import ChatService
+
+        threads = []
+        pipeline = SimpleNamespace(profile_name="balanced")
+
+        def get(profile):
+            threads.append(threading.get_ident())
+            return pipeline
+
+        service = ChatService.__new__(ChatService)
+        pool = MagicMock(get=MagicMock(side_effect=get))
+        with patch('src.backend.app.services.chat_service.rag_available', True), \
+                patch('src.backend.app.services.chat_service.get_pipeline_pool', return_value=pool):
+            assert await service._get_current_rag_service() is pipeline
+
+        assert threads and threads[0] != threading.get_ident()
+        assert vars(service) == {}
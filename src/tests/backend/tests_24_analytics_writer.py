@@ -0,0 +1,144 @@
+"""
+Analytics Writer Tests
+Testing buffered, batched search analytics writes
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.services.rag.analytics_writer import AnalyticsWriter
+from src.ai.services.rag.search_analytics import SearchAnalytics
+
+EXECUTE = 'src.ai.services.rag.analytics_writer.execute_async'
+
+
+def event(n):
+    return {"query_text": f"q{n}", "search_type": "hybrid"}
+
+
+def written_batches(supabase):
+    return [call.args[1]["p_events"] for call in supabase.rpc.call_args_list]
+
+
+class TestAnalyticsWriter:
+    """Test batching, bounds, retries and shutdown flushing"""
+
+    @pytest.mark.asyncio
+    async def test_aw001_full_batch_flushes_immediately(self):
+        """AW-001: Reaching batch_size should flush without waiting for the interval"""
+        supabase = MagicMock()
+        writer = AnalyticsWriter(supabase, batch_size=2, flush_interval=60)
+
+        with patch(EXECUTE, new=AsyncMock()):
+            writer.enqueue(event(1))
+            writer.enqueue(event(2))
+            for _ in range(5):
+                await asyncio.sleep(0)
+
+        assert written_batches(supabase) == [[event(1), event(2)]]
+        assert writer.get_stats()["written"] == 2
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_aw002_partial_batch_flushes_on_interval(self):
+        """AW-002: A partial batch should be written once the flush interval passes"""
+        supabase = MagicMock()
+        writer = AnalyticsWriter(supabase, batch_size=100, flush_interval=0.01)
+
+        with patch(EXECUTE, new=AsyncMock()):
+            writer.enqueue(event(1))
+            await asyncio.sleep(0.05)
+
+        assert written_batches(supabase) == [[event(1)]]
+        await writer.close()
+
+    def test_aw003_queue_is_bounded_and_drops_oldest(self):
+        """AW-003: A full queue should drop the oldest events first"""
+        writer = AnalyticsWriter(MagicMock(), max_queue_size=3)
+        for n in range(5):
+            writer.enqueue(event(n))
+
+        assert list(writer._queue) == [event(2), event(3), event(4)]
+        assert writer.get_stats()["dropped"] == 2
+
+    @pytest.mark.asyncio
+    async def test_aw004_failed_batch_is_retried_in_order(self):
+        """AW-004: A failed write keeps the events in front of newer ones for the next attempt"""
+        supabase = MagicMock()
+        writer = AnalyticsWriter(supabase, batch_size=10, max_queue_size=3)
+        writer.enqueue(event(1))
+        writer.enqueue(event(2))
+
+        with patch(EXECUTE, new=AsyncMock(side_effect=ConnectionError("db down"))):
+            assert await writer.flush_batch() is False
+        writer.enqueue(event(3))
+        writer.enqueue(event(4))
+
+        assert list(writer._queue) == [event(2), event(3), event(4)]
+        assert writer.get_stats()["failed_batches"] == 1
+        assert writer.get_stats()["dropped"] == 1
+        await writer.close()
+
+    @pytest.mark.asyncio
+    async def test_aw005_close_flushes_pending_events(self):
+        """AW-005: Shutdown should write everything still queued"""
+        supabase = MagicMock()
+        writer = AnalyticsWriter(supabase, batch_size=2, flush_interval=60)
+
+        with patch(EXECUTE, new=AsyncMock()):
+            for n in range(3):
+                writer.enqueue(event(n))
+            await writer.close()
+
+        assert sum(len(batch) for batch in written_batches(supabase)) == 3
+        assert writer.get_stats()["pending"] == 0
+
+    @pytest.mark.asyncio
+    async def test_aw007_unwritable_batches_are_discarded(self):
+        """AW-007: Permanent errors drop the batch at once; transient ones stop retrying after max_batch_attempts"""
+        from postgrest.exceptions import APIError
+
+        supabase = MagicMock()
+        writer = AnalyticsWriter(supabase, batch_size=2, max_batch_attempts=2)
+        for n in range(4):
+            writer.enqueue(event(n))
+
+        missing = APIError({"code": "PGRST202", "message": "Could not find the function"})
+        with patch(EXECUTE, new=AsyncMock(side_effect=missing)):
+            assert await writer.flush_batch() is True
+        assert list(writer._queue) == [event(2), event(3)]
+
+        with patch(EXECUTE, new=AsyncMock(side_effect=ConnectionError("db down"))):
+            assert await writer.flush_batch() is False
+            assert await writer.flush_batch() is True
+        assert len(writer._queue) == 0
+
+        stats = writer.get_stats()
+        assert (stats["discarded_batches"], stats["dropped"], stats["failed_batches"]) == (2, 4, 3)
+        await writer.close()
+
+
+class TestSearchAnalyticsBuffering:
+    """Test that SearchAnalytics hands rows to the writer"""
+
+    @pytest.mark.asyncio
+    async def test_aw006_log_enqueues_instead_of_rpc(self):
+        """AW-006: With a writer, logging should not call the database on the response path"""
+        analytics = SearchAnalytics.__new__(SearchAnalytics)
+        analytics.supabase = MagicMock()
+        analytics.performance_config = MagicMock(LOG_SEARCH_ANALYTICS=True, LOG_STAGE_TIMINGS=True)
+        analytics.db_config = MagicMock()
+        analytics.get_current_profile = lambda: "balanced"
+        analytics.writer = MagicMock()
+
+        await analytics.log_search_analytics("שאלה", "hybrid", 3, 0.8, 120, stage_timings={"search": 40})
+
+        analytics.supabase.rpc.assert_not_called()
+        row = analytics.writer.enqueue.call_args.args[0]
+        assert row["query_text"] == "שאלה"
+        assert row["stage_timings"] == {"search": 40}
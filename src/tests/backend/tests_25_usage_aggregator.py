@@ -0,0 +1,128 @@
+"""
+Usage Aggregator Tests
+Testing aggregated, batched API key usage recording
+"""
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.usage_aggregator import UsageAggregator
+from src.ai.core.database_key_manager import DatabaseKeyManager
+from src.ai.core.rate_governor import KeyRateGovernor
+from src.ai.core.gemini_key_manager import GeminiKeyManager, KeyUsage
+
+
+def make_db_manager(aggregator):
+    """DatabaseKeyManager in direct mode without touching Supabase"""
+    manager = DatabaseKeyManager.__new__(DatabaseKeyManager)
+    manager.use_direct_supabase = True
+    manager.supabase = MagicMock()
+    manager.usage_bulk_function = "record_api_key_usage_bulk"
+    manager.usage_aggregator = aggregator
+    manager.api_keys = [{"id": 11, "api_key": "k0"}]
+    manager._auto_refresh_task = None
+    manager.governor = KeyRateGovernor()
+    return manager
+
+
+class TestUsageAggregator:
+    """Test per-key, per-minute aggregation and flushing"""
+
+    @pytest.mark.asyncio
+    async def test_ua001_calls_collapse_into_one_row_per_key(self):
+        """UA-001: Many calls for a key in the same minute should be written as one row"""
+        writer = AsyncMock()
+        aggregator = UsageAggregator(writer, flush_interval=60)
+
+        for _ in range(50):
+            aggregator.add(1, 100)
+        aggregator.add(2, 30, requests_count=2)
+        assert await aggregator.flush() is True
+        await aggregator.close()
+
+        writer.assert_awaited_once()
+        rows = {row["api_key_id"]: row for row in writer.call_args.args[0]}
+        assert len(rows) == 2
+        assert (rows[1]["tokens_used"], rows[1]["requests_count"]) == (5000, 50)
+        assert (rows[2]["tokens_used"], rows[2]["requests_count"]) == (30, 2)
+        assert rows[1]["usage_minute"].endswith(":00+00:00")
+
+    @pytest.mark.asyncio
+    async def test_ua002_failed_write_is_retried_with_new_usage(self):
+        """UA-002: A failed flush should keep its totals and merge them with usage counted since"""
+        writer = AsyncMock(side_effect=[Exception("db down"), None])
+        aggregator = UsageAggregator(writer, flush_interval=60)
+
+        aggregator.add(1, 100)
+        assert await aggregator.flush() is False
+        aggregator.add(1, 50)
+        assert aggregator.get_stats()["pending_rows"] == 1
+        assert await aggregator.flush() is True
+        await aggregator.close()
+
+        row = writer.call_args.args[0][0]
+        assert (row["tokens_used"], row["requests_count"]) == (150, 2)
+        assert aggregator.get_stats()["consecutive_failures"] == 0
+
+    @pytest.mark.asyncio
+    async def test_ua003_background_task_flushes_on_interval(self):
+        """UA-003: A single background task should write pending usage without an explicit flush"""
+        writer = AsyncMock()
+        aggregator = UsageAggregator(writer, flush_interval=0.01)
+
+        aggregator.add(1, 10)
+        aggregator.add(1, 10)
+        for _ in range(20):
+            if writer.await_count:
+                break
+            await asyncio.sleep(0.01)
+        await aggregator.close()
+
+        assert writer.await_count == 1
+        assert writer.call_args.args[0][0]["tokens_used"] == 20
+
+
+class TestKeyManagerUsageRecording:
+    """Test that key managers hand usage to the aggregator"""
+
+    @pytest.mark.asyncio
+    async def test_ua004_record_usage_does_not_write_per_call(self):
+        """UA-004: record_usage should queue usage and write it later through the bulk RPC"""
+        manager = make_db_manager(None)
+        manager.usage_aggregator = UsageAggregator(manager._write_usage_rows, flush_interval=60)
+
+        with patch('src.ai.core.database_key_manager.execute_async', new=AsyncMock()) as execute:
+            await manager.record_usage(11, 200)
+            await manager.record_usage(11, 300)
+            execute.assert_not_awaited()
+
+            await manager.usage_aggregator.close()
+
+        execute.assert_awaited_once()
+        manager.supabase.table.assert_not_called()
+        function_name, params = manager.supabase.rpc.call_args.args
+        assert function_name == "record_api_key_usage_bulk"
+        assert params["p_rows"][0]["tokens_used"] == 500
+
+    @pytest.mark.asyncio
+    async def test_ua005_track_usage_does_not_spawn_threads(self):
+        """UA-005: GeminiKeyManager.track_usage should add to the aggregator instead of starting a thread"""
+        aggregator = MagicMock()
+        manager = GeminiKeyManager.__new__(GeminiKeyManager)
+        manager.api_keys = ["k0"]
+        manager.current_key_index = 0
+        manager.usage = {"k0": KeyUsage()}
+        manager.persistence = MagicMock()
+        manager.database_manager = make_db_manager(aggregator)
+        manager.limits = {'requests_per_minute': 15, 'requests_per_day': 1500, 'tokens_per_day': 1000000}
+
+        with patch('threading.Thread') as thread:
+            manager.track_usage(120)
+
+        thread.assert_not_called()
+        aggregator.add.assert_called_once_with(11, 120, 1)
@@ -0,0 +1,90 @@
+"""
+Token Persistence Tests
+Testing the append-only token usage log and its in-memory rollups
+"""
+import json
+import sqlite3
+import sys
+import os
+from datetime import date, timedelta
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.token_persistence import TokenUsagePersistence
+
+
+def open_store(tmp_path, **kwargs):
+    return TokenUsagePersistence(
+        data_file=str(tmp_path / "usage.sqlite3"), legacy_file=str(tmp_path / "legacy.json"), **kwargs
+    )
+
+
+class TestTokenUsagePersistence:
+    """Test appends, rollups, reload and compaction"""
+
+    def test_tp001_updates_roll_up_in_memory(self, tmp_path):
+        """TP-001: Minute, key and daily totals should reflect every update"""
+        store = open_store(tmp_path)
+        store.update_usage(0, 100)
+        store.update_usage(0, 50)
+        store.update_usage(2, 10, requests_count=3)
+
+        assert store.get_current_minute_usage(0) == {"tokens": 150, "requests": 2}
+        assert store.get_key_usage_today(2)["requests_count"] == 3
+        assert store.get_key_usage_today(5)["tokens_used"] == 0
+        summary = store.get_daily_summary()
+        assert (summary["total_tokens"], summary["total_requests"]) == (160, 5)
+        assert sorted(summary["active_keys"]) == [0, 2]
+        store.close()
+
+    def test_tp002_updates_append_rows_and_survive_reopen(self, tmp_path):
+        """TP-002: Each update should append one row, and a new instance should rebuild the rollups"""
+        store = open_store(tmp_path)
+        for _ in range(3):
+            store.update_usage(1, 20)
+        store.close()
+
+        conn = sqlite3.connect(str(tmp_path / "usage.sqlite3"))
+        assert conn.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 3
+        conn.close()
+
+        reopened = open_store(tmp_path)
+        usage = reopened.get_all_keys_usage_today()["key_1"]
+        assert (usage["tokens_used"], usage["requests_count"]) == (60, 3)
+        assert reopened.get_current_minute_usage(1)["tokens"] == 60
+        reopened.close()
+
+    def test_tp003_compaction_folds_previous_days(self, tmp_path):
+        """TP-003: Events from earlier days should become one rollup row per key and day"""
+        store = open_store(tmp_path)
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        store._conn.executemany(
+            "INSERT INTO usage_events (day, minute, created_at, key_index, tokens, requests) VALUES (?, ?, ?, ?, ?, ?)",
+            [(yesterday, "m", f"{yesterday}T10:00:00", 0, 5, 1)] * 4
+        )
+        store.update_usage(0, 7)
+        store.compact()
+
+        rows = store._conn.execute("SELECT day, key_index, tokens, requests FROM daily_rollups").fetchall()
+        assert rows == [(yesterday, 0, 20, 4)]
+        assert store._conn.execute("SELECT COUNT(*) FROM usage_events").fetchone()[0] == 1
+        assert store.get_key_usage_today(0)["tokens_used"] == 7
+        store.close()
+
+    def test_tp004_legacy_json_is_imported_once(self, tmp_path):
+        """TP-004: A new store should import today's totals from the old JSON file"""
+        today = date.today().isoformat()
+        (tmp_path / "legacy.json").write_text(json.dumps({
+            "keys_usage": {"key_3": {today: {"tokens_used": 900, "requests_count": 9,
+                                             "first_request": f"{today}T08:00:00"}}},
+            "daily_totals": {}
+        }))
+
+        store = open_store(tmp_path)
+        store.update_usage(3, 100)
+
+        usage = store.get_key_usage_today(3)
+        assert (usage["tokens_used"], usage["requests_count"]) == (1000, 10)
+        assert usage["first_request"] == f"{today}T08:00:00"
+        store.close()
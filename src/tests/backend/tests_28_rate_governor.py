@@ -0,0 +1,158 @@
+"""
+Rate Governor Tests
+Testing per-key RPM/TPM token buckets and headroom-based key selection
+"""
+import time
+import pytest
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.rate_governor import KeyRateGovernor, TokenBucket
+from src.tests.backend.tests_27_key_leasing import make_manager
+from src.tests.backend.tests_16_embedding_service import make_service
+from src.ai.core.gemini_key_manager import safe_embed_content
+
+
+class TestKeyRateGovernor:
+    """Test bucket accounting"""
+
+    def test_rg001_bucket_refills_at_per_minute_rate(self):
+        """RG-001: A drained bucket should refill at capacity/60 per second, up to capacity"""
+        with patch('src.ai.core.rate_governor.time.monotonic', return_value=100.0):
+            bucket = TokenBucket(60)
+            bucket.take(60, 100.0)
+
+        assert bucket.available(100.0) == 0
+        assert bucket.available(105.0) == pytest.approx(5)
+        assert bucket.seconds_until(10, 105.0) == pytest.approx(5)
+        assert bucket.available(1000.0) == 60
+
+    def test_rg002_tokens_and_requests_both_limit_headroom(self):
+        """RG-002: Headroom should follow the tighter of the RPM and TPM budgets"""
+        governor = KeyRateGovernor(requests_per_minute=10, tokens_per_minute=1000)
+
+        governor.take_request(1)
+        assert governor.headroom(1) == pytest.approx(0.9, abs=0.01)
+
+        governor.record_tokens(1, 1500)
+        assert governor.can_admit(1) is False
+        assert governor.headroom(1) < 0
+        assert governor.wait_time(1) > 0
+
+    def test_rg006_configure_key_updates_existing_buckets(self):
+        """RG-006: A changed per-key RPM limit should apply to a bucket that already exists"""
+        governor = KeyRateGovernor(requests_per_minute=15)
+        governor.headroom(1)
+        governor.configure_key(1, 60)
+        assert governor.snapshot()["1"]["requests_per_minute"] == 60
+
+        governor.configure_key(1, 5)
+        snapshot = governor.snapshot()["1"]
+        assert snapshot["requests_per_minute"] == 5
+        assert snapshot["requests_available"] <= 5
+
+
+class TestHeadroomKeySelection:
+    """Test that key selection follows local headroom"""
+
+    @pytest.mark.asyncio
+    async def test_rg003_lease_prefers_key_with_most_headroom(self):
+        """RG-003: A key that used most of its token budget should not be picked while others are idle"""
+        manager = make_manager(2)
+        manager.governor.record_tokens(1, 900000)
+
+        for _ in range(3):
+            async with manager.lease_key() as lease:
+                assert lease.key_id == 2
+
+    @pytest.mark.asyncio
+    async def test_rg004_saturated_keys_queue_then_lease(self):
+        """RG-004: When every key is saturated the lease should wait for a refill instead of failing"""
+        manager = make_manager(1)
+        manager.governor = KeyRateGovernor(requests_per_minute=600)
+        manager.governor.drain(1)
+
+        started = time.monotonic()
+        lease = await manager.acquire_key()
+
+        assert lease is not None and lease.key_id == 1
+        assert time.monotonic() - started >= 0.05
+
+        manager.governor = KeyRateGovernor(requests_per_minute=1)
+        manager.governor.drain(1)
+        manager.lease_max_wait = 0.1
+        assert await manager.acquire_key() is None
+
+    @pytest.mark.asyncio
+    async def test_rg005_rotation_makes_no_network_calls(self):
+        """RG-005: get_available_key should rotate on local headroom without polling the backend"""
+        manager = make_manager(2)
+        manager.use_direct_supabase = False
+        manager.base_url = "http://backend"
+        manager.client = MagicMock()
+        manager.client.get = AsyncMock()
+        manager.client.post = AsyncMock()
+
+        first = await manager.get_available_key()
+        again = await manager.get_available_key()
+        manager.client.post.assert_not_called()
+
+        await manager.mark_rate_limited(first["id"])
+        rotated = await manager.get_available_key()
+
+        assert first["id"] == again["id"] == 1
+        assert rotated["id"] == 2
+        manager.client.get.assert_not_called()
+        manager.client.post.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_rg009_unleased_keys_count_against_rpm(self):
+        """RG-009: Keys handed out by get_available_key should be charged to their RPM bucket"""
+        manager = make_manager(2)
+        manager.governor = KeyRateGovernor(requests_per_minute=10)
+
+        for _ in range(5):
+            await manager.get_available_key()
+
+        assert manager.governor.headroom(1) + manager.governor.headroom(2) == pytest.approx(1.5, abs=0.01)
+
+
+class TestQuotaCooldown:
+    """Test that quota errors from Gemini put the leased key into cooldown"""
+
+    @pytest.mark.asyncio
+    async def test_rg007_quota_error_drains_the_leased_key(self):
+        """RG-007: A 429 from an ingestion or query embedding call should drain the key before the lease is released"""
+        quota = RuntimeError("429 RESOURCE_EXHAUSTED: quota exceeded")
+        manager = make_manager(2)
+        service = make_service()
+        service.key_manager = manager
+
+        with patch('src.ai.services.rag.gemini_client.embed_content', AsyncMock(side_effect=quota)), \
+                patch('src.ai.core.gemini_key_manager.get_key_manager', return_value=manager):
+            with pytest.raises(RuntimeError):
+                await safe_embed_content(model="models/embedding-001", content="text", task_type="retrieval_document")
+            with pytest.raises(RuntimeError):
+                await service._embed_texts(["query"])
+
+        assert manager.governor.can_admit(1) is False
+        assert manager.governor.can_admit(2) is False
+        assert "last_rate_limit" in manager.key_usage_stats[1]
+        assert manager.active_leases == {}
+
+    @pytest.mark.asyncio
+    async def test_rg008_other_errors_keep_the_key_available(self):
+        """RG-008: A non-quota failure should release the key without draining it"""
+        manager = make_manager(1)
+
+        with patch('src.ai.services.rag.gemini_client.embed_content', AsyncMock(side_effect=RuntimeError("400 bad request"))), \
+                patch('src.ai.core.gemini_key_manager.get_key_manager', return_value=manager):
+            with pytest.raises(RuntimeError):
+                await safe_embed_content(model="models/embedding-001", content="text", task_type="retrieval_document")
+
+        assert manager.governor.can_admit(1) is True
+        assert "last_rate_limit" not in manager.key_usage_stats.get(1, {})
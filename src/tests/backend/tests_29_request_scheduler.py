@@ -0,0 +1,140 @@
+"""
+Request Scheduler Tests
+Testing priority lanes, per-lane concurrency and quota-aware admission
+"""
+import asyncio
+import threading
+import pytest
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.request_scheduler import RequestScheduler, LANE_CHAT, LANE_TITLE, LANE_INGESTION
+from src.ai.core.rate_governor import KeyRateGovernor
+from src.tests.backend.tests_27_key_leasing import make_manager
+
+
+def make_scheduler(chat=2, title=1, ingestion=1, ingestion_headroom=None):
+    return RequestScheduler(
+        concurrency={LANE_CHAT: chat, LANE_TITLE: title, LANE_INGESTION: ingestion},
+        min_headroom={LANE_INGESTION: ingestion_headroom},
+        recheck_interval=0.02
+    )
+
+
+class TestRequestScheduler:
+    """Test lane limits and priority order"""
+
+    @pytest.mark.asyncio
+    async def test_rs001_lane_concurrency_is_capped(self):
+        """RS-001: No more than the lane's limit should run at once, and every call should finish"""
+        scheduler = make_scheduler(ingestion=2)
+        running = peak = 0
+
+        async def job():
+            nonlocal running, peak
+            async with scheduler.slot(LANE_INGESTION):
+                running += 1
+                peak = max(peak, running)
+                await asyncio.sleep(0.01)
+                running -= 1
+
+        await asyncio.gather(*(job() for _ in range(6)))
+
+        assert peak == 2
+        stats = scheduler.get_stats()["lanes"][LANE_INGESTION]
+        assert (stats["active"], stats["waiting"], stats["admitted"]) == (0, 0, 6)
+
+    @pytest.mark.asyncio
+    async def test_rs002_chat_waiters_are_served_before_ingestion(self):
+        """RS-002: When quota frees up, queued chats should start before queued ingestion work"""
+        headroom = {"value": 0.0}
+        scheduler = RequestScheduler(
+            concurrency={LANE_CHAT: 4, LANE_TITLE: 1, LANE_INGESTION: 4},
+            min_headroom={LANE_CHAT: 0.5, LANE_INGESTION: 0.5},
+            recheck_interval=0.02
+        )
+        scheduler.set_headroom_source(lambda: headroom["value"])
+        order = []
+
+        async def job(lane, name):
+            async with scheduler.slot(lane):
+                order.append(name)
+
+        tasks = [asyncio.create_task(job(LANE_INGESTION, "ingest-1"))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(job(LANE_CHAT, "chat-1")))
+        tasks.append(asyncio.create_task(job(LANE_INGESTION, "ingest-2")))
+        tasks.append(asyncio.create_task(job(LANE_CHAT, "chat-2")))
+        await asyncio.sleep(0.05)
+        assert order == []
+
+        headroom["value"] = 1.0
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=1)
+
+        assert order[:2] == ["chat-1", "chat-2"]
+        assert sorted(order[2:]) == ["ingest-1", "ingest-2"]
+
+    @pytest.mark.asyncio
+    async def test_rs003_ingestion_waits_for_key_headroom(self):
+        """RS-003: Ingestion should hold back while keys are busy, chats should not"""
+        manager = make_manager(1)
+        manager.governor = KeyRateGovernor(requests_per_minute=10)
+        scheduler = make_scheduler(ingestion_headroom=0.3)
+        scheduler.attach_key_manager(manager)
+        for _ in range(8):
+            manager.governor.take_request(1)
+
+        async with scheduler.slot(LANE_CHAT):
+            pass
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(scheduler.acquire(LANE_INGESTION), timeout=0.1)
+        assert scheduler.get_stats()["lanes"][LANE_INGESTION]["waiting"] == 0
+
+        manager.governor = KeyRateGovernor(requests_per_minute=10)
+        scheduler.set_headroom_source(None)
+        scheduler.attach_key_manager(manager)
+        await asyncio.wait_for(scheduler.acquire(LANE_INGESTION), timeout=0.5)
+        scheduler.release(LANE_INGESTION)
+        assert scheduler.get_stats()["lanes"][LANE_INGESTION]["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_rs004_cancelled_waiter_frees_its_place(self):
+        """RS-004: A waiter cancelled while queued should not leak a slot"""
+        scheduler = make_scheduler(title=1)
+        await scheduler.acquire(LANE_TITLE)
+
+        waiter = asyncio.create_task(scheduler.acquire(LANE_TITLE))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        scheduler.release(LANE_TITLE)
+        await asyncio.sleep(0.01)
+        assert scheduler.get_stats()["lanes"][LANE_TITLE]["active"] == 0
+        await asyncio.wait_for(scheduler.acquire(LANE_TITLE), timeout=0.5)
+
+    @pytest.mark.asyncio
+    async def test_rs005_limits_are_shared_across_event_loops(self):
+        """RS-005: Ingestion running on a background thread's loop should share the lane limit"""
+        scheduler = make_scheduler(ingestion=1)
+        await scheduler.acquire(LANE_INGESTION)
+        acquired = threading.Event()
+
+        def background():
+            async def run():
+                async with scheduler.slot(LANE_INGESTION):
+                    acquired.set()
+            asyncio.run(run())
+
+        thread = threading.Thread(target=background)
+        thread.start()
+        await asyncio.sleep(0.05)
+        assert not acquired.is_set()
+
+        scheduler.release(LANE_INGESTION)
+        await asyncio.to_thread(thread.join, 2)
+        assert acquired.is_set()
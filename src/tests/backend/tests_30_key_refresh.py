@@ -0,0 +1,140 @@
+"""
+Key Refresh Tests
+Testing the immutable key snapshot, background refresh-ahead and pushed key changes
+"""
+import asyncio
+import dataclasses
+import time
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.database_key_manager import DatabaseKeyManager
+from src.ai.services.rag import gemini_client
+
+KEYS = [{"id": 1, "key_name": "Key 0", "api_key": "k0"}, {"id": 2, "key_name": "Key 1", "api_key": "k1"}]
+
+
+def make_refreshing_manager(fetch):
+    """Real DatabaseKeyManager (HTTP mode) whose key source is replaced by `fetch`"""
+    manager = DatabaseKeyManager()
+    manager._fetch_keys = AsyncMock(side_effect=fetch)
+    manager._restore_last_active_key = AsyncMock()
+    manager.usage_aggregator = None
+    return manager
+
+
+class TestKeySnapshotLoading:
+    """Test that request paths never wait on key refreshes"""
+
+    @pytest.mark.asyncio
+    async def test_kr001_cold_start_loads_keys_once(self):
+        """KR-001: Concurrent first requests should share a single key load"""
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return KEYS
+
+        manager = make_refreshing_manager(fetch)
+        leases = await asyncio.gather(*(manager.acquire_key() for _ in range(5)))
+
+        assert all(lease is not None for lease in leases)
+        manager._fetch_keys.assert_awaited_once()
+        assert manager.get_usage_stats()["refresher_running"] is True
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_kr002_stale_keys_are_served_while_refreshing(self):
+        """KR-002: An expired snapshot should be served immediately and refreshed in the background"""
+        async def fetch():
+            await asyncio.sleep(0.2)
+            return KEYS + [{"id": 3, "key_name": "Key 2", "api_key": "k2"}]
+
+        manager = make_refreshing_manager(fetch)
+        manager.api_keys = KEYS
+        manager.last_refresh = datetime.now() - timedelta(hours=2)
+
+        started = time.monotonic()
+        lease = await manager.acquire_key()
+        assert lease is not None and time.monotonic() - started < 0.1
+        assert len(manager.api_keys) == 2
+
+        await asyncio.sleep(0.3)
+        manager._fetch_keys.assert_awaited_once()
+        assert len(manager.api_keys) == 3
+        await manager.close()
+
+
+class TestKeySnapshotUpdates:
+    """Test snapshot immutability, pushes and failed refreshes"""
+
+    @pytest.mark.asyncio
+    async def test_kr003_subscribers_get_changed_snapshots_only(self):
+        """KR-003: Refreshes should swap in a new snapshot and push it only when the keys changed"""
+        results = [KEYS, KEYS, KEYS[:1]]
+        manager = make_refreshing_manager(lambda: results.pop(0))
+        seen = []
+        manager.subscribe(lambda snapshot: seen.append(snapshot.version))
+
+        assert await manager.refresh_keys() is True
+        first = manager.snapshot
+        await manager.refresh_keys()
+        await manager.refresh_keys()
+
+        assert seen == [1, 2]
+        assert len(first.keys) == 2 and len(manager.snapshot.keys) == 1
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            first.keys = ()
+        await manager.close()
+
+    @pytest.mark.asyncio
+    async def test_kr004_failed_refresh_keeps_snapshot_and_backs_off(self):
+        """KR-004: Failed refreshes should keep the current keys and retry with growing delays"""
+        outcomes = [RuntimeError("db down"), RuntimeError("db down"), KEYS[:1]]
+
+        def fetch():
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        manager = make_refreshing_manager(fetch)
+        manager.refresh_retry_min = 0.01
+        manager.api_keys = KEYS
+        manager.last_refresh = datetime.now() - timedelta(hours=2)
+
+        manager._ensure_refresher()
+        await asyncio.sleep(0.01)
+        assert len(manager.api_keys) == 2
+        await asyncio.sleep(0.2)
+
+        assert manager._fetch_keys.await_count == 3
+        assert len(manager.api_keys) == 1
+        await manager.close()
+        assert manager.get_usage_stats()["refresher_running"] is False
+
+    @pytest.mark.asyncio
+    async def test_kr006_empty_key_table_is_not_polled_in_a_tight_loop(self):
+        """KR-006: A refresh that finds no active keys should wait refresh_retry_min before the next one"""
+        manager = make_refreshing_manager(lambda: [])
+        manager.refresh_retry_min = 0.1
+
+        manager._ensure_refresher()
+        await asyncio.sleep(0.25)
+
+        assert 1 <= manager._fetch_keys.await_count <= 4
+        await manager.close()
+
+    def test_kr005_removed_keys_drop_cached_clients(self):
+        """KR-005: Gemini clients for keys that left the snapshot should be released"""
+        gemini_client.get_client("kept-key")
+        gemini_client.get_client("removed-key")
+
+        gemini_client.retain_clients(["kept-key", None])
+
+        assert "kept-key" in gemini_client._clients
+        assert "removed-key" not in gemini_client._clients
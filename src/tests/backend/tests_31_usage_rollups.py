@@ -0,0 +1,135 @@
+"""
+Usage Rollup Tests
+Testing that key usage is read from per-key rollup rows instead of api_key_usage scans
+"""
+import threading
+import pytest
+from datetime import date, datetime, timedelta, timezone
+from unittest.mock import patch, MagicMock, AsyncMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.usage_aggregator import split_usage_rollups
+from src.backend.app.services.api_key_services import ApiKeyService
+from src.backend.app.api.routes import api_keys as api_keys_routes
+from src.backend.app.utils.cache import api_keys_cache
+from src.tests.backend.tests_27_key_leasing import make_manager
+
+
+def current_minute():
+    return datetime.now(timezone.utc).replace(second=0, microsecond=0)
+
+
+def rollup_row(key_id, usage_date, usage_minute, tokens=100, requests=2):
+    return {
+        "api_key_id": key_id,
+        "usage_date": usage_date,
+        "daily_tokens": tokens * 10,
+        "daily_requests": requests * 10,
+        "usage_minute": usage_minute,
+        "minute_tokens": tokens,
+        "minute_requests": requests,
+    }
+
+
+def make_supabase(rows):
+    """Supabase mock whose every table query returns the given rows"""
+    supabase = MagicMock()
+    query = supabase.table.return_value
+    query.select.return_value = query
+    query.in_.return_value = query
+    query.eq.return_value = query
+    query.execute.return_value = MagicMock(data=rows)
+    return supabase
+
+
+class TestRollupParsing:
+    """Test conversion of rollup rows into daily and minute usage"""
+
+    def test_ur001_only_current_day_and_minute_count(self):
+        """UR-001: Rollups for an earlier day or minute should read as zero usage"""
+        today = date.today().isoformat()
+        minute = current_minute()
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        rows = [
+            rollup_row(1, today, minute.isoformat().replace("+00:00", "Z")),
+            rollup_row(2, today, (minute - timedelta(minutes=3)).isoformat()),
+            rollup_row(3, yesterday, (minute - timedelta(days=1)).isoformat()),
+        ]
+
+        daily, per_minute = split_usage_rollups(rows, today, minute)
+
+        assert daily == {1: {"tokens": 1000, "requests": 20}, 2: {"tokens": 1000, "requests": 20}}
+        assert per_minute == {1: {"tokens": 100, "requests": 2}}
+
+
+class TestRollupReaders:
+    """Test that dashboard and status readers use one rollup row per key"""
+
+    @pytest.mark.asyncio
+    async def test_ur002_key_usage_reads_rollup_table(self):
+        """UR-002: get_key_current_usage should read the rollup table, not api_key_usage"""
+        supabase = make_supabase([rollup_row(7, date.today().isoformat(), current_minute().isoformat())])
+
+        usage = await ApiKeyService(supabase).get_key_current_usage(7)
+
+        assert usage == {"daily_tokens": 1000, "daily_requests": 20, "minute_tokens": 100, "minute_requests": 2}
+        supabase.table.assert_called_once_with("api_key_usage_rollups")
+
+    @pytest.mark.asyncio
+    async def test_ur003_dashboard_uses_rollups_without_aggregation(self):
+        """UR-003: GET /api/keys/ should build key status from rollups and skip the aggregation RPCs"""
+        api_keys_cache.clear()
+        keys = [{"id": 1, "key_name": "a"}, {"id": 2, "key_name": "b"}]
+        rollups = ({1: {"tokens": 500, "requests": 950}}, {2: {"tokens": 50, "requests": 9}})
+        supabase = MagicMock()
+
+        with patch.object(ApiKeyService, 'get_all_keys', AsyncMock(return_value=keys)), \
+             patch.object(ApiKeyService, 'get_current_active_key_index', AsyncMock(return_value=0)), \
+             patch.object(ApiKeyService, 'get_usage_rollups', AsyncMock(return_value=rollups)):
+            result = await api_keys_routes.get_api_keys(supabase_client=supabase)
+
+        statuses = result["key_management"]["keys_status"]
+        assert [s["status"] for s in statuses] == ["blocked", "rate_limited"]
+        assert result["key_management"]["daily_summary"]["total_tokens"] == 500
+        supabase.rpc.assert_not_called()
+        api_keys_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_ur005_aggregated_fallback_runs_off_loop(self):
+        """UR-005: Without rollups, the dashboard's aggregation RPC should not run on the event loop thread"""
+        api_keys_cache.clear()
+        keys = [{"id": 1, "key_name": "a"}]
+        threads = []
+        row = {"api_key_id": 1, "daily_tokens": 300, "daily_requests": 3, "minute_tokens": 0, "minute_requests": 0}
+
+        def execute():
+            threads.append(threading.get_ident())
+            return MagicMock(data=[row])
+
+        supabase = MagicMock()
+        supabase.rpc.return_value.execute.side_effect = execute
+
+        with patch.object(ApiKeyService, 'get_all_keys', AsyncMock(return_value=keys)), \
+             patch.object(ApiKeyService, 'get_current_active_key_index', AsyncMock(return_value=0)), \
+             patch.object(ApiKeyService, 'get_usage_rollups', AsyncMock(side_effect=RuntimeError("no rollups"))):
+            result = await api_keys_routes.get_api_keys(supabase_client=supabase)
+
+        assert result["key_management"]["daily_summary"]["total_tokens"] == 300
+        assert threads and threads[0] != threading.get_ident()
+        api_keys_cache.clear()
+
+    @pytest.mark.asyncio
+    async def test_ur004_detailed_status_reads_rollups(self):
+        """UR-004: The AI service key status should come from one rollup query"""
+        manager = make_manager(2)
+        manager.supabase = make_supabase([rollup_row(2, date.today().isoformat(), current_minute().isoformat())])
+
+        status = await manager.get_detailed_status()
+
+        manager.supabase.table.assert_called_once_with("api_key_usage_rollups")
+        assert [k["tokens_today"] for k in status["keys_status"]] == [0, 1000]
+        assert status["keys_status"][1]["requests_current_minute"] == 2
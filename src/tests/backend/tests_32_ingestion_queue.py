@@ -0,0 +1,279 @@
+"""
+Ingestion Queue Tests
+Testing durable ingestion jobs, leases, the worker pool, retries and progress
+"""
+import asyncio
+import time
+import pytest
+from unittest.mock import MagicMock
+import sys
+import os
+
+# Add src/ai to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '../../ai'))
+
+from src.ai.core.job_store import SQLiteJobStore, QUEUED, RUNNING, COMPLETED, FAILED
+from src.ai.services.ingestion_queue import IngestionQueue, _create_store
+
+
+class FakeProcessor:
+    """DocumentProcessor stand-in; `outcomes` lists per-call results (dicts or exceptions)"""
+
+    def __init__(self, outcomes=None, delay=0.0, url="temp:///tmp/gone.pdf"):
+        self.outcomes = list(outcomes or [])
+        self.delay = delay
+        self.calls = []
+        self.cleared = []
+        self.running = self.peak = 0
+        self.supabase = MagicMock()
+        query = self.supabase.table.return_value
+        query.select.return_value = query
+        query.update.return_value = query
+        query.eq.return_value = query
+        query.execute.return_value = MagicMock(data=[{"id": 1, "url": url}])
+        self.db_config = MagicMock(DOCUMENTS_TABLE="documents")
+
+    async def process_document(self, document_id, file_path, progress=None):
+        self.calls.append(document_id)
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            if progress:
+                progress(0.5, "halfway")
+            await asyncio.sleep(self.delay)
+            outcome = self.outcomes.pop(0) if self.outcomes else {"success": True}
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        finally:
+            self.running -= 1
+
+    async def delete_document_embeddings(self, document_id):
+        raise AssertionError("retries must not delete the stored chunk set")
+
+    async def delete_legacy_embeddings(self, document_id):
+        self.cleared.append(document_id)
+        return 0
+
+
+def make_queue(store, processor, **kwargs):
+    options = dict(workers=2, lease_seconds=30, retry_base=0.05, retry_max=0.2, idle_poll=0.05)
+    options.update(kwargs)
+    return IngestionQueue(store, processor_factory=lambda: processor, **options)
+
+
+async def wait_for_status(store, job_ids, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if all(store.get(job_id)["status"] == status for job_id in job_ids):
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError(f"jobs {job_ids} did not reach {status}: {[store.get(j) for j in job_ids]}")
+
+
+def upload(tmp_path, name="doc.pdf"):
+    path = tmp_path / name
+    path.write_bytes(b"content")
+    return str(path)
+
+
+class TestJobStore:
+    """Test enqueueing, leasing and persistence in the SQLite job store"""
+
+    def test_iq001_enqueue_is_idempotent_and_leases_expire(self, tmp_path):
+        """IQ-001: One active job per document; a job with an expired lease can be claimed again"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        first = store.enqueue(7)
+        assert store.enqueue(7, "/tmp/upload.pdf") == first
+        assert store.get(first)["file_path"] == "/tmp/upload.pdf"
+
+        job = store.claim("worker-a", lease_seconds=0)
+        assert (job["id"], job["status"], job["attempts"]) == (first, RUNNING, 1)
+
+        time.sleep(0.01)
+        reclaimed = store.claim("worker-b", lease_seconds=30)
+        assert reclaimed["lease_owner"] == "worker-b" and reclaimed["attempts"] == 2
+        assert store.heartbeat(first, "worker-a", 30) is False
+        assert store.heartbeat(first, "worker-b", 30, progress=0.4, note="embedding") is True
+        assert store.claim("worker-c", lease_seconds=30) is None
+        store.close()
+
+    def test_iq002_jobs_survive_restarts(self, tmp_path):
+        """IQ-002: Jobs queued before a restart should be claimable from a reopened store"""
+        path = str(tmp_path / "jobs.sqlite3")
+        store = SQLiteJobStore(path)
+        job_id = store.enqueue(3, "/tmp/a.pdf")
+        store.close()
+
+        reopened = SQLiteJobStore(path)
+        job = reopened.claim("worker", lease_seconds=30)
+        assert job["id"] == job_id and job["document_id"] == 3
+        assert reopened.finish(job_id, "worker", COMPLETED) is True
+        assert reopened.counts() == {COMPLETED: 1}
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_iq008_local_uploads_are_pinned_to_their_host(self, tmp_path):
+        """IQ-008: Jobs with a local file go only to workers on the uploading host; others go anywhere"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        queue = make_queue(store, FakeProcessor())
+
+        pinned = await queue.enqueue(1, upload(tmp_path))
+        shared = await queue.enqueue(2)
+        assert store.get(pinned)["host"] == queue.host and store.get(shared)["host"] is None
+
+        assert store.claim("elsewhere", 30, host="other-host")["id"] == shared
+        assert store.claim("elsewhere", 30, host="other-host") is None
+        assert store.claim("here", 30, host=queue.host)["id"] == pinned
+        store.close()
+
+    def test_iq009_anon_key_does_not_select_the_shared_store(self, tmp_path, monkeypatch):
+        """IQ-009: Without the service role key the queue should fall back to SQLite, not the anon client"""
+        monkeypatch.delenv("INGESTION_QUEUE_BACKEND", raising=False)
+        monkeypatch.delenv("SUPABASE_SERVICE_KEY", raising=False)
+        monkeypatch.setenv("SUPABASE_URL", "https://example.supabase.co")
+        monkeypatch.setenv("SUPABASE_KEY", "anon-key")
+        monkeypatch.setenv("INGESTION_QUEUE_PATH", str(tmp_path / "jobs.sqlite3"))
+
+        store = _create_store(MagicMock(INGESTION_QUEUE_BACKEND="supabase"))
+
+        assert isinstance(store, SQLiteJobStore)
+        store.close()
+
+
+class TestIngestionWorkers:
+    """Test the worker pool: concurrency, wake-ups, retries and shutdown"""
+
+    @pytest.mark.asyncio
+    async def test_iq003_workers_run_jobs_concurrently_without_polling_delay(self, tmp_path):
+        """IQ-003: Enqueued jobs should start immediately and run up to `workers` at a time"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        processor = FakeProcessor(delay=0.05)
+        queue = make_queue(store, processor, workers=3, idle_poll=30)
+        processor.supabase.table.return_value.execute.return_value = MagicMock(data=[])
+        await queue.start()
+
+        started = time.monotonic()
+        job_ids = [await queue.enqueue(doc_id, upload(tmp_path, f"{doc_id}.pdf")) for doc_id in range(6)]
+        await wait_for_status(store, job_ids, COMPLETED)
+
+        assert time.monotonic() - started < 1.0
+        assert processor.peak == 3 and sorted(processor.calls) == list(range(6))
+        assert store.get(job_ids[0])["progress"] == 1
+        while queue.stats["completed"] < 6 and time.monotonic() - started < 2.0:
+            await asyncio.sleep(0.01)
+        stats = await queue.get_stats()
+        assert stats["completed"] == 6 and stats["jobs"] == {COMPLETED: 6}
+        await queue.close()
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_iq004_failures_retry_with_backoff(self, tmp_path):
+        """IQ-004: Failed attempts should be retried with growing delays and keep the stored chunks; missing sources fail at once"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        processor = FakeProcessor(outcomes=[RuntimeError("quota"), {"success": False, "error": "db"}])
+        queue = make_queue(store, processor)
+        assert [queue.retry_delay(n) for n in (1, 2, 3, 4)] == [0.05, 0.1, 0.2, 0.2]
+
+        retried = await queue.enqueue(1, upload(tmp_path))
+        assert await queue.drain() == 1
+        job = store.get(retried)
+        assert (job["status"], job["attempts"], job["last_error"]) == (QUEUED, 1, "quota")
+        assert await queue.drain() == 0
+
+        await asyncio.sleep(0.08)
+        await queue.drain()
+        await asyncio.sleep(0.15)
+        await queue.drain()
+        assert store.get(retried)["status"] == COMPLETED and store.get(retried)["attempts"] == 3
+        # Retries clear only legacy rows; document_chunks is replaced by the bulk RPC
+        assert processor.cleared == [1, 1]
+
+        missing = await queue.enqueue(2, str(tmp_path / "deleted.pdf"))
+        await queue.drain()
+        job = store.get(missing)
+        assert (job["status"], job["attempts"]) == (FAILED, 1)
+        assert "no longer available" in job["last_error"]
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_iq005_shutdown_returns_running_jobs_to_the_queue(self, tmp_path):
+        """IQ-005: Closing the pool should requeue in-flight jobs without using up an attempt"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        processor = FakeProcessor(delay=10)
+        queue = make_queue(store, processor, workers=1)
+        processor.supabase.table.return_value.execute.return_value = MagicMock(data=[])
+        await queue.start()
+
+        job_id = await queue.enqueue(5, upload(tmp_path))
+        await asyncio.sleep(0.1)
+        job = store.get(job_id)
+        assert job["status"] == RUNNING and job["progress"] == 0.5 and job["progress_note"] == "halfway"
+
+        await queue.close()
+        job = store.get(job_id)
+        assert (job["status"], job["attempts"], job["lease_owner"]) == (QUEUED, 0, None)
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_iq006_lost_lease_stops_processing(self, tmp_path):
+        """IQ-006: A worker whose lease was taken over should stop processing and leave the job alone"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        processor = FakeProcessor(delay=10)
+        queue = make_queue(store, processor, workers=1)
+        processor.supabase.table.return_value.execute.return_value = MagicMock(data=[])
+        store.heartbeat = MagicMock(return_value=False)
+        await queue.start()
+
+        job_id = await queue.enqueue(5, upload(tmp_path))
+        await asyncio.sleep(0.1)
+
+        assert processor.calls == [5] and processor.running == 0
+        job = store.get(job_id)
+        assert (job["status"], job["attempts"], job["lease_owner"]) == (RUNNING, 1, queue.worker_id)
+        assert queue.stats["completed"] == queue.stats["retried"] == queue.stats["failed"] == 0
+        await queue.close()
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_iq007_temp_url_is_used_and_terminal_failures_reach_the_document(self, tmp_path):
+        """IQ-007: Jobs without a path use the temp:// upload; a job that gives up marks its document failed"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        uploaded = upload(tmp_path)
+        processor = FakeProcessor(url=f"temp://{uploaded}")
+        queue = make_queue(store, processor)
+        documents = processor.supabase.table.return_value
+
+        recovered = await queue.enqueue(1)
+        await queue.drain()
+        assert store.get(recovered)["status"] == COMPLETED and processor.calls == [1]
+
+        os.unlink(uploaded)
+        failed = await queue.enqueue(2)
+        await queue.drain()
+        job = store.get(failed)
+        assert (job["status"], job["attempts"]) == (FAILED, 1)
+        documents.update.assert_called_with({"processing_status": "failed", "processing_notes": job["last_error"]})
+        assert processor.calls == [1]
+        store.close()
+
+    @pytest.mark.asyncio
+    async def test_iq010_local_store_sweeps_pending_documents(self, tmp_path):
+        """IQ-010: With the SQLite store, documents inserted as pending later should be queued without a restart"""
+        store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+        processor = FakeProcessor()
+        queue = make_queue(store, processor, workers=1, pending_sweep=0.1)
+        documents = processor.supabase.table.return_value
+        documents.execute.return_value = MagicMock(data=[])
+        await queue.start()
+        assert processor.calls == []
+
+        documents.execute.return_value = MagicMock(data=[{"id": 9, "url": f"temp://{upload(tmp_path)}"}])
+        deadline = time.monotonic() + 2.0
+        while not processor.calls and time.monotonic() < deadline:
+            await asyncio.sleep(0.02)
+        documents.execute.return_value = MagicMock(data=[])
+
+        assert processor.calls[:1] == [9]
+        await queue.close()
+        store.close()
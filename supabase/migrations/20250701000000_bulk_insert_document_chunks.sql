@@ -0,0 +1,41 @@
+-- Bulk insert for document chunks
+-- Replaces one insert_document_chunk_basic RPC call per chunk with one call per document.
+-- Each call runs in a single transaction: with p_replace_existing the old chunk set is swapped for
+-- the new one atomically, so a failed write never leaves a document with no or partial chunks.
+
+CREATE OR REPLACE FUNCTION insert_document_chunks_bulk(
+  p_document_id BIGINT,
+  p_chunks JSONB,                           -- [{chunk_text, embedding, content_token_count, chunk_index}, ...]
+  p_replace_existing BOOLEAN DEFAULT FALSE  -- remove chunks left over from earlier attempts first
+)
+RETURNS TABLE (
+  id bigint,
+  chunk_index integer
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF p_replace_existing THEN
+    DELETE FROM document_chunks WHERE document_chunks.document_id = p_document_id;
+  END IF;
+
+  RETURN QUERY
+  INSERT INTO document_chunks (
+    document_id,
+    chunk_text,
+    chunk_index,
+    embedding,
+    content_token_count
+  )
+  SELECT
+    p_document_id,
+    c->>'chunk_text',
+    (c->>'chunk_index')::integer,
+    (c->>'embedding')::vector(768),
+    (c->>'content_token_count')::integer
+  FROM jsonb_array_elements(p_chunks) AS c
+  RETURNING document_chunks.id, document_chunks.chunk_index;
+END;
+$$;
+
+COMMENT ON FUNCTION insert_document_chunks_bulk IS 'Inserts (or atomically replaces) the chunk set of one document in a single transaction';
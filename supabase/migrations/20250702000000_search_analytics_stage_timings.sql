@@ -0,0 +1,46 @@
+-- Per-stage latency for search analytics
+-- Stores the RAG pipeline's stage timings (embedding, search, context build, generation, ...) next to each
+-- logged search, so slow requests can be attributed to a stage.
+
+ALTER TABLE search_analytics
+  ADD COLUMN IF NOT EXISTS stage_timings JSONB;
+
+-- Overload used when the caller passes stage_timings; the original signature stays untouched
+CREATE OR REPLACE FUNCTION log_search_analytics(
+  query_text TEXT,
+  search_type TEXT,
+  results_count INTEGER,
+  top_score DOUBLE PRECISION,
+  response_time_ms INTEGER,
+  config_profile TEXT,
+  stage_timings JSONB
+)
+RETURNS BIGINT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  new_id BIGINT;
+BEGIN
+  INSERT INTO search_analytics (
+    query_text,
+    search_type,
+    results_count,
+    top_score,
+    response_time_ms,
+    config_profile,
+    stage_timings
+  )
+  VALUES (
+    log_search_analytics.query_text,
+    log_search_analytics.search_type,
+    log_search_analytics.results_count,
+    log_search_analytics.top_score,
+    log_search_analytics.response_time_ms,
+    log_search_analytics.config_profile,
+    log_search_analytics.stage_timings
+  )
+  RETURNING id INTO new_id;
+
+  RETURN new_id;
+END;
+$$;
@@ -0,0 +1,36 @@
+-- Bulk logging for search analytics
+-- The backend buffers analytics events in memory and writes them in batches with one call,
+-- instead of one log_search_analytics RPC per question on the response path.
+
+CREATE OR REPLACE FUNCTION log_search_analytics_bulk(
+  p_events JSONB  -- [{query_text, search_type, results_count, top_score, response_time_ms, config_profile, stage_timings}, ...]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  inserted INTEGER;
+BEGIN
+  INSERT INTO search_analytics (
+    query_text,
+    search_type,
+    results_count,
+    top_score,
+    response_time_ms,
+    config_profile,
+    stage_timings
+  )
+  SELECT
+    e->>'query_text',
+    e->>'search_type',
+    (e->>'results_count')::INTEGER,
+    (e->>'top_score')::DOUBLE PRECISION,
+    (e->>'response_time_ms')::INTEGER,
+    e->>'config_profile',
+    e->'stage_timings'
+  FROM jsonb_array_elements(p_events) AS e;
+
+  GET DIAGNOSTICS inserted = ROW_COUNT;
+  RETURN inserted;
+END;
+$$;
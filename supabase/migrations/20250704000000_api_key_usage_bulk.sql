@@ -0,0 +1,46 @@
+-- Bulk upsert for API key usage
+-- The AI service aggregates usage per key and minute in memory and writes the totals every few
+-- seconds, instead of inserting one api_key_usage row per embedding or generation call.
+-- Readers already sum rows per key, so an existing row for the minute is incremented when found
+-- and a new row is inserted otherwise.
+
+CREATE OR REPLACE FUNCTION record_api_key_usage_bulk(
+  p_rows JSONB  -- [{api_key_id, usage_date, usage_minute, tokens_used, requests_count}, ...]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r JSONB;
+  written INTEGER := 0;
+BEGIN
+  FOR r IN SELECT * FROM jsonb_array_elements(p_rows)
+  LOOP
+    UPDATE api_key_usage
+    SET tokens_used = tokens_used + (r->>'tokens_used')::INTEGER,
+        requests_count = requests_count + (r->>'requests_count')::INTEGER
+    WHERE id = (
+      SELECT id FROM api_key_usage
+      WHERE api_key_id = (r->>'api_key_id')::BIGINT
+        AND usage_minute = (r->>'usage_minute')::TIMESTAMPTZ
+      ORDER BY id
+      LIMIT 1
+    );
+
+    IF NOT FOUND THEN
+      INSERT INTO api_key_usage (api_key_id, usage_date, usage_minute, tokens_used, requests_count)
+      VALUES (
+        (r->>'api_key_id')::BIGINT,
+        (r->>'usage_date')::DATE,
+        (r->>'usage_minute')::TIMESTAMPTZ,
+        (r->>'tokens_used')::INTEGER,
+        (r->>'requests_count')::INTEGER
+      );
+    END IF;
+
+    written := written + 1;
+  END LOOP;
+
+  RETURN written;
+END;
+$$;
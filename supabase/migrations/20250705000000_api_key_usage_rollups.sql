@@ -0,0 +1,286 @@
+-- Materialized per-key usage rollups and a day-partitioned api_key_usage
+-- The dashboard (GET /api/keys/) and the AI service status checks used to aggregate api_key_usage
+-- on every read. A trigger now keeps one rollup row per key with its current day and minute
+-- counters, so those reads touch O(keys) rows. api_key_usage is partitioned by usage_date so old
+-- days can be dropped cheaply instead of growing the table forever.
+
+-- 1. Day-partitioned api_key_usage -------------------------------------------------------------
+
+ALTER TABLE api_key_usage RENAME TO api_key_usage_legacy;
+
+CREATE TABLE api_key_usage (
+  id BIGINT NOT NULL DEFAULT nextval('api_key_usage_id_seq'),
+  api_key_id BIGINT NOT NULL REFERENCES api_keys(id) ON DELETE CASCADE,
+  usage_date DATE NOT NULL DEFAULT CURRENT_DATE,
+  usage_minute TIMESTAMP WITH TIME ZONE NOT NULL,
+  tokens_used INTEGER NOT NULL DEFAULT 0,
+  requests_count INTEGER NOT NULL DEFAULT 0,
+  created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+  PRIMARY KEY (id, usage_date)
+) PARTITION BY RANGE (usage_date);
+
+ALTER SEQUENCE api_key_usage_id_seq OWNED BY api_key_usage.id;
+
+-- Rows outside the daily partitions (e.g. before maintenance created them) land here
+CREATE TABLE api_key_usage_default PARTITION OF api_key_usage DEFAULT;
+
+CREATE INDEX idx_api_key_usage_key_minute ON api_key_usage(api_key_id, usage_minute);
+CREATE INDEX idx_api_key_usage_key_day ON api_key_usage(api_key_id, usage_date);
+
+ALTER TABLE api_key_usage ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "API key usage is viewable by authenticated users"
+  ON api_key_usage FOR SELECT
+  TO authenticated
+  USING (true);
+
+CREATE POLICY "API key usage is insertable by authenticated users"
+  ON api_key_usage FOR INSERT
+  TO authenticated
+  WITH CHECK (true);
+
+CREATE POLICY "API key usage is updatable by authenticated users"
+  ON api_key_usage FOR UPDATE
+  TO authenticated
+  USING (true);
+
+-- Create daily partitions ahead of time and drop those past the retention window.
+-- The window is fixed here rather than taken from the caller: this function drops tables.
+CREATE OR REPLACE FUNCTION maintain_api_key_usage_partitions()
+RETURNS INTEGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  days_ahead CONSTANT INTEGER := 7;
+  retain_days CONSTANT INTEGER := 30;
+  day DATE;
+  partition_name TEXT;
+  dropped INTEGER := 0;
+  old_partition RECORD;
+BEGIN
+  FOR day IN
+    SELECT generate_series(CURRENT_DATE - retain_days, CURRENT_DATE + days_ahead, INTERVAL '1 day')::DATE
+  LOOP
+    partition_name := 'api_key_usage_p' || to_char(day, 'YYYYMMDD');
+    IF to_regclass(partition_name) IS NULL THEN
+      -- A default partition holding rows for this day would block the new partition; move them
+      CREATE TEMP TABLE IF NOT EXISTS api_key_usage_moving (LIKE api_key_usage) ON COMMIT DROP;
+      WITH moved AS (
+        DELETE FROM api_key_usage_default WHERE usage_date = day RETURNING *
+      )
+      INSERT INTO api_key_usage_moving SELECT * FROM moved;
+
+      EXECUTE format(
+        'CREATE TABLE %I PARTITION OF api_key_usage FOR VALUES FROM (%L) TO (%L)',
+        partition_name, day, day + 1
+      );
+
+      -- These rows are already counted in api_key_usage_rollups; the rollup trigger skips them
+      PERFORM set_config('app.skip_usage_rollup', 'on', true);
+      INSERT INTO api_key_usage SELECT * FROM api_key_usage_moving;
+      PERFORM set_config('app.skip_usage_rollup', 'off', true);
+      TRUNCATE api_key_usage_moving;
+    END IF;
+  END LOOP;
+
+  FOR old_partition IN
+    SELECT child.relname
+    FROM pg_inherits
+    JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+    JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+    WHERE parent.relname = 'api_key_usage'
+      AND child.relname ~ '^api_key_usage_p[0-9]{8}$'
+      AND to_date(substring(child.relname FROM '[0-9]{8}$'), 'YYYYMMDD') < CURRENT_DATE - retain_days
+  LOOP
+    EXECUTE format('DROP TABLE %I', old_partition.relname);
+    dropped := dropped + 1;
+  END LOOP;
+
+  DELETE FROM api_key_usage_default WHERE usage_date < CURRENT_DATE - retain_days;
+
+  RETURN dropped;
+END;
+$$;
+
+SELECT maintain_api_key_usage_partitions();
+
+-- Run maintenance daily when pg_cron is available; the backend also runs it on startup when it
+-- has the service role key (SUPABASE_SERVICE_KEY), since only service_role may execute it
+DO $$
+BEGIN
+  IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_cron') THEN
+    PERFORM cron.schedule('maintain-api-key-usage', '15 0 * * *', 'SELECT maintain_api_key_usage_partitions()');
+  END IF;
+END;
+$$;
+
+-- 2. Per-key rollups maintained by trigger -----------------------------------------------------
+
+CREATE TABLE IF NOT EXISTS api_key_usage_rollups (
+  api_key_id BIGINT PRIMARY KEY REFERENCES api_keys(id) ON DELETE CASCADE,
+  usage_date DATE NOT NULL,
+  daily_tokens BIGINT NOT NULL DEFAULT 0,
+  daily_requests INTEGER NOT NULL DEFAULT 0,
+  usage_minute TIMESTAMP WITH TIME ZONE NOT NULL,
+  minute_tokens INTEGER NOT NULL DEFAULT 0,
+  minute_requests INTEGER NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+ALTER TABLE api_key_usage_rollups ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "API key usage rollups are viewable by authenticated users"
+  ON api_key_usage_rollups FOR SELECT
+  TO authenticated
+  USING (true);
+
+-- Counters roll forward: a newer day or minute replaces the stored one, late rows for an older
+-- minute of the same day only add to the daily counters
+CREATE OR REPLACE FUNCTION apply_api_key_usage_rollup()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  delta_tokens INTEGER := NEW.tokens_used;
+  delta_requests INTEGER := NEW.requests_count;
+BEGIN
+  -- Set by maintain_api_key_usage_partitions while it moves rows into a new partition
+  IF current_setting('app.skip_usage_rollup', true) = 'on' THEN
+    RETURN NULL;
+  END IF;
+
+  IF TG_OP = 'UPDATE' THEN
+    delta_tokens := NEW.tokens_used - OLD.tokens_used;
+    delta_requests := NEW.requests_count - OLD.requests_count;
+  END IF;
+
+  INSERT INTO api_key_usage_rollups AS r (
+    api_key_id, usage_date, daily_tokens, daily_requests, usage_minute, minute_tokens, minute_requests
+  )
+  VALUES (NEW.api_key_id, NEW.usage_date, delta_tokens, delta_requests, NEW.usage_minute, delta_tokens, delta_requests)
+  ON CONFLICT (api_key_id) DO UPDATE SET
+    daily_tokens = CASE
+      WHEN EXCLUDED.usage_date > r.usage_date THEN EXCLUDED.daily_tokens
+      WHEN EXCLUDED.usage_date = r.usage_date THEN r.daily_tokens + EXCLUDED.daily_tokens
+      ELSE r.daily_tokens END,
+    daily_requests = CASE
+      WHEN EXCLUDED.usage_date > r.usage_date THEN EXCLUDED.daily_requests
+      WHEN EXCLUDED.usage_date = r.usage_date THEN r.daily_requests + EXCLUDED.daily_requests
+      ELSE r.daily_requests END,
+    usage_date = GREATEST(r.usage_date, EXCLUDED.usage_date),
+    minute_tokens = CASE
+      WHEN EXCLUDED.usage_minute > r.usage_minute THEN EXCLUDED.minute_tokens
+      WHEN EXCLUDED.usage_minute = r.usage_minute THEN r.minute_tokens + EXCLUDED.minute_tokens
+      ELSE r.minute_tokens END,
+    minute_requests = CASE
+      WHEN EXCLUDED.usage_minute > r.usage_minute THEN EXCLUDED.minute_requests
+      WHEN EXCLUDED.usage_minute = r.usage_minute THEN r.minute_requests + EXCLUDED.minute_requests
+      ELSE r.minute_requests END,
+    usage_minute = GREATEST(r.usage_minute, EXCLUDED.usage_minute),
+    updated_at = NOW();
+
+  RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER api_key_usage_rollup
+  AFTER INSERT OR UPDATE OF tokens_used, requests_count ON api_key_usage
+  FOR EACH ROW EXECUTE FUNCTION apply_api_key_usage_rollup();
+
+-- Copy the retained history; it passes through the trigger, so the rollups start populated
+INSERT INTO api_key_usage (id, api_key_id, usage_date, usage_minute, tokens_used, requests_count, created_at)
+SELECT id, api_key_id, usage_date, usage_minute, tokens_used, requests_count, created_at
+FROM api_key_usage_legacy
+WHERE usage_date >= CURRENT_DATE - 30;
+
+DROP TABLE api_key_usage_legacy;
+
+-- 3. Readers ------------------------------------------------------------------------------------
+
+-- Same signature as before, now one rollup row per key; other days are read from their partition
+CREATE OR REPLACE FUNCTION get_all_keys_usage_stats(
+    target_date DATE DEFAULT CURRENT_DATE,
+    target_minute TIMESTAMPTZ DEFAULT date_trunc('minute', NOW())
+)
+RETURNS TABLE (
+    api_key_id INTEGER,
+    daily_tokens INTEGER,
+    daily_requests INTEGER,
+    minute_tokens INTEGER,
+    minute_requests INTEGER
+)
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        k.id::INTEGER,
+        COALESCE(CASE WHEN r.usage_date = target_date THEN r.daily_tokens
+             ELSE (SELECT SUM(u.tokens_used) FROM api_key_usage u
+                   WHERE u.api_key_id = k.id AND u.usage_date = target_date) END, 0)::INTEGER,
+        COALESCE(CASE WHEN r.usage_date = target_date THEN r.daily_requests
+             ELSE (SELECT SUM(u.requests_count) FROM api_key_usage u
+                   WHERE u.api_key_id = k.id AND u.usage_date = target_date) END, 0)::INTEGER,
+        COALESCE(CASE WHEN r.usage_minute = target_minute THEN r.minute_tokens END, 0)::INTEGER,
+        COALESCE(CASE WHEN r.usage_minute = target_minute THEN r.minute_requests END, 0)::INTEGER
+    FROM api_keys k
+    LEFT JOIN api_key_usage_rollups r ON r.api_key_id = k.id
+    WHERE k.is_active = true
+    ORDER BY k.id;
+END;
+$$;
+
+-- Keep the bulk writer on a single partition when it looks up the minute row
+CREATE OR REPLACE FUNCTION record_api_key_usage_bulk(
+  p_rows JSONB  -- [{api_key_id, usage_date, usage_minute, tokens_used, requests_count}, ...]
+)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  r JSONB;
+  written INTEGER := 0;
+BEGIN
+  FOR r IN SELECT * FROM jsonb_array_elements(p_rows)
+  LOOP
+    UPDATE api_key_usage
+    SET tokens_used = tokens_used + (r->>'tokens_used')::INTEGER,
+        requests_count = requests_count + (r->>'requests_count')::INTEGER
+    WHERE usage_date = (r->>'usage_date')::DATE
+      AND id = (
+        SELECT id FROM api_key_usage
+        WHERE api_key_id = (r->>'api_key_id')::BIGINT
+          AND usage_date = (r->>'usage_date')::DATE
+          AND usage_minute = (r->>'usage_minute')::TIMESTAMPTZ
+        ORDER BY id
+        LIMIT 1
+      );
+
+    IF NOT FOUND THEN
+      INSERT INTO api_key_usage (api_key_id, usage_date, usage_minute, tokens_used, requests_count)
+      VALUES (
+        (r->>'api_key_id')::BIGINT,
+        (r->>'usage_date')::DATE,
+        (r->>'usage_minute')::TIMESTAMPTZ,
+        (r->>'tokens_used')::INTEGER,
+        (r->>'requests_count')::INTEGER
+      );
+    END IF;
+
+    written := written + 1;
+  END LOOP;
+
+  RETURN written;
+END;
+$$;
+
+GRANT SELECT ON api_key_usage_rollups TO authenticated;
+GRANT EXECUTE ON FUNCTION get_all_keys_usage_stats(DATE, TIMESTAMPTZ) TO authenticated;
+REVOKE EXECUTE ON FUNCTION maintain_api_key_usage_partitions() FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION maintain_api_key_usage_partitions() TO service_role;
+
+COMMENT ON TABLE api_key_usage_rollups IS 'Current day and minute usage per API key, maintained by the api_key_usage_rollup trigger';
+COMMENT ON FUNCTION maintain_api_key_usage_partitions IS 'Create upcoming daily api_key_usage partitions and drop those past retention';
@@ -0,0 +1,201 @@
+-- Durable ingestion job queue
+-- Document ingestion used to run in FastAPI BackgroundTasks (lost on restart) and in a thread that
+-- polled documents every 30 seconds. Uploads now enqueue a row here; backend workers claim jobs with
+-- a renewable lease, so any number of workers can share the queue and interrupted jobs are retried.
+
+CREATE TABLE IF NOT EXISTS ingestion_jobs (
+  id BIGSERIAL PRIMARY KEY,
+  document_id BIGINT NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+  file_path TEXT,
+  -- Host that holds file_path (a local upload); only workers on that host may claim the job
+  host TEXT,
+  status TEXT NOT NULL DEFAULT 'queued' CHECK (status IN ('queued', 'running', 'completed', 'failed')),
+  attempts INTEGER NOT NULL DEFAULT 0,
+  max_attempts INTEGER NOT NULL DEFAULT 5,
+  available_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  lease_owner TEXT,
+  lease_expires_at TIMESTAMP WITH TIME ZONE,
+  progress REAL NOT NULL DEFAULT 0,
+  progress_note TEXT,
+  last_error TEXT,
+  created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+-- At most one queued/running job per document; enqueueing again returns the existing job
+CREATE UNIQUE INDEX IF NOT EXISTS ingestion_jobs_one_active_per_document
+  ON ingestion_jobs(document_id) WHERE status IN ('queued', 'running');
+CREATE INDEX IF NOT EXISTS idx_ingestion_jobs_claim ON ingestion_jobs(status, available_at);
+
+ALTER TABLE ingestion_jobs ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Ingestion jobs are viewable by authenticated users"
+  ON ingestion_jobs FOR SELECT
+  TO authenticated
+  USING (true);
+
+CREATE OR REPLACE FUNCTION enqueue_ingestion_job(
+  p_document_id BIGINT,
+  p_file_path TEXT DEFAULT NULL,
+  p_max_attempts INTEGER DEFAULT 5,
+  p_host TEXT DEFAULT NULL
+)
+RETURNS BIGINT
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  job_id BIGINT;
+BEGIN
+  INSERT INTO ingestion_jobs (document_id, file_path, max_attempts, host)
+  VALUES (p_document_id, p_file_path, p_max_attempts, p_host)
+  ON CONFLICT (document_id) WHERE status IN ('queued', 'running')
+  DO UPDATE SET file_path = COALESCE(EXCLUDED.file_path, ingestion_jobs.file_path),
+                host = CASE WHEN EXCLUDED.file_path IS NULL THEN ingestion_jobs.host ELSE EXCLUDED.host END,
+                updated_at = NOW()
+  RETURNING id INTO job_id;
+
+  RETURN job_id;
+END;
+$$;
+
+-- Lease the oldest runnable job: queued and due, or running with an expired lease. Jobs pinned to
+-- a host (local uploads) are only handed to workers on that host
+CREATE OR REPLACE FUNCTION claim_ingestion_job(
+  p_worker TEXT,
+  p_lease_seconds INTEGER DEFAULT 300,
+  p_host TEXT DEFAULT NULL
+)
+RETURNS SETOF ingestion_jobs
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  RETURN QUERY
+  UPDATE ingestion_jobs j
+  SET status = 'running',
+      attempts = j.attempts + 1,
+      lease_owner = p_worker,
+      lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+      updated_at = NOW()
+  WHERE j.id = (
+    SELECT id FROM ingestion_jobs
+    WHERE ((status = 'queued' AND available_at <= NOW())
+       OR (status = 'running' AND lease_expires_at < NOW()))
+      AND (host IS NULL OR host = p_host)
+    ORDER BY available_at, id
+    FOR UPDATE SKIP LOCKED
+    LIMIT 1
+  )
+  RETURNING j.*;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION heartbeat_ingestion_job(
+  p_job_id BIGINT,
+  p_worker TEXT,
+  p_lease_seconds INTEGER DEFAULT 300,
+  p_progress REAL DEFAULT NULL,
+  p_note TEXT DEFAULT NULL
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  UPDATE ingestion_jobs
+  SET lease_expires_at = NOW() + make_interval(secs => p_lease_seconds),
+      progress = COALESCE(p_progress, progress),
+      progress_note = COALESCE(p_note, progress_note),
+      updated_at = NOW()
+  WHERE id = p_job_id AND status = 'running' AND lease_owner = p_worker;
+
+  RETURN FOUND;
+END;
+$$;
+
+-- p_status: 'completed', 'failed', 'queued' (retry after p_retry_seconds) or 'released'
+-- (handed back on shutdown without using up an attempt)
+CREATE OR REPLACE FUNCTION finish_ingestion_job(
+  p_job_id BIGINT,
+  p_worker TEXT,
+  p_status TEXT,
+  p_error TEXT DEFAULT NULL,
+  p_retry_seconds INTEGER DEFAULT 0
+)
+RETURNS BOOLEAN
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  IF p_status = 'completed' THEN
+    UPDATE ingestion_jobs
+    SET status = 'completed', progress = 1, lease_owner = NULL, lease_expires_at = NULL, updated_at = NOW()
+    WHERE id = p_job_id AND lease_owner = p_worker;
+  ELSIF p_status = 'released' THEN
+    UPDATE ingestion_jobs
+    SET status = 'queued', attempts = GREATEST(attempts - 1, 0), lease_owner = NULL,
+        lease_expires_at = NULL, available_at = NOW(), updated_at = NOW()
+    WHERE id = p_job_id AND lease_owner = p_worker;
+  ELSE
+    UPDATE ingestion_jobs
+    SET status = p_status, last_error = p_error, lease_owner = NULL, lease_expires_at = NULL,
+        available_at = NOW() + make_interval(secs => p_retry_seconds), updated_at = NOW()
+    WHERE id = p_job_id AND lease_owner = p_worker;
+  END IF;
+
+  RETURN FOUND;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION ingestion_job_counts()
+RETURNS TABLE (status TEXT, jobs BIGINT)
+LANGUAGE sql
+SECURITY DEFINER
+AS $$
+  SELECT j.status, COUNT(*) FROM ingestion_jobs j GROUP BY j.status;
+$$;
+
+-- Documents set back to 'pending' (or inserted pending with a stored URL) are queued without
+-- polling; uploads with a local temp:// file are queued by the backend with the file path and host
+CREATE OR REPLACE FUNCTION enqueue_pending_document()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  PERFORM enqueue_ingestion_job(NEW.id);
+  RETURN NULL;
+END;
+$$;
+
+CREATE TRIGGER documents_enqueue_ingestion
+  AFTER INSERT OR UPDATE OF processing_status ON documents
+  FOR EACH ROW
+  WHEN (NEW.processing_status = 'pending' AND NEW.url NOT LIKE 'temp://%')
+  EXECUTE FUNCTION enqueue_pending_document();
+
+-- Documents already waiting when this migration runs
+SELECT enqueue_ingestion_job(id)
+FROM documents
+WHERE processing_status = 'pending' AND url NOT LIKE 'temp://%';
+
+GRANT SELECT ON ingestion_jobs TO authenticated;
+
+-- Only the backend workers (service_role) may enqueue, claim or finish jobs; SECURITY DEFINER
+-- functions are executable by PUBLIC unless revoked
+REVOKE EXECUTE ON FUNCTION enqueue_ingestion_job(BIGINT, TEXT, INTEGER, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION claim_ingestion_job(TEXT, INTEGER, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION heartbeat_ingestion_job(BIGINT, TEXT, INTEGER, REAL, TEXT) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION finish_ingestion_job(BIGINT, TEXT, TEXT, TEXT, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION ingestion_job_counts() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION enqueue_pending_document() FROM PUBLIC, anon, authenticated;
+
+GRANT EXECUTE ON FUNCTION enqueue_ingestion_job(BIGINT, TEXT, INTEGER, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION claim_ingestion_job(TEXT, INTEGER, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION heartbeat_ingestion_job(BIGINT, TEXT, INTEGER, REAL, TEXT) TO service_role;
+GRANT EXECUTE ON FUNCTION finish_ingestion_job(BIGINT, TEXT, TEXT, TEXT, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION ingestion_job_counts() TO service_role;
+
+COMMENT ON TABLE ingestion_jobs IS 'Document ingestion jobs claimed by backend workers with renewable leases';
+COMMENT ON FUNCTION claim_ingestion_job IS 'Lease the next runnable ingestion job (FOR UPDATE SKIP LOCKED)';
@@ -0,0 +1,45 @@
+-- Corpus watermark shared by every backend process
+-- Search result caches and the in-process vector index used a process-local version, so chunks
+-- written or deleted elsewhere (another worker, the standalone ingestion script, frontend deletes
+-- that cascade to document_chunks) never invalidated them. Statement-level triggers bump one
+-- counter row whenever the chunk set changes; backends poll it and resync when it moves.
+
+CREATE TABLE IF NOT EXISTS corpus_watermark (
+  id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+  version BIGINT NOT NULL DEFAULT 0,
+  updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO corpus_watermark (id) VALUES (TRUE) ON CONFLICT (id) DO NOTHING;
+
+ALTER TABLE corpus_watermark ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Corpus watermark is viewable by everyone"
+  ON corpus_watermark FOR SELECT
+  USING (true);
+
+CREATE OR REPLACE FUNCTION bump_corpus_watermark()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+  UPDATE corpus_watermark SET version = version + 1, updated_at = NOW() WHERE id;
+  RETURN NULL;
+END;
+$$;
+
+-- Once per statement, so a bulk chunk insert costs one extra row update
+CREATE TRIGGER document_chunks_corpus_watermark
+  AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON document_chunks
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_watermark();
+
+-- Search results carry the document name
+CREATE TRIGGER documents_corpus_watermark
+  AFTER UPDATE OF name ON documents
+  FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_watermark();
+
+REVOKE EXECUTE ON FUNCTION bump_corpus_watermark() FROM PUBLIC, anon, authenticated;
+GRANT SELECT ON corpus_watermark TO anon, authenticated;
+
+COMMENT ON TABLE corpus_watermark IS 'Version counter bumped whenever document_chunks changes; polled by backends to invalidate caches';
@@ -0,0 +1,109 @@
+-- Per-document corpus change log
+-- The corpus watermark only says that the chunk set changed, so every backend reloaded all chunk
+-- embeddings on each bump, including bumps from its own ingestion. Each bump now also records the
+-- documents it touched, so backends reload just those documents. A NULL document_id (TRUNCATE)
+-- means the change cannot be narrowed down and a full reload is needed.
+
+CREATE TABLE IF NOT EXISTS corpus_changes (
+  version BIGINT NOT NULL,
+  document_id BIGINT,
+  changed_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_corpus_changes_version ON corpus_changes (version);
+CREATE INDEX IF NOT EXISTS idx_corpus_changes_changed_at ON corpus_changes (changed_at);
+
+ALTER TABLE corpus_changes ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Corpus changes are viewable by everyone"
+  ON corpus_changes FOR SELECT
+  USING (true);
+
+-- Bumps the watermark once per statement and logs the affected documents under the new version.
+-- Statements that touch no rows do not bump it, so every version has at least one log row and
+-- backends can tell a complete log from a pruned one.
+CREATE OR REPLACE FUNCTION log_corpus_change()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  v_version BIGINT;
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;
+  ELSIF TG_OP = 'DELETE' THEN
+    IF NOT EXISTS (SELECT 1 FROM old_rows) THEN RETURN NULL; END IF;
+  ELSIF TG_OP = 'UPDATE' THEN
+    IF NOT EXISTS (SELECT 1 FROM new_rows) THEN RETURN NULL; END IF;
+  END IF;
+
+  UPDATE corpus_watermark SET version = version + 1, updated_at = NOW() WHERE id
+  RETURNING version INTO v_version;
+
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO corpus_changes (version, document_id) SELECT DISTINCT v_version, document_id FROM new_rows;
+  ELSIF TG_OP = 'DELETE' THEN
+    INSERT INTO corpus_changes (version, document_id) SELECT DISTINCT v_version, document_id FROM old_rows;
+  ELSIF TG_OP = 'UPDATE' THEN
+    INSERT INTO corpus_changes (version, document_id)
+    SELECT v_version, document_id FROM new_rows UNION SELECT v_version, document_id FROM old_rows;
+  ELSE
+    INSERT INTO corpus_changes (version, document_id) VALUES (v_version, NULL);
+  END IF;
+
+  -- Backends poll every few seconds; a day of history is plenty
+  DELETE FROM corpus_changes WHERE changed_at < NOW() - INTERVAL '1 day';
+  RETURN NULL;
+END;
+$$;
+
+-- Renames change the document name carried by search results
+CREATE OR REPLACE FUNCTION log_document_rename()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+  v_version BIGINT;
+BEGIN
+  UPDATE corpus_watermark SET version = version + 1, updated_at = NOW() WHERE id
+  RETURNING version INTO v_version;
+  INSERT INTO corpus_changes (version, document_id) VALUES (v_version, NEW.id);
+  RETURN NULL;
+END;
+$$;
+
+-- Transition tables allow only one event per trigger, so each event gets its own
+DROP TRIGGER IF EXISTS document_chunks_corpus_watermark ON document_chunks;
+DROP TRIGGER IF EXISTS documents_corpus_watermark ON documents;
+
+CREATE TRIGGER document_chunks_corpus_insert
+  AFTER INSERT ON document_chunks
+  REFERENCING NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION log_corpus_change();
+
+CREATE TRIGGER document_chunks_corpus_update
+  AFTER UPDATE ON document_chunks
+  REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION log_corpus_change();
+
+CREATE TRIGGER document_chunks_corpus_delete
+  AFTER DELETE ON document_chunks
+  REFERENCING OLD TABLE AS old_rows
+  FOR EACH STATEMENT EXECUTE FUNCTION log_corpus_change();
+
+CREATE TRIGGER document_chunks_corpus_truncate
+  AFTER TRUNCATE ON document_chunks
+  FOR EACH STATEMENT EXECUTE FUNCTION log_corpus_change();
+
+CREATE TRIGGER documents_corpus_rename
+  AFTER UPDATE OF name ON documents
+  FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+  EXECUTE FUNCTION log_document_rename();
+
+REVOKE EXECUTE ON FUNCTION log_corpus_change() FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION log_document_rename() FROM PUBLIC, anon, authenticated;
+GRANT SELECT ON corpus_changes TO anon, authenticated;
+
+COMMENT ON TABLE corpus_changes IS 'Documents touched by each corpus watermark version; lets backends reload only changed documents';